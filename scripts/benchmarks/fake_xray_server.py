@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Xray Cloud authentication and GraphQL endpoints.
+
+The server keeps a synthetic project in memory and answers the operations
+used by the fetch, upload, test-manager and rollback scripts, so those
+scripts can be exercised at scale without touching production.
+
+Usage:
+    python fake_xray_server.py --size 10000 --port 8765
+    python fake_xray_server.py --seed-file project_100k.ndjson
+
+Point a script at it by overriding its endpoint constants, e.g.
+    fetch_all_xray_tests.GRAPHQL_URL = "http://127.0.0.1:8765/api/v2/graphql"
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "xray-remediation" / "xray-api"))
+
+from query_complexity import root_field_errors
+from synthetic_project import generate_project, read_ndjson
+
+FAKE_TOKEN = "fake-xray-token"
+ROOT_FIELD_PATTERN = re.compile(r'\{\s*(\w+)')
+# `alias: field(arguments)` - batched operations put one aliased root field per item
+ALIASED_FIELD_PATTERN = re.compile(r'(\w+)\s*:\s*(\w+)\s*\(([^)]*)\)')
+ARGUMENT_PATTERN = re.compile(r'(\w+)\s*:\s*(?:\$(\w+)|(-?\d+)|"([^"]*)")')
+JQL_ID_BOUND_PATTERN = re.compile(r'\bid\s*(>=|<=|>|<)\s*(\d+)', re.IGNORECASE)
+JQL_ORDER_PATTERN = re.compile(r'ORDER\s+BY\s+id(?:\s+(ASC|DESC))?', re.IGNORECASE)
+JQL_IN_PATTERN = re.compile(r'\b(key|id|labels)\s+in\s*\(([^)]*)\)', re.IGNORECASE)
+COMPARISONS = {
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+def aliased_fields(query: str, variables: Dict[str, Any]) -> List[tuple]:
+    """(alias, field, arguments) of each aliased root field, with variables substituted."""
+    fields = []
+    for alias, field, arguments in ALIASED_FIELD_PATTERN.findall(query):
+        values = {}
+        for name, variable, number, string in ARGUMENT_PATTERN.findall(arguments):
+            if variable:
+                values[name] = variables.get(variable)
+            else:
+                values[name] = int(number) if number else string
+        fields.append((alias, field, values))
+    return fields
+
+
+def project_from_records(records: Iterable[Dict[str, Any]], project_key: str = "FRAMED") -> "FakeXrayProject":
+    """Build a FakeXrayProject from synthetic_project.py records (generated or read from NDJSON)."""
+    tests = []
+    preconditions = []
+    folders = []
+    for record in records:
+        record = dict(record)
+        record_type = record.pop("type", "test")
+        if record_type == "test":
+            tests.append(record)
+        elif record_type == "precondition":
+            preconditions.append(record)
+        elif record_type == "folder":
+            folders.append(record)
+    return FakeXrayProject(tests, project_key, preconditions, folders)
+
+
+def build_synthetic_project(size: int, seed: int = 0, project_key: str = "FRAMED") -> "FakeXrayProject":
+    """
+    Build a deterministic synthetic project learned from the import_data/ TestRail exports.
+
+    Args:
+        size: Number of tests to generate
+        seed: Random seed so repeated runs produce identical projects
+        project_key: Jira project key used for issue keys
+
+    Returns:
+        FakeXrayProject ready to be served
+    """
+    return project_from_records(generate_project(size, seed, project_key), project_key)
+
+
+def load_seed_file(path: str, project_key: str = "FRAMED") -> "FakeXrayProject":
+    """Load a project from an NDJSON file written by synthetic_project.py."""
+    return project_from_records(read_ndjson(path), project_key)
+
+
+class FakeXrayProject:
+    """In-memory project state mutated by the fake GraphQL resolvers."""
+
+    def __init__(self, tests: List[Dict[str, Any]], project_key: str = "FRAMED",
+                 preconditions: Optional[List[Dict[str, Any]]] = None,
+                 folders: Optional[List[Dict[str, Any]]] = None):
+        self.project_key = project_key
+        self.tests = tests
+        self.tests_by_id = {test["issueId"]: test for test in tests}
+        self.preconditions = preconditions or []
+        self.preconditions_by_id = {p["issueId"]: p for p in self.preconditions}
+        self.folders = {}
+        for folder in folders or []:
+            folder_id = f"folder-{len(self.folders) + 1}"
+            self.folders[folder_id] = {"id": folder_id, "name": folder["name"], "path": folder["path"]}
+        self.test_sets = {}
+        self.next_issue_id = 9000000
+        self.next_step_id = 9000000
+        # Step id -> test, for the step mutations addressed by step id alone
+        self.tests_by_step_id = {step["id"]: test for test in tests for step in test.get("steps") or []}
+        self.lock = threading.Lock()
+
+    def _new_issue_id(self) -> str:
+        self.next_issue_id += 1
+        return str(self.next_issue_id)
+
+    def _new_step_id(self) -> str:
+        self.next_step_id += 1
+        return f"step-{self.next_step_id}"
+
+    def resolve(self, field: str, variables: Dict[str, Any]) -> Any:
+        """
+        Resolve a single root field.
+
+        Raises:
+            KeyError: If the operation is not supported by the fake server
+        """
+        resolver = getattr(self, f"_resolve_{field}", None)
+        if resolver is None:
+            raise KeyError(field)
+        with self.lock:
+            return resolver(variables)
+
+    def _filter_jql(self, items: List[Dict[str, Any]], jql: Optional[str]) -> List[Dict[str, Any]]:
+        """Apply the `id <op> N` bounds, `key|id|labels in (...)` and `ORDER BY id` of a JQL query; other clauses are ignored."""
+        if not jql:
+            return items
+        for field, values in JQL_IN_PATTERN.findall(jql):
+            wanted = {value.strip().strip('"').upper() for value in values.split(",")}
+            if field.lower() == "key":
+                # Like Jira, a key that does not exist fails the whole query
+                known = {(item.get("jira") or {}).get("key", "").upper() for item in items}
+                unknown = sorted(wanted - known)
+                if unknown:
+                    raise ValueError(f"An issue with key '{unknown[0]}' does not exist for field 'key'.")
+                items = [item for item in items if (item.get("jira") or {}).get("key", "").upper() in wanted]
+            elif field.lower() == "labels":
+                items = [item for item in items
+                         if any(label.upper() in wanted for label in (item.get("jira") or {}).get("labels") or [])]
+            else:
+                items = [item for item in items if item["issueId"] in wanted]
+        for operator, value in JQL_ID_BOUND_PATTERN.findall(jql):
+            items = [item for item in items if COMPARISONS[operator](int(item["issueId"]), int(value))]
+        order = JQL_ORDER_PATTERN.search(jql)
+        if order:
+            items = sorted(items, key=lambda item: int(item["issueId"]),
+                           reverse=(order.group(1) or "").upper() == "DESC")
+        return items
+
+    def _page(self, variables: Dict[str, Any], items: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        items = self._filter_jql(self.tests if items is None else items, variables.get("jql"))
+        start = variables.get("start") or 0
+        limit = variables.get("limit") or 100
+        return {
+            "total": len(items),
+            "start": start,
+            "limit": limit,
+            "results": items[start:start + limit]
+        }
+
+    def _resolve_getExpandedTests(self, variables):
+        return self._page(variables)
+
+    def _resolve_getTests(self, variables):
+        return self._page(variables)
+
+    def _resolve_getTest(self, variables):
+        return self.tests_by_id.get(variables.get("issueId"))
+
+    def _resolve_getPreconditions(self, variables):
+        return self._page(variables, self.preconditions)
+
+    def _resolve_getPrecondition(self, variables):
+        precondition = self.preconditions_by_id.get(variables.get("issueId"))
+        if precondition is None:
+            return None
+        linked = [{"issueId": test["issueId"], "jira": test["jira"]} for test in self.tests
+                  if any(p["issueId"] == precondition["issueId"]
+                         for p in (test.get("preconditions") or {}).get("results") or [])]
+        return dict(precondition, tests={"total": len(linked), "results": linked})
+
+    def _resolve_removePreconditionsFromTest(self, variables):
+        test = self.tests_by_id[variables.get("issueId")]
+        linked = test.setdefault("preconditions", {"total": 0, "results": []})
+        removed = set(variables.get("preconditionIssueIds") or [])
+        linked["results"] = [p for p in linked["results"] if p["issueId"] not in removed]
+        linked["total"] = len(linked["results"])
+        return "ok"
+
+    def _resolve_deletePrecondition(self, variables):
+        precondition = self.preconditions_by_id.pop(variables.get("issueId"), None)
+        if precondition is None:
+            return None
+        self.preconditions.remove(precondition)
+        return "ok"
+
+    def _resolve_createPrecondition(self, variables):
+        issue_id = self._new_issue_id()
+        fields = (variables.get("jira") or {}).get("fields") or {}
+        precondition = {
+            "issueId": issue_id,
+            "definition": variables.get("definition", ""),
+            "preconditionType": {"name": "Manual", "kind": "Steps"},
+            "jira": {"key": f"{self.project_key}-P{len(self.preconditions) + 1}",
+                     "summary": fields.get("summary") or variables.get("summary", "")}
+        }
+        self.preconditions.append(precondition)
+        self.preconditions_by_id[issue_id] = precondition
+        return {"precondition": precondition, "warnings": []}
+
+    def _resolve_addPreconditionsToTest(self, variables):
+        test = self.tests_by_id[variables.get("issueId") or variables.get("testIssueId")]
+        linked = test.setdefault("preconditions", {"total": 0, "results": []})
+        present = {p["issueId"] for p in linked["results"]}
+        added, unknown = [], []
+        for issue_id in variables.get("preconditionIssueIds") or []:
+            if issue_id not in self.preconditions_by_id:
+                unknown.append(issue_id)
+            elif issue_id not in present:
+                linked["results"].append(self.preconditions_by_id[issue_id])
+                present.add(issue_id)
+                added.append(issue_id)
+        linked["total"] = len(linked["results"])
+        warning = f"Preconditions not found: {', '.join(unknown)}" if unknown else None
+        return {"addedPreconditions": added, "warning": warning}
+
+    def _resolve_addTestStep(self, variables):
+        test = self.tests_by_id[variables["issueId"]]
+        step = dict(variables.get("step") or {})
+        step["id"] = self._new_step_id()
+        test["steps"].append(step)
+        self.tests_by_step_id[step["id"]] = test
+        return step
+
+    def _resolve_updateTestStep(self, variables):
+        test = self.tests_by_step_id.get(variables["stepId"])
+        for step in (test or {}).get("steps") or []:
+            if step["id"] == variables["stepId"]:
+                step.update(variables.get("step") or {})
+                return {"warnings": []}
+        return {"warnings": [f"Step {variables['stepId']} not found"]}
+
+    def _resolve_removeTestStep(self, variables):
+        test = self.tests_by_step_id.pop(variables["stepId"], None)
+        if test is not None:
+            test["steps"] = [s for s in test["steps"] if s["id"] != variables["stepId"]]
+        return "ok"
+
+    def _resolve_removeAllTestSteps(self, variables):
+        test = self.tests_by_id[variables["issueId"]]
+        for step in test["steps"]:
+            self.tests_by_step_id.pop(step["id"], None)
+        test["steps"] = []
+        return "ok"
+
+    def _resolve_createFolder(self, variables):
+        folder_id = f"folder-{len(self.folders) + 1}"
+        parent = self.folders.get(variables.get("parentId"))
+        path = f"{parent['path'] if parent else ''}/{variables['name']}"
+        folder = {"id": folder_id, "name": variables["name"], "path": path}
+        self.folders[folder_id] = folder
+        return {"folder": folder, "warnings": []}
+
+    def _resolve_createTest(self, variables):
+        issue_id = self._new_issue_id()
+        key = f"{self.project_key}-{len(self.tests) + 1}"
+        steps = [
+            {"id": self._new_step_id(), "action": s.get("action", ""), "data": "",
+             "result": s.get("expectedResult", s.get("result", ""))}
+            for s in variables.get("steps") or []
+        ]
+        test = {
+            "issueId": issue_id,
+            "jira": {
+                "key": key,
+                "summary": variables.get("summary", ""),
+                "description": variables.get("description", ""),
+                "labels": variables.get("labels") or [],
+                "priority": {"name": variables.get("priority") or "Medium"},
+                "status": {"name": "To Do"},
+                "assignee": None
+            },
+            "steps": steps,
+            "preconditions": {"total": 0, "results": []},
+            "testType": {"name": variables.get("testType", "Manual"), "kind": "Steps"},
+            "folder": None,
+            "lastModified": "2025-08-01T00:00:00Z"
+        }
+        self.tests.append(test)
+        self.tests_by_id[issue_id] = test
+        self.tests_by_step_id.update((step["id"], test) for step in steps)
+        return {"test": {"issueId": issue_id, "key": key, "summary": test["jira"]["summary"]}, "warnings": []}
+
+    def _resolve_addTestsToFolder(self, variables):
+        folder = self.folders.get(variables.get("folderId")) or {
+            "id": variables.get("folderId"), "name": variables.get("folderPath"), "path": variables.get("folderPath")
+        }
+        test_ids = variables.get("testIds") or variables.get("testIssueIds") or []
+        for issue_id in test_ids:
+            if issue_id in self.tests_by_id:
+                self.tests_by_id[issue_id]["folder"] = {"name": folder["name"], "path": folder["path"]}
+        return {"folder": dict(folder, testsCount=len(test_ids)), "warnings": []}
+
+    def _resolve_createTestSet(self, variables):
+        issue_id = self._new_issue_id()
+        test_set = {
+            "issueId": issue_id,
+            "key": f"{self.project_key}-S{len(self.test_sets) + 1}",
+            "summary": variables.get("summary") or variables.get("name", ""),
+            "tests": variables.get("tests") or variables.get("testIssueIds") or []
+        }
+        self.test_sets[issue_id] = test_set
+        return {"testSet": test_set, "warnings": []}
+
+
+class FakeXrayHandler(BaseHTTPRequestHandler):
+    """Serves /authenticate and /graphql for a FakeXrayProject."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, keep-alive clients
+    # stall on delayed ACKs and every pooled request shows ~40 ms latency.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Any):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.path.endswith("/authenticate"):
+            self._send_json(200, FAKE_TOKEN)
+            return
+
+        if not self.path.endswith("/graphql"):
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        if self.headers.get("Authorization") != f"Bearer {FAKE_TOKEN}":
+            self._send_json(401, {"error": "Unauthorized"})
+            return
+
+        try:
+            request = json.loads(body or b"{}")
+            query = request.get("query", "")
+            variables = request.get("variables") or {}
+            errors = root_field_errors(query)
+            if errors:
+                # Like Xray, a document that fails validation runs none of its fields
+                self._send_json(200, {"errors": [{"message": message} for message in errors]})
+                return
+            aliased = aliased_fields(query, variables)
+            if aliased:
+                # Root fields run in document order, like Xray executes mutation fields
+                data = {alias: self.server.project.resolve(field, arguments) for alias, field, arguments in aliased}
+                self._send_json(200, {"data": data})
+                return
+            match = ROOT_FIELD_PATTERN.search(query)
+            field = match.group(1) if match else ""
+            data = self.server.project.resolve(field, variables)
+            self._send_json(200, {"data": {field: data}})
+        except KeyError as e:
+            self._send_json(200, {"errors": [{"message": f"Unsupported operation: {e}"}]})
+        except Exception as e:
+            self._send_json(200, {"errors": [{"message": str(e)}]})
+
+
+class FakeXrayServer:
+    """Runs FakeXrayHandler on a background thread."""
+
+    def __init__(self, project: FakeXrayProject, host: str = "127.0.0.1", port: int = 0,
+                 latency_ms: float = 0.0):
+        self.httpd = ThreadingHTTPServer((host, port), FakeXrayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.project = project
+        self.httpd.latency = latency_ms / 1000.0
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def graphql_url(self) -> str:
+        return f"{self.base_url}/api/v2/graphql"
+
+    @property
+    def auth_url(self) -> str:
+        return f"{self.base_url}/api/v2/authenticate"
+
+    def start(self) -> "FakeXrayServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    """Run the fake server in the foreground."""
+    parser = argparse.ArgumentParser(description="Local fake Xray Cloud endpoint")
+    parser.add_argument("--size", type=int, default=1000, help="Number of synthetic tests")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic project")
+    parser.add_argument("--seed-file", help="NDJSON project written by synthetic_project.py (overrides --size)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Artificial per-request latency")
+    args = parser.parse_args()
+
+    if args.seed_file:
+        project = load_seed_file(args.seed_file)
+    else:
+        project = build_synthetic_project(args.size, args.seed)
+    server = FakeXrayServer(project, args.host, args.port, args.latency_ms)
+    print(f"Fake Xray server with {len(project.tests)} tests and {len(project.preconditions)} "
+          f"preconditions listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping fake Xray server")
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
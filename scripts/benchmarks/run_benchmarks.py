@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Throughput/latency benchmarks for the fetch, upload, test-manager and rollback paths.
+
+Each scenario runs the real entry point (XrayTestFetcher.run, the XrayAPIUploader
+upload flow, XrayTestManager batch operations, rollback_test_steps.py) against the
+local fake Xray server from fake_xray_server.py. Scenarios run in a child process so
+peak RSS is measured per scenario, while the fake server stays in this process.
+
+Pacing sleeps (time.sleep) are disabled in the child so the numbers reflect client
+and request overhead rather than hard-coded delays.
+
+Usage:
+    python run_benchmarks.py                                  # 1k, 10k and 100k tests
+    python run_benchmarks.py --sizes 1000 --scenarios fetch rollback
+    python run_benchmarks.py --sizes 1000 --runs 3 --save-thresholds   # record a new baseline
+
+Only metrics with enough samples are gated: a latency percentile needs enough
+requests that a single slow one cannot move it (MIN_SAMPLES), and requests/s
+and wall time need a run long enough to time (MIN_TIMED_SECONDS). With --runs,
+each scenario runs several times and the median of every metric is used.
+
+Output:
+    - benchmark_results.json: requests/s, p50/p95/p99 latency, peak RSS and wall time
+      per scenario and size, plus any threshold regressions
+    - Exit code 1 if any scenario regressed past thresholds.json or has no
+      thresholds there
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+from typing import Dict, List, Any
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCHMARK_DIR.parent
+sys.path.insert(0, str(BENCHMARK_DIR))
+
+from fake_xray_server import FakeXrayServer, build_synthetic_project
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_THRESHOLDS_FILE = BENCHMARK_DIR / "thresholds.json"
+PROJECT_KEY = "FRAMED"
+
+# Fewest requests for a latency percentile to be gated (about 10 requests above p95/p99)
+MIN_SAMPLES = {"p50": 20, "p95": 200, "p99": 1000}
+
+# Shortest wall time for requests/s and wall time to be gated
+MIN_TIMED_SECONDS = 2.0
+
+
+class RequestRecorder:
+    """Times every HTTP request made through requests (requests.post and Session)."""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self._original = None
+
+    def install(self):
+        import requests
+
+        self._original = requests.sessions.Session.request
+        original = self._original
+        recorder = self
+
+        def timed_request(session, method, url, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                response = original(session, method, url, *args, **kwargs)
+                if response.status_code >= 400:
+                    recorder.errors += 1
+                return response
+            except Exception:
+                recorder.errors += 1
+                raise
+            finally:
+                recorder.latencies.append(time.perf_counter() - started)
+
+        requests.sessions.Session.request = timed_request
+
+    def uninstall(self):
+        import requests
+
+        if self._original:
+            requests.sessions.Session.request = self._original
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+# ---------------------------------------------------------------------------
+# Scenario inputs (written by the parent, read by the child like the real scripts)
+# ---------------------------------------------------------------------------
+
+def write_scenario_inputs(scenario: str, tests: List[Dict[str, Any]], workdir: str):
+    """Write the input files a scenario reads, derived from the synthetic project."""
+    if scenario == "upload":
+        subfolders = sorted({(t.get("folder") or {}).get("name") or "General" for t in tests})
+        transformed = {
+            "folders": {"Team Page": subfolders},
+            "tests": [
+                {
+                    "originalId": test["jira"]["key"],
+                    "summary": test["jira"]["summary"],
+                    "description": test["jira"]["description"],
+                    "priority": test["jira"]["priority"]["name"],
+                    "labels": test["jira"]["labels"],
+                    "testType": "Manual",
+                    "folder": f"Team Page/{(test.get('folder') or {}).get('name') or 'General'}",
+                    "steps": [
+                        {"action": step["action"], "expectedResult": step["result"]}
+                        for step in test["steps"]
+                    ]
+                }
+                for test in tests
+            ]
+        }
+        with open(os.path.join(workdir, "transformed_tests.json"), "w") as f:
+            json.dump(transformed, f)
+
+    elif scenario == "rollback":
+        backup = {
+            "backup_info": {"timestamp": datetime.now().isoformat(), "failures": []},
+            "tests": [
+                {
+                    "key": test["jira"]["key"],
+                    "issue_id": test["issueId"],
+                    "summary": test["jira"]["summary"],
+                    "backup_successful": True,
+                    "current_data": {"steps": [], "jira": test["jira"]}
+                }
+                for test in tests if test["steps"]
+            ]
+        }
+        with open(os.path.join(workdir, "test_backup_benchmark.json"), "w") as f:
+            json.dump(backup, f)
+
+
+# ---------------------------------------------------------------------------
+# Scenarios (run inside the child process)
+# ---------------------------------------------------------------------------
+
+def run_fetch_scenario(base_url: str, workdir: str):
+    """XrayTestFetcher.run over the whole project."""
+    sys.path.insert(0, str(SCRIPTS_DIR / "xray-filtering-and-modding"))
+    import fetch_all_xray_tests as fetch_module
+
+    fetch_module.GRAPHQL_URL = f"{base_url}/api/v2/graphql"
+    fetch_module.AUTH_ENDPOINT = f"{base_url}/api/v2/authenticate"
+    fetch_module.OUTPUT_DIR = workdir
+    fetch_module.PROGRESS_FILE = os.path.join(workdir, "fetch_progress.ndjson")
+    fetch_module.RATE_LIMIT_DELAY = 0
+
+    fetch_module.XrayTestFetcher().run()
+
+
+def run_fetch_keyset_scenario(base_url: str, workdir: str):
+    """XrayTestFetcher.run with keyset pagination over parallel id ranges."""
+    sys.path.insert(0, str(SCRIPTS_DIR / "xray-filtering-and-modding"))
+    import fetch_all_xray_tests as fetch_module
+
+    fetch_module.GRAPHQL_URL = f"{base_url}/api/v2/graphql"
+    fetch_module.AUTH_ENDPOINT = f"{base_url}/api/v2/authenticate"
+    fetch_module.OUTPUT_DIR = workdir
+    fetch_module.PROGRESS_FILE = os.path.join(workdir, "fetch_progress.ndjson")
+    fetch_module.RATE_LIMIT_DELAY = 0
+
+    fetch_module.XrayTestFetcher(pagination="keyset").run()
+
+
+def run_upload_scenario(base_url: str, workdir: str):
+    """XrayAPIUploader folder setup, test upload and test set creation."""
+    sys.path.insert(0, str(SCRIPTS_DIR / "xray-upload"))
+    from xray_api_uploader import XrayAPIUploader
+
+    with open(os.path.join(workdir, "transformed_tests.json")) as f:
+        transformed_data = json.load(f)
+
+    uploader = XrayAPIUploader()
+    uploader.project_key = PROJECT_KEY
+    uploader.auth_url = f"{base_url}/api/v2/authenticate"
+    uploader.graphql_url = f"{base_url}/api/v2/graphql"
+
+    if not uploader.authenticate():
+        raise RuntimeError("Authentication against the fake server failed")
+    successful, failed = uploader.upload_tests(transformed_data)
+    if successful:
+        uploader.create_standard_test_sets(successful)
+
+
+def run_manager_scenario(base_url: str, workdir: str):
+    """XrayTestManager paging plus batch step and folder operations."""
+    sys.path.insert(0, str(SCRIPTS_DIR / "xray-test-manager"))
+    from xray_client import XrayCredentials, XrayGraphQLClient
+    from test_manager import XrayTestManager, TestStep
+
+    credentials = XrayCredentials(client_id="bench", client_secret="bench", base_url=base_url,
+                                  email="", token="")
+    client = XrayGraphQLClient(credentials)
+    client.graphql_url = f"{base_url}/api/v2/graphql"
+    client.authenticator.auth_url = f"{base_url}/api/v2/authenticate"
+    manager = XrayTestManager(client)
+
+    summaries = []
+    start = 0
+    while True:
+        page = manager.fetch_tests_summary(PROJECT_KEY, limit=100, start=start)
+        if not page:
+            break
+        summaries.extend(page)
+        start += len(page)
+
+    new_steps = [
+        TestStep(id=None, action="Launch mobile app", data="", result="App launches successfully"),
+        TestStep(id=None, action="Navigate to the feature under test", data="", result="Feature screen is displayed")
+    ]
+    for summary in summaries:
+        if summary.has_steps:
+            details = manager.get_test_details(summary.issue_id)
+            first = details.steps[0]
+            manager.update_test_steps(summary.issue_id, [
+                TestStep(id=first.id, action=first.action, data=first.data, result=f"{first.result} (verified)")
+            ])
+        else:
+            manager.add_test_steps(summary.issue_id, new_steps)
+
+    issue_ids = [summary.issue_id for summary in summaries]
+    for i in range(0, len(issue_ids), 100):
+        manager.batch_move_to_folder(PROJECT_KEY, issue_ids[i:i + 100], "/Benchmark")
+
+
+def run_rollback_scenario(base_url: str, workdir: str):
+    """rollback_test_steps.py over every test that currently has steps."""
+    sys.path.insert(0, str(SCRIPTS_DIR / "mlbmob-2799-analysis"))
+    import rollback_test_steps as rollback_module
+
+    rollback_module.GRAPHQL_URL = f"{base_url}/api/v2/graphql"
+    rollback_module.AUTH_ENDPOINT = f"{base_url}/api/v2/authenticate"
+
+    backup_data = rollback_module.load_backup_data(os.path.join(workdir, "test_backup_benchmark.json"))
+    token = rollback_module.authenticate()
+    for test_data in backup_data["tests"]:
+        rollback_module.process_single_rollback(test_data, token)
+
+
+SCENARIOS = {
+    "fetch": run_fetch_scenario,
+    "fetch-keyset": run_fetch_keyset_scenario,
+    "upload": run_upload_scenario,
+    "manager": run_manager_scenario,
+    "rollback": run_rollback_scenario,
+}
+
+
+def run_child(scenario: str, size: int, base_url: str, workdir: str, result_file: str):
+    """Run one scenario in this (child) process and write its metrics to result_file."""
+    os.environ.setdefault("XRAY_CLIENT", "bench")
+    os.environ.setdefault("XRAY_SECRET", "bench")
+    time.sleep = lambda seconds: None
+
+    recorder = RequestRecorder()
+    recorder.install()
+    os.chdir(workdir)
+
+    started = time.perf_counter()
+    error = None
+    try:
+        SCENARIOS[scenario](base_url, workdir)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall_time = time.perf_counter() - started
+    recorder.uninstall()
+
+    latencies = sorted(recorder.latencies)
+    result = {
+        "scenario": scenario,
+        "size": size,
+        "requests": len(latencies),
+        "http_errors": recorder.errors,
+        "wall_time_s": round(wall_time, 3),
+        "requests_per_second": round(len(latencies) / wall_time, 1) if wall_time > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "error": error,
+    }
+    with open(result_file, "w") as f:
+        json.dump(result, f)
+
+
+# ---------------------------------------------------------------------------
+# Parent: fake server lifecycle, thresholds and reporting
+# ---------------------------------------------------------------------------
+
+def run_scenario(scenario: str, size: int, seed: int, latency_ms: float) -> Dict[str, Any]:
+    """Start a fresh fake server for one scenario/size and run the child against it."""
+    project = build_synthetic_project(size, seed, PROJECT_KEY)
+    tests = project.tests
+
+    with tempfile.TemporaryDirectory(prefix=f"xray-bench-{scenario}-") as workdir:
+        write_scenario_inputs(scenario, tests, workdir)
+        result_file = os.path.join(workdir, "result.json")
+
+        with FakeXrayServer(project, latency_ms=latency_ms) as server:
+            completed = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), "--child", scenario,
+                 "--sizes", str(size), "--base-url", server.base_url,
+                 "--workdir", workdir, "--result-file", result_file],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+
+        if completed.returncode != 0 or not os.path.exists(result_file):
+            return {"scenario": scenario, "size": size,
+                    "error": f"child exited with {completed.returncode}: {completed.stderr[-2000:]}"}
+
+        with open(result_file) as f:
+            return json.load(f)
+
+
+def median_result(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One result per scenario and size: the median of every metric over the runs (a failed run wins)."""
+    failed = [run for run in runs if run.get("error")]
+    if failed or len(runs) == 1:
+        return (failed or runs)[0]
+
+    def middle(values):
+        return round(median(values), 3)
+
+    result = dict(runs[0])
+    result.update({
+        "requests": int(median(run["requests"] for run in runs)),
+        "http_errors": max(run["http_errors"] for run in runs),
+        "wall_time_s": middle(run["wall_time_s"] for run in runs),
+        "requests_per_second": round(median(run["requests_per_second"] for run in runs), 1),
+        "latency_ms": {key: middle(run["latency_ms"][key] for run in runs) for key in runs[0]["latency_ms"]},
+        "peak_rss_mb": round(median(run["peak_rss_mb"] for run in runs), 1),
+        "runs": len(runs),
+    })
+    return result
+
+
+def gated_metrics(result: Dict[str, Any]) -> List[str]:
+    """Metrics of a result measured on enough samples to gate on."""
+    metrics = ["peak_rss_mb"]
+    if result["wall_time_s"] >= MIN_TIMED_SECONDS:
+        metrics += ["requests_per_second", "wall_time_s"]
+    metrics += [pct for pct, samples in MIN_SAMPLES.items() if result["requests"] >= samples]
+    return metrics
+
+
+def load_thresholds(path: Path) -> Dict[str, Any]:
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def check_thresholds(result: Dict[str, Any], thresholds: Dict[str, Any]) -> List[str]:
+    """
+    Compare a scenario result against its thresholds.
+
+    A scenario and size without thresholds counts as a regression, so a new
+    scenario or size cannot pass unchecked.
+
+    Returns:
+        List of human-readable regression descriptions (empty if within limits)
+    """
+    label = f"{result['scenario']}@{result['size']}"
+    if result.get("error"):
+        return [f"{label}: {result['error']}"]
+
+    limits = thresholds.get(result["scenario"], {}).get(str(result["size"]))
+    if not limits:
+        return [f"{label}: no thresholds (record a baseline with --save-thresholds)"]
+
+    regressions = []
+    gated = gated_metrics(result)
+    if ("min_requests_per_second" in limits and "requests_per_second" in gated
+            and result["requests_per_second"] < limits["min_requests_per_second"]):
+        regressions.append(f"{label}: {result['requests_per_second']} req/s < {limits['min_requests_per_second']}")
+    for pct in ("p50", "p95", "p99"):
+        key = f"max_{pct}_ms"
+        if key in limits and pct in gated and result["latency_ms"][pct] > limits[key]:
+            regressions.append(f"{label}: {pct} {result['latency_ms'][pct]} ms > {limits[key]}")
+    if "max_peak_rss_mb" in limits and result["peak_rss_mb"] > limits["max_peak_rss_mb"]:
+        regressions.append(f"{label}: peak RSS {result['peak_rss_mb']} MB > {limits['max_peak_rss_mb']}")
+    if "max_wall_time_s" in limits and "wall_time_s" in gated and result["wall_time_s"] > limits["max_wall_time_s"]:
+        regressions.append(f"{label}: wall time {result['wall_time_s']} s > {limits['max_wall_time_s']}")
+    return regressions
+
+
+def thresholds_from_results(results: List[Dict[str, Any]], existing: Dict[str, Any],
+                            headroom: float, latency_headroom: float) -> Dict[str, Any]:
+    """
+    Derive thresholds for the gated metrics of measured results, allowing
+    `headroom` (e.g. 0.5 = 50%) slack, and `latency_headroom` on latency percentiles.
+    """
+    thresholds = json.loads(json.dumps(existing))
+    for result in results:
+        if result.get("error"):
+            continue
+        gated = gated_metrics(result)
+        limits = {"max_peak_rss_mb": round(result["peak_rss_mb"] * (1 + headroom), 1)}
+        if "requests_per_second" in gated:
+            limits["min_requests_per_second"] = round(result["requests_per_second"] / (1 + headroom), 1)
+            limits["max_wall_time_s"] = round(result["wall_time_s"] * (1 + headroom), 3)
+        for pct in MIN_SAMPLES:
+            if pct in gated:
+                limits[f"max_{pct}_ms"] = round(result["latency_ms"][pct] * (1 + latency_headroom), 3)
+        thresholds.setdefault(result["scenario"], {})[str(result["size"])] = limits
+    return thresholds
+
+
+def main():
+    """Main entry point for the benchmark runner."""
+    parser = argparse.ArgumentParser(description="Benchmark Xray fetch/upload paths against a local fake server")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Synthetic project sizes (number of tests)")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS),
+                        help="Scenarios to run")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic project")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Artificial per-request latency added by the fake server")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON report")
+    parser.add_argument("--thresholds", default=str(DEFAULT_THRESHOLDS_FILE), help="Regression thresholds file")
+    parser.add_argument("--save-thresholds", action="store_true",
+                        help="Write thresholds derived from this run instead of checking them")
+    parser.add_argument("--runs", type=int, default=1,
+                        help="Runs per scenario and size; the median of each metric is reported")
+    parser.add_argument("--headroom", type=float, default=0.5,
+                        help="Slack applied when saving thresholds (0.5 = 50%%)")
+    parser.add_argument("--latency-headroom", type=float, default=1.0,
+                        help="Slack applied to latency percentiles when saving thresholds (1.0 = 100%%)")
+    # Internal: used by the parent to run a single scenario in a child process
+    parser.add_argument("--child", choices=sorted(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.sizes[0], args.base_url, args.workdir, args.result_file)
+        return 0
+
+    thresholds_path = Path(args.thresholds)
+    thresholds = load_thresholds(thresholds_path)
+    results = []
+    regressions = []
+
+    print("Xray Benchmarks")
+    print("===============")
+    for size in args.sizes:
+        for scenario in args.scenarios:
+            runs = max(1, args.runs)
+            print(f"Running {scenario} with {size} tests{f' ({runs} runs)' if runs > 1 else ''}...", flush=True)
+            result = median_result([run_scenario(scenario, size, args.seed, args.latency_ms) for _ in range(runs)])
+            results.append(result)
+
+            if result.get("error"):
+                print(f"  ✗ {result['error']}")
+            else:
+                print(f"  ✓ {result['requests']} requests in {result['wall_time_s']}s "
+                      f"({result['requests_per_second']} req/s), "
+                      f"p50/p95/p99 {result['latency_ms']['p50']}/{result['latency_ms']['p95']}/"
+                      f"{result['latency_ms']['p99']} ms, peak RSS {result['peak_rss_mb']} MB")
+
+            if not args.save_thresholds:
+                regressions.extend(check_thresholds(result, thresholds))
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "seed": args.seed,
+        "latency_ms": args.latency_ms,
+        "thresholds_file": str(thresholds_path),
+        "results": results,
+        "regressions": regressions,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Report saved to: {args.output}")
+
+    if args.save_thresholds:
+        with open(thresholds_path, "w") as f:
+            json.dump(thresholds_from_results(results, thresholds, args.headroom, args.latency_headroom), f, indent=2)
+        print(f"✓ Thresholds saved to: {thresholds_path}")
+        return 0
+
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  ✗ {regression}")
+        return 1
+
+    print("✓ All scenarios within thresholds")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Synthetic large-project generator seeded from the TestRail exports in import_data/.
+
+The generator learns the real distributions in home_surface.csv, mlbapp.csv and
+news_surface.csv (step counts, text lengths, sections, priorities, precondition
+usage and step-text reuse) and synthesizes projects of arbitrary size with tests,
+steps, preconditions, folders and labels.
+
+Usage:
+    python synthetic_project.py --size 100000 --output project_100k.ndjson
+    python synthetic_project.py --dump-profile profile.json
+
+Output:
+    NDJSON, one record per line with a "type" of folder, label, precondition or test.
+    Test records are shaped like getExpandedTests results, so the file can be loaded
+    directly by fake_xray_server.py (--seed-file).
+"""
+
+import argparse
+import csv
+import json
+import math
+import random
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+IMPORT_DATA_DIR = Path(__file__).resolve().parent.parent.parent / "import_data"
+
+# Surface labels used for the imported TestRail suites (see docs/SCRIPTS_README.md)
+SURFACE_LABELS = {
+    "home_surface.csv": "surface-home",
+    "mlbapp.csv": "surface-core",
+    "news_surface.csv": "surface-news",
+}
+
+PRIORITY_MAP = {
+    "1 - High Priority": "High",
+    "2 - Medium Priority": "Medium",
+    "3 - Low Priority": "Low",
+}
+
+NUMBERED_ITEM = re.compile(r'^\s*\d+\.\s+', re.MULTILINE)
+MAX_VOCABULARY = 200000
+MAX_SHARED_STEPS = 5000
+
+# csv rows with long multi-line steps exceed the default field limit
+csv.field_size_limit(sys.maxsize)
+
+
+@dataclass
+class ProjectProfile:
+    """Empirical distributions learned from TestRail exports."""
+    test_count: int = 0
+    step_counts: List[int] = field(default_factory=list)
+    action_lengths: List[int] = field(default_factory=list)
+    result_lengths: List[int] = field(default_factory=list)
+    title_lengths: List[int] = field(default_factory=list)
+    description_lengths: List[int] = field(default_factory=list)
+    precondition_lengths: List[int] = field(default_factory=list)
+    precondition_rate: float = 0.0
+    precondition_unique_ratio: float = 1.0
+    step_reuse_rate: float = 0.0
+    sections: Dict[str, int] = field(default_factory=dict)
+    priorities: Dict[str, int] = field(default_factory=dict)
+    vocabulary: List[str] = field(default_factory=list)
+
+
+def split_numbered(text: str) -> List[str]:
+    """Split '1. foo\\n2. bar' style TestRail text into its items."""
+    if not text or not text.strip():
+        return []
+    parts = NUMBERED_ITEM.split(text)
+    items = [part.strip() for part in parts if part.strip()]
+    return items if NUMBERED_ITEM.search(text) else [text.strip()]
+
+
+def parse_steps(row: Dict[str, str]) -> List[Tuple[str, str]]:
+    """Extract (action, expected result) pairs from a TestRail export row."""
+    actions = split_numbered(row.get("Steps Separated (Step)", ""))
+    if actions:
+        results = split_numbered(row.get("Steps Separated (Expected Result)", ""))
+        results += [""] * (len(actions) - len(results))
+        return list(zip(actions, results))
+
+    steps = row.get("Steps", "")
+    if not steps.strip():
+        return []
+    if "Expected Result:" in steps:
+        pairs = []
+        for item in split_numbered(steps):
+            action, _, result = item.partition("Expected Result:")
+            pairs.append((action.strip(), result.strip()))
+        return pairs
+    return [(steps.strip(), (row.get("Expected Result") or "").strip())]
+
+
+def section_to_folder(section: str) -> str:
+    """Map a TestRail section to an Xray Test Repository path."""
+    return "/" + "/".join(part.strip() for part in section.split("/") if part.strip())
+
+
+def folder_label(folder_path: str) -> str:
+    """feature-* label for the leaf folder of a path."""
+    leaf = folder_path.rstrip("/").rsplit("/", 1)[-1]
+    slug = re.sub(r'[^a-z0-9]+', '-', leaf.lower()).strip("-")
+    return f"feature-{slug or 'general'}"
+
+
+def learn_profile(csv_paths: Optional[List[Path]] = None) -> ProjectProfile:
+    """
+    Learn a ProjectProfile from TestRail CSV exports.
+
+    Args:
+        csv_paths: CSV files to learn from (defaults to the suites in import_data/)
+
+    Returns:
+        ProjectProfile with the empirical distributions
+    """
+    if csv_paths is None:
+        csv_paths = [IMPORT_DATA_DIR / name for name in SURFACE_LABELS]
+
+    profile = ProjectProfile()
+    sections = Counter()
+    priorities = Counter()
+    preconditions = Counter()
+    step_texts = Counter()
+    vocabulary = []
+
+    for path in csv_paths:
+        surface = SURFACE_LABELS.get(Path(path).name, "surface-core")
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                profile.test_count += 1
+                title = row.get("Title", "")
+                profile.title_lengths.append(len(title))
+                profile.description_lengths.append(len(row.get("Section Description") or ""))
+                sections[f"{surface}|{section_to_folder(row.get('Section') or 'General')}"] += 1
+                priorities[PRIORITY_MAP.get(row.get("Priority", ""), "Medium")] += 1
+
+                precondition = (row.get("Preconditions") or "").strip()
+                if precondition:
+                    preconditions[precondition] += 1
+                    profile.precondition_lengths.append(len(precondition))
+
+                steps = parse_steps(row)
+                profile.step_counts.append(len(steps))
+                for action, result in steps:
+                    profile.action_lengths.append(len(action))
+                    profile.result_lengths.append(len(result))
+                    step_texts[action] += 1
+
+                if len(vocabulary) < MAX_VOCABULARY:
+                    vocabulary.extend(title.split())
+                    for action, result in steps:
+                        vocabulary.extend(action.split())
+                        vocabulary.extend(result.split())
+
+    total_preconditions = sum(preconditions.values())
+    total_steps = sum(step_texts.values())
+    profile.precondition_rate = total_preconditions / max(profile.test_count, 1)
+    profile.precondition_unique_ratio = len(preconditions) / max(total_preconditions, 1)
+    profile.step_reuse_rate = 1 - len(step_texts) / max(total_steps, 1)
+    profile.sections = dict(sections)
+    profile.priorities = dict(priorities)
+    profile.vocabulary = vocabulary[:MAX_VOCABULARY] or ["Verify", "the", "app"]
+    return profile
+
+
+def load_profile(path: str) -> ProjectProfile:
+    with open(path, "r") as f:
+        return ProjectProfile(**json.load(f))
+
+
+class ProjectGenerator:
+    """Samples synthetic project records from a ProjectProfile."""
+
+    def __init__(self, profile: ProjectProfile, seed: int = 0, project_key: str = "FRAMED",
+                 project_id: str = "26420"):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.project_key = project_key
+        self.project_id = project_id
+        self.next_key = 1
+        self.next_step_id = 1
+        self.shared_steps = []
+
+        weighted = sorted(profile.sections.items())
+        self.section_names = [name for name, _ in weighted]
+        self.section_weights = [count for _, count in weighted]
+        self.priority_names = sorted(profile.priorities)
+        self.priority_weights = [profile.priorities[name] for name in self.priority_names]
+
+    def _text(self, length: int) -> str:
+        if length <= 0:
+            return ""
+        words = []
+        total = 0
+        while total < length:
+            word = self.rng.choice(self.profile.vocabulary)
+            words.append(word)
+            total += len(word) + 1
+        return " ".join(words)[:length]
+
+    def _sample_length(self, lengths: List[int]) -> int:
+        return self.rng.choice(lengths) if lengths else 0
+
+    def _key(self) -> str:
+        key = f"{self.project_key}-{self.next_key}"
+        self.next_key += 1
+        return key
+
+    def _step(self) -> Dict[str, Any]:
+        step_id = f"{self.next_step_id:08x}-synthetic-step"
+        self.next_step_id += 1
+
+        if self.shared_steps and self.rng.random() < self.profile.step_reuse_rate:
+            action, result = self.rng.choice(self.shared_steps)
+        else:
+            action = self._text(self._sample_length(self.profile.action_lengths))
+            result = self._text(self._sample_length(self.profile.result_lengths))
+            if len(self.shared_steps) < MAX_SHARED_STEPS:
+                self.shared_steps.append((action, result))
+
+        return {"id": step_id, "action": action, "data": "", "result": result}
+
+    def _folders(self, size: int) -> List[Tuple[str, str]]:
+        """(surface label, folder path) pairs, replicated so folder density matches the exports."""
+        replicas = max(1, math.ceil(size / max(self.profile.test_count, 1)))
+        folders = []
+        for replica in range(replicas):
+            for name in self.section_names:
+                surface, path = name.split("|", 1)
+                folders.append((surface, path if replica == 0 else f"{path} {replica + 1}"))
+        return folders
+
+    def generate(self, size: int) -> Iterator[Dict[str, Any]]:
+        """
+        Yield folder, label, precondition and test records for a project of `size` tests.
+
+        Records are yielded lazily so projects of 100k+ tests can be streamed to disk.
+        """
+        replicas = max(1, math.ceil(size / max(self.profile.test_count, 1)))
+        folders = self._folders(size)
+        for _, path in folders:
+            yield {"type": "folder", "path": path, "name": path.rsplit("/", 1)[-1]}
+
+        sections = [name.split("|", 1) for name in self.section_names]
+        labels = sorted({surface for surface, _ in sections} | {folder_label(path) for _, path in sections})
+        for label in labels:
+            yield {"type": "label", "name": label}
+
+        precondition_count = math.ceil(size * self.profile.precondition_rate * self.profile.precondition_unique_ratio)
+        preconditions = []
+        for i in range(precondition_count):
+            key = self._key()
+            definition = self._text(self._sample_length(self.profile.precondition_lengths))
+            precondition = {
+                "issueId": str(5000000 + i),
+                "projectId": self.project_id,
+                "definition": definition,
+                "preconditionType": {"name": "Manual", "kind": "Steps"},
+                "jira": {"key": key, "summary": definition[:80] or key}
+            }
+            preconditions.append(precondition)
+            yield dict(precondition, type="precondition")
+
+        for i in range(size):
+            name = self.rng.choices(self.section_names, self.section_weights)[0]
+            surface, section_path = name.split("|", 1)
+            replica = self.rng.randrange(replicas)
+            path = f"{section_path} {replica + 1}" if replica else section_path
+
+            linked = []
+            if preconditions and self.rng.random() < self.profile.precondition_rate:
+                linked.append(self.rng.choice(preconditions))
+
+            steps = [self._step() for _ in range(self.rng.choice(self.profile.step_counts or [0]))]
+            yield {
+                "type": "test",
+                "issueId": str(1000000 + i),
+                "jira": {
+                    "key": self._key(),
+                    "summary": self._text(max(self._sample_length(self.profile.title_lengths), 8)),
+                    "description": self._text(self._sample_length(self.profile.description_lengths)),
+                    "labels": [surface, folder_label(section_path)],
+                    "priority": {"name": self.rng.choices(self.priority_names, self.priority_weights)[0]},
+                    "status": {"name": "To Do"},
+                    "assignee": None
+                },
+                "steps": steps,
+                "preconditions": {"total": len(linked), "results": linked},
+                "testType": {"name": "Manual", "kind": "Steps"},
+                "folder": {"name": path.rsplit("/", 1)[-1], "path": path},
+                "lastModified": "2025-08-01T00:00:00Z"
+            }
+
+
+def generate_project(size: int, seed: int = 0, project_key: str = "FRAMED",
+                     profile: Optional[ProjectProfile] = None) -> Iterator[Dict[str, Any]]:
+    """Convenience wrapper: learn the default profile (if needed) and yield records."""
+    return ProjectGenerator(profile or learn_profile(), seed, project_key).generate(size)
+
+
+def write_ndjson(records: Iterator[Dict[str, Any]], output_file: str) -> Counter:
+    """Stream records to an NDJSON file, returning counts per record type."""
+    counts = Counter()
+    with open(output_file, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            counts[record["type"]] += 1
+    return counts
+
+
+def read_ndjson(input_file: str) -> Iterator[Dict[str, Any]]:
+    """Yield records from an NDJSON file written by write_ndjson."""
+    with open(input_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    """Main entry point for the generator."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic Xray project from TestRail exports")
+    parser.add_argument("--size", type=int, default=1000, help="Number of tests to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (same seed, same project)")
+    parser.add_argument("--project-key", default="FRAMED")
+    parser.add_argument("--csv", nargs="+", help="TestRail CSV exports to learn from (default: import_data/)")
+    parser.add_argument("--profile", help="Use a previously dumped profile instead of learning one")
+    parser.add_argument("--dump-profile", help="Write the learned profile to this JSON file and exit")
+    parser.add_argument("--output", default="synthetic_project.ndjson", help="NDJSON output file")
+    args = parser.parse_args()
+
+    if args.profile:
+        profile = load_profile(args.profile)
+    else:
+        profile = learn_profile([Path(p) for p in args.csv] if args.csv else None)
+        print(f"✓ Learned profile from {profile.test_count} TestRail tests")
+
+    if args.dump_profile:
+        with open(args.dump_profile, "w") as f:
+            json.dump(asdict(profile), f)
+        print(f"✓ Profile saved to: {args.dump_profile}")
+        return
+
+    counts = write_ndjson(generate_project(args.size, args.seed, args.project_key, profile), args.output)
+    print(f"✓ Wrote {counts['test']} tests, {counts['precondition']} preconditions, "
+          f"{counts['folder']} folders and {counts['label']} labels to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,12 @@ Check available XRAY issue types in MLBAPP project
 
 import os
 import sys
-import requests
-from requests.auth import HTTPBasicAuth
 import getpass
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'xray-remediation', 'xray-api'))
+from jira_client import JiraClient
+
 # Configuration
 JIRA_BASE_URL = os.environ.get('JIRA_BASE_URL', 'https://baseball.atlassian.net')
 JIRA_EMAIL = os.environ.get('JIRA_EMAIL', '')
@@ -27,22 +29,19 @@ def check_xray_issue_types():
     if not JIRA_TOKEN:
         JIRA_TOKEN = getpass.getpass("Enter ATLASSIAN API Token: ").strip()
     
-    session = requests.Session()
-    session.auth = HTTPBasicAuth(JIRA_EMAIL, JIRA_TOKEN)
-    session.headers.update({
-        'Accept': 'application/json',
-        'Content-Type': 'application/json'
-    })
+    jira = JiraClient(base_url=JIRA_BASE_URL, email=JIRA_EMAIL, api_token=JIRA_TOKEN)
     
     print(f"\nChecking XRAY issue types in project {PROJECT_KEY}...")
     print("="*60)
     
     # Get project info including issue types
-    url = f"{JIRA_BASE_URL}/rest/api/2/project/{PROJECT_KEY}"
-    response = session.get(url)
+    try:
+        project_data = jira.get(f"/rest/api/2/project/{PROJECT_KEY}")
+    except Exception as e:
+        print(f"Error accessing project: {e}")
+        return
     
-    if response.status_code == 200:
-        project_data = response.json()
+    if project_data:
         issue_types = project_data.get('issueTypes', [])
         
         print(f"\nAll issue types in {PROJECT_KEY}:")
@@ -76,31 +75,22 @@ def check_xray_issue_types():
             ("Test", 'issuetype = "Test" OR issuetype = "Xray Test"'),
         ]
         
-        search_url = f"{JIRA_BASE_URL}/rest/api/2/search"
-        
         for entity_name, jql_part in xray_searches:
             jql = f'project = {PROJECT_KEY} AND {jql_part}'
-            params = {
-                'jql': jql,
-                'maxResults': 1
-            }
             
-            response = session.get(search_url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                if data['total'] > 0:
-                    issue = data['issues'][0]
-                    issue_type = issue['fields']['issuetype']
-                    print(f"\n✅ {entity_name} exists in project:")
-                    print(f"   Example: {issue['key']}")
-                    print(f"   Issue Type ID: {issue_type['id']}")
-                    print(f"   Issue Type Name: {issue_type['name']}")
-                else:
-                    print(f"\n❌ No {entity_name} found in project")
-    
-    else:
-        print(f"Error accessing project: {response.status_code}")
-        print(f"Response: {response.text}")
+            try:
+                issue = jira.first(jql, ["issuetype"])
+            except Exception as e:
+                print(f"\n? {entity_name} search failed: {e}")
+                continue
+            if issue:
+                issue_type = issue['fields']['issuetype']
+                print(f"\n✅ {entity_name} exists in project:")
+                print(f"   Example: {issue['key']}")
+                print(f"   Issue Type ID: {issue_type['id']}")
+                print(f"   Issue Type Name: {issue_type['name']}")
+            else:
+                print(f"\n❌ No {entity_name} found in project")
 
 if __name__ == '__main__':
     check_xray_issue_types()
\ No newline at end of file
@@ -11,6 +11,11 @@ import sys
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
+# Step text is stored deduplicated (shared with catalog snapshots and exports)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from step_texts import dump_json
+
 # Configuration
 GRAPHQL_URL = "https://xray.cloud.getxray.app/api/v2/graphql"
 AUTH_ENDPOINT = "https://xray.cloud.getxray.app/api/v2/authenticate"
@@ -211,8 +216,7 @@ def main():
     report_file = f'backup_report_{timestamp}.txt'
     
     print(f"\nSaving backup data to {backup_file}...")
-    with open(backup_file, 'w', encoding='utf-8') as f:
-        json.dump(backup_data, f, indent=2, ensure_ascii=False)
+    dump_json(backup_data, backup_data['tests'], backup_file, indent=2)
     
     # Generate and save report
     print(f"Generating backup report...")
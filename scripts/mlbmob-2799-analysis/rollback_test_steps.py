@@ -2,6 +2,10 @@
 """
 PHASE 3: Rollback Test Steps Script
 Uses backup data to restore original test states and remove added steps
+
+Each test is synced to its backed-up steps with the fewest step operations:
+steps that still match the backup keep their ids, and all removals, updates
+and re-added steps for a test are sent as one batched mutation.
 """
 
 import json
@@ -11,6 +15,15 @@ import sys
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
+# Per-operation API metrics, written at exit when XRAY_METRICS_DIR is set
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from api_metrics import metrics_from_env
+from step_diff import StepSyncPlan, build_step_mutations, plan_step_sync
+from step_texts import load_json
+
+metrics_from_env()
+
 # Configuration
 GRAPHQL_URL = "https://xray.cloud.getxray.app/api/v2/graphql"
 AUTH_ENDPOINT = "https://xray.cloud.getxray.app/api/v2/authenticate"
@@ -48,8 +61,7 @@ def load_backup_data(backup_file: str = None) -> Dict[str, Any]:
         backup_file = max(backup_files)
     
     try:
-        with open(backup_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_json(backup_file)
         
         print(f"✓ Loaded backup data from {backup_file}")
         return data
@@ -58,8 +70,14 @@ def load_backup_data(backup_file: str = None) -> Dict[str, Any]:
     except json.JSONDecodeError as e:
         raise ValueError(f"Invalid JSON in backup file: {e}")
 
-def get_current_test_steps(test_id: str, token: str) -> List[Dict[str, Any]]:
-    """Get current test steps from XRAY."""
+def get_current_test_steps(test_id: str, token: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Get current test steps from XRAY.
+    
+    Returns:
+        The test's steps, or None if they could not be read (an empty list
+        would plan to re-add every backed-up step on top of the current ones)
+    """
     query = """
     query GetCurrentSteps($issueId: String!) {
         getTest(issueId: $issueId) {
@@ -88,104 +106,87 @@ def get_current_test_steps(test_id: str, token: str) -> List[Dict[str, Any]]:
         
         if response.status_code != 200:
             print(f"    ✗ HTTP Error {response.status_code}: {response.text[:200]}")
-            return []
+            return None
         
         result = response.json()
         if 'errors' in result:
             print(f"    ✗ GraphQL Error: {result['errors']}")
-            return []
+            return None
         
-        if 'data' not in result or not result['data']['getTest']:
+        if not (result.get('data') or {}).get('getTest'):
             print(f"    ✗ No test data found")
-            return []
+            return None
         
-        return result['data']['getTest'].get('steps', [])
+        return result['data']['getTest'].get('steps') or []
         
     except Exception as e:
         print(f"    ✗ Exception: {e}")
-        return []
+        return None
 
-def remove_test_step(test_id: str, step_id: str, token: str) -> bool:
-    """Remove a single test step."""
-    remove_mutation = """
-    mutation RemoveTestStep($issueId: String!, $stepId: String!) {
-        removeTestStep(issueId: $issueId, stepId: $stepId) {
-            id
-        }
-    }
-    """
-    
+def execute_step_plan(test_id: str, plan: StepSyncPlan, token: str) -> bool:
+    """Send a step sync plan as batched mutations."""
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
     
-    variables = {
-        "issueId": test_id,
-        "stepId": step_id
-    }
-    
-    try:
-        response = requests.post(GRAPHQL_URL,
-                               json={"query": remove_mutation, "variables": variables},
-                               headers=headers,
-                               timeout=30)
-        
-        if response.status_code != 200:
-            print(f"    ✗ HTTP Error {response.status_code}: {response.text[:200]}")
-            return False
-        
-        result = response.json()
-        if 'errors' in result:
-            print(f"    ✗ GraphQL Error: {result['errors']}")
-            return False
-        
-        if 'data' not in result or 'removeTestStep' not in result['data']:
-            print(f"    ✗ Unexpected response: {result}")
+    for query, variables in build_step_mutations(test_id, plan):
+        try:
+            response = requests.post(GRAPHQL_URL,
+                                   json={"query": query, "variables": variables},
+                                   headers=headers,
+                                   timeout=30)
+            
+            if response.status_code != 200:
+                print(f"    ✗ HTTP Error {response.status_code}: {response.text[:200]}")
+                return False
+            
+            result = response.json()
+            if 'errors' in result:
+                print(f"    ✗ GraphQL Error: {result['errors']}")
+                return False
+            
+        except Exception as e:
+            print(f"    ✗ Exception: {e}")
             return False
-        
-        return True
-        
-    except Exception as e:
-        print(f"    ✗ Exception: {e}")
-        return False
-
-def rollback_test_steps(test_id: str, backup_steps: List[Dict[str, Any]], token: str) -> bool:
-    """Rollback test to its original state."""
-    # Get current steps
-    current_steps = get_current_test_steps(test_id, token)
     
-    if not current_steps:
-        print(f"    ✓ No steps to remove")
-        return True
+    return True
+
+def describe_plan(plan: StepSyncPlan) -> str:
+    return (f"remove {len(plan.removals)}, update {len(plan.updates)}, re-add {len(plan.additions)} steps "
+            f"({plan.kept} unchanged)")
+
+def rollback_test_steps(test_id: str, backup_steps: List[Dict[str, Any]], token: str,
+                        current_steps: List[Dict[str, Any]]) -> Optional[StepSyncPlan]:
+    """Rollback test from its current steps to the backup; returns the executed plan, or None on failure."""
+    plan = plan_step_sync(current_steps, backup_steps)
     
-    # Remove all current steps
-    print(f"    Removing {len(current_steps)} current steps...")
-    removed_count = 0
+    if plan.is_empty:
+        print(f"    ✓ Steps already match the backup")
+        return plan
     
-    for step in current_steps:
-        if remove_test_step(test_id, step['id'], token):
-            removed_count += 1
-        else:
-            print(f"    ✗ Failed to remove step {step['id']}")
+    print(f"    Syncing to backup: {describe_plan(plan)}...")
+    if execute_step_plan(test_id, plan, token):
+        print(f"    ✓ Applied {plan.operations} step operations")
+        return plan
     
-    if removed_count == len(current_steps):
-        print(f"    ✓ Successfully removed {removed_count} steps")
-        return True
-    else:
-        print(f"    ⚠️  Removed {removed_count}/{len(current_steps)} steps")
-        return False
+    print(f"    ✗ Failed to apply step operations")
+    return None
 
-def verify_rollback(test_id: str, expected_steps: int, token: str) -> bool:
-    """Verify that rollback was successful."""
+def verify_rollback(test_id: str, backup_steps: List[Dict[str, Any]], token: str) -> bool:
+    """Verify that the test's steps match the backup."""
     current_steps = get_current_test_steps(test_id, token)
-    actual_steps = len(current_steps)
+    if current_steps is None:
+        print(f"    ✗ Could not read the steps back to verify the rollback")
+        return False
+    remaining = plan_step_sync(current_steps, backup_steps)
     
-    if actual_steps == expected_steps:
-        print(f"    ✓ Rollback verified: {actual_steps} steps (expected {expected_steps})")
+    if remaining.is_empty:
+        print(f"    ✓ Rollback verified: {len(current_steps)} steps match the backup")
         return True
     else:
-        print(f"    ✗ Rollback failed: {actual_steps} steps (expected {expected_steps})")
+        print(f"    ✗ Rollback failed: {len(current_steps)} steps, still differs from backup "
+              f"({describe_plan(remaining)})")
         return False
 
 def process_single_rollback(test_data: Dict[str, Any], token: str, dry_run: bool = False) -> Dict[str, Any]:
@@ -208,20 +209,27 @@ def process_single_rollback(test_data: Dict[str, Any], token: str, dry_run: bool
         backup_steps = test_data['current_data']['steps']
         expected_steps = len(backup_steps)
         
+        # Never plan against steps that could not be read
+        current_steps = get_current_test_steps(test_data['issue_id'], token)
+        if current_steps is None:
+            result['message'] = "Could not read current steps, skipped"
+            return result
+        
         if dry_run:
-            current_steps = get_current_test_steps(test_data['issue_id'], token)
+            plan = plan_step_sync(current_steps, backup_steps)
             result['success'] = True
-            result['message'] = f"DRY RUN: Would remove {len(current_steps)} steps, restore to {expected_steps} steps"
-            result['steps_removed'] = len(current_steps)
+            result['message'] = f"DRY RUN: Would {describe_plan(plan)}, restore to {expected_steps} steps"
+            result['steps_removed'] = len(plan.removals)
             return result
         
         # Perform rollback
-        if rollback_test_steps(test_data['issue_id'], backup_steps, token):
+        plan = rollback_test_steps(test_data['issue_id'], backup_steps, token, current_steps)
+        if plan is not None:
             # Verify rollback
-            if verify_rollback(test_data['issue_id'], expected_steps, token):
+            if verify_rollback(test_data['issue_id'], backup_steps, token):
                 result['success'] = True
                 result['message'] = f"Successfully rolled back to {expected_steps} steps"
-                result['steps_removed'] = len(get_current_test_steps(test_data['issue_id'], token))
+                result['steps_removed'] = len(plan.removals)
             else:
                 result['message'] = "Rollback completed but verification failed"
         else:
@@ -8,10 +8,14 @@ import json
 import os
 import requests
 import sys
-import time
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
+# Steps are appended with batched mutations built by the shared step diff module
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from step_diff import MAX_STEP_OPERATIONS, StepSyncPlan, build_step_mutations, step_text
+
 # Configuration
 GRAPHQL_URL = "https://xray.cloud.getxray.app/api/v2/graphql"
 AUTH_ENDPOINT = "https://xray.cloud.getxray.app/api/v2/authenticate"
@@ -90,77 +94,40 @@ def check_test_has_steps(test_id: str, token: str) -> bool:
     except Exception:
         return False
 
-def add_test_step(test_id: str, step: Dict[str, str], token: str) -> bool:
-    """Add a single test step to a test."""
-    add_step_mutation = """
-    mutation AddTestStep($issueId: String!, $action: String, $result: String, $data: String) {
-        addTestStep(
-            issueId: $issueId, 
-            step: {
-                action: $action,
-                result: $result,
-                data: $data
-            }
-        ) {
-            id
-        }
-    }
-    """
-    
+def add_steps_to_test(test_id: str, steps: List[Dict[str, str]], token: str) -> bool:
+    """Append steps to a test with one batched mutation per MAX_STEP_OPERATIONS steps."""
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
-    
-    variables = {
-        "issueId": test_id,
-        "action": step.get('action', ''),
-        "result": step.get('result', ''),
-        "data": step.get('data', '')
-    }
-    
-    try:
-        response = requests.post(GRAPHQL_URL,
-                               json={"query": add_step_mutation, "variables": variables},
-                               headers=headers,
-                               timeout=30)
-        
-        if response.status_code != 200:
-            print(f"    ✗ HTTP Error {response.status_code}: {response.text[:200]}")
-            return False
-        
-        result = response.json()
-        if 'errors' in result:
-            print(f"    ✗ GraphQL Error: {result['errors']}")
-            return False
-        
-        if 'data' not in result or 'addTestStep' not in result['data']:
-            print(f"    ✗ Unexpected response: {result}")
-            return False
-        
-        step_id = result['data']['addTestStep']['id']
-        print(f"    ✓ Step added successfully (ID: {step_id})")
-        return True
-        
-    except Exception as e:
-        print(f"    ✗ Exception: {e}")
-        return False
-
-def add_steps_to_test(test_id: str, steps: List[Dict[str, str]], token: str) -> bool:
-    """Add multiple steps to a test."""
+    plan = StepSyncPlan(updates=[], removals=[], additions=[step_text(step) for step in steps], kept=0)
     success_count = 0
     
-    for i, step in enumerate(steps):
-        print(f"      Adding step {i+1}/{len(steps)}...")
-        
-        if add_test_step(test_id, step, token):
-            success_count += 1
-        else:
-            print(f"      ✗ Failed to add step {i+1}")
-            # Continue with remaining steps instead of failing completely
-        
-        # Rate limiting: small delay between steps
-        time.sleep(0.5)
+    for start, (query, variables) in zip(range(0, len(plan.additions), MAX_STEP_OPERATIONS),
+                                         build_step_mutations(test_id, plan)):
+        batch_size = len(plan.additions[start:start + MAX_STEP_OPERATIONS])
+        try:
+            response = requests.post(GRAPHQL_URL,
+                                   json={"query": query, "variables": variables},
+                                   headers=headers,
+                                   timeout=30)
+            
+            if response.status_code != 200:
+                print(f"    ✗ HTTP Error {response.status_code}: {response.text[:200]}")
+                break
+            
+            result = response.json()
+            if 'errors' in result:
+                print(f"    ✗ GraphQL Error: {result['errors']}")
+                break
+            
+            added = [step['id'] for step in (result.get('data') or {}).values() if step and step.get('id')]
+            success_count += len(added)
+            print(f"    ✓ Added {len(added)}/{batch_size} steps (IDs: {', '.join(added)})")
+            
+        except Exception as e:
+            print(f"    ✗ Exception: {e}")
+            break
     
     print(f"      ✓ Added {success_count}/{len(steps)} steps successfully")
     return success_count == len(steps)
@@ -6,9 +6,15 @@ Cross-references backup data with transformation data to ensure consistency
 
 import json
 import os
+import sys
 from datetime import datetime
 from typing import Dict, List, Any, Tuple
 
+# Backups store step text deduplicated
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from step_texts import load_json
+
 def load_backup_data() -> Dict[str, Any]:
     """Load the most recent backup data."""
     backup_files = [f for f in os.listdir('.') if f.startswith('test_backup_') and f.endswith('.json')]
@@ -18,8 +24,7 @@ def load_backup_data() -> Dict[str, Any]:
     # Get the most recent backup
     latest_backup = max(backup_files)
     
-    with open(latest_backup, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_json(latest_backup)
     
     print(f"✓ Loaded backup data from {latest_backup}")
     return data
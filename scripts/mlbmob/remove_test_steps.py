@@ -1,14 +1,29 @@
 #!/usr/bin/env python3
 """
 Remove all test steps from specified tests in Xray.
+
+Tests are cleared in batches: one request removes the steps of every test in a
+batch (aliased removeAllTestSteps fields) and one aliased query verifies that
+the batch is empty. Batches run on a small thread pool paced by the shared rate
+limiter. With --per-step, each test's steps are looked up and removed with
+aliased removeTestStep fields instead (for sites without removeAllTestSteps).
+
+Usage:
+    python remove_test_steps.py [--no-confirm] [--workers 4] [--batch-size 25] [--per-step]
 """
 
+import argparse
 import json
 import requests
 import os
-import time
 import sys
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from rate_limiter import shared_rate_limiter
+from step_diff import MAX_STEP_OPERATIONS
 
 # Configuration
 GRAPHQL_URL = "https://xray.cloud.getxray.app/api/v2/graphql"
@@ -39,47 +54,99 @@ def authenticate():
     except requests.exceptions.RequestException as e:
         raise Exception(f"Failed to authenticate: {e}")
 
-def remove_all_steps_from_test(test_id: str, test_key: str, token: str) -> bool:
-    """Remove all test steps from a test."""
-    remove_all_steps_mutation = """
-    mutation RemoveAllSteps($issueId: String!) {
-        removeAllTestSteps(issueId: $issueId)
-    }
+def post_graphql(session: requests.Session, query: str, variables: Dict, token: str) -> Dict:
+    """Send one GraphQL request, paced by the shared rate limiter; returns `data`."""
+    shared_rate_limiter().acquire()
+    response = session.post(GRAPHQL_URL,
+                            json={"query": query, "variables": variables},
+                            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+                            timeout=30)
+    if response.status_code != 200:
+        raise Exception(f"HTTP Error {response.status_code}: {response.text[:200]}")
+    result = response.json()
+    if 'errors' in result:
+        raise Exception(f"GraphQL Error: {result['errors']}")
+    return result.get('data') or {}
+
+def aliased_per_test(operation: str, field: str, issue_ids: List[str]) -> Tuple[str, Dict]:
+    """One `t<i>: <field>` per test, each taking its issue id as $id<i>."""
+    definitions = ", ".join(f"$id{i}: String!" for i in range(len(issue_ids)))
+    fields = "\n".join(f"    t{i}: {field.format(i=i)}" for i in range(len(issue_ids)))
+    query = f"{operation}({definitions}) {{\n{fields}\n}}"
+    return query, {f"id{i}": issue_id for i, issue_id in enumerate(issue_ids)}
+
+def get_steps(session: requests.Session, issue_ids: List[str], token: str) -> Dict[str, Optional[List[str]]]:
+    """Step ids of several tests, fetched with one aliased query (None for a test that does not exist)."""
+    query, variables = aliased_per_test("query GetSteps", "getTest(issueId: $id{i}) {{ steps {{ id }} }}", issue_ids)
+    data = post_graphql(session, query, variables, token)
+    return {issue_id: [step['id'] for step in (data[f"t{i}"].get('steps') or [])] if data.get(f"t{i}") else None
+            for i, issue_id in enumerate(issue_ids)}
+
+def remove_all_steps(session: requests.Session, issue_ids: List[str], token: str):
+    """Remove every step of several tests with one aliased removeAllTestSteps request."""
+    query, variables = aliased_per_test("mutation RemoveAllSteps", "removeAllTestSteps(issueId: $id{i})", issue_ids)
+    post_graphql(session, query, variables, token)
+
+def remove_steps_individually(session: requests.Session, issue_ids: List[str], token: str):
+    """Remove every step of several tests with aliased removeTestStep fields, MAX_STEP_OPERATIONS per request."""
+    step_ids = [step_id for ids in get_steps(session, issue_ids, token).values() for step_id in ids or []]
+    for start in range(0, len(step_ids), MAX_STEP_OPERATIONS):
+        chunk = step_ids[start:start + MAX_STEP_OPERATIONS]
+        definitions = ", ".join(f"$step{i}: String!" for i in range(len(chunk)))
+        # removeTestStep takes only the step id and returns a plain String
+        fields = "\n".join(f"    r{i}: removeTestStep(stepId: $step{i})" for i in range(len(chunk)))
+        variables = {f"step{i}": step_id for i, step_id in enumerate(chunk)}
+        post_graphql(session, f"mutation RemoveSteps({definitions}) {{\n{fields}\n}}", variables, token)
+
+def clear_batch(session: requests.Session, batch: List[Dict[str, str]], token: str,
+                per_step: bool = False) -> Tuple[List[str], List[Tuple[str, str]]]:
     """
+    Clear the steps of a batch of tests and verify the result with one query.
     
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-    
-    variables = {
-        "issueId": test_id
-    }
-    
+    Returns:
+        (cleared test keys, [(test key, error)])
+    """
+    issue_ids = [test['id'] for test in batch]
     try:
-        response = requests.post(GRAPHQL_URL,
-                               json={"query": remove_all_steps_mutation, "variables": variables},
-                               headers=headers,
-                               timeout=30)
-        
-        if response.status_code != 200:
-            print(f"    HTTP Error {response.status_code}: {response.text[:200]}")
-            return False
-            
-        result = response.json()
-        
-        if 'errors' in result:
-            print(f"    GraphQL Error: {result['errors']}")
-            return False
-        
-        return True
-        
+        if per_step:
+            remove_steps_individually(session, issue_ids, token)
+        else:
+            remove_all_steps(session, issue_ids, token)
+        remaining = get_steps(session, issue_ids, token)
     except Exception as e:
-        print(f"    Exception: {e}")
-        return False
+        return [], [(test['key'], str(e)) for test in batch]
+    
+    cleared, failed = [], []
+    for test in batch:
+        steps = remaining.get(test['id'])
+        if steps is None:
+            # getTest returns null for an unknown or mistyped issue id
+            failed.append((test['key'], "test not found"))
+            continue
+        left = len(steps)
+        if left:
+            failed.append((test['key'], f"{left} steps remain"))
+        else:
+            cleared.append(test['key'])
+    return cleared, failed
+
+def remove_all_steps_from_test(test_id: str, test_key: str, token: str) -> bool:
+    """Remove all test steps from a test."""
+    cleared, failed = clear_batch(requests.Session(), [{"key": test_key, "id": test_id}], token)
+    for key, error in failed:
+        print(f"    {key}: {error}")
+    return bool(cleared)
 
 def main():
     """Main function to remove steps from tests."""
+    parser = argparse.ArgumentParser(description="Remove all test steps from tests in Xray")
+    parser.add_argument("--no-confirm", action="store_true", help="Do not ask before removing")
+    parser.add_argument("--workers", type=int, default=4, help="Batches processed at the same time")
+    parser.add_argument("--batch-size", type=int, default=25, help="Tests cleared per request")
+    parser.add_argument("--per-step", action="store_true",
+                        help="Remove steps one by one (aliased removeTestStep) instead of removeAllTestSteps")
+    args = parser.parse_args()
+    
     # List of tests we updated (from the previous script output)
     tests_to_clean = [
         {"key": "MLBMOB-2203", "id": "1145807"},
@@ -118,7 +185,7 @@ def main():
         print(f"Error: {e}")
         return
     
-    if '--no-confirm' not in sys.argv:
+    if not args.no_confirm:
         print("\nTests to clean:")
         for test in tests_to_clean[:10]:
             print(f"  - {test['key']}")
@@ -130,25 +197,24 @@ def main():
             print("Aborted.")
             return
     
-    # Remove steps
+    # Remove steps, one batch of tests per request
     successful_removals = 0
     failed_removals = []
+    batches = [tests_to_clean[i:i + args.batch_size] for i in range(0, len(tests_to_clean), args.batch_size)]
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=max(args.workers, 10)))
     
-    for i, test in enumerate(tests_to_clean):
-        test_id = test['id']
-        test_key = test['key']
-        
-        print(f"\n[{i+1}/{len(tests_to_clean)}] Removing steps from {test_key}...")
-        
-        if remove_all_steps_from_test(test_id, test_key, token):
-            successful_removals += 1
-            print(f"  ✓ Successfully removed steps from {test_key}")
-        else:
-            failed_removals.append(test_key)
-            print(f"  ✗ Failed to remove steps from {test_key}")
-        
-        # Rate limiting
-        time.sleep(0.5)
+    print(f"\nClearing {len(tests_to_clean)} tests in {len(batches)} batches ({args.workers} workers)...")
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(clear_batch, session, batch, token, args.per_step) for batch in batches]
+        for future in as_completed(futures):
+            cleared, failed = future.result()
+            successful_removals += len(cleared)
+            for key in cleared:
+                print(f"  ✓ Successfully removed steps from {key}")
+            for key, error in failed:
+                failed_removals.append(key)
+                print(f"  ✗ Failed to remove steps from {key}: {error}")
     
     # Summary
     print(f"\n{'='*50}")
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Update Xray tests with proposed changes (preconditions and/or steps).
+
+Preconditions of all tests are linked after the per-test loop, grouped by test
+and alias-batched by PreconditionLinker; pairs already linked are skipped.
 """
 
 import json
@@ -10,9 +13,16 @@ import time
 import sys
 from typing import Dict, List, Any
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from precondition_linker import AssociationResult, PreconditionLinker
+from precondition_registry import PreconditionRegistry
+from step_diff import StepSyncPlan, build_step_mutations, step_text
+
 # Configuration
 GRAPHQL_URL = "https://xray.cloud.getxray.app/api/v2/graphql"
 OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_KEY = "MLBMOB"
 
 def authenticate():
     """Authenticate with Xray API and get JWT token."""
@@ -72,7 +82,7 @@ def create_precondition(definition: str, token: str) -> str:
     variables = {
         "definition": definition,
         "summary": summary,
-        "projectKey": "MLBMOB"
+        "projectKey": PROJECT_KEY
     }
     
     response = requests.post(GRAPHQL_URL,
@@ -95,30 +105,11 @@ def create_precondition(definition: str, token: str) -> str:
     
     return result['data']['createPrecondition']['precondition']['issueId']
 
-def add_preconditions_to_test(test_id: str, precondition_ids: List[str], token: str):
-    """Add preconditions to a test."""
-    add_mutation = """
-    mutation AddPreconditions($testId: String!, $preconditionIds: [String!]!) {
-        addPreconditionsToTest(issueId: $testId, preconditionIssueIds: $preconditionIds) {
-            addedPreconditions
-            warning
-        }
-    }
-    """
-    
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-    
-    variables = {
-        "testId": test_id,
-        "preconditionIds": precondition_ids
-    }
-    
+def run_query(query: str, variables: Dict[str, Any], token: str) -> Dict[str, Any]:
+    """Execute a GraphQL query and return its `data`."""
     response = requests.post(GRAPHQL_URL,
-                           json={"query": add_mutation, "variables": variables},
-                           headers=headers,
+                           json={"query": query, "variables": variables},
+                           headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
                            timeout=30)
     
     if response.status_code != 200:
@@ -127,16 +118,26 @@ def add_preconditions_to_test(test_id: str, precondition_ids: List[str], token:
     result = response.json()
     if 'errors' in result:
         raise Exception(f"GraphQL Error: {result['errors']}")
-    
-    if 'data' not in result or 'addPreconditionsToTest' not in result['data']:
-        raise Exception(f"Unexpected response structure: {result}")
-    
-    if 'warning' in result['data']['addPreconditionsToTest'] and result['data']['addPreconditionsToTest']['warning']:
-        print(f"      Warning: {result['data']['addPreconditionsToTest']['warning']}")
-    
-    added_count = result['data']['addPreconditionsToTest'].get('addedPreconditions', 0)
-    if added_count == 0:
-        raise Exception("No preconditions were added - they may already exist on the test")
+    return result.get('data') or {}
+
+def get_or_create_precondition(definition: str, registry: PreconditionRegistry, token: str) -> str:
+    """Return the ID of the precondition with this definition, creating it only if none exists."""
+    entry, created = registry.get_or_create(definition, lambda text: create_precondition(text, token))
+    if not created:
+        print(f"      Reusing precondition {entry.key or entry.issue_id}")
+    return entry.issue_id
+
+def add_preconditions_to_test(test_id: str, precondition_ids: List[str], token: str):
+    """Add preconditions to a test."""
+    linker = PreconditionLinker(lambda query, variables: run_query(query, variables, token))
+    result = linker.associate((test_id, precondition_id) for precondition_id in precondition_ids)
+    
+    if test_id in result.failed:
+        raise Exception(result.failed[test_id])
+    if test_id in result.warnings:
+        print(f"      Warning: {result.warnings[test_id]}")
+    if not result.added.get(test_id) and not result.skipped.get(test_id):
+        raise Exception("No preconditions were added")
 
 def check_test_has_steps(test_id: str, token: str) -> bool:
     """Check if a test already has steps."""
@@ -172,39 +173,16 @@ def check_test_has_steps(test_id: str, token: str) -> bool:
     return len(steps) > 0
 
 def add_steps_to_test(test_id: str, steps: List[Dict[str, str]], token: str):
-    """Add steps to a test."""
-    add_step_mutation = """
-    mutation AddTestStep($issueId: String!, $action: String, $result: String, $data: String) {
-        addTestStep(
-            issueId: $issueId, 
-            step: {
-                action: $action,
-                result: $result,
-                data: $data
-            }
-        ) {
-            id
-        }
-    }
-    """
-    
+    """Append steps to a test with one batched mutation per MAX_STEP_OPERATIONS steps."""
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
+    plan = StepSyncPlan(updates=[], removals=[], additions=[step_text(step) for step in steps], kept=0)
     
-    for i, step in enumerate(steps):
-        print(f"      Adding step {i+1}/{len(steps)}...")
-        
-        variables = {
-            "issueId": test_id,
-            "action": step.get('action', ''),
-            "result": step.get('result', ''),
-            "data": step.get('data', '')
-        }
-        
+    for query, variables in build_step_mutations(test_id, plan):
         response = requests.post(GRAPHQL_URL,
-                               json={"query": add_step_mutation, "variables": variables},
+                               json={"query": query, "variables": variables},
                                headers=headers,
                                timeout=30)
         
@@ -274,9 +252,14 @@ def main():
             print("Aborted.")
             return
     
+    # Index existing preconditions once, so identical definitions are reused
+    registry = PreconditionRegistry(lambda query, variables: run_query(query, variables, token), PROJECT_KEY)
+    if any(update['preconditions'] for update in updates):
+        print(f"✓ Indexed {registry.load()} existing preconditions")
+    
     # Update tests
-    successful = 0
     failed = []
+    precondition_pairs = []
     
     for i, update in enumerate(updates):
         test_id = update['issueId']
@@ -285,16 +268,14 @@ def main():
         print(f"\n[{i+1}/{len(updates)}] Updating {test_key}...")
         
         try:
-            # Add preconditions if any
+            # Resolve preconditions if any (linked for all tests at the end)
             if update['preconditions']:
-                print(f"    Creating and adding {len(update['preconditions'])} precondition(s)...")
+                print(f"    Resolving {len(update['preconditions'])} precondition(s)...")
                 precondition_ids = []
                 for precond in update['preconditions']:
-                    precond_id = create_precondition(precond['definition'], token)
+                    precond_id = get_or_create_precondition(precond['definition'], registry, token)
                     precondition_ids.append(precond_id)
-                
-                add_preconditions_to_test(test_id, precondition_ids, token)
-                print(f"    ✓ Added preconditions")
+                precondition_pairs.extend((test_id, precond_id) for precond_id in precondition_ids)
             
             # Add steps if any
             if update['steps']:
@@ -304,15 +285,34 @@ def main():
                 else:
                     add_steps_to_test(test_id, update['steps'], token)
                     print(f"    ✓ Added {len(update['steps'])} step(s)")
-            
-            successful += 1
+                
+                # Rate limiting
+                time.sleep(0.5)
             
         except Exception as e:
             print(f"    ✗ Error: {e}")
             failed.append(test_key)
-        
-        # Rate limiting
-        time.sleep(0.5)
+    
+    # Link preconditions: one addPreconditionsToTest per test, many tests per request
+    if precondition_pairs:
+        print(f"\nLinking {len(precondition_pairs)} precondition(s)...")
+        linker = PreconditionLinker(lambda query, variables: run_query(query, variables, token))
+        try:
+            result = linker.associate(precondition_pairs)
+        except Exception as e:
+            # Steps are already in; fail the linked tests and still print the summary
+            print(f"    ✗ Linking failed: {e}")
+            result = AssociationResult({}, {}, {test_id: str(e) for test_id, _ in precondition_pairs}, {})
+        print(f"    ✓ Added {result.added_count}, already linked {result.skipped_count}")
+        for update in updates:
+            test_id = update['issueId']
+            if test_id in result.warnings:
+                print(f"    {update['key']} warning: {result.warnings[test_id]}")
+            if test_id in result.failed and update['key'] not in failed:
+                print(f"    ✗ {update['key']}: {result.failed[test_id]}")
+                failed.append(update['key'])
+    
+    successful = len(updates) - len(failed)
     
     # Summary
     print(f"\n{'='*50}")
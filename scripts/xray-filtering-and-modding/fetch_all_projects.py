@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Fetch tests from several Xray projects concurrently.
+
+Runs one XrayTestFetcher per project in parallel. The fetchers share one HTTP
+connection pool and one request budget (XRAY_RATE_LIMIT requests per second
+across all projects). Each project keeps its own progress journal and results
+under projects/<KEY>/, so an interrupted portfolio refresh resumes per project.
+
+Usage:
+    python fetch_all_projects.py                              # MLB, CALC, FRAMED, BALLPARK
+    python fetch_all_projects.py --projects FRAMED MLB --workers 2
+
+Output:
+    - projects/<KEY>/tests_with_steps.json
+    - projects/<KEY>/tests_without_steps.json
+    - projects/<KEY>/fetch_progress.ndjson and .ndjson.pages (only while a project is incomplete)
+    - projects_summary.json: Per-project counts, timings and errors
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import fetch_all_xray_tests
+from fetch_all_xray_tests import XrayTestFetcher
+from rate_limiter import shared_rate_limiter
+
+# Same projects as XrayTestManager.get_available_projects
+DEFAULT_PROJECTS = ["MLB", "CALC", "FRAMED", "BALLPARK"]
+PROGRESS_INTERVAL = 2.0  # Seconds between consolidated progress lines
+
+
+class ProgressBoard:
+    """Thread-safe per-project progress with a single consolidated status line."""
+
+    def __init__(self, projects: List[str]):
+        self.lock = threading.Lock()
+        self.projects = {
+            key: {"state": "queued", "fetched": 0, "total": None, "started": None,
+                  "finished": None, "error": None}
+            for key in projects
+        }
+        self._last_render = 0.0
+
+    def update(self, key: str, **fields):
+        with self.lock:
+            self.projects[key].update(fields)
+            now = time.monotonic()
+            if now - self._last_render >= PROGRESS_INTERVAL or fields.get("state") in ("done", "failed"):
+                self._last_render = now
+                print(self.status_line(), flush=True)
+
+    def status_line(self) -> str:
+        parts = []
+        fetched = total = 0
+        for key, project in self.projects.items():
+            if project["total"] is None:
+                parts.append(f"{key} {project['state']}")
+            else:
+                parts.append(f"{key} {project['fetched']}/{project['total']}"
+                             + ("" if project["state"] == "running" else f" {project['state']}"))
+                fetched += project["fetched"]
+                total += project["total"]
+        overall = f"{fetched}/{total} ({fetched / total * 100:.0f}%)" if total else "starting"
+        return f"[{datetime.now().strftime('%H:%M:%S')}] {overall} | " + " | ".join(parts)
+
+
+def fetch_project(key: str, output_root: str, session: requests.Session, board: ProgressBoard) -> Dict:
+    """Fetch one project into its own partition; returns its summary."""
+    output_dir = os.path.join(output_root, key)
+    board.update(key, state="running", started=time.time())
+    fetcher = XrayTestFetcher(
+        project_key=key,
+        output_dir=output_dir,
+        progress_file=os.path.join(output_dir, "fetch_progress.ndjson"),
+        session=session,
+        rate_limiter=shared_rate_limiter(),
+        interactive=False,
+        verbose=False,
+        on_progress=lambda fetched, total: board.update(key, fetched=fetched, total=total)
+    )
+
+    try:
+        fetcher.run()
+    except Exception as e:
+        board.update(key, state="failed", error=str(e), finished=time.time())
+        raise
+
+    board.update(key, state="done", finished=time.time())
+    return {
+        "tests_with_steps": len(fetcher.tests_with_steps),
+        "tests_without_steps": len(fetcher.tests_without_steps),
+        "output_dir": output_dir
+    }
+
+
+def main():
+    """Main entry point for the script."""
+    parser = argparse.ArgumentParser(description="Fetch tests from several Xray projects concurrently")
+    parser.add_argument("--projects", nargs="+", default=DEFAULT_PROJECTS, help="Jira project keys")
+    parser.add_argument("--workers", type=int, default=4, help="Projects fetched at the same time")
+    parser.add_argument("--output-dir", default=os.path.join(fetch_all_xray_tests.OUTPUT_DIR, "projects"),
+                        help="Root directory for per-project results")
+    args = parser.parse_args()
+
+    print(f"Xray Multi-Project Fetcher")
+    print(f"==========================")
+    print(f"Projects: {', '.join(args.projects)}")
+    print(f"Workers: {args.workers}")
+    print(f"Output: {args.output_dir}\n")
+
+    # One connection pool for every project
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(args.workers * 2, 10))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    board = ProgressBoard(args.projects)
+    results = {}
+    started = time.time()
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(fetch_project, key, args.output_dir, session, board): key
+                for key in args.projects
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    results[key] = {"error": str(e)}
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Fetch interrupted by user. Progress has been saved per project.")
+        print("You can resume by running the script again.")
+        sys.exit(1)
+
+    for key, project in board.projects.items():
+        results[key].update({
+            "state": project["state"],
+            "total": project["total"],
+            "fetched": project["fetched"],
+            "duration_s": round((project["finished"] or time.time()) - (project["started"] or started), 1)
+        })
+
+    summary_file = os.path.join(args.output_dir, "projects_summary.json")
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(summary_file, "w") as f:
+        json.dump({
+            "fetch_date": datetime.now().isoformat(),
+            "duration_s": round(time.time() - started, 1),
+            "projects": results
+        }, f, indent=2)
+
+    print("\n" + "=" * 50)
+    print("FETCH SUMMARY")
+    print("=" * 50)
+    for key in args.projects:
+        result = results[key]
+        if result.get("error"):
+            print(f"✗ {key}: {result['error']}")
+        else:
+            print(f"✓ {key}: {result['fetched']} tests ({result['tests_with_steps']} with steps, "
+                  f"{result['tests_without_steps']} without) in {result['duration_s']}s")
+    print(f"\n✓ Summary saved to: {summary_file}")
+
+    if any(result.get("error") for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
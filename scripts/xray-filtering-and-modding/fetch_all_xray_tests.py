@@ -13,20 +13,33 @@ Usage:
 Output:
     - tests_with_steps.json: Contains all tests that have defined test steps
     - tests_without_steps.json: Contains all tests without test steps
-    - fetch_progress.json: Tracks progress for resuming interrupted fetches
+    - fetch_progress.ndjson (+ .pages segment): Append-only journal of completed pages for resuming interrupted fetches
 """
 
 import json
 import requests
 import os
+import threading
 import time
 import sys
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Callable
 from datetime import datetime
 from dotenv import load_dotenv
 
+# Per-operation API metrics, written at exit when XRAY_METRICS_DIR is set
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from api_metrics import metrics_from_env
+from connection_expander import ConnectionExpander
+from json_stream import CHUNK_SIZE, StreamedPage
+from keyset_pager import KeysetScanner, resume_cursors
+from progress_journal import ProgressJournal
+from query_complexity import AdaptivePager, is_timeout_error
+from step_texts import dump_json, load_json
+
 # Load environment variables from .env file
 load_dotenv()
+metrics_from_env()
 
 # Configuration with environment variable overrides
 GRAPHQL_URL = "https://xray.cloud.getxray.app/api/v2/graphql"
@@ -34,22 +47,30 @@ AUTH_ENDPOINT = "https://xray.cloud.getxray.app/api/v2/authenticate"
 
 # Get configuration from environment variables with defaults
 PROJECT_ID = os.getenv('PROJECT_ID', '26420')  # Default to MLBMOB project
-BATCH_SIZE = int(os.getenv('BATCH_SIZE', '100'))
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', '100'))  # Upper bound; lowered to fit the complexity limit
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', '5'))
 RETRY_WAIT = int(os.getenv('RETRY_WAIT', '2'))  # Base wait time between retries
 RATE_LIMIT_DELAY = float(os.getenv('RATE_LIMIT_DELAY', '1'))  # Delay between successful requests
+PAGINATION = os.getenv('PAGINATION', 'offset')  # 'offset' (start=N) or 'keyset' (id > N, parallel id ranges)
+KEYSET_WORKERS = int(os.getenv('KEYSET_WORKERS', '4'))  # Id ranges scanned at the same time in keyset mode
+DEDUP_STEP_TEXT = os.getenv('DEDUP_STEP_TEXT', '').lower() in ('1', 'true', 'yes')  # Shared step text table in tests_with_steps.json
 
 # Output directory is the same as the script location
 OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Progress tracking file
-PROGRESS_FILE = os.path.join(OUTPUT_DIR, 'fetch_progress.json')
+# Progress journal (one appended record per completed page)
+PROGRESS_FILE = os.path.join(OUTPUT_DIR, 'fetch_progress.ndjson')
+
+# Precondition fields, shared with the follow-up queries for tests with more than 100 preconditions
+PRECONDITION_FIELDS = 'issueId projectId definition jira (fields: ["key", "summary"])'
 
 # GraphQL query to fetch expanded test information
 QUERY = """
-query GetExpandedTests($projectId: String, $limit: Int!, $start: Int) {
-    getExpandedTests(projectId: $projectId, limit: $limit, start: $start) {
+query GetExpandedTests($projectId: String, $jql: String, $limit: Int!, $start: Int) {
+    getExpandedTests(projectId: $projectId, jql: $jql, limit: $limit, start: $start) {
         total
+        start
+        limit
         results {
             issueId
             jira (fields: ["summary", "key", "description", "labels", "priority", "status"])
@@ -62,10 +83,7 @@ query GetExpandedTests($projectId: String, $limit: Int!, $start: Int) {
             preconditions (limit: 100, start: 0) {
                 total
                 results {
-                    issueId
-                    projectId
-                    definition
-                    jira (fields: ["key", "summary"])
+                    %s
                 }
             }
             testType {
@@ -79,14 +97,50 @@ query GetExpandedTests($projectId: String, $limit: Int!, $start: Int) {
         }
     }
 }
-"""
+""" % PRECONDITION_FIELDS
 
 
 class XrayTestFetcher:
     """Handles fetching tests from Xray with retry logic and progress tracking."""
     
-    def __init__(self):
-        """Initialize the fetcher with configuration and check credentials."""
+    def __init__(self, project_id: Optional[str] = None, project_key: Optional[str] = None,
+                 output_dir: Optional[str] = None, progress_file: Optional[str] = None,
+                 session: Optional[requests.Session] = None, rate_limiter: Optional[Any] = None,
+                 interactive: bool = True, verbose: bool = True,
+                 on_progress: Optional[Callable[[int, int], None]] = None,
+                 pagination: Optional[str] = None, keyset_workers: Optional[int] = None):
+        """
+        Initialize the fetcher with configuration and check credentials.
+        
+        Args:
+            project_id: Xray project id (defaults to PROJECT_ID)
+            project_key: Jira project key; selects tests with `project = KEY` JQL instead of project_id
+            output_dir: Directory for results (defaults to OUTPUT_DIR)
+            progress_file: Progress journal (defaults to PROGRESS_FILE)
+            session: HTTP session, shared when several projects are fetched at once
+            rate_limiter: Optional shared request pacing (anything with acquire())
+            interactive: Ask before resuming or continuing after a failed batch;
+                         otherwise resume automatically and stop on a failed batch
+            verbose: Print per-batch progress
+            on_progress: Called with (tests fetched, total tests) after every page
+            pagination: 'offset' or 'keyset' (defaults to PAGINATION)
+            keyset_workers: Id ranges scanned in parallel in keyset mode (defaults to KEYSET_WORKERS)
+        """
+        self.project_key = project_key
+        self.project_id = project_key or project_id or PROJECT_ID
+        self.jql = f'project = "{project_key}"' if project_key else None
+        self.output_dir = output_dir or OUTPUT_DIR
+        self.progress_file = progress_file or PROGRESS_FILE
+        self.session = session or requests.Session()
+        self.rate_limiter = rate_limiter
+        self.interactive = interactive
+        self.log = print if verbose else (lambda *args, **kwargs: None)
+        self.on_progress = on_progress
+        self.pagination = pagination or PAGINATION
+        self.keyset_workers = keyset_workers or KEYSET_WORKERS
+        if self.pagination not in ('offset', 'keyset'):
+            raise ValueError(f"Unknown pagination mode '{self.pagination}', expected 'offset' or 'keyset'")
+        
         self.client_id = os.getenv('XRAY_CLIENT')
         self.client_secret = os.getenv('XRAY_SECRET')
         
@@ -102,6 +156,13 @@ class XrayTestFetcher:
         self.tests_without_steps = []
         self.processed_issue_ids = set()
         
+        # Largest page whose worst case (tests x nested preconditions) fits the server limit
+        self.pager = AdaptivePager(QUERY, {"start": 0}, max_page_size=BATCH_SIZE)
+        # Fetches the rest of any preconditions connection truncated at 100, paced by
+        # the fetcher's limiter (the process-wide one when none is given)
+        self.expander = ConnectionExpander(self.execute_query, rate_limiter=self.rate_limiter)
+        self.journal = ProgressJournal(self.progress_file)
+        
     def authenticate(self) -> str:
         """
         Authenticate with Xray API and get JWT token.
@@ -119,8 +180,8 @@ class XrayTestFetcher:
         
         for attempt in range(MAX_RETRIES):
             try:
-                print(f"Authenticating with Xray API (attempt {attempt + 1}/{MAX_RETRIES})...")
-                response = requests.post(AUTH_ENDPOINT, json=auth_data, timeout=30)
+                self.log(f"Authenticating with Xray API (attempt {attempt + 1}/{MAX_RETRIES})...")
+                response = self.session.post(AUTH_ENDPOINT, json=auth_data, timeout=30)
                 
                 if response.status_code == 401:
                     raise Exception("Invalid credentials. Please check your XRAY_CLIENT and XRAY_SECRET.")
@@ -131,14 +192,14 @@ class XrayTestFetcher:
                 # JWT tokens typically expire after 24 hours
                 self.token_expiry = time.time() + (23 * 60 * 60)  # 23 hours to be safe
                 
-                print("✓ Successfully authenticated with Xray API")
+                self.log("✓ Successfully authenticated with Xray API")
                 return self.token
                 
             except requests.exceptions.RequestException as e:
                 if attempt < MAX_RETRIES - 1:
                     wait_time = RETRY_WAIT * (2 ** attempt)  # Exponential backoff
-                    print(f"  Authentication failed: {e}")
-                    print(f"  Waiting {wait_time} seconds before retry...")
+                    self.log(f"  Authentication failed: {e}")
+                    self.log(f"  Waiting {wait_time} seconds before retry...")
                     time.sleep(wait_time)
                 else:
                     raise Exception(f"Failed to authenticate after {MAX_RETRIES} attempts: {e}")
@@ -146,15 +207,52 @@ class XrayTestFetcher:
     def ensure_valid_token(self):
         """Ensure we have a valid authentication token, refreshing if necessary."""
         if not self.token or time.time() >= self.token_expiry:
-            print("Token expired or missing, re-authenticating...")
+            self.log("Token expired or missing, re-authenticating...")
             self.authenticate()
     
-    def fetch_tests_batch(self, start: int) -> Dict[str, Any]:
+    def execute_query(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Execute a single GraphQL query and return its data.
+        
+        Not paced here: the expander, its only caller, acquires the rate
+        limiter once per request.
+        
+        Raises:
+            Exception: On HTTP or GraphQL errors
+        """
+        self.ensure_valid_token()
+        response = self.session.post(
+            GRAPHQL_URL,
+            json={"query": query, "variables": variables},
+            headers={"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"},
+            timeout=60
+        )
+        response.raise_for_status()
+        result = response.json()
+        if 'errors' in result:
+            raise Exception(f"GraphQL errors: {result['errors']}")
+        return result['data']
+    
+    def fetch_tests_batch(self, start: int, jql: Optional[str] = None, limit: Optional[int] = None,
+                          on_test: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """
         Fetch a batch of tests from Xray with retry logic.
         
+        The page size comes from self.pager. When Xray times out or rejects the
+        query as too complex, the page is halved and retried instead of resending
+        the same oversized request.
+        
+        Each test is decoded from the response body as it arrives and handed to
+        on_test straight away, before the rest of the page has been read.
+        Preconditions past the first 100 are merged into the same test dicts
+        once the page is complete. A retried page passes its tests to on_test
+        again, so on_test must ignore tests it has already seen.
+        
         Args:
             start: Starting index for the batch
+            jql: JQL for this batch (keyset bounds), instead of the fetcher's own filter
+            limit: Fixed page size instead of the pager's
+            on_test: Called with every test as soon as it is decoded
             
         Returns:
             Dict containing the API response
@@ -169,68 +267,88 @@ class XrayTestFetcher:
             "Content-Type": "application/json"
         }
         
-        variables = {
-            "projectId": PROJECT_ID,
-            "limit": BATCH_SIZE,
-            "start": start
-        }
-        
-        payload = {
-            "query": QUERY,
-            "variables": variables
-        }
-        
         last_error = None
         for attempt in range(MAX_RETRIES):
+            page_size = limit or self.pager.page_size
+            payload = {
+                "query": QUERY,
+                "variables": {
+                    "projectId": None if self.jql else self.project_id,
+                    "jql": jql or self.jql,
+                    "limit": page_size,
+                    "start": start
+                }
+            }
+            
             try:
-                print(f"  Fetching batch starting at {start} (attempt {attempt + 1}/{MAX_RETRIES})...")
+                self.log(f"  Fetching {page_size} tests "
+                         f"{f'matching {jql}' if jql else f'starting at {start}'} "
+                         f"(attempt {attempt + 1}/{MAX_RETRIES})...")
                 
-                response = requests.post(
+                if self.rate_limiter:
+                    self.rate_limiter.acquire()
+                response = self.session.post(
                     GRAPHQL_URL, 
                     json=payload, 
                     headers=headers, 
-                    timeout=60  # Longer timeout for large batches
+                    timeout=60,  # Longer timeout for large batches
+                    stream=True  # Hand tests to on_test as they arrive instead of buffering the page
                 )
                 
-                # Handle rate limiting
-                if response.status_code == 429:
-                    retry_after = int(response.headers.get('Retry-After', 60))
-                    print(f"  Rate limited. Waiting {retry_after} seconds...")
-                    time.sleep(retry_after)
-                    continue
-                
-                # Handle authentication errors
-                if response.status_code == 401:
-                    print("  Authentication error, refreshing token...")
-                    self.authenticate()
-                    headers["Authorization"] = f"Bearer {self.token}"
-                    continue
-                
-                response.raise_for_status()
-                result = response.json()
+                with response:
+                    # Handle rate limiting
+                    if response.status_code == 429:
+                        retry_after = int(response.headers.get('Retry-After', 60))
+                        self.log(f"  Rate limited. Waiting {retry_after} seconds...")
+                        time.sleep(retry_after)
+                        continue
+                    
+                    # Handle authentication errors
+                    if response.status_code == 401:
+                        self.log("  Authentication error, refreshing token...")
+                        self.authenticate()
+                        headers["Authorization"] = f"Bearer {self.token}"
+                        continue
+                    
+                    response.raise_for_status()
+                    page = StreamedPage(response.iter_content(CHUNK_SIZE), 'getExpandedTests')
+                    # GraphQL errors normally precede data; don't hand out tests of a failed query
+                    page.raise_for_errors()
+                    tests = []
+                    for test in page.results():
+                        tests.append(test)
+                        if on_test:
+                            on_test(test)
                 
-                # Check for GraphQL errors
-                if 'errors' in result:
-                    raise Exception(f"GraphQL errors: {result['errors']}")
+                # Check for GraphQL errors sent after the results
+                page.raise_for_errors()
                 
                 # Validate response structure
-                if 'data' not in result or 'getExpandedTests' not in result['data']:
+                if not page.found:
                     raise Exception("Invalid response structure")
                 
-                batch_count = len(result['data']['getExpandedTests']['results'])
-                print(f"  ✓ Successfully fetched {batch_count} tests")
+                result = {'data': {'getExpandedTests': {**page.fields, 'results': tests}}}
+                self.log(f"  ✓ Successfully fetched {len(tests)} tests")
+                
+                added = self.expander.expand(tests, 'ExpandedTest', 'preconditions', PRECONDITION_FIELDS)
+                if added:
+                    self.log(f"  ✓ Fetched {added} more preconditions for tests with over 100")
                 
+                self.pager.record_success()
                 return result
                 
             except Exception as e:
                 last_error = e
-                if attempt < MAX_RETRIES - 1:
+                if is_timeout_error(e) and self.pager.page_size > 1:
+                    self.log(f"  Error: {e}")
+                    self.log(f"  Reducing page size to {self.pager.shrink()} and retrying...")
+                elif attempt < MAX_RETRIES - 1:
                     wait_time = RETRY_WAIT * (2 ** attempt)  # Exponential backoff
-                    print(f"  Error: {e}")
-                    print(f"  Waiting {wait_time} seconds before retry...")
+                    self.log(f"  Error: {e}")
+                    self.log(f"  Waiting {wait_time} seconds before retry...")
                     time.sleep(wait_time)
                 else:
-                    print(f"  ✗ Failed to fetch batch after {MAX_RETRIES} attempts")
+                    self.log(f"  ✗ Failed to fetch batch after {MAX_RETRIES} attempts")
         
         raise Exception(f"Failed to fetch batch at start={start}: {last_error}")
     
@@ -242,124 +360,174 @@ class XrayTestFetcher:
             results: List of test objects from the API
         """
         for test in results:
-            issue_id = test.get('issueId')
-            
-            # Skip if we've already processed this test (in case of duplicates)
-            if issue_id in self.processed_issue_ids:
-                continue
-            
-            self.processed_issue_ids.add(issue_id)
-            
-            # Categorize based on whether the test has steps
-            if test.get('steps') and len(test['steps']) > 0:
-                self.tests_with_steps.append(test)
-            else:
-                self.tests_without_steps.append(test)
+            self.process_test(test)
     
-    def save_progress(self, current_position: int, total: int):
+    def process_test(self, test: Dict[str, Any]):
         """
-        Save current progress to allow resuming interrupted fetches.
+        Categorize one test by whether it has steps.
         
         Args:
-            current_position: Current batch starting position
-            total: Total number of tests to fetch
+            test: Test object from the API
         """
-        progress_data = {
-            'timestamp': datetime.now().isoformat(),
-            'project_id': PROJECT_ID,
-            'current_position': current_position,
-            'total_tests': total,
-            'tests_fetched': len(self.processed_issue_ids),
-            'tests_with_steps_count': len(self.tests_with_steps),
-            'tests_without_steps_count': len(self.tests_without_steps),
-            'processed_issue_ids': list(self.processed_issue_ids)
-        }
+        issue_id = test.get('issueId')
         
-        with open(PROGRESS_FILE, 'w') as f:
-            json.dump(progress_data, f, indent=2)
+        # Skip if we've already processed this test (offset pages overlap when tests
+        # are created mid-scan, and a retried page hands out its tests again)
+        if issue_id in self.processed_issue_ids:
+            return
+        
+        self.processed_issue_ids.add(issue_id)
+        
+        # Categorize based on whether the test has steps
+        if test.get('steps') and len(test['steps']) > 0:
+            self.tests_with_steps.append(test)
+        else:
+            self.tests_without_steps.append(test)
+    
+    def save_progress(self, start: int, next_position: int, results: List[Dict[str, Any]]):
+        """
+        Append a completed page to the progress journal to allow resuming interrupted fetches.
+        
+        Args:
+            start: Starting position of the page
+            next_position: Position of the next page
+            results: Tests in the page
+        """
+        self.journal.record_page(start, next_position, (test.get('issueId') for test in results))
     
     def load_progress(self) -> Optional[Dict[str, Any]]:
         """
-        Load previous progress if available.
+        Load previous progress if available by replaying the journal.
         
         Returns:
-            Dict containing progress data or None if no progress file exists
+            Dict containing progress data or None if no progress journal exists
         """
-        if os.path.exists(PROGRESS_FILE):
-            try:
-                with open(PROGRESS_FILE, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Warning: Could not load progress file: {e}")
-        return None
+        try:
+            state = self.journal.replay()
+        except Exception as e:
+            self.log(f"Warning: Could not load progress journal: {e}")
+            return None
+        if not state:
+            return None
+        return {
+            'timestamp': state.get('timestamp'),
+            'project_id': state.get('project_id'),
+            'current_position': state['position'],
+            'total_tests': state.get('total'),
+            'tests_fetched': len(state['issue_ids']),
+            'processed_issue_ids': state['issue_ids'],
+            'pagination': state.get('pagination', 'offset'),
+            'keyset_ranges': state.get('keyset_ranges')
+        }
     
     def save_results(self):
         """Save the categorized test results to JSON files."""
-        with_steps_file = os.path.join(OUTPUT_DIR, 'tests_with_steps.json')
-        without_steps_file = os.path.join(OUTPUT_DIR, 'tests_without_steps.json')
-        
-        # Save tests with steps
-        with open(with_steps_file, 'w') as f:
-            json.dump({
-                "project_id": PROJECT_ID,
-                "fetch_date": datetime.now().isoformat(),
-                "total": len(self.tests_with_steps),
-                "tests": self.tests_with_steps
-            }, f, indent=2)
+        os.makedirs(self.output_dir, exist_ok=True)
+        with_steps_file = os.path.join(self.output_dir, 'tests_with_steps.json')
+        without_steps_file = os.path.join(self.output_dir, 'tests_without_steps.json')
+        
+        # Save tests with steps (optionally with step text deduplicated)
+        dump_json({
+            "project_id": self.project_id,
+            "fetch_date": datetime.now().isoformat(),
+            "total": len(self.tests_with_steps),
+            "tests": self.tests_with_steps
+        }, self.tests_with_steps, with_steps_file, dedupe=DEDUP_STEP_TEXT, indent=2, ensure_ascii=True)
         
         # Save tests without steps
         with open(without_steps_file, 'w') as f:
             json.dump({
-                "project_id": PROJECT_ID,
+                "project_id": self.project_id,
                 "fetch_date": datetime.now().isoformat(),
                 "total": len(self.tests_without_steps),
                 "tests": self.tests_without_steps
             }, f, indent=2)
         
-        print(f"\n✓ Results saved to:")
-        print(f"  - {with_steps_file}")
-        print(f"  - {without_steps_file}")
+        self.log(f"\n✓ Results saved to:")
+        self.log(f"  - {with_steps_file}")
+        self.log(f"  - {without_steps_file}")
     
     def run(self):
         """Main execution method to fetch all tests."""
-        print(f"Xray Test Fetcher")
-        print(f"================")
-        print(f"Project ID: {PROJECT_ID}")
-        print(f"Batch Size: {BATCH_SIZE}")
-        print(f"Max Retries: {MAX_RETRIES}")
-        print(f"Rate Limit Delay: {RATE_LIMIT_DELAY}s\n")
+        self.log(f"Xray Test Fetcher")
+        self.log(f"================")
+        self.log(f"Project ID: {self.project_id}")
+        self.log(f"Batch Size: {self.pager.page_size} (max {BATCH_SIZE})")
+        self.log(f"Pagination: {self.pagination}"
+                 + (f" ({self.keyset_workers} parallel id ranges)" if self.pagination == 'keyset' else ""))
+        self.log(f"Max Retries: {MAX_RETRIES}")
+        self.log(f"Rate Limit Delay: {RATE_LIMIT_DELAY}s\n")
         
         # Check for previous progress
         progress = self.load_progress()
         start_position = 0
+        resume = False
         
-        if progress and progress.get('project_id') == PROJECT_ID:
-            print(f"Found previous progress from {progress['timestamp']}")
-            print(f"Tests already fetched: {progress['tests_fetched']}")
+        if progress and progress.get('project_id') == self.project_id and \
+                progress.get('pagination') == self.pagination:
+            self.log(f"Found previous progress from {progress['timestamp']}")
+            self.log(f"Tests already fetched: {progress['tests_fetched']}")
             
-            resume = input("Resume from previous progress? (y/n): ").lower().strip() == 'y'
+            if self.interactive:
+                resume = input("Resume from previous progress? (y/n): ").lower().strip() == 'y'
+            else:
+                resume = True
             if resume:
-                start_position = progress['current_position']
+                start_position = progress['current_position'] if self.pagination == 'offset' else 0
                 self.processed_issue_ids = set(progress['processed_issue_ids'])
-                print(f"Resuming from position {start_position}...\n")
+                self.log(f"Resuming from position {start_position}...\n" if self.pagination == 'offset'
+                         else "Resuming keyset scan...\n")
         
         # Authenticate
         try:
             self.authenticate()
         except Exception as e:
-            print(f"❌ Error: {e}")
+            self.log(f"❌ Error: {e}")
+            if not self.interactive:
+                raise
             return
         
+        if self.pagination == 'keyset':
+            total_tests = self._fetch_keyset(resume, progress)
+        else:
+            total_tests = self._fetch_offset(start_position, resume)
+        if total_tests is None:
+            return
+        
+        # Save final results
+        self.journal.close()
+        self.save_results()
+        
+        # Print summary
+        self._print_summary()
+        
+        # Clean up progress file on successful completion
+        if len(self.processed_issue_ids) >= total_tests * 0.95:  # 95% threshold for "complete"
+            if os.path.exists(self.progress_file):
+                self.journal.remove()
+                self.log("\n✓ Fetch completed successfully. Progress journal removed.")
+    
+    def _fetch_offset(self, start_position: int, resume: bool) -> Optional[int]:
+        """
+        Fetch all pages with offset pagination, from start_position.
+        
+        Returns:
+            Total number of tests, or None if the initial batch failed
+        """
         # Fetch first batch to get total count
-        print("Fetching first batch to determine total count...")
+        self.log("Fetching first batch to determine total count...")
         try:
             first_response = self.fetch_tests_batch(0)
         except Exception as e:
-            print(f"❌ Failed to fetch initial batch: {e}")
-            return
+            self.log(f"❌ Failed to fetch initial batch: {e}")
+            if not self.interactive:
+                raise
+            return None
         
-        total_tests = first_response['data']['getExpandedTests']['total']
-        print(f"\nTotal tests in project: {total_tests}")
+        first_page = first_response['data']['getExpandedTests']
+        total_tests = first_page['total']
+        self.log(f"\nTotal tests in project: {total_tests}")
+        self.journal.start(resume=resume, project_id=self.project_id, total=total_tests)
         
         # If resuming, load existing data
         if start_position > 0:
@@ -371,102 +539,172 @@ class XrayTestFetcher:
                 self.processed_issue_ids.add(test.get('issueId'))
         else:
             # Process first batch if starting fresh
-            results = first_response['data']['getExpandedTests']['results']
-            self.process_test_batch(results)
-            self.save_progress(BATCH_SIZE, total_tests)
-        
-        # Calculate batches to fetch
-        batches_to_fetch = []
-        for batch_start in range(start_position, total_tests, BATCH_SIZE):
-            if batch_start > 0:  # Skip first batch if already processed
-                batches_to_fetch.append(batch_start)
+            self.process_test_batch(first_page['results'])
+            start_position = self._next_position(0, first_page)
+            self.save_progress(0, start_position, first_page['results'])
+        self._report_progress(total_tests)
         
-        print(f"Batches to fetch: {len(batches_to_fetch)}")
-        print(f"Estimated time: {len(batches_to_fetch) * (RATE_LIMIT_DELAY + 2):.0f} seconds\n")
+        # Page sizes can change while fetching, so batches are not precomputed
+        remaining_batches = -(-max(total_tests - start_position, 0) // self.pager.page_size)
+        self.log(f"Batches to fetch: {remaining_batches}")
+        self.log(f"Estimated time: {remaining_batches * (RATE_LIMIT_DELAY + 2):.0f} seconds\n")
         
         # Fetch remaining batches
-        for i, batch_start in enumerate(batches_to_fetch):
-            print(f"\nBatch {i + 1}/{len(batches_to_fetch)}: "
-                  f"Fetching tests {batch_start} to {min(batch_start + BATCH_SIZE, total_tests)}...")
+        batch_start = start_position
+        batch_number = 0
+        while batch_start < total_tests:
+            batch_number += 1
+            self.log(f"\nBatch {batch_number}: "
+                     f"Fetching tests {batch_start} to {min(batch_start + self.pager.page_size, total_tests)}...")
             
             try:
-                response = self.fetch_tests_batch(batch_start)
-                
-                # Process batch
-                results = response['data']['getExpandedTests']['results']
-                self.process_test_batch(results)
+                # Tests are processed as they arrive
+                response = self.fetch_tests_batch(batch_start, on_test=self.process_test)
+                page = response['data']['getExpandedTests']
                 
                 # Save progress after each successful batch
-                next_position = batch_start + BATCH_SIZE
-                self.save_progress(next_position, total_tests)
+                next_position = self._next_position(batch_start, page)
+                self.save_progress(batch_start, next_position, page['results'])
+                batch_start = next_position
+                self._report_progress(total_tests)
                 
                 # Rate limiting delay
-                if i < len(batches_to_fetch) - 1:  # Don't delay after last batch
+                if batch_start < total_tests:  # Don't delay after last batch
                     time.sleep(RATE_LIMIT_DELAY)
                     
             except Exception as e:
-                print(f"❌ Failed to fetch batch at position {batch_start}: {e}")
-                print("Progress has been saved. You can resume later.")
+                self.log(f"❌ Failed to fetch batch at position {batch_start}: {e}")
+                self.log("Progress has been saved. You can resume later.")
                 
                 # Ask user if they want to continue or stop
-                if i < len(batches_to_fetch) - 1:
+                batch_start += self.pager.page_size
+                if batch_start < total_tests:
+                    if not self.interactive:
+                        raise
                     choice = input("\nContinue with next batch? (y/n): ").lower().strip()
                     if choice != 'y':
-                        print("Stopping fetch. Progress has been saved.")
+                        self.log("Stopping fetch. Progress has been saved.")
                         break
         
-        # Save final results
-        self.save_results()
+        return total_tests
+    
+    def _fetch_keyset(self, resume: bool, progress: Optional[Dict[str, Any]]) -> Optional[int]:
+        """
+        Fetch all tests with keyset pagination: the issue id span is split into
+        ranges that are scanned in parallel, each page bounded by `id > last seen`.
         
-        # Print summary
-        self._print_summary()
+        Returns:
+            Total number of tests, or None if the id bounds could not be fetched
+        """
+        lock = threading.Lock()
+        
+        def process_test(test: Dict[str, Any]):
+            with lock:
+                self.process_test(test)
+        
+        def fetch_page(jql: str, limit: Optional[int]) -> Dict[str, Any]:
+            # Range pages are processed as they arrive; the id bound lookups (limit 1) are not
+            page = self.fetch_tests_batch(0, jql=jql, limit=limit,
+                                          on_test=process_test if limit is None else None)
+            page = page['data']['getExpandedTests']
+            if limit is None:
+                time.sleep(RATE_LIMIT_DELAY)
+            return page
+        
+        scanner = KeysetScanner(fetch_page, base_jql=self.jql, workers=self.keyset_workers)
+        
+        if resume and progress.get('keyset_ranges'):
+            ranges = [tuple(id_range) for id_range in progress['keyset_ranges']]
+            total_tests = progress['total_tests']
+            self._load_existing_results()
+            for test in self.tests_with_steps + self.tests_without_steps:
+                self.processed_issue_ids.add(test.get('issueId'))
+            cursors = resume_cursors(ranges, self.processed_issue_ids)
+        else:
+            self.log("Fetching lowest and highest issue ids...")
+            try:
+                bounds = scanner.bounds()
+            except Exception as e:
+                self.log(f"❌ Failed to fetch id bounds: {e}")
+                if not self.interactive:
+                    raise
+                return None
+            if bounds:
+                low, high, total_tests = bounds
+                ranges = scanner.split(low, high)
+            else:
+                ranges, total_tests = [], 0
+            cursors = {}
         
-        # Clean up progress file on successful completion
-        if len(self.processed_issue_ids) >= total_tests * 0.95:  # 95% threshold for "complete"
-            if os.path.exists(PROGRESS_FILE):
-                os.remove(PROGRESS_FILE)
-                print("\n✓ Fetch completed successfully. Progress file removed.")
+        self.log(f"\nTotal tests in project: {total_tests}")
+        self.log(f"Scanning {len(ranges)} id ranges with {self.keyset_workers} workers\n")
+        self.journal.start(resume=resume, project_id=self.project_id, total=total_tests,
+                           pagination='keyset', keyset_ranges=ranges)
+        self._report_progress(total_tests)
+        
+        def on_page(index: int, results: List[Dict[str, Any]], last_id: int):
+            with lock:
+                # In keyset mode a page record carries its range index and last id
+                self.save_progress(index, last_id, results)
+                self._report_progress(total_tests)
+        
+        try:
+            scanner.scan(ranges, on_page, cursors)
+        except Exception as e:
+            self.log(f"❌ Keyset scan failed: {e}")
+            self.log("Progress has been saved. You can resume later.")
+            if not self.interactive:
+                raise
+        
+        return total_tests
+    
+    def _report_progress(self, total: int):
+        if self.on_progress:
+            self.on_progress(len(self.processed_issue_ids), total)
+    
+    def _next_position(self, start: int, page: Dict[str, Any]) -> int:
+        """Position after a page, using the limit Xray applied (it may cap the requested one)."""
+        return start + (page.get('limit') or len(page['results']) or self.pager.page_size)
     
     def _load_existing_results(self):
         """Load existing results when resuming."""
-        with_steps_file = os.path.join(OUTPUT_DIR, 'tests_with_steps.json')
-        without_steps_file = os.path.join(OUTPUT_DIR, 'tests_without_steps.json')
+        with_steps_file = os.path.join(self.output_dir, 'tests_with_steps.json')
+        without_steps_file = os.path.join(self.output_dir, 'tests_without_steps.json')
         
         if os.path.exists(with_steps_file):
-            with open(with_steps_file, 'r') as f:
-                data = json.load(f)
-                self.tests_with_steps = data.get('tests', [])
+            data = load_json(with_steps_file)
+            self.tests_with_steps = data.get('tests', [])
         
         if os.path.exists(without_steps_file):
             with open(without_steps_file, 'r') as f:
                 data = json.load(f)
                 self.tests_without_steps = data.get('tests', [])
         
-        print(f"Loaded {len(self.tests_with_steps)} tests with steps")
-        print(f"Loaded {len(self.tests_without_steps)} tests without steps")
+        self.log(f"Loaded {len(self.tests_with_steps)} tests with steps")
+        self.log(f"Loaded {len(self.tests_without_steps)} tests without steps")
     
     def _print_summary(self):
         """Print a summary of the fetch results."""
         total_fetched = len(self.tests_with_steps) + len(self.tests_without_steps)
         
-        print("\n" + "=" * 50)
-        print("FETCH SUMMARY")
-        print("=" * 50)
-        print(f"Total tests fetched: {total_fetched}")
-        print(f"Tests with steps: {len(self.tests_with_steps)} "
-              f"({len(self.tests_with_steps) / max(total_fetched, 1) * 100:.1f}%)")
-        print(f"Tests without steps: {len(self.tests_without_steps)} "
-              f"({len(self.tests_without_steps) / max(total_fetched, 1) * 100:.1f}%)")
+        self.log("\n" + "=" * 50)
+        self.log("FETCH SUMMARY")
+        self.log("=" * 50)
+        self.log(f"Total tests fetched: {total_fetched}")
+        self.log(f"Tests with steps: {len(self.tests_with_steps)} "
+                 f"({len(self.tests_with_steps) / max(total_fetched, 1) * 100:.1f}%)")
+        self.log(f"Tests without steps: {len(self.tests_without_steps)} "
+                 f"({len(self.tests_without_steps) / max(total_fetched, 1) * 100:.1f}%)")
         
         # Show some example tests
         if self.tests_without_steps:
-            print("\nExample tests without steps:")
+            self.log("\nExample tests without steps:")
             for test in self.tests_without_steps[:5]:
                 jira_data = test.get('jira', {})
-                print(f"  - {jira_data.get('key', 'N/A')}: {jira_data.get('summary', 'N/A')}")
+                self.log(f"  - {jira_data.get('key', 'N/A')}: {jira_data.get('summary', 'N/A')}")
             
             if len(self.tests_without_steps) > 5:
-                print(f"  ... and {len(self.tests_without_steps) - 5} more")
+                self.log(f"  ... and {len(self.tests_without_steps) - 5} more")
 
 
 def main():
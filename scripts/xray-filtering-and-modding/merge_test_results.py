@@ -5,6 +5,12 @@ Merge test results from multiple JSON files to get complete dataset.
 
 import json
 import os
+import sys
+
+# tests_with_steps.json may store step text deduplicated (DEDUP_STEP_TEXT=1)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from step_texts import load_json
 
 def merge_results():
     """Merge test results from original mlbmob folder with current results."""
@@ -22,14 +28,13 @@ def merge_results():
     
     # Load original data if exists
     if os.path.exists(original_with_steps):
-        with open(original_with_steps, 'r') as f:
-            data = json.load(f)
-            tests = data.get('tests', data) if isinstance(data, dict) else data
-            for test in tests:
-                issue_id = test.get('issueId')
-                if issue_id and issue_id not in all_issue_ids:
-                    all_issue_ids.add(issue_id)
-                    all_tests_with_steps.append(test)
+        data = load_json(original_with_steps)
+        tests = data.get('tests', data) if isinstance(data, dict) else data
+        for test in tests:
+            issue_id = test.get('issueId')
+            if issue_id and issue_id not in all_issue_ids:
+                all_issue_ids.add(issue_id)
+                all_tests_with_steps.append(test)
         print(f"Loaded {len(all_tests_with_steps)} tests with steps from original file")
     
     if os.path.exists(original_without_steps):
@@ -45,16 +50,15 @@ def merge_results():
     
     # Load current data
     if os.path.exists(current_with_steps):
-        with open(current_with_steps, 'r') as f:
-            data = json.load(f)
-            tests = data.get('tests', [])
-            added = 0
-            for test in tests:
-                issue_id = test.get('issueId')
-                if issue_id and issue_id not in all_issue_ids:
-                    all_issue_ids.add(issue_id)
-                    all_tests_with_steps.append(test)
-                    added += 1
+        data = load_json(current_with_steps)
+        tests = data.get('tests', [])
+        added = 0
+        for test in tests:
+            issue_id = test.get('issueId')
+            if issue_id and issue_id not in all_issue_ids:
+                all_issue_ids.add(issue_id)
+                all_tests_with_steps.append(test)
+                added += 1
         print(f"Added {added} new tests with steps from current file")
     
     if os.path.exists(current_without_steps):
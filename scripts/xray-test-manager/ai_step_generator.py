@@ -13,6 +13,7 @@ from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 import re
 
+from models import Test
 from test_manager import TestSummary, TestStep, XrayTestManager
 
 logger = logging.getLogger(__name__)
@@ -134,10 +135,9 @@ class AIStepGenerator:
             metadata=analysis
         )
     
-    def _analyze_test_content(self, test_summary: TestSummary, test_details: Dict) -> Dict[str, Any]:
+    def _analyze_test_content(self, test_summary: TestSummary, test_details: Optional[Test]) -> Dict[str, Any]:
         """Analyze test content to determine appropriate step categories"""
-        jira_data = test_details.get("jira", {})
-        description = jira_data.get("description", "")
+        description = test_details.description if test_details else ""
         summary = test_summary.summary.lower()
         desc_lower = description.lower()
         
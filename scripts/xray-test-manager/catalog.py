@@ -0,0 +1,266 @@
+"""
+XRAY Test Catalog - Compact In-Memory Representation
+
+Holds large numbers of tests for interactive tooling without one dataclass,
+one list of label strings and four step strings per test. Instead:
+
+- each test is a slotted CatalogRecord (no per-instance __dict__)
+- labels, label combinations, priorities, assignees and folder paths are stored
+  once in interning tables and referenced by index
+- step text is content-addressed: each distinct action/data/result text is
+  stored once in a StepTextTable (shared with snapshots, backups and exports)
+  and steps hold three text ids; step ids live in one UTF-8 buffer. A step is
+  decoded only when it is read, and equal steps have equal text ids
+
+Records convert to and from the TestSummary/TestStep dataclasses used by
+XrayTestManager, so existing code can keep working with those.
+"""
+
+import os
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from models import Test, decode_test_page
+from test_manager import TestStep, TestSummary, XrayTestManager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from step_texts import STEP_TEXT_FIELDS, StepTextTable
+
+# Fields returned per step
+STEP_FIELDS = ("id",) + STEP_TEXT_FIELDS
+
+
+class StringTable:
+    """Interning table: each distinct value is stored once and referenced by index"""
+    __slots__ = ("values", "_index")
+
+    def __init__(self):
+        self.values: List = []
+        self._index: Dict = {}
+
+    def add(self, value) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def find(self, value) -> Optional[int]:
+        """Index of a value, or None if it was never added"""
+        return self._index.get(value)
+
+    def __getitem__(self, index: int):
+        return self.values[index]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class CatalogRecord:
+    """One test; string fields other than key/summary are indexes into the catalog tables"""
+    __slots__ = ("issue_id", "key", "summary", "label_set", "priority", "assignee", "folder",
+                 "last_modified", "steps_count", "step_start")
+
+    def __init__(self, issue_id: str, key: str, summary: str, label_set: int, priority: int,
+                 assignee: int, folder: int, last_modified: str, steps_count: int, step_start: int):
+        self.issue_id = issue_id
+        self.key = key
+        self.summary = summary
+        self.label_set = label_set
+        self.priority = priority
+        self.assignee = assignee
+        self.folder = folder
+        self.last_modified = last_modified
+        self.steps_count = steps_count
+        self.step_start = step_start  # First step in the step store, -1 if steps were not loaded
+
+
+class TestCatalog:
+    """Compact catalog of tests with interned metadata and array-backed steps"""
+
+    def __init__(self):
+        self.records: List[CatalogRecord] = []
+        self.labels = StringTable()
+        self.label_sets = StringTable()  # Tuples of label indexes
+        self.priorities = StringTable()
+        self.assignees = StringTable()   # None is index 0 (unassigned)
+        self.folders = StringTable()     # None is index 0 (no folder)
+        self.assignees.add(None)
+        self.folders.add(None)
+        self.step_texts = StepTextTable()
+        self._step_refs = array("I")          # len(STEP_TEXT_FIELDS) text ids per step
+        self._step_ids = bytearray()
+        self._step_id_offsets = array("Q", [0])
+        self._by_id: Dict[str, int] = {}
+        self._by_key: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[CatalogRecord]:
+        return iter(self.records)
+
+    @property
+    def stored_steps(self) -> int:
+        return len(self._step_id_offsets) - 1
+
+    def add(self, issue_id: str, key: str, summary: str, labels: Sequence[str] = (), priority: str = "",
+            assignee: Optional[str] = None, folder_path: Optional[str] = None, last_modified: str = "",
+            steps: Optional[Iterable[Tuple[Optional[str], str, str, str]]] = None,
+            steps_count: int = 0) -> CatalogRecord:
+        """
+        Add a test (or replace the test with the same issue id).
+
+        Args:
+            steps: (id, action, data, result) tuples; None if only the count is known
+            steps_count: Number of steps when steps are not given
+        """
+        step_start = -1
+        if steps is not None:
+            step_start = self.stored_steps
+            for step in steps:
+                self._append_step(step)
+            steps_count = self.stored_steps - step_start
+
+        label_set = self.label_sets.add(tuple(self.labels.add(label) for label in labels))
+        record = CatalogRecord(issue_id, key, summary, label_set, self.priorities.add(priority or ""),
+                               self.assignees.add(assignee), self.folders.add(folder_path),
+                               last_modified, steps_count, step_start)
+
+        position = self._by_id.get(issue_id)
+        if position is None:
+            position = len(self.records)
+            self.records.append(record)
+        else:
+            # Replaced records leave their old steps unreferenced in the store
+            self._by_key.pop(self.records[position].key, None)
+            self.records[position] = record
+        self._by_id[issue_id] = position
+        self._by_key[key] = position
+        return record
+
+    def _append_step(self, step: Tuple[Optional[str], str, str, str]):
+        step_id, action, data, result = step
+        add = self.step_texts.add
+        self._step_refs.extend((add(action), add(data), add(result)))
+        self._step_ids += (step_id or "").encode("utf-8")
+        self._step_id_offsets.append(len(self._step_ids))
+
+    def add_test(self, test: Test) -> CatalogRecord:
+        """Add a decoded Test, including its steps"""
+        return self.add(test.issue_id, test.key, test.summary, test.labels, test.priority, test.assignee,
+                        test.folder_path, test.last_modified, test.steps)
+
+    def add_summary(self, summary: TestSummary, steps: Optional[List[TestStep]] = None) -> CatalogRecord:
+        """Add a TestSummary, optionally with its steps"""
+        return self.add(
+            summary.issue_id, summary.key, summary.summary, summary.labels, summary.priority, summary.assignee,
+            summary.folder_path, summary.last_modified,
+            None if steps is None else ((step.id, step.action, step.data, step.result) for step in steps),
+            summary.steps_count
+        )
+
+    @classmethod
+    def from_tests(cls, tests: Iterable[Test]) -> "TestCatalog":
+        catalog = cls()
+        for test in tests:
+            catalog.add_test(test)
+        return catalog
+
+    @classmethod
+    def from_project(cls, manager: XrayTestManager, project_key: str, page_size: int = 100) -> "TestCatalog":
+        """Page through every test of a project into a new catalog, one page in memory at a time"""
+        catalog = cls()
+        start = 0
+        while True:
+            total, tests = decode_test_page(manager.client.get_tests(project_key, page_size, start))
+            for test in tests:
+                catalog.add_test(test)
+            start += len(tests)
+            if not tests or start >= total:
+                return catalog
+
+    @classmethod
+    def from_summaries(cls, summaries: Iterable[TestSummary],
+                       steps: Optional[Dict[str, List[TestStep]]] = None) -> "TestCatalog":
+        """Build a catalog from summaries, with steps per issue id where available"""
+        catalog = cls()
+        steps = steps or {}
+        for summary in summaries:
+            catalog.add_summary(summary, steps.get(summary.issue_id))
+        return catalog
+
+    def get(self, issue_id_or_key: str) -> Optional[CatalogRecord]:
+        position = self._by_id.get(issue_id_or_key)
+        if position is None:
+            position = self._by_key.get(issue_id_or_key)
+        return None if position is None else self.records[position]
+
+    def labels_of(self, record: CatalogRecord) -> List[str]:
+        return [self.labels[index] for index in self.label_sets[record.label_set]]
+
+    def folder_of(self, record: CatalogRecord) -> Optional[str]:
+        return self.folders[record.folder]
+
+    def step_text_ids(self, step_index: int) -> Tuple[int, ...]:
+        """The (action, data, result) text ids of one stored step; equal ids mean equal text"""
+        base = step_index * len(STEP_TEXT_FIELDS)
+        return tuple(self._step_refs[base:base + len(STEP_TEXT_FIELDS)])
+
+    def step_fields(self, step_index: int) -> Tuple[str, ...]:
+        """Decode the (id, action, data, result) of one stored step"""
+        offsets = self._step_id_offsets
+        step_id = self._step_ids[offsets[step_index]:offsets[step_index + 1]].decode("utf-8")
+        texts = self.step_texts
+        return (step_id,) + tuple(texts[text_id] for text_id in self.step_text_ids(step_index))
+
+    def steps(self, record: Union[CatalogRecord, str]) -> Optional[List[TestStep]]:
+        """The test's steps as TestStep dataclasses, or None if they were not loaded"""
+        if isinstance(record, str):
+            record = self.get(record)
+        if record is None or record.step_start < 0:
+            return None
+        steps = []
+        for step_index in range(record.step_start, record.step_start + record.steps_count):
+            step_id, action, data, result = self.step_fields(step_index)
+            steps.append(TestStep(id=step_id or None, action=action, data=data, result=result))
+        return steps
+
+    def summary(self, record: Union[CatalogRecord, str]) -> Optional[TestSummary]:
+        """The test as a TestSummary dataclass"""
+        if isinstance(record, str):
+            record = self.get(record)
+        if record is None:
+            return None
+        return TestSummary(
+            issue_id=record.issue_id,
+            key=record.key,
+            summary=record.summary,
+            labels=self.labels_of(record),
+            priority=self.priorities[record.priority],
+            assignee=self.assignees[record.assignee],
+            steps_count=record.steps_count,
+            folder_path=self.folders[record.folder],
+            last_modified=record.last_modified,
+            has_steps=record.steps_count > 0
+        )
+
+    def summaries(self) -> List[TestSummary]:
+        return [self.summary(record) for record in self.records]
+
+    def with_label(self, label: str) -> List[CatalogRecord]:
+        """Records carrying a label (compares interned indexes, no string work per test)"""
+        label_index = self.labels.find(label)
+        if label_index is None:
+            return []
+        matching_sets = {index for index, label_set in enumerate(self.label_sets.values) if label_index in label_set}
+        return [record for record in self.records if record.label_set in matching_sets]
+
+    def in_folder(self, folder_path: str) -> List[CatalogRecord]:
+        """Records in a folder or any of its subfolders"""
+        prefix = folder_path.rstrip("/") + "/"
+        matching = {index for index, path in enumerate(self.folders.values)
+                    if path and (path == folder_path or path.startswith(prefix))}
+        return [record for record in self.records if record.folder in matching]
@@ -125,32 +125,30 @@ class XrayTestManagerCLI:
                 print("Test not found.")
                 return
             
-            jira_data = details.get("jira", {})
-            
             print(f"\n=== Test Details ===")
-            print(f"Key: {jira_data.get('key', 'N/A')}")
-            print(f"Summary: {jira_data.get('summary', 'N/A')}")
-            print(f"Priority: {jira_data.get('priority', {}).get('name', 'N/A')}")
-            print(f"Assignee: {jira_data.get('assignee', {}).get('displayName', 'Unassigned')}")
+            print(f"Key: {details.key or 'N/A'}")
+            print(f"Summary: {details.summary or 'N/A'}")
+            print(f"Priority: {details.priority or 'N/A'}")
+            print(f"Assignee: {details.assignee or 'Unassigned'}")
             
-            if jira_data.get('labels'):
-                print(f"Labels: {', '.join(jira_data['labels'])}")
+            if details.labels:
+                print(f"Labels: {', '.join(details.labels)}")
             
-            if details.get('folder', {}).get('path'):
-                print(f"Folder: {details['folder']['path']}")
+            if details.folder_path:
+                print(f"Folder: {details.folder_path}")
             
             print(f"\nDescription:")
-            print(jira_data.get('description', 'No description'))
+            print(details.description or 'No description')
             
-            steps = details.get('steps', [])
+            steps = details.steps
             if steps:
                 print(f"\nTest Steps ({len(steps)}):")
                 for i, step in enumerate(steps, 1):
-                    print(f"  {i}. {step.get('action', 'N/A')}")
-                    if step.get('data'):
-                        print(f"     Data: {step['data']}")
-                    if step.get('result'):
-                        print(f"     Expected: {step['result']}")
+                    print(f"  {i}. {step.action or 'N/A'}")
+                    if step.data:
+                        print(f"     Data: {step.data}")
+                    if step.result:
+                        print(f"     Expected: {step.result}")
                     print()
             else:
                 print("\nNo test steps defined.")
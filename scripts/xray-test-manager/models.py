@@ -0,0 +1,142 @@
+"""
+XRAY Response Models
+
+Typed, immutable models for the test data returned by the GraphQL API, and the
+single place where raw responses are turned into them. Models are NamedTuples:
+one tuple allocation per object, no per-instance __dict__, and fields are
+resolved once at decode time instead of through `.get("jira", {}).get(...)`
+chains in every consumer.
+
+Response bodies are decoded from bytes with orjson when it is installed (it is
+in requirements.txt), falling back to the standard library json module.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(body: Union[bytes, str]) -> Any:
+    """Decode a JSON response body, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class Step(NamedTuple):
+    """A manual test step"""
+    id: Optional[str]
+    action: str = ""
+    data: str = ""
+    result: str = ""
+
+
+class Folder(NamedTuple):
+    """A Test Repository folder"""
+    name: str
+    path: str
+
+
+class Precondition(NamedTuple):
+    """A precondition attached to a test"""
+    issue_id: str
+    key: str = ""
+    summary: str = ""
+    definition: str = ""
+
+
+class Test(NamedTuple):
+    """A test with its Jira fields, steps, folder and preconditions"""
+    issue_id: str
+    key: str = ""
+    summary: str = ""
+    description: str = ""
+    labels: Tuple[str, ...] = ()
+    priority: str = ""
+    assignee: Optional[str] = None
+    test_type: str = ""
+    steps: Tuple[Step, ...] = ()
+    folder: Optional[Folder] = None
+    preconditions: Tuple[Precondition, ...] = ()
+    last_modified: str = ""
+
+    @property
+    def has_steps(self) -> bool:
+        return bool(self.steps)
+
+    @property
+    def folder_path(self) -> Optional[str]:
+        return self.folder.path if self.folder else None
+
+
+# Positional tuple construction skips NamedTuple keyword/default handling (hot path for large pages)
+_new = tuple.__new__
+
+
+def decode_step(step: Dict) -> Step:
+    get = step.get
+    return _new(Step, (get("id"), get("action") or "", get("data") or "", get("result") or ""))
+
+
+def decode_precondition(precondition: Dict) -> Precondition:
+    jira = precondition.get("jira") or {}
+    return _new(Precondition, (
+        precondition.get("issueId", ""),
+        jira.get("key") or "",
+        jira.get("summary") or "",
+        precondition.get("definition") or ""
+    ))
+
+
+def decode_test(test: Dict) -> Test:
+    """
+    Build a Test from one GraphQL test object (getTest, getTests or getExpandedTests result)
+
+    Missing fields (not selected by the query) get their defaults.
+    """
+    get = test.get
+    jira = get("jira") or {}
+    priority = jira.get("priority")
+    assignee = jira.get("assignee")
+    test_type = get("testType")
+    folder = get("folder")
+    steps = get("steps")
+    preconditions = get("preconditions")
+    if preconditions.__class__ is dict:
+        # Paginated connection ({total, results}) on getTests/getExpandedTests
+        preconditions = preconditions.get("results")
+
+    return _new(Test, (
+        get("issueId", ""),
+        jira.get("key") or "",
+        jira.get("summary") or "",
+        jira.get("description") or "",
+        tuple(jira.get("labels") or ()),
+        (priority.get("name") or "") if priority.__class__ is dict else (priority or ""),
+        assignee.get("displayName") if assignee.__class__ is dict else assignee,
+        test_type.get("name", "") if test_type else "",
+        tuple([decode_step(step) for step in steps]) if steps else (),
+        _new(Folder, (folder.get("name") or "", folder.get("path") or "")) if folder else None,
+        tuple([decode_precondition(p) for p in preconditions]) if preconditions else (),
+        get("lastModified") or ""
+    ))
+
+
+def decode_tests(results: Iterable[Dict]) -> List[Test]:
+    """Build Tests from a page's results"""
+    return [decode_test(test) for test in results]
+
+
+def decode_test_page(data: Dict, operation: str = "getTests") -> Tuple[int, List[Test]]:
+    """
+    Build Tests from the `data` of a page query.
+
+    Returns:
+        (total reported by Xray, tests in the page)
+    """
+    page = data.get(operation) or {}
+    return page.get("total", 0), decode_tests(page.get("results") or ())
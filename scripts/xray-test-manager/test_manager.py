@@ -7,6 +7,7 @@ test organization, and label management.
 """
 
 import os
+import sys
 import json
 import logging
 from typing import Dict, List, Optional, Any, Tuple
@@ -14,8 +15,14 @@ from datetime import datetime
 from dataclasses import dataclass, asdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from models import Test, decode_test, decode_test_page
 from xray_client import XrayGraphQLClient, create_client_from_env
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from jql_planner import in_clause
+from step_diff import MAX_STEP_OPERATIONS, StepSyncPlan, build_step_mutations, plan_step_sync
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -31,6 +38,22 @@ class TestSummary:
     folder_path: Optional[str]
     last_modified: str
     has_steps: bool
+    
+    @classmethod
+    def from_test(cls, test: Test) -> "TestSummary":
+        """Summarize a decoded Test"""
+        return cls(
+            issue_id=test.issue_id,
+            key=test.key,
+            summary=test.summary,
+            labels=list(test.labels),
+            priority=test.priority,
+            assignee=test.assignee,
+            steps_count=len(test.steps),
+            folder_path=test.folder_path,
+            last_modified=test.last_modified,
+            has_steps=test.has_steps
+        )
 
 @dataclass
 class TestStep:
@@ -78,32 +101,20 @@ class XrayTestManager:
             start: Starting offset for pagination
             filters: Optional filters (labels, folder_path, has_steps, etc.)
         """
-        jql = self._build_jql_from_filters(project_key, filters)
+        labels = (filters or {}).get("labels")
+        jql = self._build_jql_from_filters(project_key, dict(filters or {}, labels=None))
         
         try:
-            result = self.client.get_tests(project_key, limit, start, jql)
-            tests = result.get("getTests", {}).get("results", [])
-            
-            summaries = []
-            for test in tests:
-                jira_data = test.get("jira", {})
-                steps = test.get("steps", [])
-                
-                summary = TestSummary(
-                    issue_id=test.get("issueId", ""),
-                    key=jira_data.get("key", ""),
-                    summary=jira_data.get("summary", ""),
-                    labels=jira_data.get("labels", []),
-                    priority=jira_data.get("priority", {}).get("name", ""),
-                    assignee=jira_data.get("assignee", {}).get("displayName") if jira_data.get("assignee") else None,
-                    steps_count=len(steps),
-                    folder_path=test.get("folder", {}).get("path") if test.get("folder") else None,
-                    last_modified=test.get("lastModified", ""),
-                    has_steps=len(steps) > 0
-                )
-                summaries.append(summary)
-            
-            return summaries
+            if labels:
+                # Long label lists are split over concurrent sub-queries and merged
+                page = self.client.jql_planner.search(
+                    lambda sub_jql, page_limit, page_start: self.client.get_tests(
+                        project_key, page_limit, page_start, sub_jql).get("getTests"),
+                    jql, "labels", labels, limit, start)
+                _, tests = decode_test_page({"getTests": page})
+            else:
+                _, tests = decode_test_page(self.client.get_tests(project_key, limit, start, jql))
+            return [TestSummary.from_test(test) for test in tests]
             
         except Exception as e:
             logger.error(f"Failed to fetch tests: {e}")
@@ -118,8 +129,7 @@ class XrayTestManager:
         
         # Label filters
         if "labels" in filters and filters["labels"]:
-            label_conditions = [f'labels = "{label}"' for label in filters["labels"]]
-            jql_parts.append(f'({" OR ".join(label_conditions)})')
+            jql_parts.append(in_clause("labels", filters["labels"]))
         
         # Priority filter
         if "priority" in filters and filters["priority"]:
@@ -142,38 +152,18 @@ class XrayTestManager:
     def get_tests_without_steps(self, project_key: str, limit: int = 100, start: int = 0) -> List[TestSummary]:
         """Get tests that don't have any test steps defined"""
         try:
-            result = self.client.get_tests_without_steps(project_key, limit, start)
-            tests = result.get("getTests", {}).get("results", [])
-            
-            summaries = []
-            for test in tests:
-                jira_data = test.get("jira", {})
-                
-                summary = TestSummary(
-                    issue_id=test.get("issueId", ""),
-                    key=jira_data.get("key", ""),
-                    summary=jira_data.get("summary", ""),
-                    labels=jira_data.get("labels", []),
-                    priority=jira_data.get("priority", {}).get("name", ""),
-                    assignee=jira_data.get("assignee", {}).get("displayName") if jira_data.get("assignee") else None,
-                    steps_count=0,
-                    folder_path=test.get("folder", {}).get("path") if test.get("folder") else None,
-                    last_modified=test.get("lastModified", ""),
-                    has_steps=False
-                )
-                summaries.append(summary)
-            
-            return summaries
+            _, tests = decode_test_page(self.client.get_tests_without_steps(project_key, limit, start))
+            return [TestSummary.from_test(test) for test in tests]
             
         except Exception as e:
             logger.error(f"Failed to fetch tests without steps: {e}")
             raise
     
-    def get_test_details(self, issue_id: str) -> Dict:
-        """Get detailed test information including steps"""
+    def get_test_details(self, issue_id: str) -> Optional[Test]:
+        """Get detailed test information including steps (None if the test does not exist)"""
         try:
-            result = self.client.get_test_details(issue_id)
-            return result.get("getTest", {})
+            test = self.client.get_test_details(issue_id).get("getTest")
+            return decode_test(test) if test else None
             
         except Exception as e:
             logger.error(f"Failed to fetch test details for {issue_id}: {e}")
@@ -185,29 +175,8 @@ class XrayTestManager:
         jql = f'project = "{project_key}" AND issuetype = "Test" AND (summary ~ "{keywords}" OR description ~ "{keywords}")'
         
         try:
-            result = self.client.get_tests(project_key, limit, 0, jql)
-            tests = result.get("getTests", {}).get("results", [])
-            
-            summaries = []
-            for test in tests:
-                jira_data = test.get("jira", {})
-                steps = test.get("steps", [])
-                
-                summary = TestSummary(
-                    issue_id=test.get("issueId", ""),
-                    key=jira_data.get("key", ""),
-                    summary=jira_data.get("summary", ""),
-                    labels=jira_data.get("labels", []),
-                    priority=jira_data.get("priority", {}).get("name", ""),
-                    assignee=jira_data.get("assignee", {}).get("displayName") if jira_data.get("assignee") else None,
-                    steps_count=len(steps),
-                    folder_path=test.get("folder", {}).get("path") if test.get("folder") else None,
-                    last_modified=test.get("lastModified", ""),
-                    has_steps=len(steps) > 0
-                )
-                summaries.append(summary)
-            
-            return summaries
+            _, tests = decode_test_page(self.client.get_tests(project_key, limit, 0, jql))
+            return [TestSummary.from_test(test) for test in tests]
             
         except Exception as e:
             logger.error(f"Failed to search tests: {e}")
@@ -260,10 +229,11 @@ class XrayTestManager:
                     result=step.result
                 )
                 
-                if result.get("updateTestStep", {}).get("step"):
+                warnings = (result.get("updateTestStep") or {}).get("warnings")
+                if "updateTestStep" in result and not warnings:
                     successful.append(step.id)
                 else:
-                    failed.append((step.id, "Failed to update step"))
+                    failed.append((step.id, "; ".join(warnings or []) or "Failed to update step"))
                     
             except Exception as e:
                 failed.append((step.id, str(e)))
@@ -274,6 +244,68 @@ class XrayTestManager:
             total=len(steps)
         )
     
+    def plan_test_steps(self, issue_id: str, desired_steps: List[TestStep]) -> StepSyncPlan:
+        """Operations sync_test_steps would send for a test (no changes are made)"""
+        test = self.get_test_details(issue_id)
+        if test is None:
+            raise ValueError(f"Test {issue_id} not found")
+        return plan_step_sync(test.steps, desired_steps)
+    
+    def sync_test_steps(self, issue_id: str, desired_steps: List[TestStep],
+                        plan: Optional[StepSyncPlan] = None) -> BatchOperationResult:
+        """
+        Make a test's steps equal to desired_steps with the fewest step operations.
+        
+        Steps whose text already matches keep their id (and execution history);
+        changed steps are updated in place, surplus steps removed and missing ones
+        appended, all in one aliased mutation per MAX_STEP_OPERATIONS operations.
+        
+        Args:
+            issue_id: Test issue id
+            desired_steps: Steps in their final order (ids are ignored)
+            plan: Plan from plan_test_steps, to skip fetching the current steps again
+        
+        Returns:
+            BatchOperationResult over the operations: updated/removed step ids and
+            the ids of appended steps, or (step id or action, error) per failure
+            (an update that returns warnings counts as failed)
+        """
+        if plan is None:
+            plan = self.plan_test_steps(issue_id, desired_steps)
+        successful = []
+        failed = []
+        
+        # Aliases carry the operation's index in update, removal, addition order
+        labels = ([step_id for step_id, _ in plan.updates] + list(plan.removals)
+                  + [action for action, _, _ in plan.additions])
+        for batch, (query, variables) in enumerate(build_step_mutations(issue_id, plan)):
+            try:
+                data = self.client.execute_query(query, variables)
+            except Exception as e:
+                start = batch * MAX_STEP_OPERATIONS
+                failed.extend((label, str(e)) for label in labels[start:start + MAX_STEP_OPERATIONS])
+                continue
+            for alias, result in sorted(data.items(), key=lambda item: int(item[0][1:])):
+                label = labels[int(alias[1:])]
+                if result is None:
+                    failed.append((label, "No result"))
+                elif alias.startswith("a"):
+                    # Newly added steps are reported by their new id
+                    successful.append(result.get("id") or (result.get("step") or {}).get("id") or label)
+                elif alias.startswith("u") and result.get("warnings"):
+                    # updateTestStep reports rejected changes as warnings, not errors
+                    failed.append((label, "; ".join(result["warnings"])))
+                else:
+                    successful.append(label)
+        
+        if failed:
+            logger.warning(f"Step sync for {issue_id}: {len(failed)} of {plan.operations} operations failed")
+        return BatchOperationResult(
+            successful=successful,
+            failed=failed,
+            total=plan.operations
+        )
+    
     def batch_add_labels(self, issue_ids: List[str], labels: List[str]) -> BatchOperationResult:
         """Add labels to multiple tests (requires JIRA REST API)"""
         # This would need to be implemented using JIRA REST API
@@ -333,14 +365,11 @@ class XrayTestManager:
         """Get all unique labels from tests in a project"""
         try:
             # Fetch all tests to get labels
-            result = self.client.get_tests(project_key, limit=100)
-            tests = result.get("getTests", {}).get("results", [])
+            _, tests = decode_test_page(self.client.get_tests(project_key, limit=100))
             
             all_labels = set()
             for test in tests:
-                jira_data = test.get("jira", {})
-                labels = jira_data.get("labels", [])
-                all_labels.update(labels)
+                all_labels.update(test.labels)
             
             return sorted(list(all_labels))
             
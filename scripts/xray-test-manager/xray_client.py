@@ -6,18 +6,33 @@ It handles authentication, query execution, and provides methods for all major t
 """
 
 import os
+import sys
 import json
 import time
 import requests
+from pathlib import Path
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import logging
 
+from models import loads
+
+# Shared Xray API utilities (record/replay cassette, metrics) live in xray-remediation/xray-api
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "xray-remediation" / "xray-api"))
+from api_metrics import metrics_from_env
+from cassette import cassette_from_env
+from connection_expander import ConnectionExpander
+from jql_planner import ORDER_BY_PATTERN, JqlPlanner, jql_value
+from query_complexity import largest_page_size
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Per-operation API metrics, written at exit when XRAY_METRICS_DIR is set
+metrics_from_env()
+
 @dataclass
 class XrayCredentials:
     """XRAY API credentials configuration"""
@@ -34,6 +49,7 @@ class XrayAuthenticator:
         self.credentials = credentials
         self.access_token = None
         self.token_expires_at = None
+        self.auth_url = "https://xray.cloud.getxray.app/api/v1/authenticate"
         self.session = requests.Session()
         
     def get_access_token(self) -> str:
@@ -45,7 +61,7 @@ class XrayAuthenticator:
     
     def _refresh_token(self) -> str:
         """Refresh the XRAY access token"""
-        url = "https://xray.cloud.getxray.app/api/v1/authenticate"
+        url = self.auth_url
         headers = {"Content-Type": "application/json"}
         payload = {
             "client_id": self.credentials.client_id,
@@ -74,9 +90,31 @@ class XrayGraphQLClient:
         self.authenticator = XrayAuthenticator(credentials)
         self.graphql_url = "https://xray.cloud.getxray.app/api/v1/graphql"
         self.session = requests.Session()
+        # Optional record/replay store (XRAY_CASSETTE / XRAY_CASSETTE_MODE)
+        self.cassette = cassette_from_env()
+        # Splits long label/key lists over concurrent sub-queries
+        self.jql_planner = JqlPlanner()
         
     def execute_query(self, query: str, variables: Optional[Dict] = None) -> Dict:
         """Execute a GraphQL query with proper authentication"""
+        payload = {
+            "query": query,
+            "variables": variables or {}
+        }
+        
+        if self.cassette:
+            result = self.cassette.execute(query, variables, lambda: self._post_graphql(payload))
+        else:
+            result = self._post_graphql(payload)
+        
+        if "errors" in result:
+            logger.error(f"GraphQL errors: {result['errors']}")
+            raise Exception(f"GraphQL errors: {result['errors']}")
+            
+        return result.get("data", {})
+    
+    def _post_graphql(self, payload: Dict) -> Dict:
+        """Send a GraphQL payload and return the decoded response body"""
         token = self.authenticator.get_access_token()
         
         headers = {
@@ -84,22 +122,10 @@ class XrayGraphQLClient:
             "Authorization": f"Bearer {token}"
         }
         
-        payload = {
-            "query": query,
-            "variables": variables or {}
-        }
-        
         try:
             response = self.session.post(self.graphql_url, json=payload, headers=headers)
             response.raise_for_status()
-            
-            result = response.json()
-            
-            if "errors" in result:
-                logger.error(f"GraphQL errors: {result['errors']}")
-                raise Exception(f"GraphQL errors: {result['errors']}")
-                
-            return result.get("data", {})
+            return loads(response.content)
             
         except requests.exceptions.RequestException as e:
             logger.error(f"GraphQL request failed: {e}")
@@ -118,8 +144,8 @@ class XrayGraphQLClient:
             folder_path: Filter by Test Repository folder path
         """
         query = """
-        query GetTests($projectKey: String!, $limit: Int!, $start: Int!, $jql: String) {
-            getTests(projectKey: $projectKey, limit: $limit, start: $start, jql: $jql) {
+        query GetTests($limit: Int!, $start: Int!, $jql: String) {
+            getTests(limit: $limit, start: $start, jql: $jql) {
                 total
                 results {
                     issueId
@@ -154,14 +180,23 @@ class XrayGraphQLClient:
         """
         
         variables = {
-            "projectKey": project_key,
             "limit": limit,
             "start": start,
-            "jql": jql
+            "jql": self._project_jql(project_key, jql)
         }
         
         return self.execute_query(query, variables)
     
+    @staticmethod
+    def _project_jql(project_key: str, jql: Optional[str] = None) -> str:
+        """JQL restricted to a project (getTests and getTestSets take no project key argument)"""
+        scope = f"project = {jql_value(project_key)}"
+        if not jql:
+            return scope
+        order = ORDER_BY_PATTERN.search(jql)
+        where, order_by = (jql[:order.start()], order.group(0)) if order else (jql, "")
+        return f"{scope} AND ({where.strip()}){order_by}" if where.strip() else f"{scope}{order_by}"
+    
     def get_test_details(self, issue_id: str) -> Dict:
         """Get detailed information for a specific test"""
         query = """
@@ -205,17 +240,19 @@ class XrayGraphQLClient:
     
     def search_tests_by_labels(self, project_key: str, labels: List[str], 
                               limit: int = 100, start: int = 0) -> Dict:
-        """Search tests by specific labels"""
-        label_query = " OR ".join([f'labels = "{label}"' for label in labels])
-        jql = f'project = "{project_key}" AND issuetype = "Test" AND ({label_query})'
-        
-        return self.get_tests(project_key, limit, start, jql)
+        """Search tests carrying any of the labels (long label lists are split over concurrent sub-queries)"""
+        jql = f'project = "{project_key}" AND issuetype = "Test"'
+        page = self.jql_planner.search(
+            lambda sub_jql, page_limit, page_start: self.get_tests(project_key, page_limit, page_start,
+                                                                   sub_jql).get("getTests"),
+            jql, "labels", labels, limit, start)
+        return {"getTests": page}
     
     def get_tests_without_steps(self, project_key: str, limit: int = 100, start: int = 0) -> Dict:
         """Get tests that have no test steps defined"""
         query = """
-        query GetTestsWithoutSteps($projectKey: String!, $limit: Int!, $start: Int!) {
-            getTests(projectKey: $projectKey, limit: $limit, start: $start) {
+        query GetTestsWithoutSteps($jql: String!, $limit: Int!, $start: Int!) {
+            getTests(jql: $jql, limit: $limit, start: $start) {
                 total
                 results {
                     issueId
@@ -239,7 +276,7 @@ class XrayGraphQLClient:
         """
         
         variables = {
-            "projectKey": project_key,
+            "jql": self._project_jql(project_key),
             "limit": limit,
             "start": start
         }
@@ -286,23 +323,16 @@ class XrayGraphQLClient:
     
     def update_test_step(self, issue_id: str, step_id: str, action: str, 
                         data: str = "", result: str = "") -> Dict:
-        """Update an existing test step"""
+        """Update an existing test step (Xray addresses it by step id; issue_id is unused)"""
         query = """
-        mutation UpdateTestStep($issueId: String!, $stepId: String!, $step: UpdateStepInput!) {
-            updateTestStep(issueId: $issueId, stepId: $stepId, step: $step) {
-                step {
-                    id
-                    action
-                    data
-                    result
-                }
+        mutation UpdateTestStep($stepId: String!, $step: UpdateStepInput!) {
+            updateTestStep(stepId: $stepId, step: $step) {
                 warnings
             }
         }
         """
         
         variables = {
-            "issueId": issue_id,
             "stepId": step_id,
             "step": {
                 "action": action,
@@ -314,27 +344,24 @@ class XrayGraphQLClient:
         return self.execute_query(query, variables)
     
     def remove_test_step(self, issue_id: str, step_id: str) -> Dict:
-        """Remove a test step from a test"""
+        """Remove a test step from a test (Xray addresses it by step id; issue_id is unused)"""
         query = """
-        mutation RemoveTestStep($issueId: String!, $stepId: String!) {
-            removeTestStep(issueId: $issueId, stepId: $stepId) {
-                warnings
-            }
+        mutation RemoveTestStep($stepId: String!) {
+            removeTestStep(stepId: $stepId)
         }
         """
         
         variables = {
-            "issueId": issue_id,
             "stepId": step_id
         }
         
         return self.execute_query(query, variables)
     
     def get_test_sets(self, project_key: str, limit: int = 100, start: int = 0) -> Dict:
-        """Get test sets for a project"""
+        """Get test sets for a project, with every member test (not just the first 100)"""
         query = """
-        query GetTestSets($projectKey: String!, $limit: Int!, $start: Int!) {
-            getTestSets(projectKey: $projectKey, limit: $limit, start: $start) {
+        query GetTestSets($jql: String, $limit: Int!, $start: Int!) {
+            getTestSets(jql: $jql, limit: $limit, start: $start) {
                 total
                 results {
                     issueId
@@ -352,12 +379,17 @@ class XrayGraphQLClient:
         """
         
         variables = {
-            "projectKey": project_key,
-            "limit": limit,
+            "jql": self._project_jql(project_key),
             "start": start
         }
+        # Each set nests up to 100 tests; keep the page within the complexity limit
+        variables["limit"] = largest_page_size(query, variables, max_page_size=limit)
         
-        return self.execute_query(query, variables)
+        result = self.execute_query(query, variables)
+        ConnectionExpander(self.execute_query).expand(
+            result['getTestSets']['results'], 'TestSet', 'tests', 'issueId jira(fields: ["key", "summary"])'
+        )
+        return result
     
     def create_test_set(self, project_key: str, name: str, test_issue_ids: List[str]) -> Dict:
         """Create a new test set with specified tests"""
@@ -5,12 +5,20 @@ Implements folder creation, test import, and test set management.
 """
 import json
 import os
+import sys
 import time
 import requests
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 from dotenv import load_dotenv
 
+# Per-operation API metrics, written at exit when XRAY_METRICS_DIR is set
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'xray-remediation', 'xray-api'))
+from api_metrics import metrics_from_env
+
+metrics_from_env()
+
 
 class XrayAPIUploader:
     """Handle XRAY GraphQL API operations for test upload."""
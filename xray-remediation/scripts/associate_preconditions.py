@@ -2,12 +2,14 @@
 """
 Associate standalone preconditions with appropriate tests in FRAMED project.
 Analyzes precondition content and maps to relevant tests.
+
+Selected associations are linked together at the end with PreconditionLinker
+(one addPreconditionsToTest per test, many tests per request).
 """
 
 import os
 import sys
 import json
-import time
 from pathlib import Path
 from datetime import datetime
 
@@ -16,12 +18,14 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "xray-api"))
 from auth_utils import XrayAPIClient
+from precondition_linker import PreconditionLinker
 
 class PreconditionAssociator:
     """Associate preconditions with tests"""
     
     def __init__(self):
         self.client = XrayAPIClient()
+        self.linker = PreconditionLinker(self.client.execute_graphql_query)
         self.token = None
         self.associated_count = 0
         self.error_count = 0
@@ -148,28 +152,25 @@ class PreconditionAssociator:
     
     def associate_precondition_to_test(self, precondition_id, test_id, test_key):
         """Associate a precondition with a test"""
-        mutation = """
-        mutation AddPrecondition($testIssueId: String!, $preconditionIssueIds: [String]!) {
-            addPreconditionsToTest(testIssueId: $testIssueId, preconditionIssueIds: $preconditionIssueIds) {
-                addedPreconditions
-                warning
-            }
-        }
+        return self.link_selected([(precondition_id, test_id, test_key)]) == [True]
+    
+    def link_selected(self, selected):
         """
+        Link (precondition id, test id, test key) selections in batched requests.
         
-        variables = {
-            "testIssueId": test_id,
-            "preconditionIssueIds": [precondition_id]
-        }
-        
-        try:
-            response = self.client.execute_graphql_query(mutation, variables)
-            if response:
-                return True
-            return False
-        except Exception as e:
-            print(f"Error associating to {test_key}: {e}")
-            return False
+        Returns:
+            Success flag per selection
+        """
+        result = self.linker.associate((test_id, precondition_id) for precondition_id, test_id, _ in selected)
+        for test_id, warning in result.warnings.items():
+            print(f"   Warning for test {test_id}: {warning}")
+        flags = []
+        for _, test_id, test_key in selected:
+            error = result.failed.get(str(test_id))
+            if error:
+                print(f"Error associating to {test_key}: {error}")
+            flags.append(error is None)
+        return flags
     
     def associate_preconditions(self, dry_run=False, auto_associate=False):
         """Main process to associate preconditions"""
@@ -246,7 +247,8 @@ class PreconditionAssociator:
             print("   Operation cancelled")
             return
         
-        # Process associations
+        # Collect the selected associations
+        selected = []
         for i, assoc in enumerate(associations, 1):
             prec = assoc['precondition']
             matches = assoc['matches']
@@ -256,33 +258,9 @@ class PreconditionAssociator:
             
             if auto_associate and matches:
                 # Auto-associate with top match
-                top_match = matches[0]
-                test = top_match['test']
-                
+                test = matches[0]['test']
                 print(f"   Auto-associating with: {test['jira']['key']}")
-                
-                success = self.associate_precondition_to_test(
-                    prec['issueId'],
-                    test['issueId'],
-                    test['jira']['key']
-                )
-                
-                if success:
-                    self.associated_count += 1
-                    self.results.append({
-                        'precondition': prec['jira']['key'],
-                        'test': test['jira']['key'],
-                        'status': 'success'
-                    })
-                    print("   ✓ Associated successfully")
-                else:
-                    self.error_count += 1
-                    self.results.append({
-                        'precondition': prec['jira']['key'],
-                        'test': test['jira']['key'],
-                        'status': 'error'
-                    })
-                    print("   ✗ Failed to associate")
+                selected.append((prec, test))
             else:
                 # Manual selection
                 print("\n   Suggested tests:")
@@ -296,32 +274,28 @@ class PreconditionAssociator:
                 try:
                     choice_num = int(choice)
                     if 0 < choice_num <= len(matches):
-                        selected_test = matches[choice_num - 1]['test']
-                        
-                        success = self.associate_precondition_to_test(
-                            prec['issueId'],
-                            selected_test['issueId'],
-                            selected_test['jira']['key']
-                        )
-                        
-                        if success:
-                            self.associated_count += 1
-                            self.results.append({
-                                'precondition': prec['jira']['key'],
-                                'test': selected_test['jira']['key'],
-                                'status': 'success'
-                            })
-                            print("   ✓ Associated successfully")
-                        else:
-                            self.error_count += 1
-                            print("   ✗ Failed to associate")
+                        selected.append((prec, matches[choice_num - 1]['test']))
                     else:
                         print("   Skipped")
                 except ValueError:
                     print("   Invalid choice, skipping")
-            
-            # Rate limiting
-            time.sleep(0.5)
+        
+        # Link all selections together
+        print(f"\n   Linking {len(selected)} associations...")
+        flags = self.link_selected([(prec['issueId'], test['issueId'], test['jira']['key'])
+                                    for prec, test in selected])
+        for (prec, test), success in zip(selected, flags):
+            if success:
+                self.associated_count += 1
+                print(f"   ✓ {prec['jira']['key']} → {test['jira']['key']}")
+            else:
+                self.error_count += 1
+                print(f"   ✗ {prec['jira']['key']} → {test['jira']['key']}")
+            self.results.append({
+                'precondition': prec['jira']['key'],
+                'test': test['jira']['key'],
+                'status': 'success' if success else 'error'
+            })
         
         # Summary
         print("\n" + "="*80)
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Associate preconditions with tests - batch version for non-interactive execution.
+
+All associations go out through PreconditionLinker: one addPreconditionsToTest
+per test, many tests per request, skipping pairs that are already linked.
 """
 
 import os
@@ -13,12 +16,14 @@ from datetime import datetime
 sys.path.insert(0, str(Path(__file__).parent.parent))
 sys.path.insert(0, str(Path(__file__).parent.parent / "xray-api"))
 from auth_utils import XrayAPIClient
+from precondition_linker import PreconditionLinker
 
 class PreconditionAssociator:
     """Associate standalone preconditions with tests"""
     
     def __init__(self):
         self.client = XrayAPIClient()
+        self.linker = PreconditionLinker(self.client.execute_graphql_query)
         self.associations = []
         self.associated_count = 0
         self.error_count = 0
@@ -166,58 +171,32 @@ class PreconditionAssociator:
         print(f"3. Found associations for {len(associations)} preconditions")
         return associations
         
-    def associate_precondition(self, test_id, precondition_id):
-        """Associate a precondition with a test"""
-        mutation = """
-        mutation AddPrecondition($testIssueId: String!, $preconditionIssueIds: [String]!) {
-            addPreconditionsToTest(issueId: $testIssueId, preconditionIssueIds: $preconditionIssueIds) {
-                warning
-            }
-        }
-        """
-        
-        try:
-            result = self.client.execute_graphql_query(mutation, {
-                "testIssueId": test_id,
-                "preconditionIssueIds": [precondition_id]
-            })
-            return True
-        except Exception as e:
-            print(f"   ✗ Error: {e}")
-            return False
-            
     def execute_associations(self, associations):
-        """Execute the associations"""
-        results = []
-        
+        """Execute the associations (top match of each precondition) in batched requests"""
         print("\n4. Executing associations...")
-        for assoc in associations:
-            # Use the top match only for automatic association
-            if assoc['matches']:
-                top_match = assoc['matches'][0]
-                
-                print(f"\n   Associating {assoc['precondition_key']} → {top_match['test_key']}")
-                
-                success = self.associate_precondition(
-                    top_match['test_id'],
-                    assoc['precondition_id']
-                )
-                
-                if success:
-                    print(f"   ✓ Success")
-                    self.associated_count += 1
-                    results.append({
-                        'status': 'success',
-                        'precondition': assoc['precondition_key'],
-                        'test': top_match['test_key']
-                    })
-                else:
-                    self.error_count += 1
-                    results.append({
-                        'status': 'error',
-                        'precondition': assoc['precondition_key'],
-                        'test': top_match['test_key']
-                    })
+        planned = [(assoc, assoc['matches'][0]) for assoc in associations if assoc['matches']]
+        outcome = self.linker.associate(
+            (top_match['test_id'], assoc['precondition_id']) for assoc, top_match in planned
+        )
+        print(f"   Linked {outcome.added_count}, already linked {outcome.skipped_count}, "
+              f"failed tests {len(outcome.failed)}")
+        
+        results = []
+        for assoc, top_match in planned:
+            error = outcome.failed.get(str(top_match['test_id']))
+            if error:
+                print(f"   ✗ {assoc['precondition_key']} → {top_match['test_key']}: {error}")
+                self.error_count += 1
+                status = 'error'
+            else:
+                print(f"   ✓ {assoc['precondition_key']} → {top_match['test_key']}")
+                self.associated_count += 1
+                status = 'success'
+            results.append({
+                'status': status,
+                'precondition': assoc['precondition_key'],
+                'test': top_match['test_key']
+            })
         
         return results
         
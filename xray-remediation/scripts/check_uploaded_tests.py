@@ -9,6 +9,7 @@ from pathlib import Path
 parent_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(parent_dir / 'xray-api'))
 from auth_utils import XrayAPIClient
+from issue_ids import IssueIdResolver
 
 def check_uploaded_tests():
     client = XrayAPIClient()
@@ -42,6 +43,9 @@ def check_uploaded_tests():
             tests = result['getTests']['results']
             total = result['getTests']['total']
             
+            # Keep the key/id pairs so later scripts need not look them up again
+            IssueIdResolver(client.execute_graphql_query).remember(tests)
+            
             print(f"\n=== FUNCTIONAL TESTS UPLOADED TODAY ===")
             print(f"Total found: {total}")
             print(f"\nTests:")
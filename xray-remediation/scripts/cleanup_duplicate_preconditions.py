@@ -20,10 +20,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'xray-api'))
 from auth_utils import XrayAPIClient
+from issue_ids import IssueIdResolver
 
 class PreconditionCleanup:
     def __init__(self):
         self.xray_client = XrayAPIClient()
+        self.issue_ids = IssueIdResolver(self.xray_client.execute_graphql_query)
         # Mapping of JIRA keys to numeric issueIds based on GraphQL query results
         self.key_to_id_map = {
             "FRAMED-1355": "1158139",
@@ -95,6 +97,12 @@ class PreconditionCleanup:
         self.precondition_data = {}
         self.test_mappings = {}
         
+    def resolve_keys(self):
+        """Fill key_to_id_map for every key of the duplicate pairs (cached, one batched lookup for the rest)"""
+        self.issue_ids.remember(self.key_to_id_map)
+        keys = [key for pair in self.duplicate_pairs for key in pair]
+        self.key_to_id_map.update(self.issue_ids.resolve(keys, issue_type="Precondition"))
+    
     def get_precondition_with_tests(self, jira_key: str) -> Dict:
         """Query a single precondition with its linked tests"""
         # Convert JIRA key to numeric issueId
@@ -138,6 +146,7 @@ class PreconditionCleanup:
         """Analyze all duplicate pairs and their linked tests"""
         print("\n=== Analyzing Duplicate Preconditions ===\n")
         
+        self.resolve_keys()
         for original, duplicate in self.duplicate_pairs:
             print(f"\nProcessing pair: {original} (keep) / {duplicate} (remove)")
             
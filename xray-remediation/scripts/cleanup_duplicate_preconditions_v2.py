@@ -7,23 +7,63 @@ This script:
 3. Updates tests to reference the original (lower ID) precondition
 4. Deletes the duplicate preconditions
 5. Cleans up labels on remaining preconditions
+
+The steps run as a pipeline: all preconditions of all pairs are read in a few
+aliased queries, the reference swaps are planned per test (a test linked to
+several duplicates is updated once), tests are updated with one add-then-remove
+per test, many tests per request, and duplicates are deleted concurrently once
+a batched re-read confirms no test is linked to them any more.
+
+Usage:
+    python cleanup_duplicate_preconditions_v2.py [--dry-run] [--discover] [--workers 4]
 """
 
+import argparse
 import json
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'xray-api'))
 
 from auth_utils import XrayAPIClient
+from connection_expander import ConnectionExpander
+from issue_ids import IssueIdResolver
+from precondition_linker import PreconditionLinker
+from precondition_registry import DEFAULT_TYPE, PreconditionRegistry, normalize_definition
+from rate_limiter import shared_rate_limiter
+
+# Preconditions read per aliased query
+READ_BATCH_SIZE = 25
+
+PRECONDITION_FIELDS = """issueId
+            definition
+            preconditionType {
+                name
+                kind
+            }
+            tests(limit: 100, start: 0) {
+                total
+                results {
+                    issueId
+                    jira(fields: ["key", "summary"])
+                }
+            }
+            jira(fields: ["key", "summary", "labels"])"""
 
 class PreconditionCleanup:
-    def __init__(self):
+    def __init__(self, workers: int = 4, dry_run: bool = False):
         self.xray_client = XrayAPIClient()
+        self.workers = workers
+        self.dry_run = dry_run
+        self.rate_limiter = shared_rate_limiter()
+        self.expander = ConnectionExpander(self.xray_client.execute_graphql_query, max_workers=workers)
+        self.linker = PreconditionLinker(self.xray_client.execute_graphql_query, max_workers=workers)
+        self.issue_ids = IssueIdResolver(self.xray_client.execute_graphql_query, max_workers=workers)
         # Mapping of JIRA keys to numeric issueIds based on GraphQL query results
         self.key_to_id_map = {
             "FRAMED-1355": "1158139",
@@ -92,8 +132,69 @@ class PreconditionCleanup:
             ("FRAMED-1374", "FRAMED-1594"),
             ("FRAMED-1375", "FRAMED-1595")
         ]
+        # Pairs must have the same type and (whitespace-normalized) definition to be merged
+        self.require_same_definition = False
         self.precondition_data = {}
         self.test_mappings = {}
+    
+    def discover_duplicate_pairs(self, project_key: str = "FRAMED"):
+        """
+        Replace the known pairs with every group of preconditions of the same
+        type whose definitions differ at most in whitespace. Each pair is
+        checked again against a fresh read before anything is changed.
+        """
+        registry = PreconditionRegistry(self.xray_client.execute_graphql_query, project_key,
+                                        max_workers=self.workers)
+        registry.load()
+        self.key_to_id_map = {}
+        self.duplicate_pairs = []
+        for group in registry.duplicates():
+            original = group[0]
+            for duplicate in group[1:]:
+                if not original.key or not duplicate.key:
+                    continue
+                self.key_to_id_map[original.key] = original.issue_id
+                self.key_to_id_map[duplicate.key] = duplicate.issue_id
+                self.duplicate_pairs.append((original.key, duplicate.key))
+        self.require_same_definition = True
+        print(f"Discovered {len(self.duplicate_pairs)} duplicate preconditions in {project_key}")
+    
+    def resolve_keys(self):
+        """Fill key_to_id_map for every key of the duplicate pairs (cached, one batched lookup for the rest)"""
+        self.issue_ids.remember(self.key_to_id_map)
+        keys = [key for pair in self.duplicate_pairs for key in pair]
+        self.key_to_id_map.update(self.issue_ids.resolve(keys, issue_type="Precondition"))
+    
+    def fetch_preconditions(self, issue_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Read many preconditions with their linked tests, READ_BATCH_SIZE per aliased query.
+        
+        Returns:
+            issueId -> precondition (None if it does not exist, e.g. already deleted)
+        """
+        issue_ids = list(dict.fromkeys(issue_ids))
+        batches = [issue_ids[i:i + READ_BATCH_SIZE] for i in range(0, len(issue_ids), READ_BATCH_SIZE)]
+        
+        def fetch(batch):
+            definitions = ", ".join(f"$id{i}: String!" for i in range(len(batch)))
+            fields = "\n".join(
+                f"        p{i}: getPrecondition(issueId: $id{i}) {{\n            {PRECONDITION_FIELDS}\n        }}"
+                for i in range(len(batch)))
+            query = f"query GetPreconditionsWithTests({definitions}) {{\n{fields}\n}}"
+            self.rate_limiter.acquire()
+            variables = {f"id{i}": issue_id for i, issue_id in enumerate(batch)}
+            result = self.xray_client.execute_graphql_query(query, variables)
+            return [(issue_id, (result or {}).get(f"p{i}")) for i, issue_id in enumerate(batch)]
+        
+        preconditions = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for results in executor.map(fetch, batches):
+                preconditions.update(results)
+        
+        # Linked tests beyond the first 100
+        self.expander.expand([p for p in preconditions.values() if p], 'Precondition', 'tests',
+                             'issueId jira(fields: ["key", "summary"])')
+        return preconditions
         
     def get_precondition_with_tests(self, jira_key: str) -> Dict:
         """Query a single precondition with its linked tests"""
@@ -102,66 +203,29 @@ class PreconditionCleanup:
         if not issue_id:
             print(f"    ERROR: No issueId mapping found for {jira_key}")
             return {}
-            
-        query = """
-        query GetPreconditionWithTests($issueId: String!) {
-            getPrecondition(issueId: $issueId) {
-                issueId
-                definition
-                preconditionType {
-                    name
-                    kind
-                }
-                tests(limit: 100, start: 0) {
-                    total
-                    results {
-                        issueId
-                        jira(fields: ["key", "summary"])
-                    }
-                }
-                jira(fields: ["key", "summary", "labels"])
-            }
-        }
-        """
-        
-        variables = {"issueId": issue_id}
-        result = self.xray_client.execute_graphql_query(query, variables)
-        
-        # Debug logging
-        if not result:
-            print(f"    ERROR: No response for {jira_key} (ID: {issue_id})")
-            return {}
-            
-        # Extract the data from the response
-        # The GraphQL response might come in different formats
-        if result:
-            if 'data' in result and result['data']:
-                return result['data']
-            elif 'getPrecondition' in result:
-                # Direct response format
-                return result
-            else:
-                print(f"    ERROR: Unexpected response format for {jira_key}")
-                print(f"    Response: {json.dumps(result, indent=2)}")
-                return {}
-        else:
-            print(f"    ERROR: No response for {jira_key}")
-            return {}
+        return {'getPrecondition': self.fetch_preconditions([issue_id]).get(issue_id)}
     
     def analyze_duplicates(self):
         """Analyze all duplicate pairs and their linked tests"""
         print("\n=== Analyzing Duplicate Preconditions ===\n")
         
+        self.resolve_keys()
+        missing = [key for pair in self.duplicate_pairs for key in pair if key not in self.key_to_id_map]
+        for key in missing:
+            print(f"    ERROR: No issueId mapping found for {key}")
+        preconditions = self.fetch_preconditions(
+            [self.key_to_id_map[key] for pair in self.duplicate_pairs for key in pair if key in self.key_to_id_map])
+        print(f"Read {len(preconditions)} preconditions for {len(self.duplicate_pairs)} pairs")
+        
         for original_key, duplicate_key in self.duplicate_pairs:
+            if original_key in missing or duplicate_key in missing:
+                continue
             print(f"\nProcessing pair: {original_key} (keep) / {duplicate_key} (remove)")
             
-            # Get data for both preconditions
-            original_data = self.get_precondition_with_tests(original_key)
-            duplicate_data = self.get_precondition_with_tests(duplicate_key)
-            
-            # Extract the actual precondition data
-            original_precond = original_data.get('getPrecondition', {})
-            duplicate_precond = duplicate_data.get('getPrecondition', {})
+            original_id = self.key_to_id_map[original_key]
+            duplicate_id = self.key_to_id_map[duplicate_key]
+            original_precond = preconditions.get(original_id)
+            duplicate_precond = preconditions.get(duplicate_id)
             
             # Skip if duplicate is already deleted (returns null)
             if duplicate_precond is None:
@@ -172,37 +236,42 @@ class PreconditionCleanup:
                 print(f"  ERROR: Could not retrieve data for original precondition {original_key}")
                 continue
             
+            original_definition = original_precond.get('definition') or ''
+            duplicate_definition = duplicate_precond.get('definition') or ''
+            original_type = (original_precond.get('preconditionType') or {}).get('name') or DEFAULT_TYPE
+            duplicate_type = (duplicate_precond.get('preconditionType') or {}).get('name') or DEFAULT_TYPE
+            same = (original_type == duplicate_type
+                    and normalize_definition(original_definition) == normalize_definition(duplicate_definition))
+            if original_definition != duplicate_definition or original_type != duplicate_type:
+                print(f"  Definitions differ{' (whitespace only)' if same else ''}:")
+                print(f"    {original_key} [{original_type}]: {original_definition!r}")
+                print(f"    {duplicate_key} [{duplicate_type}]: {duplicate_definition!r}")
+            if not same:
+                if self.require_same_definition:
+                    print(f"  ✗ Not a duplicate, skipping {duplicate_key}")
+                    continue
+                print("  WARNING: merging a known pair whose definitions differ")
+            
             # Store the data
             self.precondition_data[original_key] = original_precond
             self.precondition_data[duplicate_key] = duplicate_precond
             
-            # Extract test information
-            original_test_ids = []
-            duplicate_test_ids = []
-            
-            if original_precond.get('tests', {}).get('results'):
-                for test in original_precond['tests']['results']:
-                    test_id = test.get('issueId')
-                    if test_id:
-                        original_test_ids.append(test_id)
-            
-            if duplicate_precond.get('tests', {}).get('results'):
-                for test in duplicate_precond['tests']['results']:
-                    test_id = test.get('issueId')
-                    if test_id:
-                        duplicate_test_ids.append(test_id)
-            
-            # Store mapping with numeric IDs
-            original_id = self.key_to_id_map[original_key]
-            duplicate_id = self.key_to_id_map[duplicate_key]
+            # Extract test information (numeric test IDs)
+            original_test_ids = [test['issueId'] for test in (original_precond.get('tests') or {}).get('results') or []
+                                 if test.get('issueId')]
+            duplicate_test_ids = [test['issueId'] for test in (duplicate_precond.get('tests') or {}).get('results') or []
+                                  if test.get('issueId')]
             
             self.test_mappings[duplicate_key] = {
                 'original_key': original_key,
                 'original_id': original_id,
                 'duplicate_id': duplicate_id,
                 'tests_to_update': duplicate_test_ids,  # Store numeric test IDs
+                'original_test_ids': original_test_ids,
                 'original_summary': original_precond.get('jira', {}).get('summary', ''),
                 'duplicate_summary': duplicate_precond.get('jira', {}).get('summary', ''),
+                'original_definition': original_definition,
+                'duplicate_definition': duplicate_definition,
                 'original_labels': original_precond.get('jira', {}).get('labels', []),
                 'duplicate_labels': duplicate_precond.get('jira', {}).get('labels', [])
             }
@@ -217,6 +286,24 @@ class PreconditionCleanup:
             print(f"    Labels: {self.test_mappings[duplicate_key]['duplicate_labels']}")
             print(f"    Tests using it: {len(duplicate_test_ids)}")
     
+    def build_swap_plan(self) -> Dict[str, Dict]:
+        """
+        Reference changes per test: originals to add and duplicates to remove.
+        
+        A test linked to several duplicates gets all its changes in one plan
+        entry; an original the test already uses is not added again.
+        """
+        plan = {}
+        for duplicate_key, mapping in self.test_mappings.items():
+            already_linked = set(mapping['original_test_ids'])
+            for test_id in mapping['tests_to_update']:
+                entry = plan.setdefault(test_id, {'add': [], 'remove': [], 'duplicates': []})
+                if test_id not in already_linked and mapping['original_id'] not in entry['add']:
+                    entry['add'].append(mapping['original_id'])
+                entry['remove'].append(mapping['duplicate_id'])
+                entry['duplicates'].append(duplicate_key)
+        return plan
+    
     def update_test_references(self):
         """Update tests to reference the original precondition instead of duplicate"""
         print("\n\n=== Updating Test References ===\n")
@@ -228,77 +315,40 @@ class PreconditionCleanup:
         }
         
         for duplicate_key, mapping in self.test_mappings.items():
-            original_id = mapping['original_id']
-            duplicate_id = mapping['duplicate_id']
-            tests_to_update = mapping['tests_to_update']
-            
-            if not tests_to_update:
-                print(f"\nNo tests to update for {duplicate_key}")
+            if not mapping['tests_to_update']:
+                print(f"No tests to update for {duplicate_key}")
                 update_summary['skipped'].append({
                     'duplicate': duplicate_key,
                     'reason': 'No tests linked'
                 })
-                continue
-            
-            print(f"\nUpdating tests that reference {duplicate_key} (ID: {duplicate_id}) to use {mapping['original_key']} (ID: {original_id})")
-            
-            for test_id in tests_to_update:
-                try:
-                    # First, remove the duplicate precondition from the test
-                    remove_mutation = """
-                    mutation RemovePreconditionFromTest($testId: String!, $preconditionIds: [String]!) {
-                        removePreconditionsFromTest(issueId: $testId, preconditionIds: $preconditionIds)
-                    }
-                    """
-                    
-                    remove_variables = {
-                        "testId": test_id,
-                        "preconditionIds": [duplicate_id]
-                    }
-                    
-                    remove_result = self.xray_client.execute_graphql_query(remove_mutation, remove_variables)
-                    
-                    # Then add the original precondition to the test
-                    add_mutation = """
-                    mutation AddPreconditionToTest($testId: String!, $preconditionIds: [String]!) {
-                        addPreconditionsToTest(issueId: $testId, preconditionIds: $preconditionIds) {
-                            addedPreconditions
-                            warning
-                        }
-                    }
-                    """
-                    
-                    add_variables = {
-                        "testId": test_id,
-                        "preconditionIds": [original_id]
-                    }
-                    
-                    add_result = self.xray_client.execute_graphql_query(add_mutation, add_variables)
-                    
-                    if add_result.get('data', {}).get('addPreconditionsToTest'):
-                        print(f"  ✓ Updated test {test_id}: {duplicate_key} → {mapping['original_key']}")
-                        update_summary['successful'].append({
-                            'test_id': test_id,
-                            'from_key': duplicate_key,
-                            'to_key': mapping['original_key']
-                        })
-                    else:
-                        print(f"  ✗ Failed to update test {test_id}")
-                        update_summary['failed'].append({
-                            'test_id': test_id,
-                            'from_key': duplicate_key,
-                            'to_key': mapping['original_key'],
-                            'error': add_result.get('errors', 'Unknown error')
-                        })
-                        
-                except Exception as e:
-                    print(f"  ✗ Error updating test {test_id}: {str(e)}")
-                    update_summary['failed'].append({
-                        'test_id': test_id,
-                        'from_key': duplicate_key,
-                        'to_key': mapping['original_key'],
-                        'error': str(e)
-                    })
+        
+        plan = self.build_swap_plan()
+        print(f"Swap plan: {len(plan)} tests, "
+              f"{sum(len(entry['remove']) for entry in plan.values())} references to move")
+        if self.dry_run:
+            for test_id, entry in plan.items():
+                print(f"  Would update test {test_id}: remove {entry['remove']}, add {entry['add']}")
+            return update_summary
+        
+        result = self.linker.swap({test_id: (entry['add'], entry['remove']) for test_id, entry in plan.items()})
+        
+        for test_id, entry in plan.items():
+            error = result.failed.get(test_id)
+            for duplicate_key in entry['duplicates']:
+                mapping = self.test_mappings[duplicate_key]
+                item = {
+                    'test_id': test_id,
+                    'from_key': duplicate_key,
+                    'to_key': mapping['original_key']
+                }
+                if error:
+                    print(f"  ✗ Failed to update test {test_id}: {error}")
+                    update_summary['failed'].append(dict(item, error=error))
+                else:
+                    print(f"  ✓ Updated test {test_id}: {duplicate_key} → {mapping['original_key']}")
+                    update_summary['successful'].append(item)
+            if test_id in result.warnings:
+                print(f"    Warning for test {test_id}: {result.warnings[test_id]}")
         
         return update_summary
     
@@ -312,49 +362,74 @@ class PreconditionCleanup:
             'skipped': []
         }
         
+        candidates = []
         for duplicate_key, mapping in self.test_mappings.items():
-            duplicate_id = mapping['duplicate_id']
-            
             # Check if all tests were successfully updated
-            tests_to_update = set(mapping['tests_to_update'])
             failed_updates = {item['test_id'] for item in update_summary['failed'] 
                             if item['from_key'] == duplicate_key}
             
             if failed_updates:
-                print(f"\nSkipping deletion of {duplicate_key} - some test updates failed")
+                print(f"Skipping deletion of {duplicate_key} - some test updates failed")
                 deletion_summary['skipped'].append({
                     'precondition': duplicate_key,
                     'reason': f"Failed to update tests: {', '.join(failed_updates)}"
                 })
                 continue
-            
+            candidates.append(duplicate_key)
+        
+        if self.dry_run:
+            for duplicate_key in candidates:
+                print(f"  Would delete {duplicate_key} (ID: {self.test_mappings[duplicate_key]['duplicate_id']})")
+            return deletion_summary
+        
+        # Safety check: re-read every candidate and only delete those no test links to
+        current = self.fetch_preconditions([self.test_mappings[key]['duplicate_id'] for key in candidates])
+        to_delete = []
+        for duplicate_key in candidates:
+            precondition = current.get(self.test_mappings[duplicate_key]['duplicate_id'])
+            if precondition is None:
+                print(f"  INFO: {duplicate_key} is already deleted")
+                deletion_summary['skipped'].append({
+                    'precondition': duplicate_key,
+                    'reason': 'Already deleted'
+                })
+                continue
+            remaining = (precondition.get('tests') or {}).get('total') or 0
+            if remaining:
+                print(f"  ✗ Not deleting {duplicate_key}: still linked to {remaining} tests")
+                deletion_summary['skipped'].append({
+                    'precondition': duplicate_key,
+                    'reason': f"Still linked to {remaining} tests"
+                })
+                continue
+            to_delete.append(duplicate_key)
+        
+        delete_mutation = """
+        mutation DeletePrecondition($issueId: String!) {
+            deletePrecondition(issueId: $issueId)
+        }
+        """
+        
+        def delete(duplicate_key):
+            duplicate_id = self.test_mappings[duplicate_key]['duplicate_id']
+            self.rate_limiter.acquire()
             try:
-                # Delete the duplicate precondition using numeric ID
-                delete_mutation = """
-                mutation DeletePrecondition($issueId: String!) {
-                    deletePrecondition(issueId: $issueId)
-                }
-                """
-                
-                delete_variables = {"issueId": duplicate_id}
-                delete_result = self.xray_client.execute_graphql_query(delete_mutation, delete_variables)
-                
-                if delete_result.get('data', {}).get('deletePrecondition'):
+                result = self.xray_client.execute_graphql_query(delete_mutation, {"issueId": duplicate_id})
+                return duplicate_key, duplicate_id, (result or {}).get('deletePrecondition'), None
+            except Exception as e:
+                return duplicate_key, duplicate_id, None, str(e)
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for duplicate_key, duplicate_id, deleted, error in executor.map(delete, to_delete):
+                if deleted:
                     print(f"  ✓ Deleted {duplicate_key} (ID: {duplicate_id})")
                     deletion_summary['successful'].append(duplicate_key)
                 else:
-                    print(f"  ✗ Failed to delete {duplicate_key}")
+                    print(f"  ✗ Failed to delete {duplicate_key}" + (f": {error}" if error else ""))
                     deletion_summary['failed'].append({
                         'precondition': duplicate_key,
-                        'error': delete_result.get('errors', 'Unknown error')
+                        'error': error or 'Unknown error'
                     })
-                    
-            except Exception as e:
-                print(f"  ✗ Error deleting {duplicate_key}: {str(e)}")
-                deletion_summary['failed'].append({
-                    'precondition': duplicate_key,
-                    'error': str(e)
-                })
         
         return deletion_summary
     
@@ -404,7 +479,7 @@ class PreconditionCleanup:
     
     def run(self):
         """Execute the full cleanup process"""
-        print("Starting Precondition Cleanup Process")
+        print("Starting Precondition Cleanup Process" + (" (DRY RUN)" if self.dry_run else ""))
         print("=" * 50)
         
         # Step 1: Analyze duplicates and map test relationships
@@ -424,5 +499,15 @@ class PreconditionCleanup:
 
 
 if __name__ == "__main__":
-    cleanup = PreconditionCleanup()
-    cleanup.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Merge duplicate preconditions into the original and delete them")
+    parser.add_argument("--dry-run", action="store_true", help="Show the swap plan and deletions without changes")
+    parser.add_argument("--discover", action="store_true",
+                        help="Find duplicate pairs by normalized definition instead of using the known pairs")
+    parser.add_argument("--project", default="FRAMED", help="Project searched with --discover")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests")
+    args = parser.parse_args()
+    
+    cleanup = PreconditionCleanup(workers=args.workers, dry_run=args.dry_run)
+    if args.discover:
+        cleanup.discover_duplicate_pairs(args.project)
+    cleanup.run()
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Clean up test case ID labels from existing API tests in FRAMED project.
-Uses JIRA REST API via MCP tools to update labels.
+Uses the JIRA REST API (shared Jira client) to find the tests and update labels.
 """
 
 import os
@@ -15,14 +15,13 @@ from datetime import datetime
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 sys.path.insert(0, str(Path(__file__).parent.parent / "xray-api"))
-from auth_utils import XrayAPIClient
+from jira_client import JiraClient
 
 class TestLabelCleaner:
     """Clean test case ID labels from Xray tests"""
     
     def __init__(self):
-        self.client = XrayAPIClient()
-        self.token = None
+        self.jira = None
         self.cleaned_count = 0
         self.error_count = 0
         self.results = []
@@ -30,10 +29,11 @@ class TestLabelCleaner:
         self.test_id_pattern = re.compile(r'^API-[A-Z]*-?\d+$')
         
     def authenticate(self):
-        """Authenticate with Xray API"""
+        """Authenticate with the Jira API"""
         try:
-            self.token = self.client.get_auth_token()
-            print("✓ Xray authentication successful")
+            self.jira = JiraClient()
+            self.jira.myself()
+            print("✓ Jira authentication successful")
             return True
         except Exception as e:
             print(f"✗ Authentication failed: {e}")
@@ -41,39 +41,24 @@ class TestLabelCleaner:
             
     def get_tests_with_labels(self):
         """Get all tests that have test case ID labels"""
-        query = """
-        query GetTestsWithLabels {
-            getTests(jql: "project = FRAMED AND labels IS NOT EMPTY", limit: 100) {
-                total
-                results {
-                    issueId
-                    jira(fields: ["key", "summary", "labels"])
-                    folder {
-                        name
-                        path
-                    }
-                }
-            }
-        }
-        """
+        jql = "project = FRAMED AND issuetype = Test AND labels IS NOT EMPTY"
         
         try:
             print("\nFetching tests with labels...")
-            result = self.client.execute_graphql_query(query)
-            tests = result['getTests']['results']
+            tests = list(self.jira.search(jql, ["summary", "labels"]))
             print(f"✓ Found {len(tests)} tests with labels")
             
             # Filter tests that have test case ID labels
             tests_to_clean = []
             for test in tests:
-                current_labels = test['jira'].get('labels', [])
+                current_labels = test['fields'].get('labels', [])
                 test_id_labels = [label for label in current_labels if self.test_id_pattern.match(label)]
                 
                 if test_id_labels:
                     tests_to_clean.append({
-                        'issueId': test['issueId'],
-                        'key': test['jira']['key'],
-                        'summary': test['jira']['summary'],
+                        'issueId': test['id'],
+                        'key': test['key'],
+                        'summary': test['fields']['summary'],
                         'current_labels': current_labels,
                         'labels_to_remove': test_id_labels,
                         'new_labels': [label for label in current_labels if not self.test_id_pattern.match(label)]
@@ -86,6 +71,20 @@ class TestLabelCleaner:
             print(f"✗ Error fetching tests: {e}")
             return []
 
+    def update_labels(self, tests_to_clean):
+        """Write the new label lists, several tests at a time"""
+        print(f"\nUpdating labels of {len(tests_to_clean)} tests...")
+        outcomes = self.jira.bulk(lambda test: self.jira.update_issue(test['key'], {'labels': test['new_labels']}),
+                                  tests_to_clean)
+        for test, _, error in outcomes:
+            if error:
+                self.error_count += 1
+                print(f"  ✗ {test['key']}: {error}")
+            else:
+                self.cleaned_count += 1
+                print(f"  ✓ {test['key']}: removed {', '.join(test['labels_to_remove'])}")
+            self.results.append({'key': test['key'], 'success': error is None, 'error': str(error) if error else None})
+
     def display_changes_summary(self, tests_to_clean):
         """Display summary of changes that will be made"""
         print("\n" + "="*80)
@@ -133,12 +132,9 @@ class TestLabelCleaner:
             print("✗ Changes cancelled by user")
             return False
             
-        # Note: Since we can't update labels via Xray GraphQL API directly,
-        # we'll need to use JIRA REST API or MCP tools
-        print("\n⚠️  Note: Label updates require JIRA REST API access")
-        print("Tests identified for cleanup have been logged.")
+        self.update_labels(tests_to_clean)
         
-        # Save results to file for manual processing or future automation
+        # Save results to file
         results_file = Path(__file__).parent.parent / 'logs' / f'label_cleanup_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
         results_file.parent.mkdir(exist_ok=True)
         
@@ -146,13 +142,16 @@ class TestLabelCleaner:
             json.dump({
                 'timestamp': datetime.now().isoformat(),
                 'tests_to_clean': tests_to_clean,
-                'total_count': len(tests_to_clean)
+                'total_count': len(tests_to_clean),
+                'cleaned': self.cleaned_count,
+                'errors': self.error_count,
+                'results': self.results
             }, f, indent=2)
             
         print(f"\n✓ Results saved to: {results_file}")
-        print(f"  - {len(tests_to_clean)} tests identified for label cleanup")
+        print(f"  - {self.cleaned_count} tests cleaned, {self.error_count} errors")
         
-        return True
+        return self.error_count == 0
 
 def main():
     """Main entry point"""
@@ -1,17 +1,24 @@
 #!/usr/bin/env python3
 """
 Close Test and Precondition tickets in FRAMED project to remove them from backlog.
-Uses MCP JIRA tools to transition tickets to Closed status.
+Transitions tickets to Closed status with the bulk transition engine; every
+outcome is appended to logs/close_tickets_journal.jsonl and tickets already
+closed (or journaled as closed) are skipped, so the script can be re-run.
 """
 
 import json
 import sys
 from pathlib import Path
 from datetime import datetime
-import time
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "xray-api"))
+from jira_client import JiraClient
+from jira_transitions import BulkTransitioner
+
+CLOSED_STATUS = "Closed"
+CLOSE_COMMENT = "Closing Xray test/precondition ticket - removing from development backlog"
 
 def close_xray_tickets():
     """Close all Test and Precondition tickets to remove from backlog"""
@@ -27,9 +34,9 @@ def close_xray_tickets():
         print(f"✗ Error loading discovery file: {e}")
         return
     
-    # Create execution log
+    # Success/failure journal, shared by re-runs
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = Path(__file__).parent.parent / 'logs' / f'close_tickets_log_{timestamp}.txt'
+    log_file = Path(__file__).parent.parent / 'logs' / 'close_tickets_journal.jsonl'
     
     print("\n" + "="*80)
     print("CLOSING XRAY TICKETS IN FRAMED PROJECT")
@@ -45,59 +52,23 @@ def close_xray_tickets():
         print("✗ Operation cancelled by user")
         return
     
-    # Process tickets
-    success_count = 0
-    error_count = 0
-    results = []
-    
-    with open(log_file, 'w') as f:
-        f.write(f"FRAMED Ticket Closure Log\n")
-        f.write(f"Started: {datetime.now().isoformat()}\n")
-        f.write(f"Total tickets: {len(data['issues'])}\n")
-        f.write("="*80 + "\n\n")
-    
     print("\nProcessing tickets...")
+    transitioner = BulkTransitioner(JiraClient(), CLOSED_STATUS, comment=CLOSE_COMMENT, journal_path=log_file)
+    outcome = transitioner.run(ticket['key'] for ticket in data['issues'])
     
-    # Process in batches to avoid overwhelming the system
-    batch_size = 5
-    for i in range(0, len(data['issues']), batch_size):
-        batch = data['issues'][i:i+batch_size]
-        batch_num = (i // batch_size) + 1
-        
-        print(f"\nBatch {batch_num} ({len(batch)} tickets):")
-        
-        for ticket in batch:
-            result = {
-                "key": ticket['key'],
-                "summary": ticket['summary'],
-                "status": "pending"
-            }
-            
-            print(f"  - {ticket['key']}: {ticket['summary'][:50]}...")
-            
-            # NOTE: This is where MCP JIRA transition should be called
-            # The transition ID for "Closed" is 101 based on the earlier query
-            print(f"    → Transitioning to Closed (transition ID: 101)")
-            
-            # In actual execution, you would use:
-            # mcp__mcp-atlassian__jira_transition_issue(
-            #     issue_key=ticket['key'],
-            #     transition_id="101",
-            #     comment="Closing Xray test/precondition ticket - removing from development backlog"
-            # )
-            
-            result["status"] = "success"
-            success_count += 1
-            results.append(result)
-            
-            # Log result
-            with open(log_file, 'a') as f:
-                f.write(f"{ticket['key']}: Closed successfully\n")
-        
-        # Delay between batches to respect rate limits
-        if i + batch_size < len(data['issues']):
-            print("  Waiting 2 seconds before next batch...")
-            time.sleep(2)
+    results = []
+    for ticket in data['issues']:
+        result = {"key": ticket['key'], "summary": ticket['summary'], "status": "success"}
+        if ticket['key'] in outcome.failed:
+            result["status"] = "error"
+            result["error"] = outcome.failed[ticket['key']]
+            print(f"  ✗ {ticket['key']}: {result['error']}")
+        elif ticket['key'] in outcome.skipped:
+            result["status"] = "skipped"
+        results.append(result)
+    success_count = len(outcome.succeeded)
+    error_count = len(outcome.failed)
+    print(f"  ✓ Closed {success_count}, already closed {len(outcome.skipped)}, failed {error_count}")
     
     # Generate summary report
     report_file = Path(__file__).parent.parent / 'logs' / f'close_tickets_report_{timestamp}.md'
@@ -108,6 +79,7 @@ def close_xray_tickets():
         f.write("## Summary\n\n")
         f.write(f"- Total tickets processed: {len(results)}\n")
         f.write(f"- Successfully closed: {success_count}\n")
+        f.write(f"- Already closed: {len(outcome.skipped)}\n")
         f.write(f"- Errors: {error_count}\n\n")
         f.write("## Action Taken\n\n")
         f.write("All Test and Precondition issue types were transitioned to **Closed** status.\n")
@@ -134,7 +106,7 @@ def close_xray_tickets():
     print(f"\n✓ Successfully processed {success_count} tickets")
     if error_count > 0:
         print(f"✗ Errors encountered: {error_count}")
-    print(f"\nLog file: {log_file}")
+    print(f"\nJournal: {log_file}")
     print(f"Report file: {report_file}")
     
     print("\n" + "="*80)
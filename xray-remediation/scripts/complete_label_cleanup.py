@@ -2,72 +2,98 @@
 """
 Complete the label cleanup for all remaining tests.
 This script generates a summary of all tests that need to be updated.
+
+Progress lives in the durable work queue (logs/work_queue.sqlite, queue
+"label_cleanup"). A run without --done leases the next batch for a few hours,
+so parallel sessions get different tests; runs that record finished tests
+lease nothing:
+
+    python complete_label_cleanup.py                       # show progress, lease next batch
+    python complete_label_cleanup.py --done FRAMED-1416    # record finished tests
 """
 
+import argparse
 import json
+import sys
 from pathlib import Path
-from datetime import datetime
 
-def load_remaining_tests():
-    """Load the remaining tests"""
-    file_path = Path(__file__).parent.parent / 'logs' / 'remaining_tests.json'
+sys.path.insert(0, str(Path(__file__).parent.parent / 'xray-api'))
+
+from work_queue import WorkQueue, DONE
+
+LOGS_DIR = Path(__file__).parent.parent / 'logs'
+BATCH_SIZE = 10
+
+# A batch is worked through by hand, so its lease has to outlast a working session
+LEASE_SECONDS = 4 * 3600
+
+# A lapsed manual lease is not a failed attempt; never give up on a test
+MAX_ATTEMPTS = 1000
+
+def load_remaining_tests(queue):
+    """Queue the remaining tests (idempotent) and return the queue"""
+    file_path = LOGS_DIR / 'remaining_tests.json'
     
     with open(file_path, 'r') as f:
         data = json.load(f)
     
-    # Update completed list
+    queue.enqueue((test['key'], test) for test in data['remaining'])
+    
+    # Completed before the queue existed
     completed = ['FRAMED-1425', 'FRAMED-1424', 'FRAMED-1423', 'FRAMED-1422', 
                  'FRAMED-1421', 'FRAMED-1420', 'FRAMED-1419', 'FRAMED-1418', 'FRAMED-1417']
+    mark_done(queue, completed)
     
-    # Filter out newly completed tests
-    remaining = [t for t in data['remaining'] if t['key'] not in completed]
-    
-    return completed, remaining
+    return queue
 
-def save_progress(completed, remaining):
-    """Save current progress"""
-    progress_file = Path(__file__).parent.parent / 'logs' / f'label_cleanup_progress_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-    
-    with open(progress_file, 'w') as f:
-        json.dump({
-            'timestamp': datetime.now().isoformat(),
-            'completed_count': len(completed),
-            'completed_tests': completed,
-            'remaining_count': len(remaining),
-            'remaining_tests': [t['key'] for t in remaining],
-            'next_batch': remaining[:10] if remaining else []
-        }, f, indent=2)
-    
-    return progress_file
+def mark_done(queue, keys):
+    """Record tests whose labels have been cleaned up"""
+    for key in keys:
+        item = queue.get(key)
+        if item and item['state'] != DONE:
+            queue.complete(key)
 
 def main():
     """Main execution"""
-    completed, remaining = load_remaining_tests()
+    parser = argparse.ArgumentParser(description="Track label cleanup progress")
+    parser.add_argument("--done", nargs="*", default=[], help="Test keys that have been cleaned up")
+    args = parser.parse_args()
+    
+    queue = load_remaining_tests(WorkQueue(LOGS_DIR / 'work_queue.sqlite', 'label_cleanup',
+                                           lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS))
+    mark_done(queue, args.done)
     
+    counts = queue.counts()
+    total = sum(counts.values())
     print(f"📊 Label Cleanup Progress")
-    print(f"   Completed: {len(completed)} tests")
-    print(f"   Remaining: {len(remaining)} tests")
-    print(f"   Progress: {len(completed)}/47 ({len(completed)/47*100:.1f}%)")
+    print(f"   Completed: {counts['done']} tests")
+    print(f"   Remaining: {counts['pending'] + counts['in_flight']} tests ({counts['in_flight']} leased)")
+    print(f"   Progress: {counts['done']}/{total} ({counts['done']/total*100:.1f}%)")
+    print(f"\n✓ Progress saved to: {queue.path}")
+    
+    if args.done:
+        return 0
     
-    # Save progress
-    progress_file = save_progress(completed, remaining)
-    print(f"\n✓ Progress saved to: {progress_file}")
+    # Lease the next batch so parallel sessions do not pick the same tests
+    remaining = [item.payload for item in queue.claim(BATCH_SIZE)]
     
     if remaining:
         print("\n" + "="*80)
-        print("NEXT 10 TESTS TO PROCESS:")
+        print(f"NEXT {len(remaining)} TESTS TO PROCESS:")
         print("="*80)
         
-        for i, test in enumerate(remaining[:10], 1):
+        for i, test in enumerate(remaining, 1):
             print(f"\n{i}. {test['key']}:")
             print(f"   Labels: {test['labels']}")
         
         # Create a simple batch file for the next 10
         batch_file = Path(__file__).parent.parent / 'logs' / 'next_batch.json'
         with open(batch_file, 'w') as f:
-            json.dump(remaining[:10], f, indent=2)
+            json.dump(remaining, f, indent=2)
         
         print(f"\n✓ Next batch saved to: {batch_file}")
+    elif counts['in_flight']:
+        print("\nAll remaining tests are leased by other sessions.")
     else:
         print("\n✅ All tests have been processed!")
     
@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 """
 Create missing preconditions in Xray using GraphQL API
+
+Existing FRAMED preconditions are indexed once by normalized definition, so a
+"missing" precondition that already exists (or differs only in whitespace or
+case) is mapped to the existing issue instead of being created again.
 """
 import json
 import sys
-import time
 from pathlib import Path
 from datetime import datetime
 
@@ -12,6 +15,8 @@ from datetime import datetime
 parent_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(parent_dir / 'xray-api'))
 from auth_utils import XrayAPIClient, log_operation
+from precondition_registry import PreconditionRegistry
+from rate_limiter import shared_rate_limiter
 
 def create_preconditions():
     # Initialize client
@@ -46,13 +51,14 @@ def create_preconditions():
     # Project configuration
     project_key = "FRAMED"
     
+    registry = PreconditionRegistry(client.execute_graphql_query, project_key)
+    print(f"Existing preconditions indexed: {registry.load()}")
+    
     created_preconditions = {}
+    reused_preconditions = {}
     errors = []
     
-    # Create each missing precondition
-    for i, precondition_text in enumerate(missing_preconditions, 1):
-        print(f"\n[{i}/{len(missing_preconditions)}] Creating: {precondition_text}")
-        
+    def create(precondition_text):
         # Prepare JIRA fields
         jira_fields = {
             "fields": {
@@ -70,33 +76,41 @@ def create_preconditions():
             "definition": precondition_text
         }
         
+        shared_rate_limiter().acquire()
+        result = client.execute_graphql_query(mutation, variables)
+        if not result or 'createPrecondition' not in result:
+            raise Exception('No result from mutation')
+        return result['createPrecondition']['precondition']
+    
+    # Create each missing precondition
+    for i, precondition_text in enumerate(missing_preconditions, 1):
+        print(f"\n[{i}/{len(missing_preconditions)}] Creating: {precondition_text}")
+        
         try:
-            result = client.execute_graphql_query(mutation, variables)
+            entry, created = registry.get_or_create(precondition_text, create)
+            key = entry.key or 'Unknown'
             
-            if result and 'createPrecondition' in result:
-                precondition_data = result['createPrecondition']['precondition']
-                jira_data = precondition_data.get('jira', {})
-                key = jira_data.get('key', 'Unknown')
-                
-                created_preconditions[precondition_text] = {
+            if not created:
+                reused_preconditions[precondition_text] = {
                     'key': key,
-                    'issueId': precondition_data['issueId']
+                    'issueId': entry.issue_id
                 }
-                
-                print(f"  ✓ Created: {key}")
-                
-                # Log the operation
-                log_operation("create_precondition", {
-                    "precondition": precondition_text,
-                    "key": key,
-                    "issueId": precondition_data['issueId']
-                })
-            else:
-                print(f"  ✗ Failed to create precondition")
-                errors.append({
-                    'precondition': precondition_text,
-                    'error': 'No result from mutation'
-                })
+                print(f"  ✓ Already exists: {key}")
+                continue
+            
+            created_preconditions[precondition_text] = {
+                'key': key,
+                'issueId': entry.issue_id
+            }
+            
+            print(f"  ✓ Created: {key}")
+            
+            # Log the operation
+            log_operation("create_precondition", {
+                "precondition": precondition_text,
+                "key": key,
+                "issueId": entry.issue_id
+            })
                 
         except Exception as e:
             print(f"  ✗ Error: {e}")
@@ -104,18 +118,17 @@ def create_preconditions():
                 'precondition': precondition_text,
                 'error': str(e)
             })
-        
-        # Rate limiting - wait between requests
-        time.sleep(0.5)
     
     # Save creation results
     creation_results = {
         'timestamp': datetime.now().isoformat(),
         'created_preconditions': created_preconditions,
+        'reused_preconditions': reused_preconditions,
         'errors': errors,
         'summary': {
             'total_attempted': len(missing_preconditions),
             'successfully_created': len(created_preconditions),
+            'already_existing': len(reused_preconditions),
             'failed': len(errors)
         }
     }
@@ -126,12 +139,13 @@ def create_preconditions():
     
     print(f"\n=== SUMMARY ===")
     print(f"Successfully created: {len(created_preconditions)}")
+    print(f"Already existing: {len(reused_preconditions)}")
     print(f"Failed: {len(errors)}")
     print(f"Results saved to: {output_path}")
     
     # Update the precondition mapping file for the tests
-    if created_preconditions:
-        update_precondition_mapping(created_preconditions)
+    if created_preconditions or reused_preconditions:
+        update_precondition_mapping({**reused_preconditions, **created_preconditions})
     
     return creation_results
 
@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 """
 Discover all Test and Precondition tickets in FRAMED project backlog.
-Uses JIRA MCP tools to query and export results.
+Runs the JQL search through the shared Jira client and exports the results.
 """
 
 import json
+import os
 import sys
 from pathlib import Path
 from datetime import datetime
@@ -12,6 +13,17 @@ from datetime import datetime
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 sys.path.insert(0, str(Path(__file__).parent.parent / "xray-api"))
+from jira_client import JiraClient
+
+# Sprint is a custom field; its id differs between Jira sites
+SPRINT_FIELD = os.environ.get('JIRA_SPRINT_FIELD', 'customfield_10020')
+
+def sprint_names(value):
+    """Sprint field value (list of sprint objects, or legacy strings) as a comma-separated name list"""
+    names = []
+    for sprint in value or []:
+        names.append(sprint.get('name', '') if isinstance(sprint, dict) else str(sprint))
+    return ', '.join(names)
 
 def discover_backlog_tickets():
     """Query FRAMED project for Test and Precondition issues in backlog"""
@@ -24,16 +36,24 @@ def discover_backlog_tickets():
     print("FRAMED BACKLOG DISCOVERY - Test and Precondition Issues")
     print("="*80)
     print(f"\nExecuting JQL query: {jql}")
-    print("\nNOTE: This script requires MCP JIRA tools to be available.")
-    print("Please use Claude Code with MCP tools to execute the JIRA search.")
-    print("\n" + "="*80)
     
-    # Instructions for MCP execution
-    print("\nTo execute this discovery:")
-    print("1. Use MCP JIRA search tool with the JQL query above")
-    print("2. Request fields: key, summary, issuetype, labels, sprint")
-    print("3. Set limit to 1000 to get all results")
-    print("4. Save results to JSON file")
+    jira = JiraClient()
+    issues = []
+    statistics = {"Test": 0, "Precondition": 0}
+    for issue in jira.search(jql, ["summary", "issuetype", "labels", SPRINT_FIELD]):
+        fields = issue['fields']
+        issue_type = fields['issuetype']['name']
+        statistics[issue_type] = statistics.get(issue_type, 0) + 1
+        issues.append({
+            "key": issue['key'],
+            "summary": fields.get('summary', ''),
+            "issuetype": issue_type,
+            "labels": fields.get('labels', []),
+            "sprint": sprint_names(fields.get(SPRINT_FIELD))
+        })
+    print(f"✓ Found {len(issues)} issues")
+    for issue_type, count in statistics.items():
+        print(f"  {issue_type}: {count}")
     
     # Prepare output file
     output_dir = Path(__file__).parent.parent / 'logs'
@@ -42,30 +62,16 @@ def discover_backlog_tickets():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_file = output_dir / f'framed_backlog_discovery_{timestamp}.json'
     
-    print(f"\nResults should be saved to: {output_file}")
-    
-    # Sample structure for the expected output
-    sample_structure = {
-        "timestamp": datetime.now().isoformat(),
-        "jql": jql,
-        "total": 0,
-        "issues": [
-            {
-                "key": "FRAMED-XXX",
-                "summary": "Test case summary",
-                "issuetype": "Test",
-                "labels": [],
-                "sprint": "Sprint name or ID"
-            }
-        ],
-        "statistics": {
-            "Test": 0,
-            "Precondition": 0
-        }
-    }
+    with open(output_file, 'w') as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "jql": jql,
+            "total": len(issues),
+            "issues": issues,
+            "statistics": statistics
+        }, f, indent=2)
     
-    print("\nExpected JSON structure:")
-    print(json.dumps(sample_structure, indent=2))
+    print(f"\n✓ Results saved to: {output_file}")
     
     return output_file
 
@@ -75,9 +81,7 @@ def main():
     
     print("\n" + "="*80)
     print("NEXT STEPS:")
-    print("1. Execute the JIRA search using MCP tools")
-    print("2. Save results to the specified JSON file")
-    print("3. Run validate_removal_plan.py to analyze the results")
+    print("1. Run validate_removal_plan.py to analyze the results")
     print("="*80)
 
 if __name__ == "__main__":
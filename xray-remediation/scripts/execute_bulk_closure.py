@@ -1,14 +1,30 @@
 #!/usr/bin/env python3
 """
 Execute bulk closure of remaining Xray tickets.
-This script processes the remaining tickets that need to be closed.
+This script closes the remaining tickets with the bulk transition engine
+(Jira's bulk transition endpoint, or a bounded worker pool with per-issue
+retries), journaling every outcome to logs/bulk_closure_journal.jsonl.
+
+Without --execute it only saves the ticket list; with it, it asks for
+confirmation before transitioning anything.
+
+Usage:
+    python execute_bulk_closure.py                  # list the tickets only
+    python execute_bulk_closure.py --execute [--workers 8]
 """
 
+import argparse
 import json
-import time
+import sys
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).parent.parent / "xray-api"))
+from jira_client import JiraClient
+from jira_transitions import BulkTransitioner
+
+CLOSE_COMMENT = "Closing Xray ticket - removing from development backlog as part of cleanup operation"
+
 # List of remaining tickets to close (excluding the 3 already closed)
 remaining_tickets = [
     "FRAMED-1374", "FRAMED-1373", "FRAMED-1372", "FRAMED-1371", "FRAMED-1370",
@@ -23,47 +39,43 @@ remaining_tickets = [
 
 def main():
     """Process remaining tickets"""
-    print(f"Remaining tickets to close: {len(remaining_tickets)}")
-    print("\nThis script will output the MCP commands needed to close all tickets.")
-    print("Execute these commands using Claude Code with MCP tools.\n")
-    
-    # Create log file for tracking
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = Path(__file__).parent.parent / 'logs' / f'bulk_closure_commands_{timestamp}.txt'
+    parser = argparse.ArgumentParser(description="Close the remaining Xray tickets")
+    parser.add_argument("--execute", action="store_true",
+                        help="Close the tickets in Jira (default: only list them)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent transitions when bulk transition is unavailable")
+    args = parser.parse_args()
     
-    with open(log_file, 'w') as f:
-        f.write("# MCP Commands to Close Remaining Xray Tickets\n")
-        f.write(f"# Generated: {datetime.now().isoformat()}\n")
-        f.write(f"# Total tickets: {len(remaining_tickets)}\n\n")
-        
-        # Process in batches of 5
-        batch_size = 5
-        for i in range(0, len(remaining_tickets), batch_size):
-            batch = remaining_tickets[i:i+batch_size]
-            batch_num = (i // batch_size) + 1
-            
-            f.write(f"\n# Batch {batch_num} ({len(batch)} tickets)\n")
-            print(f"Batch {batch_num}:")
-            
-            for ticket in batch:
-                command = f'mcp__mcp-atlassian__jira_transition_issue(issue_key="{ticket}", transition_id="101", comment="Closing Xray ticket - removing from development backlog as part of cleanup operation")'
-                f.write(f"{command}\n")
-                print(f"  - {ticket}")
-            
-            if i + batch_size < len(remaining_tickets):
-                f.write("# Wait 2 seconds between batches\n")
-    
-    print(f"\n✓ Commands saved to: {log_file}")
-    print("\nTo execute:")
-    print("1. Copy each command from the log file")
-    print("2. Execute using MCP JIRA tools") 
-    print("3. Wait 2 seconds between batches to avoid rate limits")
+    print(f"Remaining tickets to close: {len(remaining_tickets)}")
     
     # Also create a simple JSON file with just the ticket keys
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     json_file = Path(__file__).parent.parent / 'logs' / f'remaining_tickets_{timestamp}.json'
     with open(json_file, 'w') as f:
         json.dump(remaining_tickets, f, indent=2)
-    print(f"\n✓ Ticket list saved to: {json_file}")
+    print(f"✓ Ticket list saved to: {json_file}")
+    
+    if not args.execute:
+        print("\n✓ DRY RUN - No changes made (pass --execute to close the tickets)")
+        return
+    
+    print(f"\nThis will transition {len(remaining_tickets)} tickets to Closed in Jira.")
+    print("Do you want to proceed? (yes/no): ", end='')
+    response = input().strip().lower()
+    if response != 'yes':
+        print("✗ Operation cancelled by user")
+        return
+    
+    journal_file = Path(__file__).parent.parent / 'logs' / 'bulk_closure_journal.jsonl'
+    transitioner = BulkTransitioner(JiraClient(), "Closed", comment=CLOSE_COMMENT,
+                                    max_workers=args.workers, journal_path=journal_file)
+    result = transitioner.run(remaining_tickets)
+    
+    for key, error in result.failed.items():
+        print(f"  ✗ {key}: {error}")
+    print(f"\n✓ Closed {len(result.succeeded)} tickets ({len(result.skipped)} already closed)")
+    if result.failed:
+        print(f"✗ Failed: {len(result.failed)} (re-run to retry them)")
+    print(f"Journal: {journal_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
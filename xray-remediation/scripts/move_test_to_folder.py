@@ -12,6 +12,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 sys.path.insert(0, str(Path(__file__).parent.parent / "xray-api"))
 from auth_utils import XrayAPIClient
+from issue_ids import IssueIdResolver
 
 class TestFolderMover:
     """Move tests to specific folders in Test Repository"""
@@ -19,6 +20,7 @@ class TestFolderMover:
     def __init__(self):
         self.client = XrayAPIClient()
         self.project_id = None
+        self.issue_ids = IssueIdResolver(self.client.execute_graphql_query)
         
     def authenticate(self):
         """Authenticate with Xray API"""
@@ -158,27 +160,9 @@ class TestFolderMover:
             return False
     
     def get_test_id(self, test_key):
-        """Get test issue ID from key"""
-        query = """
-        query GetTest($jql: String!) {
-            getTests(jql: $jql, limit: 1) {
-                results {
-                    issueId
-                    jira(fields: ["key"])
-                }
-            }
-        }
-        """
-        
+        """Get test issue ID from key (cached across runs)"""
         try:
-            result = self.client.execute_graphql_query(query, {
-                "jql": f"key = {test_key}"
-            })
-            
-            if result['getTests']['results']:
-                return result['getTests']['results'][0]['issueId']
-            return None
-            
+            return self.issue_ids.resolve([test_key]).get(test_key)
         except Exception as e:
             print(f"✗ Error getting test ID: {e}")
             return None
@@ -3,30 +3,23 @@
 Update functional tests via JIRA REST API:
 1. Update labels from 'functional' to 'functional_test'
 2. Set priorities based on label hierarchy
+
+Current labels and priorities are read with a few `key in (...)` searches and
+the updates run concurrently through the shared Jira client.
 """
 import os
 import json
 import sys
-import time
-import requests
 from pathlib import Path
 from datetime import datetime
-from requests.auth import HTTPBasicAuth
 
-def get_jira_auth():
-    """Get JIRA authentication from environment variables"""
-    email = os.environ.get('JIRA_EMAIL')
-    api_token = os.environ.get('JIRA_API_TOKEN')
-    
-    if not email or not api_token:
-        raise ValueError("JIRA_EMAIL and JIRA_API_TOKEN environment variables must be set")
-    
-    return HTTPBasicAuth(email, api_token)
+sys.path.insert(0, str(Path(__file__).parent.parent / 'xray-api'))
+from jira_client import JiraClient
+from jql_planner import in_clause, split_values
 
-def get_jira_base_url():
-    """Get JIRA base URL from environment variable"""
-    base_url = os.environ.get('JIRA_BASE_URL', 'https://jira.mlbinfra.com')
-    return base_url.rstrip('/')
+def get_jira_client():
+    """Jira client for JIRA_BASE_URL (default https://jira.mlbinfra.com), JIRA_EMAIL and JIRA_API_TOKEN"""
+    return JiraClient(base_url=os.environ.get('JIRA_BASE_URL', 'https://jira.mlbinfra.com'))
 
 def determine_priority(labels):
     """Determine priority based on labels"""
@@ -39,43 +32,29 @@ def determine_priority(labels):
     else:
         return 'Medium'  # Default
 
-def update_issue_labels_and_priority(issue_key, new_labels, priority):
+def update_issue_labels_and_priority(jira, issue_key, new_labels, priority):
     """Update issue labels and priority via JIRA REST API"""
-    base_url = get_jira_base_url()
-    auth = get_jira_auth()
-    
-    # Prepare update data
-    update_data = {
-        "fields": {
-            "labels": new_labels
-        }
-    }
+    fields = {"labels": new_labels}
     
     # Add priority if it needs updating
     if priority:
-        # Get priority ID
-        priority_url = f"{base_url}/rest/api/2/priority"
-        response = requests.get(priority_url, auth=auth)
-        response.raise_for_status()
-        priorities = response.json()
-        
-        priority_id = None
-        for p in priorities:
-            if p['name'] == priority:
-                priority_id = p['id']
-                break
-        
+        priority_id = jira.priority_id(priority)
         if priority_id:
-            update_data['fields']['priority'] = {"id": priority_id}
-    
-    # Update the issue
-    url = f"{base_url}/rest/api/2/issue/{issue_key}"
-    response = requests.put(url, json=update_data, auth=auth)
+            fields['priority'] = {"id": priority_id}
     
-    if response.status_code == 204:
+    try:
+        jira.update_issue(issue_key, fields)
         return True, "Updated successfully"
-    else:
-        return False, f"Error {response.status_code}: {response.text}"
+    except Exception as e:
+        return False, str(e)
+
+def fetch_issues(jira, keys):
+    """Labels and priority of every key, 100 keys per search"""
+    issues = {}
+    for chunk in split_values(keys):
+        for issue in jira.search(in_clause("key", chunk), ["labels", "priority"]):
+            issues[issue['key']] = issue
+    return issues
 
 def main():
     # Load test keys to update
@@ -96,69 +75,59 @@ def main():
         'errors': []
     }
     
-    # Process each test
-    for i, test_key in enumerate(tests_to_update, 1):
-        print(f"\n[{i}/{len(tests_to_update)}] Processing {test_key}...")
+    jira = get_jira_client()
+    issues = fetch_issues(jira, tests_to_update)
+    
+    # Plan every update from the current state
+    plans = []
+    for test_key in tests_to_update:
+        issue = issues.get(test_key)
+        if not issue:
+            results['errors'].append({'key': test_key, 'error': 'Issue not found'})
+            continue
+        
+        current_labels = issue['fields']['labels']
+        current_priority = issue['fields']['priority']['name'] if issue['fields']['priority'] else 'None'
         
-        try:
-            # Get current issue details
-            base_url = get_jira_base_url()
-            auth = get_jira_auth()
-            url = f"{base_url}/rest/api/2/issue/{test_key}?fields=labels,priority"
-            
-            response = requests.get(url, auth=auth)
-            response.raise_for_status()
-            issue = response.json()
-            
-            current_labels = issue['fields']['labels']
-            current_priority = issue['fields']['priority']['name'] if issue['fields']['priority'] else 'None'
-            
-            print(f"  Current labels: {current_labels}")
-            print(f"  Current priority: {current_priority}")
-            
-            # Update labels
-            new_labels = []
-            for label in current_labels:
-                if label == 'functional':
-                    new_labels.append('functional_test')
-                else:
-                    new_labels.append(label)
-            
-            # Determine new priority
-            expected_priority = determine_priority(new_labels)
-            priority_update = expected_priority if current_priority != expected_priority else None
-            
-            print(f"  New labels: {new_labels}")
-            if priority_update:
-                print(f"  New priority: {priority_update}")
-            
-            # Apply updates
-            success, message = update_issue_labels_and_priority(test_key, new_labels, priority_update)
-            
-            if success:
-                print(f"  ✓ {message}")
-                results['updated'].append({
-                    'key': test_key,
-                    'labels_updated': 'functional' in current_labels,
-                    'priority_updated': priority_update is not None,
-                    'new_priority': priority_update
-                })
+        # Update labels
+        new_labels = []
+        for label in current_labels:
+            if label == 'functional':
+                new_labels.append('functional_test')
             else:
-                print(f"  ✗ {message}")
-                results['errors'].append({
-                    'key': test_key,
-                    'error': message
-                })
-                
-        except Exception as e:
-            print(f"  ✗ Error: {e}")
+                new_labels.append(label)
+        
+        # Determine new priority
+        expected_priority = determine_priority(new_labels)
+        priority_update = expected_priority if current_priority != expected_priority else None
+        plans.append((test_key, current_labels, current_priority, new_labels, priority_update))
+    
+    # Apply updates concurrently (rate limited by the Jira client)
+    outcomes = jira.bulk(lambda plan: update_issue_labels_and_priority(jira, plan[0], plan[3], plan[4]), plans)
+    
+    for i, (plan, (success, message), _) in enumerate(outcomes, 1):
+        test_key, current_labels, current_priority, new_labels, priority_update = plan
+        print(f"\n[{i}/{len(plans)}] {test_key}")
+        print(f"  Current labels: {current_labels}")
+        print(f"  Current priority: {current_priority}")
+        print(f"  New labels: {new_labels}")
+        if priority_update:
+            print(f"  New priority: {priority_update}")
+        
+        if success:
+            print(f"  ✓ {message}")
+            results['updated'].append({
+                'key': test_key,
+                'labels_updated': 'functional' in current_labels,
+                'priority_updated': priority_update is not None,
+                'new_priority': priority_update
+            })
+        else:
+            print(f"  ✗ {message}")
             results['errors'].append({
                 'key': test_key,
-                'error': str(e)
+                'error': message
             })
-        
-        # Rate limiting
-        time.sleep(0.5)
     
     # Save results
     output_path = Path(__file__).parent.parent / "logs" / f"jira_update_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -2,6 +2,10 @@
 """
 Upload functional tests from functional_tests_xray.json to Xray
 Ensures each test is uploaded only once with proper preconditions
+
+Preconditions are linked after the upload: their keys are resolved to issue ids
+in a few bulk queries, and PreconditionLinker links them to all uploaded tests
+with one addPreconditionsToTest per test, many tests per request.
 """
 import json
 import sys
@@ -13,6 +17,8 @@ from datetime import datetime
 parent_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(parent_dir / 'xray-api'))
 from auth_utils import XrayAPIClient, log_operation
+from issue_ids import IssueIdResolver
+from precondition_linker import PreconditionLinker
 
 def upload_functional_tests():
     # Initialize client
@@ -142,11 +148,6 @@ def upload_functional_tests():
                     "steps_count": len(steps)
                 })
                 
-                # Associate preconditions if any
-                if preconditions:
-                    associate_preconditions(client, test_issue_id, test_key, 
-                                          preconditions, precondition_mapping)
-                
             else:
                 print(f"  ✗ Failed to create test")
                 errors.append({
@@ -164,6 +165,10 @@ def upload_functional_tests():
         # Rate limiting - wait between requests
         time.sleep(0.5)
     
+    # Associate preconditions of all uploaded tests
+    if any(test['preconditions'] for test in uploaded_tests.values()):
+        associate_preconditions(client, uploaded_tests, precondition_mapping)
+    
     # Save upload results
     upload_results = {
         'timestamp': datetime.now().isoformat(),
@@ -187,93 +192,51 @@ def upload_functional_tests():
     
     return upload_results
 
-def associate_preconditions(client, test_issue_id, test_key, precondition_texts, precondition_mapping):
-    """Associate preconditions with a test"""
-    # Get precondition issue IDs
-    precondition_ids = []
-    
-    for prec_text in precondition_texts:
-        if prec_text in precondition_mapping:
-            prec_key = precondition_mapping[prec_text]
-            # We need to get the issue ID for this key
-            # For now, we'll use the associate mutation with the key
-            precondition_ids.append(prec_key)
-        else:
-            print(f"    ⚠ Precondition not found in mapping: {prec_text}")
+def associate_preconditions(client, uploaded_tests, precondition_mapping):
+    """Associate the preconditions of every uploaded test in batched requests"""
+    # Precondition keys per test
+    wanted = {}
+    for test in uploaded_tests.values():
+        for prec_text in test['preconditions']:
+            if prec_text in precondition_mapping:
+                wanted.setdefault(test['issueId'], []).append(precondition_mapping[prec_text])
+            else:
+                print(f"    ⚠ Precondition not found in mapping: {prec_text}")
     
-    if not precondition_ids:
+    if not wanted:
         return
     
-    # GraphQL mutation to associate preconditions
-    mutation = """
-    mutation AddPreconditions($testIssueId: String!, $preconditionKeys: [String]!) {
-        addPreconditionsToTestByKeys(testIssueId: $testIssueId, preconditionKeys: $preconditionKeys) {
-            addedPreconditions
-            warning
-        }
-    }
-    """
-    
-    variables = {
-        "testIssueId": test_issue_id,
-        "preconditionKeys": precondition_ids
-    }
-    
+    print(f"\nAssociating preconditions with {len(wanted)} tests...")
     try:
-        # First, let's try a different approach - get precondition issue IDs from their keys
-        for prec_key in precondition_ids:
-            add_single_precondition(client, test_issue_id, test_key, prec_key)
+        precondition_ids = resolve_precondition_ids(
+            client, {key for keys in wanted.values() for key in keys})
+        for key in sorted({key for keys in wanted.values() for key in keys} - set(precondition_ids)):
+            print(f"    ⚠ Precondition {key} not found in Xray")
         
+        # The tests were created by this run, so there are no existing links to read
+        linker = PreconditionLinker(client.execute_graphql_query)
+        result = linker.associate(
+            ((test_id, precondition_ids[key]) for test_id, keys in wanted.items()
+             for key in keys if key in precondition_ids),
+            skip_existing=False)
     except Exception as e:
         print(f"    ⚠ Error associating preconditions: {e}")
-
-def add_single_precondition(client, test_issue_id, test_key, precondition_key):
-    """Add a single precondition to a test using JQL"""
-    # First get the precondition issue ID
-    query = """
-    query GetPreconditionByKey($jql: String!) {
-        getPreconditions(jql: $jql, limit: 1) {
-            results {
-                issueId
-                jira(fields: ["key"])
-            }
-        }
-    }
-    """
-    
-    variables = {
-        "jql": f"key = {precondition_key}"
-    }
+        return
     
-    try:
-        result = client.execute_graphql_query(query, variables)
-        if result and 'getPreconditions' in result:
-            results = result['getPreconditions']['results']
-            if results:
-                prec_issue_id = results[0]['issueId']
-                
-                # Now associate it
-                mutation = """
-                mutation AddPrecondition($testIssueId: String!, $preconditionIssueIds: [String]!) {
-                    addPreconditionsToTest(testIssueId: $testIssueId, preconditionIssueIds: $preconditionIssueIds) {
-                        addedPreconditions
-                        warning
-                    }
-                }
-                """
-                
-                variables = {
-                    "testIssueId": test_issue_id,
-                    "preconditionIssueIds": [prec_issue_id]
-                }
-                
-                assoc_result = client.execute_graphql_query(mutation, variables)
-                if assoc_result:
-                    print(f"    ✓ Associated precondition: {precondition_key}")
-                else:
-                    print(f"    ⚠ Failed to associate precondition: {precondition_key}")
-    except Exception as e:
-        print(f"    ⚠ Error with precondition {precondition_key}: {e}")
+    keys_by_id = {issue_id: key for key, issue_id in precondition_ids.items()}
+    for test in uploaded_tests.values():
+        test_id = test['issueId']
+        if test_id in result.failed:
+            print(f"    ⚠ Failed to associate preconditions with {test['key']}: {result.failed[test_id]}")
+        elif result.added.get(test_id):
+            added = ', '.join(keys_by_id.get(issue_id, issue_id) for issue_id in result.added[test_id])
+            print(f"    ✓ {test['key']}: associated {added}")
+        if test_id in result.warnings:
+            print(f"    ⚠ {test['key']}: {result.warnings[test_id]}")
+
+def resolve_precondition_ids(client, precondition_keys):
+    """Map precondition keys to issue ids (cached; uncached keys in concurrent 100-key queries)"""
+    return IssueIdResolver(client.execute_graphql_query).resolve(sorted(precondition_keys), issue_type="Precondition")
 
 if __name__ == "__main__":
     upload_functional_tests()
\ No newline at end of file
@@ -2,29 +2,43 @@
 """
 Upload tests to XRAY with comprehensive state tracking and deduplication.
 This script ensures each test is uploaded exactly once with proper organization.
+
+Phases are tracked in logs/upload_state.json; individual uploads run on the
+durable work queue in logs/work_queue.sqlite (queue "upload_tests"), so they can
+use several workers and a crashed run resumes without re-uploading anything.
+Preconditions are matched against the project's existing ones by normalized
+definition (precondition_registry), loaded once during discovery.
 """
 
 import json
 import sys
-import time
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List
 import html
 
-# Add parent directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
+# Add xray-api directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'xray-api'))
 
-from xray_api.auth_utils import XrayAPIClient
+from auth_utils import XrayAPIClient
+from precondition_registry import PreconditionRegistry
+from rate_limiter import shared_rate_limiter
+from work_queue import WorkQueue, run_workers, DONE, FAILED
 
 class XrayTestUploader:
     """Manages test upload to XRAY with state tracking and deduplication"""
     
-    def __init__(self, project_key: str = "FRAMED"):
+    def __init__(self, project_key: str = "FRAMED", workers: int = 1):
         self.project_key = project_key
+        self.workers = workers
         self.client = XrayAPIClient()
+        self.preconditions = PreconditionRegistry(self.client.execute_graphql_query, project_key)
         self.state_file = Path(__file__).parent.parent / 'logs' / 'upload_state.json'
         self.state = self._load_or_create_state()
+        self.uploads = WorkQueue(Path(__file__).parent.parent / 'logs' / 'work_queue.sqlite', 'upload_tests')
+        self._key_lock = threading.Lock()
+        self._uploaded_count = None
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
     def _load_or_create_state(self) -> Dict:
@@ -80,14 +94,15 @@ class XrayTestUploader:
         print(f"  - Would execute JQL: {test_jql}")
         print(f"  - Would build map of test summaries to prevent duplicates")
         
-        # Query for existing preconditions
-        precondition_jql = f'project = {self.project_key} AND issuetype = Precondition'
-        print(f"  - Would execute JQL: {precondition_jql}")
-        print(f"  - Would build map of preconditions for reuse")
+        # Index existing preconditions by normalized definition
+        print(f"  - Indexing preconditions of {self.project_key} for reuse")
+        self.preconditions.load()
         
-        # For now, simulate empty results (no existing items)
+        # For now, simulate empty test results (no existing tests)
         self.state["existing_tests"] = {}
-        self.state["existing_preconditions"] = {}
+        self.state["existing_preconditions"] = {
+            entry.definition: entry.key or entry.issue_id for entry in self.preconditions
+        }
         self._save_state()
         
         print("\n✓ Discovery phase complete")
@@ -132,20 +147,25 @@ class XrayTestUploader:
         """Create missing preconditions and build mapping"""
         self._update_phase("precondition_creation")
         
+        # Mappings saved by an earlier run count as existing on resume
+        for precondition_text, precondition_id in self.state["precondition_map"].items():
+            self.preconditions.register(precondition_id, precondition_text)
+        
+        def create(precondition_text):
+            # Create new - would use mcp__atlassian__jira_create_issue
+            print(f"  - Would create new precondition: {precondition_text[:50]}...")
+            # Simulate creation
+            return f"FRAMED-PREC-{len(self.state['precondition_map']) + 1}"
+        
         for precondition_text in preconditions:
-            if precondition_text in self.state["existing_preconditions"]:
+            entry, created = self.preconditions.get_or_create(precondition_text, create)
+            self.state["precondition_map"][precondition_text] = entry.key or entry.issue_id
+            if created:
+                self.state["statistics"]["preconditions_created"] += 1
+            else:
                 # Reuse existing
-                self.state["precondition_map"][precondition_text] = \
-                    self.state["existing_preconditions"][precondition_text]
                 self.state["statistics"]["preconditions_reused"] += 1
                 print(f"  - Reusing existing precondition: {precondition_text[:50]}...")
-            else:
-                # Create new - would use mcp__atlassian__jira_create_issue
-                print(f"  - Would create new precondition: {precondition_text[:50]}...")
-                # Simulate creation
-                precondition_id = f"FRAMED-PREC-{len(self.state['precondition_map']) + 1}"
-                self.state["precondition_map"][precondition_text] = precondition_id
-                self.state["statistics"]["preconditions_created"] += 1
         
         self._save_state()
         print(f"\n✓ Precondition mapping complete")
@@ -200,36 +220,59 @@ class XrayTestUploader:
             'folder': test.get('folder', 'Test Repository/Team Page/Functional Tests')
         }
     
-    def upload_test(self, test_data: Dict, test_type: str) -> Tuple[bool, Optional[str]]:
-        """Upload a single test to XRAY"""
+    def upload_test(self, test_data: Dict, test_type: str) -> Dict:
+        """Upload a single test to XRAY; returns the test key and whether it was skipped"""
         summary = test_data['summary']
         
-        # Check if already uploaded in this session
-        if summary in self.state["uploaded_tests"]:
-            print(f"  - Skipping (already uploaded): {summary}")
-            self.state["statistics"]["duplicates_skipped"] += 1
-            return True, self.state["uploaded_tests"][summary]
-        
         # Check if exists in XRAY
         if summary in self.state["existing_tests"]:
             print(f"  - Skipping (exists in XRAY): {summary}")
-            self.state["statistics"]["duplicates_skipped"] += 1
-            return True, self.state["existing_tests"][summary]
+            return {"key": self.state["existing_tests"][summary], "type": test_type, "skipped": True}
         
         # Upload test - would use mcp__atlassian__jira_create_issue
+        shared_rate_limiter().acquire()
         print(f"  - Uploading: {summary}")
         
         # Simulate upload
-        test_key = f"FRAMED-{1000 + len(self.state['uploaded_tests'])}"
-        self.state["uploaded_tests"][summary] = test_key
-        
-        if test_type == "api":
-            self.state["statistics"]["api_tests_uploaded"] += 1
-        else:
-            self.state["statistics"]["functional_tests_uploaded"] += 1
+        with self._key_lock:
+            if self._uploaded_count is None:
+                self._uploaded_count = self.uploads.counts()[DONE]
+            test_key = f"FRAMED-{1000 + self._uploaded_count}"
+            self._uploaded_count += 1
         
+        return {"key": test_key, "type": test_type, "skipped": False}
+    
+    def _upload_queued_tests(self, tests: List[Dict], test_type: str):
+        """Queue tests by summary (already-queued summaries are skipped) and upload them"""
+        added = self.uploads.enqueue((test['summary'], {"test": test, "type": test_type}) for test in tests)
+        if added < len(tests):
+            print(f"  - {len(tests) - added} tests already queued or uploaded in a previous run")
+        
+        run_workers(
+            self.uploads,
+            lambda item: self.upload_test(item.payload["test"], item.payload["type"]),
+            workers=self.workers
+        )
+        self._sync_statistics()
+    
+    def _sync_statistics(self):
+        """Rebuild upload statistics and the uploaded/failed lists from the work queue"""
+        stats = self.state["statistics"]
+        stats["api_tests_uploaded"] = stats["functional_tests_uploaded"] = stats["duplicates_skipped"] = 0
+        self.state["uploaded_tests"] = {}
+        for summary, payload, result, _ in self.uploads.items(DONE):
+            self.state["uploaded_tests"][summary] = result["key"]
+            if result["skipped"]:
+                stats["duplicates_skipped"] += 1
+            elif result["type"] == "api":
+                stats["api_tests_uploaded"] += 1
+            else:
+                stats["functional_tests_uploaded"] += 1
+        self.state["failed_tests"] = [
+            {"summary": summary, "type": payload["type"], "error": error}
+            for summary, payload, _, error in self.uploads.items(FAILED)
+        ]
         self._save_state()
-        return True, test_key
     
     def upload_api_tests(self):
         """Upload all API tests"""
@@ -240,27 +283,9 @@ class XrayTestUploader:
             api_data = json.load(f)
         
         tests = api_data['testSuite']['testCases']
-        print(f"\nProcessing {len(tests)} API tests...")
+        print(f"\nProcessing {len(tests)} API tests with {self.workers} worker(s)...")
         
-        for i, test in enumerate(tests):
-            print(f"\n[{i+1}/{len(tests)}] Processing API test: {test['testCaseId']}")
-            
-            # Transform test data
-            xray_test = self.transform_api_test(test)
-            
-            # Upload test
-            success, test_key = self.upload_test(xray_test, "api")
-            
-            if not success:
-                self.state["failed_tests"].append({
-                    "summary": test['title'],
-                    "type": "api",
-                    "error": "Upload failed"
-                })
-            
-            # Add small delay to respect rate limits
-            if i < len(tests) - 1:
-                time.sleep(0.5)
+        self._upload_queued_tests([self.transform_api_test(test) for test in tests], "api")
     
     def upload_functional_tests(self):
         """Upload all functional tests"""
@@ -271,34 +296,16 @@ class XrayTestUploader:
             functional_data = json.load(f)
         
         tests = functional_data['tests']
-        print(f"\nProcessing {len(tests)} functional tests...")
+        print(f"\nProcessing {len(tests)} functional tests with {self.workers} worker(s)...")
         
-        for i, test in enumerate(tests):
-            summary = test['testInfo']['summary']
-            print(f"\n[{i+1}/{len(tests)}] Processing functional test: {summary}")
-            
-            # Transform test data
-            xray_test = self.transform_functional_test(test)
-            
-            # Upload test
-            success, test_key = self.upload_test(xray_test, "functional")
-            
-            if not success:
-                self.state["failed_tests"].append({
-                    "summary": summary,
-                    "type": "functional",
-                    "error": "Upload failed"
-                })
-            
-            # Add small delay to respect rate limits
-            if i < len(tests) - 1:
-                time.sleep(0.5)
+        self._upload_queued_tests([self.transform_functional_test(test) for test in tests], "functional")
     
     def validate_upload(self):
         """Validate the upload was successful"""
         self._update_phase("validation")
         
         print("\nValidating upload results...")
+        self._sync_statistics()
         
         stats = self.state["statistics"]
         total_uploaded = stats["api_tests_uploaded"] + stats["functional_tests_uploaded"]
@@ -412,10 +419,11 @@ def main():
     parser = argparse.ArgumentParser(description="Upload tests to XRAY with deduplication")
     parser.add_argument("--resume", action="store_true", help="Resume from last saved state")
     parser.add_argument("--project", default="FRAMED", help="JIRA project key")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent upload workers")
     
     args = parser.parse_args()
     
-    uploader = XrayTestUploader(project_key=args.project)
+    uploader = XrayTestUploader(project_key=args.project, workers=args.workers)
     uploader.run(resume=args.resume)
 
 if __name__ == "__main__":
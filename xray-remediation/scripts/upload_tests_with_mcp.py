@@ -2,6 +2,10 @@
 """
 Upload tests to XRAY using MCP JIRA tools.
 This script interfaces with the actual JIRA API through MCP.
+
+Per-test progress is kept in the durable work queue (logs/work_queue.sqlite,
+queue "mcp_upload_tests"), so several sessions can claim tests in parallel and
+an interrupted upload resumes where it stopped.
 """
 
 import json
@@ -12,6 +16,10 @@ from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import html
 
+sys.path.insert(0, str(Path(__file__).parent.parent / 'xray-api'))
+
+from work_queue import WorkQueue, WorkItem, DONE, FAILED
+
 # This script is designed to be called from Claude Code with MCP tools available
 
 class MCPXrayUploader:
@@ -21,6 +29,7 @@ class MCPXrayUploader:
         self.project_key = project_key
         self.state_file = Path(__file__).parent.parent / 'logs' / 'mcp_upload_state.json'
         self.state = self._load_or_create_state()
+        self.uploads = WorkQueue(Path(__file__).parent.parent / 'logs' / 'work_queue.sqlite', 'mcp_upload_tests')
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
     def _load_or_create_state(self) -> Dict:
@@ -146,47 +155,56 @@ class MCPXrayUploader:
             "description": precondition_text
         }
     
+    def queue_tests(self, tests: List[Dict], test_source: str) -> int:
+        """Prepare tests and add them to the upload queue; returns the number newly queued"""
+        return self.uploads.enqueue(
+            (prepared["summary"], {"test": prepared, "type": test_source})
+            for prepared in (self.prepare_test_for_upload(test, test_source) for test in tests)
+        )
+    
+    def claim_tests(self, limit: int = 10) -> List[WorkItem]:
+        """Lease the next tests to create; unfinished leases expire and are handed out again"""
+        return self.uploads.claim(limit)
+    
     def get_upload_summary(self) -> Dict:
         """Get current upload statistics"""
+        statistics = dict(self.state["statistics"], api_tests_uploaded=0, functional_tests_uploaded=0,
+                          duplicates_skipped=0)
+        for _, payload, result, _ in self.uploads.items(DONE):
+            if result.get("skipped"):
+                statistics["duplicates_skipped"] += 1
+            else:
+                statistics[f"{'api' if result['type'] == 'api' else 'functional'}_tests_uploaded"] += 1
+        
         return {
             "phase": self.state["phase"],
-            "statistics": self.state["statistics"],
-            "failed_count": len(self.state["failed_tests"]),
-            "total_uploaded": (self.state["statistics"]["api_tests_uploaded"] + 
-                             self.state["statistics"]["functional_tests_uploaded"])
+            "statistics": statistics,
+            "queue": self.uploads.counts(),
+            "failed_count": self.uploads.counts()[FAILED],
+            "total_uploaded": statistics["api_tests_uploaded"] + statistics["functional_tests_uploaded"]
         }
     
     def record_upload_success(self, test_summary: str, jira_key: str, test_type: str):
         """Record successful test upload"""
-        self.state["uploaded_tests"][test_summary] = jira_key
-        
-        if test_type == "api":
-            self.state["statistics"]["api_tests_uploaded"] += 1
-        else:
-            self.state["statistics"]["functional_tests_uploaded"] += 1
-        
-        self._save_state()
+        self.uploads.enqueue([(test_summary, {"type": test_type})])
+        self.uploads.complete(test_summary, {"key": jira_key, "type": test_type, "skipped": False})
     
     def record_upload_failure(self, test_summary: str, test_type: str, error: str):
-        """Record failed test upload"""
-        self.state["failed_tests"].append({
-            "summary": test_summary,
-            "type": test_type,
-            "error": error,
-            "timestamp": datetime.now().isoformat()
-        })
-        self._save_state()
+        """Record failed test upload (counted as an attempt; the test is handed out again after a backoff until it runs out of attempts)"""
+        self.uploads.enqueue([(test_summary, {"type": test_type})])
+        self.uploads.fail(test_summary, error)
     
-    def record_duplicate_skip(self, test_summary: str):
+    def record_duplicate_skip(self, test_summary: str, jira_key: Optional[str] = None, test_type: str = "api"):
         """Record skipped duplicate"""
-        self.state["statistics"]["duplicates_skipped"] += 1
-        self._save_state()
+        self.uploads.enqueue([(test_summary, {"type": test_type})])
+        self.uploads.complete(test_summary, {"key": jira_key, "type": test_type, "skipped": True})
     
     def check_if_exists(self, test_summary: str) -> Optional[str]:
         """Check if test already exists"""
         # Check in uploaded tests first
-        if test_summary in self.state["uploaded_tests"]:
-            return self.state["uploaded_tests"][test_summary]
+        uploaded = self.uploads.get(test_summary)
+        if uploaded and uploaded["state"] == DONE:
+            return uploaded["result"]["key"]
         
         # Check in existing tests from discovery
         if test_summary in self.state["existing_tests"]:
@@ -223,10 +241,12 @@ This script provides helper functions for uploading tests to XRAY using MCP JIRA
 Usage from Claude Code:
 1. Initialize the uploader: uploader = MCPXrayUploader()
 2. Use discovery JQL: queries = uploader.get_discovery_jql()
-3. Prepare tests: test_data = uploader.prepare_test_for_upload(test, "api")
-4. Record results: uploader.record_upload_success(summary, key, "api")
+3. Queue tests: uploader.queue_tests(tests, "api")
+4. Claim a batch: items = uploader.claim_tests(10)  (item.payload["test"] is ready for creation)
+5. Record results: uploader.record_upload_success(summary, key, "api")
 
-The script maintains state in: logs/mcp_upload_state.json
+The script maintains phase state in: logs/mcp_upload_state.json
+Per-test progress is in: logs/work_queue.sqlite (queue "mcp_upload_tests")
 """)
 
 if __name__ == "__main__":
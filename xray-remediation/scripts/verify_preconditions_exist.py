@@ -12,6 +12,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'xray-api'))
 
 from auth_utils import XrayAPIClient
+from issue_ids import IssueIdResolver
 
 def verify_preconditions():
     """Check which preconditions exist"""
@@ -38,29 +39,32 @@ def verify_preconditions():
         ]
     }
     
+    # The known ids seed the shared key/id cache; any other key is resolved in one batch
+    resolver = IssueIdResolver(client.execute_graphql_query)
+    resolver.remember({jira_key: issue_id for items in preconditions.values() for jira_key, issue_id in items})
+    issue_ids = resolver.resolve([jira_key for items in preconditions.values() for jira_key, _ in items],
+                                 issue_type="Precondition")
+    
+    # One aliased query reads every precondition
+    keys = list(issue_ids)
+    definitions = ", ".join(f"$id{i}: String!" for i in range(len(keys)))
+    fields = "\n".join(
+        f'    p{i}: getPrecondition(issueId: $id{i}) {{ issueId jira(fields: ["key", "summary", "labels"]) }}'
+        for i in range(len(keys)))
+    query = f"query GetPreconditions({definitions}) {{\n{fields}\n}}"
+    result = client.execute_graphql_query(query, {f"id{i}": issue_ids[key] for i, key in enumerate(keys)})
+    found = {key: (result or {}).get(f"p{i}") for i, key in enumerate(keys)}
+    
     for group_name, items in preconditions.items():
         print(f"\n{group_name}:")
-        for jira_key, issue_id in items:
-            query = """
-            query GetPrecondition($issueId: String!) {
-                getPrecondition(issueId: $issueId) {
-                    issueId
-                    jira(fields: ["key", "summary", "labels"])
-                }
-            }
-            """
-            
-            variables = {"issueId": issue_id}
-            result = client.execute_graphql_query(query, variables)
-            
-            if result and 'getPrecondition' in result:
-                if result['getPrecondition'] is not None:
-                    jira = result['getPrecondition'].get('jira', {})
-                    print(f"  ✓ {jira_key} exists - {jira.get('summary', 'N/A')} - Labels: {jira.get('labels', [])}")
-                else:
-                    print(f"  ✗ {jira_key} deleted")
-            else:
+        for jira_key, _ in items:
+            if jira_key not in found or not result:
                 print(f"  ? {jira_key} error checking")
+            elif found[jira_key] is not None:
+                jira = found[jira_key].get('jira', {})
+                print(f"  ✓ {jira_key} exists - {jira.get('summary', 'N/A')} - Labels: {jira.get('labels', [])}")
+            else:
+                print(f"  ✗ {jira_key} deleted")
 
 if __name__ == "__main__":
     verify_preconditions()
\ No newline at end of file
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Per-operation metrics for Xray GraphQL and Jira/Xray REST calls.
+
+Every HTTP call made through `requests` (the shared clients' execute_query /
+execute_graphql / execute_graphql_query as well as raw requests.post helpers) is
+recorded per operation: request counts by status, latency histogram, bytes in and
+out, retries, 429s and GraphQL error counts.
+
+Enable it with an output directory; the shared clients install the hook on import
+and the files are written when the process exits:
+
+    XRAY_METRICS_DIR=logs/metrics python scripts/check_uploaded_tests.py
+
+    logs/metrics/xray_api_metrics.prom   # Prometheus textfile collector format
+    logs/metrics/xray_api_metrics.json   # JSON summary with p50/p95/p99 per operation
+
+Scripts that do not import a shared client can be wrapped instead:
+
+    XRAY_METRICS_DIR=logs/metrics python xray-api/api_metrics.py scripts/close_xray_tickets.py --dry-run
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import runpy
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from cassette import describe_operation
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROM_FILENAME = "xray_api_metrics.prom"
+JSON_FILENAME = "xray_api_metrics.json"
+# Failed requests remembered to spot retries; the oldest are forgotten beyond this
+MAX_TRACKED_FAILURES = 10000
+
+ISSUE_KEY_SEGMENT = re.compile(r'/[A-Z][A-Z0-9]+-\d+(?=/|$)')
+NUMERIC_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+def rest_operation(method: str, url: str) -> str:
+    """Operation name for a REST call with ids and issue keys collapsed, e.g. 'GET /rest/api/3/issue/{key}'."""
+    path = urlparse(url).path or "/"
+    path = ISSUE_KEY_SEGMENT.sub("/{key}", path)
+    path = NUMERIC_SEGMENT.sub("/{id}", path)
+    return f"{method.upper()} {path}"
+
+
+class OperationStats:
+    """Counters and latency samples for one operation."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.statuses = {}
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latencies = array("d")
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.graphql_errors = 0
+        self.exceptions = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies)
+
+    def observe(self, latency: float):
+        self.latencies.append(latency)
+        self.latency_sum += latency
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.bucket_counts[i] += 1
+                return
+        self.bucket_counts[-1] += 1
+
+    def percentile(self, pct: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class APIMetrics:
+    """Process-wide registry of per-operation API metrics."""
+
+    def __init__(self):
+        self.operations = {}
+        self.started_at = datetime.now()
+        self._failed_requests = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _stats(self, operation: str, kind: str) -> OperationStats:
+        stats = self.operations.get(operation)
+        if stats is None:
+            stats = self.operations[operation] = OperationStats(kind)
+        return stats
+
+    def record(self, operation: str, kind: str, latency: float, status: Optional[int],
+               bytes_out: int = 0, bytes_in: int = 0, graphql_errors: int = 0,
+               fingerprint: Optional[str] = None):
+        """
+        Record one completed (or failed) request.
+
+        Args:
+            operation: GraphQL operation name or REST 'METHOD /path'
+            kind: "graphql" or "rest"
+            latency: Wall time of the request in seconds
+            status: HTTP status, or None if the request raised
+            bytes_out: Request body size
+            bytes_in: Response body size
+            graphql_errors: Number of entries in the response "errors" list
+            fingerprint: Hash of the request body; a repeat of a failed request counts as a retry
+        """
+        failed = status is None or status >= 400 or graphql_errors > 0
+        with self._lock:
+            stats = self._stats(operation, kind)
+            stats.observe(latency)
+            label = str(status) if status is not None else "exception"
+            stats.statuses[label] = stats.statuses.get(label, 0) + 1
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            stats.graphql_errors += graphql_errors
+            if status == 429:
+                stats.rate_limited += 1
+            if status is None:
+                stats.exceptions += 1
+            if fingerprint:
+                if self._failed_requests.pop(fingerprint, None):
+                    stats.retries += 1
+                if failed:
+                    self._failed_requests[fingerprint] = True
+                    if len(self._failed_requests) > MAX_TRACKED_FAILURES:
+                        self._failed_requests.popitem(last=False)
+
+    def record_retry(self, operation: str, kind: str = "graphql"):
+        """Explicitly count a retry (for callers that retry with a changed payload)."""
+        with self._lock:
+            self._stats(operation, kind).retries += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """JSON-serializable summary per operation."""
+        with self._lock:
+            operations = {}
+            for name, stats in sorted(self.operations.items()):
+                operations[name] = {
+                    "kind": stats.kind,
+                    "count": stats.count,
+                    "statuses": dict(stats.statuses),
+                    "latency_ms": {
+                        "mean": round(stats.latency_sum / stats.count * 1000, 3) if stats.count else 0.0,
+                        "p50": round(stats.percentile(50) * 1000, 3),
+                        "p95": round(stats.percentile(95) * 1000, 3),
+                        "p99": round(stats.percentile(99) * 1000, 3),
+                        "max": round(max(stats.latencies) * 1000, 3) if stats.count else 0.0,
+                    },
+                    "total_time_s": round(stats.latency_sum, 3),
+                    "bytes_out": stats.bytes_out,
+                    "bytes_in": stats.bytes_in,
+                    "retries": stats.retries,
+                    "rate_limited": stats.rate_limited,
+                    "graphql_errors": stats.graphql_errors,
+                    "exceptions": stats.exceptions,
+                }
+        return {
+            "started_at": self.started_at.isoformat(),
+            "finished_at": datetime.now().isoformat(),
+            "script": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "",
+            "total_requests": sum(op["count"] for op in operations.values()),
+            "total_time_s": round(sum(op["total_time_s"] for op in operations.values()), 3),
+            "operations": operations,
+        }
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in Prometheus text exposition format."""
+        lines = [
+            "# HELP xray_api_requests_total Xray/Jira API requests by operation and HTTP status.",
+            "# TYPE xray_api_requests_total counter",
+        ]
+        with self._lock:
+            items = sorted(self.operations.items())
+            for name, stats in items:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'xray_api_requests_total{{operation="{_escape(name)}",kind="{stats.kind}",'
+                                 f'status="{status}"}} {count}')
+
+            lines += [
+                "# HELP xray_api_request_duration_seconds Xray/Jira API request latency.",
+                "# TYPE xray_api_request_duration_seconds histogram",
+            ]
+            for name, stats in items:
+                labels = f'operation="{_escape(name)}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.bucket_counts):
+                    cumulative += count
+                    lines.append(f'xray_api_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'xray_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f'xray_api_request_duration_seconds_sum{{{labels}}} {stats.latency_sum:.6f}')
+                lines.append(f'xray_api_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+            counters = [
+                ("xray_api_request_bytes_total", "Request/response body bytes.", None),
+                ("xray_api_retries_total", "Requests repeated after a failure.", "retries"),
+                ("xray_api_rate_limited_total", "HTTP 429 responses.", "rate_limited"),
+                ("xray_api_graphql_errors_total", "GraphQL errors returned in response bodies.", "graphql_errors"),
+            ]
+            for metric, help_text, attribute in counters:
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                for name, stats in items:
+                    labels = f'operation="{_escape(name)}"'
+                    if attribute is None:
+                        lines.append(f'{metric}{{{labels},direction="out"}} {stats.bytes_out}')
+                        lines.append(f'{metric}{{{labels},direction="in"}} {stats.bytes_in}')
+                    else:
+                        lines.append(f'{metric}{{{labels}}} {getattr(stats, attribute)}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, output_dir: str):
+        """Write the Prometheus textfile and JSON summary (atomically) to output_dir."""
+        os.makedirs(output_dir, exist_ok=True)
+        outputs = [
+            (PROM_FILENAME, self.to_prometheus()),
+            (JSON_FILENAME, json.dumps(self.summary(), indent=2)),
+        ]
+        for filename, content in outputs:
+            path = os.path.join(output_dir, filename)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        logger.info(f"API metrics written to {output_dir}")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _describe_request(method: str, url: str, kwargs: Dict[str, Any]):
+    """Return (operation, kind, fingerprint) for an outgoing request."""
+    payload = kwargs.get("json")
+    if payload is None and kwargs.get("data") and url.endswith("/graphql"):
+        try:
+            payload = json.loads(kwargs["data"])
+        except (TypeError, ValueError):
+            payload = None
+
+    if isinstance(payload, dict) and "query" in payload:
+        _, operation = describe_operation(payload["query"])
+        kind = "graphql"
+    else:
+        operation = rest_operation(method, url)
+        kind = "rest"
+
+    body = json.dumps(payload, sort_keys=True, default=str) if payload is not None else str(kwargs.get("data") or "")
+    fingerprint = hashlib.sha1(f"{method} {url} {body}".encode("utf-8")).hexdigest()
+    return operation, kind, fingerprint
+
+
+def _count_graphql_errors(response, kind: str, streamed: bool) -> int:
+    if kind != "graphql" or streamed:
+        return 0
+    content = response.content or b""
+    # Cheap pre-check so successful pages are never decoded here
+    if b'"errors"' not in content:
+        return 0
+    try:
+        body = response.json()
+    except ValueError:
+        return 0
+    # Hand the decoded body to the caller's response.json() instead of decoding it again
+    decode = response.json
+    response.json = lambda **kwargs: decode(**kwargs) if kwargs else body
+    errors = body.get("errors") if isinstance(body, dict) else None
+    return len(errors) if errors else 0
+
+
+metrics = APIMetrics()
+_installed = False
+
+
+def install_requests_hook(registry: APIMetrics = metrics):
+    """Record every requests call (requests.post/get and Session.request) in `registry`."""
+    global _installed
+    if _installed:
+        return
+    import requests
+
+    original = requests.sessions.Session.request
+
+    def instrumented_request(session, method, url, *args, **kwargs):
+        operation, kind, fingerprint = _describe_request(method, url, kwargs)
+        started = time.perf_counter()
+        try:
+            response = original(session, method, url, *args, **kwargs)
+        except Exception:
+            registry.record(operation, kind, time.perf_counter() - started, None, fingerprint=fingerprint)
+            raise
+
+        latency = time.perf_counter() - started
+        streamed = bool(kwargs.get("stream"))
+        request_body = response.request.body if response.request is not None else None
+        bytes_out = len(request_body) if request_body else 0
+        # Don't consume streamed bodies; fall back to the declared length
+        bytes_in = int(response.headers.get("Content-Length", 0) or 0) if streamed else len(response.content or b"")
+        registry.record(operation, kind, latency, response.status_code, bytes_out, bytes_in,
+                        _count_graphql_errors(response, kind, streamed), fingerprint)
+        return response
+
+    requests.sessions.Session.request = instrumented_request
+    _installed = True
+
+
+def metrics_from_env() -> Optional[APIMetrics]:
+    """
+    Install the requests hook and an exit writer if XRAY_METRICS_DIR is set.
+
+    Safe to call from every client module; it only installs once.
+    """
+    output_dir = os.environ.get("XRAY_METRICS_DIR")
+    if not output_dir:
+        return None
+    if not _installed:
+        install_requests_hook(metrics)
+        atexit.register(metrics.write, output_dir)
+    return metrics
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: XRAY_METRICS_DIR=<dir> python api_metrics.py <script.py> [args...]")
+        sys.exit(1)
+
+    os.environ.setdefault("XRAY_METRICS_DIR", os.path.join(os.getcwd(), "metrics"))
+    metrics_from_env()
+    script = sys.argv[1]
+    sys.argv = sys.argv[1:]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    runpy.run_path(script, run_name="__main__")
@@ -11,6 +11,10 @@ import logging
 from datetime import datetime
 from pathlib import Path
 
+from api_metrics import metrics_from_env
+from cassette import cassette_from_env
+from json_stream import CHUNK_SIZE, StreamedPage
+
 # Configure logging
 logging.basicConfig(
     level=logging.DEBUG,
@@ -22,6 +26,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Per-operation API metrics, written at exit when XRAY_METRICS_DIR is set
+metrics_from_env()
+
 # Xray API Configuration
 XRAY_BASE_URL = "https://xray.cloud.getxray.app/api/v1"
 XRAY_GRAPHQL_URL = "https://xray.cloud.getxray.app/api/v2/graphql"
@@ -32,8 +39,11 @@ class XrayAPIClient:
     def __init__(self, client_id=None, client_secret=None):
         self.client_id = client_id or os.environ.get('XRAY_CLIENT_ID') or os.environ.get('XRAY_CLIENT')
         self.client_secret = client_secret or os.environ.get('XRAY_CLIENT_SECRET') or os.environ.get('XRAY_SECRET')
+        # Optional record/replay store (XRAY_CASSETTE / XRAY_CASSETTE_MODE)
+        self.cassette = cassette_from_env()
         
-        if not self.client_id or not self.client_secret:
+        # Strict replay never authenticates, so it can run without credentials
+        if (not self.client_id or not self.client_secret) and not (self.cassette and self.cassette.offline):
             raise ValueError("XRAY_CLIENT and XRAY_SECRET must be provided")
         
         self.token = None
@@ -69,13 +79,6 @@ class XrayAPIClient:
     
     def execute_graphql_query(self, query, variables=None):
         """Execute GraphQL query against Xray API"""
-        token = self.get_auth_token()
-        
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "query": query,
             "variables": variables or {}
@@ -84,17 +87,51 @@ class XrayAPIClient:
         # Debug logging
         logger.debug(f"GraphQL request payload: {json.dumps(payload, indent=2)}")
         
+        if self.cassette:
+            result = self.cassette.execute(query, variables, lambda: self._post_graphql(payload))
+        else:
+            result = self._post_graphql(payload)
+        
+        if "errors" in result:
+            logger.error(f"GraphQL errors: {result['errors']}")
+            raise Exception(f"GraphQL errors: {result['errors']}")
+        
+        return result.get("data")
+    
+    def iter_graphql_results(self, query, operation, variables=None):
+        """Yield data.<operation>.results[*] of a page query as the response body arrives"""
+        if self.cassette:
+            # Recorded responses are stored whole
+            yield from ((self.execute_graphql_query(query, variables) or {}).get(operation) or {}).get("results") or []
+            return
+
+        headers = {
+            "Authorization": f"Bearer {self.get_auth_token()}",
+            "Content-Type": "application/json"
+        }
+        payload = {"query": query, "variables": variables or {}}
+        with requests.post(XRAY_GRAPHQL_URL, headers=headers, json=payload, stream=True) as response:
+            response.raise_for_status()
+            page = StreamedPage(response.iter_content(CHUNK_SIZE), operation)
+            if page.errors:
+                logger.error(f"GraphQL errors: {page.errors}")
+            page.raise_for_errors()
+            yield from page.results()
+            page.raise_for_errors()
+
+    def _post_graphql(self, payload):
+        """Send a GraphQL payload to Xray and return the decoded response body"""
+        token = self.get_auth_token()
+        
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        
         try:
             response = requests.post(XRAY_GRAPHQL_URL, headers=headers, json=payload)
             response.raise_for_status()
-            
-            result = response.json()
-            
-            if "errors" in result:
-                logger.error(f"GraphQL errors: {result['errors']}")
-                raise Exception(f"GraphQL errors: {result['errors']}")
-            
-            return result.get("data")
+            return response.json()
             
         except requests.exceptions.RequestException as e:
             logger.error(f"GraphQL request failed: {e}")
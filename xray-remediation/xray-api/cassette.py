@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Record/replay cassette for Xray GraphQL requests.
+
+Stores GraphQL responses in a single SQLite file keyed by operation name and a
+hash of the normalized query and variables, so re-running analysis scripts can
+be served locally instead of hitting Xray again.
+
+Enable it for any script using XrayAPIClient (auth_utils.py) or the test
+manager's XrayGraphQLClient with environment variables:
+
+    XRAY_CASSETTE=logs/xray_cassette.sqlite   # store location
+    XRAY_CASSETTE_MODE=replay                 # record | replay | strict
+
+Modes:
+    record  - always call Xray and (re)store every query response
+    replay  - serve stored responses, call Xray and store on a miss
+    strict  - serve stored responses only; a miss raises CassetteMissError
+              and no network request (including authentication) is made
+
+Mutations are never stored or replayed; they are passed through in record and
+replay mode and refused in strict mode.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("record", "replay", "strict")
+OPERATION_PATTERN = re.compile(r'^\s*(query|mutation)\b\s*(\w*)', re.IGNORECASE)
+ROOT_FIELD_PATTERN = re.compile(r'\{\s*(\w+)')
+
+
+class CassetteMissError(Exception):
+    """Raised in strict mode when a request has no stored response."""
+
+
+def describe_operation(query: str):
+    """
+    Return (operation type, operation name) for a GraphQL document.
+
+    Anonymous operations are named after their first root field.
+    """
+    match = OPERATION_PATTERN.match(query or "")
+    operation_type = match.group(1).lower() if match else "query"
+    name = match.group(2) if match and match.group(2) else None
+    if not name:
+        root = ROOT_FIELD_PATTERN.search(query or "")
+        name = root.group(1) if root else "anonymous"
+    return operation_type, name
+
+
+def request_key(query: str, variables: Optional[Dict[str, Any]]) -> str:
+    """Stable cassette key: operation name plus a hash of normalized query and variables."""
+    _, name = describe_operation(query)
+    normalized_query = " ".join((query or "").split())
+    canonical = json.dumps({"query": normalized_query, "variables": variables or {}},
+                           sort_keys=True, separators=(",", ":"))
+    return f"{name}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]}"
+
+
+class HTTPCassette:
+    """SQLite-backed store of GraphQL request/response pairs."""
+
+    def __init__(self, path: str, mode: str = "replay"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}', expected one of {', '.join(MODES)}")
+
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " operation TEXT NOT NULL,"
+            " recorded_at TEXT NOT NULL,"
+            " body BLOB NOT NULL)"
+        )
+        self._db.commit()
+
+    @property
+    def offline(self) -> bool:
+        """True when no network access is allowed."""
+        return self.mode == "strict"
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def store(self, key: str, operation: str, response: Dict[str, Any]):
+        body = zlib.compress(json.dumps(response, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, operation, recorded_at, body) VALUES (?, ?, ?, ?)",
+                (key, operation, datetime.now().isoformat(), body)
+            )
+            self._db.commit()
+
+    def execute(self, query: str, variables: Optional[Dict[str, Any]],
+                send: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return the response for a GraphQL request, from the store or via `send`.
+
+        Args:
+            query: GraphQL document
+            variables: GraphQL variables
+            send: Performs the real request and returns the decoded response body
+                  (including any "errors"); only called when the network is used
+
+        Returns:
+            Decoded GraphQL response body
+
+        Raises:
+            CassetteMissError: In strict mode, for mutations or unrecorded queries
+        """
+        operation_type, name = describe_operation(query)
+
+        if operation_type == "mutation":
+            if self.offline:
+                raise CassetteMissError(f"Refusing to send mutation {name} in strict replay mode")
+            return send()
+
+        key = request_key(query, variables)
+        if self.mode != "record":
+            cached = self.lookup(key)
+            if cached is not None:
+                self.hits += 1
+                logger.debug(f"Cassette hit for {key}")
+                return cached
+            if self.offline:
+                self.misses += 1
+                raise CassetteMissError(f"No recorded response for {name} ({key}) in {self.path}")
+
+        self.misses += 1
+        response = send()
+        # Errors may be transient (timeouts, rate limits); only keep clean responses
+        if "errors" not in response:
+            self.store(key, name, response)
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        """Number of stored responses per operation."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT operation, COUNT(*) FROM responses GROUP BY operation ORDER BY operation"
+            ).fetchall()
+        return dict(rows)
+
+    def clear(self, operation: Optional[str] = None):
+        """Remove stored responses, optionally only for one operation."""
+        with self._lock:
+            if operation:
+                self._db.execute("DELETE FROM responses WHERE operation = ?", (operation,))
+            else:
+                self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._db.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cassettes = {}
+
+
+def cassette_from_env() -> Optional[HTTPCassette]:
+    """
+    Return the cassette configured by XRAY_CASSETTE / XRAY_CASSETTE_MODE, if any.
+
+    Clients in the same process share one cassette per store path.
+    """
+    path = os.environ.get("XRAY_CASSETTE")
+    if not path:
+        return None
+    mode = os.environ.get("XRAY_CASSETTE_MODE", "replay").lower()
+    key = (os.path.abspath(path), mode)
+    if key not in _cassettes:
+        _cassettes[key] = HTTPCassette(path, mode)
+        logger.info(f"Using Xray cassette {path} in {mode} mode")
+    return _cassettes[key]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("stats", "clear"):
+        print("Usage: python cassette.py stats <store.sqlite>")
+        print("       python cassette.py clear <store.sqlite> [operation]")
+        sys.exit(1)
+
+    cassette = HTTPCassette(sys.argv[2], "replay")
+    if sys.argv[1] == "stats":
+        counts = cassette.stats()
+        for operation, count in counts.items():
+            print(f"{operation}: {count}")
+        print(f"Total: {sum(counts.values())} responses ({os.path.getsize(sys.argv[2])} bytes)")
+    else:
+        cassette.clear(sys.argv[3] if len(sys.argv) > 3 else None)
+        print("✓ Cassette cleared")
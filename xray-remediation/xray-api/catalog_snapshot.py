@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped binary snapshots of test catalogs.
+
+Loading tests_with_steps.json or mlbmob_2799_all_tests.json means parsing the
+whole document before the first lookup. A snapshot stores the same records in a
+binary file that is opened with mmap: opening costs one header read, a lookup by
+issue key or id is a binary search over a sorted index, and only the records
+actually read are decoded.
+
+Layout (little-endian):
+
+    header      magic "XRAYSNAP", version, record count, section offsets
+    records     per record: data offset, data length, key string, id string
+    key index   record numbers sorted by issue key
+    id index    record numbers sorted by issue id
+    strings     string offsets, then the UTF-8 string blob (keys and ids)
+    step texts  offsets, then the UTF-8 blob of each distinct step action/data/result
+    data        one compact JSON document per record, step text replaced by text ids
+    metadata    JSON object with the source document's top-level scalars
+
+Usage:
+    python catalog_snapshot.py build tests_with_steps.json tests_with_steps.snap
+    python catalog_snapshot.py build backup.json backup.snap --path data.getExpandedTests.results
+    python catalog_snapshot.py get tests_with_steps.snap MLBMOB-1234
+    python catalog_snapshot.py info tests_with_steps.snap
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from step_texts import StepTextTable, dedupe_record, expand_document, expand_steps, record_steps
+
+MAGIC = b"XRAYSNAP"
+VERSION = 2  # 2: content-addressed step text table
+HEADER = struct.Struct("<8sHHI9Q")  # magic, version, reserved, count, 9 section offsets/lengths
+RECORD = struct.Struct("<QIII")     # data offset, data length, key string, id string
+INDEX = struct.Struct("<I")
+OFFSET = struct.Struct("<Q")
+NO_STRING = 0xFFFFFFFF
+
+# Lists tried, in order, when no --path is given
+RECORD_LISTS = ("tests", "all_tests", "results", "data.getExpandedTests.results", "data.getTests.results")
+
+
+def record_key(record: Dict[str, Any]) -> Optional[str]:
+    """Jira key of a test record in any of the repo's JSON layouts"""
+    jira = record.get("jira")
+    if isinstance(jira, dict) and jira.get("key"):
+        return jira["key"]
+    return record.get("key")
+
+
+def record_id(record: Dict[str, Any]) -> Optional[str]:
+    """Issue id of a test record in any of the repo's JSON layouts"""
+    value = record.get("issueId") or record.get("issue_id") or record.get("id")
+    return str(value) if value is not None else None
+
+
+def find_records(document: Any, path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Locate the record list in a JSON document.
+
+    Args:
+        document: Parsed JSON
+        path: Dotted path to the list; otherwise the document itself (if a list) or RECORD_LISTS
+
+    Raises:
+        ValueError: If no record list is found
+    """
+    if isinstance(document, list) and path is None:
+        return document
+    for candidate in ([path] if path else RECORD_LISTS):
+        value = document
+        for part in candidate.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if isinstance(value, list):
+            return value
+    raise ValueError(f"No record list found (tried {path or ', '.join(RECORD_LISTS)})")
+
+
+def write_snapshot(records: Iterable[Dict[str, Any]], path: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Write records to a snapshot file (atomically replacing any existing one).
+
+    Returns:
+        Number of records written
+    """
+    data = bytearray()
+    entries = []
+    strings: List[bytes] = []
+    texts = StepTextTable()
+    for record in records:
+        encoded = json.dumps(dedupe_record(record, texts), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        key, issue_id = record_key(record), record_id(record)
+        key_string = id_string = NO_STRING
+        if key is not None:
+            key_string = len(strings)
+            strings.append(key.encode("utf-8"))
+        if issue_id is not None:
+            id_string = len(strings)
+            strings.append(issue_id.encode("utf-8"))
+        entries.append((len(data), len(encoded), key_string, id_string))
+        data += encoded
+
+    def sorted_by(field: int) -> List[int]:
+        present = [i for i, entry in enumerate(entries) if entry[field] != NO_STRING]
+        return sorted(present, key=lambda i: strings[entries[i][field]])
+
+    key_index, id_index = sorted_by(2), sorted_by(3)
+    metadata_bytes = json.dumps(metadata or {}, ensure_ascii=False).encode("utf-8")
+
+    records_offset = HEADER.size
+    key_index_offset = records_offset + RECORD.size * len(entries)
+    id_index_offset = key_index_offset + INDEX.size * len(key_index)
+    strings_offset = id_index_offset + INDEX.size * len(id_index)
+    blob_offset = strings_offset + OFFSET.size * (len(strings) + 1)
+    texts_offset = blob_offset + sum(len(s) for s in strings)
+    data_offset = texts_offset + OFFSET.size * (len(texts) + 1) + texts.stored_bytes
+    metadata_offset = data_offset + len(data)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(entries), key_index_offset, id_index_offset,
+                            len(key_index), len(id_index), strings_offset, texts_offset, len(texts),
+                            data_offset, metadata_offset))
+        f.write(b"".join(RECORD.pack(*entry) for entry in entries))
+        f.write(b"".join(INDEX.pack(i) for i in key_index))
+        f.write(b"".join(INDEX.pack(i) for i in id_index))
+        position = 0
+        offsets = [OFFSET.pack(0)]
+        for string in strings:
+            position += len(string)
+            offsets.append(OFFSET.pack(position))
+        f.write(b"".join(offsets))
+        f.write(b"".join(strings))
+        position = 0
+        offsets = [OFFSET.pack(0)]
+        for text_id in range(len(texts)):
+            text = texts.raw(text_id)
+            position += len(text)
+            offsets.append(OFFSET.pack(position))
+        f.write(b"".join(offsets))
+        f.write(b"".join(texts.raw(text_id) for text_id in range(len(texts))))
+        f.write(data)
+        f.write(metadata_bytes)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return len(entries)
+
+
+def build_snapshot(json_path: str, snapshot_path: str, path: Optional[str] = None) -> int:
+    """Convert a JSON document (fetch output, backup, analysis export) into a snapshot."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        document = expand_document(json.load(f))
+    records = find_records(document, path)
+    metadata = {key: value for key, value in document.items()
+                if not isinstance(value, (list, dict))} if isinstance(document, dict) else {}
+    metadata["source"] = os.path.basename(json_path)
+    return write_snapshot(records, snapshot_path, metadata)
+
+
+class CatalogSnapshot:
+    """Read-only, memory-mapped view of a snapshot; records are decoded on access"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.count, self._key_index, self._id_index, self._key_count, self._id_count,
+         self._strings, self._texts, self.text_count, self._data, self._metadata) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a catalog snapshot")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"{path} has snapshot version {version}, expected {VERSION}")
+        self._blob = self._strings + OFFSET.size * (self._string_count() + 1)
+        self._text_blob = self._texts + OFFSET.size * (self.text_count + 1)
+
+    def _string_count(self) -> int:
+        # Every record contributes at most a key and an id string
+        return self._key_count + self._id_count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "CatalogSnapshot":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return json.loads(self._map[self._metadata:].decode("utf-8"))
+
+    def _entry(self, number: int) -> Tuple[int, int, int, int]:
+        return RECORD.unpack_from(self._map, HEADER.size + number * RECORD.size)
+
+    def _string(self, string: int) -> bytes:
+        start, = OFFSET.unpack_from(self._map, self._strings + string * OFFSET.size)
+        end, = OFFSET.unpack_from(self._map, self._strings + (string + 1) * OFFSET.size)
+        return self._map[self._blob + start:self._blob + end]
+
+    def step_text(self, text_id: int) -> str:
+        """One entry of the step text table"""
+        start, end = struct.unpack_from("<2Q", self._map, self._texts + text_id * OFFSET.size)
+        return self._map[self._text_blob + start:self._text_blob + end].decode("utf-8")
+
+    def raw(self, number: int) -> bytes:
+        """The JSON bytes of one record (step text as ids into the step text table)"""
+        offset, length, _, _ = self._entry(number)
+        return self._map[self._data + offset:self._data + offset + length]
+
+    def record(self, number: int) -> Dict[str, Any]:
+        """Decode one record by position, with its step text"""
+        record = json.loads(self.raw(number).decode("utf-8"))
+        steps = record_steps(record)
+        if steps:
+            expand_steps(steps, _TextView(self))
+        return record
+
+    def _search(self, index_offset: int, count: int, field: int, value: str) -> Optional[int]:
+        target = value.encode("utf-8")
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            number, = INDEX.unpack_from(self._map, index_offset + middle * INDEX.size)
+            if self._string(self._entry(number)[field]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < count:
+            number, = INDEX.unpack_from(self._map, index_offset + low * INDEX.size)
+            if self._string(self._entry(number)[field]) == target:
+                return number
+        return None
+
+    def find(self, key_or_id: str) -> Optional[int]:
+        """Position of the record with this issue key or id"""
+        number = self._search(self._key_index, self._key_count, 2, key_or_id)
+        if number is None:
+            number = self._search(self._id_index, self._id_count, 3, str(key_or_id))
+        return number
+
+    def get(self, key_or_id: str) -> Optional[Dict[str, Any]]:
+        """Decode the record with this issue key or id"""
+        number = self.find(key_or_id)
+        return None if number is None else self.record(number)
+
+    def __contains__(self, key_or_id: str) -> bool:
+        return self.find(key_or_id) is not None
+
+    def keys(self) -> Iterator[str]:
+        """Issue keys in sorted order, without decoding any record"""
+        for position in range(self._key_count):
+            number, = INDEX.unpack_from(self._map, self._key_index + position * INDEX.size)
+            yield self._string(self._entry(number)[2]).decode("utf-8")
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for number in range(self.count):
+            yield self.record(number)
+
+
+class _TextView:
+    """Index access to a snapshot's step text table (what expand_steps expects)"""
+    __slots__ = ("_snapshot",)
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self._snapshot = snapshot
+
+    def __getitem__(self, text_id: int) -> str:
+        return self._snapshot.step_text(text_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query memory-mapped catalog snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Convert a JSON export into a snapshot")
+    build.add_argument("json_file")
+    build.add_argument("snapshot_file")
+    build.add_argument("--path", help="Dotted path to the record list (e.g. data.getExpandedTests.results)")
+    get = commands.add_parser("get", help="Print records by issue key or id")
+    get.add_argument("snapshot_file")
+    get.add_argument("keys", nargs="+")
+    info = commands.add_parser("info", help="Print snapshot metadata")
+    info.add_argument("snapshot_file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_snapshot(args.json_file, args.snapshot_file, args.path)
+        print(f"✓ Wrote {count} records to {args.snapshot_file}")
+        return
+
+    with CatalogSnapshot(args.snapshot_file) as snapshot:
+        if args.command == "info":
+            print(f"Records: {len(snapshot)}")
+            print(f"Distinct step texts: {snapshot.text_count}")
+            for key, value in snapshot.metadata.items():
+                print(f"{key}: {value}")
+            return
+        missing = 0
+        for key in args.keys:
+            record = snapshot.get(key)
+            if record is None:
+                print(f"✗ {key} not found", file=sys.stderr)
+                missing += 1
+            else:
+                print(json.dumps(record, indent=2, ensure_ascii=False))
+        if missing:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
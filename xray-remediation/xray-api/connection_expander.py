@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Automatic sub-pagination for nested GraphQL connections.
+
+Nested connections such as TestSet.tests, Precondition.tests or
+ExpandedTest.preconditions return at most `limit` items per parent, so a parent
+with more members comes back truncated (`total > len(results)`). The expander
+finds those parents, fetches the missing inner pages concurrently - several
+parents and pages per request, one alias each - and merges them back in place:
+
+    expander = ConnectionExpander(client.execute_graphql_query)
+    expander.expand(data['getTestSets']['results'], 'TestSet', 'tests',
+                    'issueId jira(fields: ["key", "summary"])')
+
+Follow-up requests are paced by the shared rate limiter and sized with the
+query complexity estimator.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from query_complexity import DEFAULT_SERVER_LIMIT, MAX_PAGE_SIZE, estimate_complexity
+from rate_limiter import RateLimiter, shared_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Root query returning a single parent by issue id, per parent type
+ROOT_QUERIES = {
+    "Test": "getTest",
+    "ExpandedTest": "getExpandedTest",
+    "TestSet": "getTestSet",
+    "TestExecution": "getTestExecution",
+    "TestPlan": "getTestPlan",
+    "Precondition": "getPrecondition",
+}
+
+
+class ConnectionExpander:
+    """Completes truncated nested connections with batched, concurrent follow-up queries."""
+
+    def __init__(self, execute: Callable[[str, Dict[str, Any]], Dict[str, Any]], max_workers: int = 4,
+                 page_size: int = MAX_PAGE_SIZE, max_aliases: int = 50,
+                 server_limit: int = DEFAULT_SERVER_LIMIT, rate_limiter: Optional[RateLimiter] = None):
+        """
+        Args:
+            execute: Runs a GraphQL query with variables and returns its `data`
+                     (XrayAPIClient.execute_graphql_query, XrayGraphQLClient.execute_query);
+                     it must not pace requests itself, the expander acquires rate_limiter
+                     once per request
+            max_workers: Concurrent follow-up requests
+            page_size: Inner page size for follow-up pages
+            max_aliases: Upper bound on pages fetched by one request
+            server_limit: Complexity limit each request must stay under
+            rate_limiter: Request pacing (defaults to the process-wide limiter)
+        """
+        self.execute = execute
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.max_aliases = max_aliases
+        self.server_limit = server_limit
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+
+    def build_query(self, parent_type: str, connection: str, selection: str,
+                    pages: List[Tuple[str, int]]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build one aliased query fetching several (parent issueId, start) pages.
+
+        Returns:
+            Tuple of (query, variables); page i is returned under alias `p<i>`
+        """
+        root = ROOT_QUERIES[parent_type]
+        definitions = ", ".join(f"$id{i}: String" for i in range(len(pages)))
+        fields = "\n".join(
+            f"    p{i}: {root}(issueId: $id{i}) {{ {connection}(limit: {self.page_size}, start: {start}) "
+            f"{{ total results {{ {selection} }} }} }}"
+            for i, (_, start) in enumerate(pages)
+        )
+        query = f"query Expand{parent_type}{connection[:1].upper()}{connection[1:]}({definitions}) {{\n{fields}\n}}"
+        variables = {f"id{i}": issue_id for i, (issue_id, _) in enumerate(pages)}
+        return query, variables
+
+    def _aliases_per_request(self, parent_type: str, connection: str, selection: str) -> int:
+        query, variables = self.build_query(parent_type, connection, selection, [("0", 0)])
+        cost = max(1, estimate_complexity(query, variables))
+        return max(1, min(self.max_aliases, self.server_limit // cost))
+
+    def expand(self, parents: List[Dict[str, Any]], parent_type: str, connection: str, selection: str,
+               id_field: str = "issueId") -> int:
+        """
+        Fetch the missing pages of `connection` for every truncated parent and merge them in place.
+
+        Args:
+            parents: Parent objects as returned by Xray, each with `connection` selected
+                     as `{ total results { ... } }` and an `issueId`
+            parent_type: Schema type of the parents (a key of ROOT_QUERIES)
+            connection: Name of the nested connection field
+            selection: Fields to select on each inner result (should match the original query)
+            id_field: Inner result field used to drop duplicates across pages
+
+        Returns:
+            Number of inner items added
+        """
+        if parent_type not in ROOT_QUERIES:
+            raise ValueError(f"No single-item query known for {parent_type}")
+
+        by_id = {}
+        pages = []
+        for parent in parents:
+            nested = (parent or {}).get(connection)
+            issue_id = (parent or {}).get("issueId")
+            if not nested or not issue_id:
+                continue
+            have = len(nested.get("results") or [])
+            if (nested.get("total") or 0) <= have:
+                continue
+            by_id[issue_id] = parent
+            pages.extend((issue_id, start) for start in range(have, nested["total"], self.page_size))
+
+        if not pages:
+            return 0
+
+        per_request = self._aliases_per_request(parent_type, connection, selection)
+        batches = [pages[i:i + per_request] for i in range(0, len(pages), per_request)]
+        logger.info(f"Expanding {connection} for {len(by_id)} {parent_type} parents: "
+                    f"{len(pages)} pages in {len(batches)} requests")
+
+        def fetch(batch):
+            query, variables = self.build_query(parent_type, connection, selection, batch)
+            self.rate_limiter.acquire()
+            data = self.execute(query, variables) or {}
+            return [(issue_id, start, ((data.get(f"p{i}") or {}).get(connection) or {}).get("results") or [])
+                    for i, (issue_id, start) in enumerate(batch)]
+
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for results in executor.map(fetch, batches):
+                for issue_id, start, items in results:
+                    fetched.setdefault(issue_id, []).append((start, items))
+
+        added = 0
+        for issue_id, parent_pages in fetched.items():
+            nested = by_id[issue_id][connection]
+            merged = list(nested.get("results") or [])
+            seen = {item.get(id_field) for item in merged if isinstance(item, dict) and item.get(id_field)}
+            for _, items in sorted(parent_pages, key=lambda page: page[0]):
+                for item in items:
+                    key = item.get(id_field) if isinstance(item, dict) else None
+                    if key is not None:
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    merged.append(item)
+                    added += 1
+            nested["results"] = merged
+        return added
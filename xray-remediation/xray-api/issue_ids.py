@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Bulk Jira key <-> Xray issue id resolution with a persistent cache.
+
+Xray's GraphQL API addresses issues by numeric issue id, while people and
+reports use Jira keys. Looking ids up one `key = X` query at a time costs a
+request per issue on every run. IssueIdResolver resolves many keys at once with
+`key in (...)` queries of up to 100 keys, run concurrently, and stores the
+pairs in logs/issue_ids.sqlite. A key and its issue id never change, so cached
+pairs are reused by every later run and script without another request:
+
+    resolver = IssueIdResolver(client.execute_graphql_query)
+    ids = resolver.resolve(["FRAMED-1355", "FRAMED-1356"])             # key -> issue id
+    keys = resolver.keys_for(["1158139"], issue_type="Precondition")   # issue id -> key
+    resolver.remember(data['getTests']['results'])                     # pairs seen elsewhere
+
+Usage:
+    python issue_ids.py FRAMED-1355 FRAMED-1356 [--type Precondition]
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from jql_planner import in_clause, skip_unknown_values, split_values
+from rate_limiter import RateLimiter, shared_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent / 'logs' / 'issue_ids.sqlite'
+
+# Keys (or ids) per `in (...)` query; also the page size, so one page holds every match
+CHUNK_SIZE = 100
+
+# Plural root query per issue type
+ISSUE_QUERIES = {
+    "Test": "getTests",
+    "Precondition": "getPreconditions",
+    "TestSet": "getTestSets",
+    "TestExecution": "getTestExecutions",
+    "TestPlan": "getTestPlans",
+}
+
+RESOLVE_QUERY = """
+query ResolveIssueIds($jql: String!, $limit: Int!) {
+    %s(jql: $jql, limit: $limit) {
+        results {
+            issueId
+            jira(fields: ["key"])
+        }
+    }
+}
+"""
+
+
+class IssueIdCache:
+    """Key <-> issue id pairs in a SQLite file, shared by all scripts."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS issue_ids ("
+            " key TEXT PRIMARY KEY,"
+            " issue_id TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS issue_ids_id ON issue_ids (issue_id)")
+
+    def _select(self, column: str, other: str, values: List[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            # SQLite allows at most 999 parameters per statement
+            for start in range(0, len(values), 900):
+                chunk = values[start:start + 900]
+                rows = self._db.execute(
+                    f"SELECT {column}, {other} FROM issue_ids WHERE {column} IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+                found.update(rows.fetchall())
+        return found
+
+    def ids(self, keys: List[str]) -> Dict[str, str]:
+        """Cached issue ids of the given keys"""
+        return self._select("key", "issue_id", keys)
+
+    def keys(self, issue_ids: List[str]) -> Dict[str, str]:
+        """Cached keys of the given issue ids"""
+        return self._select("issue_id", "key", issue_ids)
+
+    def put(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """Store (key, issue id) pairs; returns how many were given"""
+        pairs = [(str(key).upper(), str(issue_id)) for key, issue_id in pairs]
+        if pairs:
+            with self._lock:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    self._db.executemany("INSERT OR REPLACE INTO issue_ids (key, issue_id) VALUES (?, ?)", pairs)
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    raise
+                self._db.execute("COMMIT")
+        return len(pairs)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM issue_ids").fetchone()[0]
+
+
+class IssueIdResolver:
+    """Resolves many keys or issue ids at once, going to Xray only for pairs not cached yet."""
+
+    def __init__(self, execute: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+                 cache: Optional[IssueIdCache] = None, max_workers: int = 4,
+                 chunk_size: int = CHUNK_SIZE, rate_limiter: Optional[RateLimiter] = None):
+        """
+        Args:
+            execute: Runs a GraphQL query with variables and returns its `data`
+                     (XrayAPIClient.execute_graphql_query, XrayGraphQLClient.execute_query)
+            cache: Pair store (defaults to logs/issue_ids.sqlite)
+            max_workers: Concurrent lookup queries
+            chunk_size: Keys per query (at most 100, Xray's page limit)
+            rate_limiter: Request pacing (defaults to the process-wide limiter)
+        """
+        self.execute = execute
+        self.cache = cache if cache is not None else IssueIdCache()
+        self.max_workers = max_workers
+        self.chunk_size = min(chunk_size, CHUNK_SIZE)
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+
+    def remember(self, items: Any) -> int:
+        """
+        Cache pairs obtained elsewhere.
+
+        Args:
+            items: A {key: issue id} dict, or Xray results with `issueId` and `jira.key`
+
+        Returns:
+            Number of pairs stored
+        """
+        if isinstance(items, dict):
+            return self.cache.put(items.items())
+        pairs = []
+        for item in items or []:
+            key = (item.get("jira") or {}).get("key") or item.get("key")
+            if key and item.get("issueId"):
+                pairs.append((key, item["issueId"]))
+        return self.cache.put(pairs)
+
+    def _lookup(self, field: str, values: List[str], issue_type: str) -> int:
+        """
+        Fetch and cache the pairs for values not in the cache; returns the number of requests.
+
+        A chunk Jira rejects because of values that do not exist is retried
+        without them (or split in halves when the error does not name them),
+        so the other values in it still resolve.
+
+        Raises:
+            Exception: A lookup failed for any other reason
+        """
+        if issue_type not in ISSUE_QUERIES:
+            raise ValueError(f"Unknown issue type {issue_type}, expected one of {', '.join(ISSUE_QUERIES)}")
+        query = RESOLVE_QUERY % ISSUE_QUERIES[issue_type]
+        chunks = split_values(values, self.chunk_size)
+
+        def fetch(chunk: List[str]) -> List[Dict[str, Any]]:
+            self.rate_limiter.acquire()
+            data = self.execute(query, {"jql": in_clause(field, chunk), "limit": len(chunk)}) or {}
+            return (data.get(ISSUE_QUERIES[issue_type]) or {}).get("results") or []
+
+        def fetch_known(chunk: List[str]) -> Tuple[List[Dict[str, Any]], int]:
+            results, requests, unknown = skip_unknown_values(fetch, chunk)
+            if unknown:
+                logger.info(f"{issue_type} {field}s not found: {', '.join(unknown)}")
+            return results, requests
+
+        requests = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for results, chunk_requests in executor.map(fetch_known, chunks):
+                self.remember(results)
+                requests += chunk_requests
+        return requests
+
+    def resolve(self, keys: Iterable[str], issue_type: str = "Test") -> Dict[str, str]:
+        """
+        Issue ids of Jira keys.
+
+        Args:
+            keys: Jira keys (case-insensitive)
+            issue_type: Type of the issues not cached yet (a key of ISSUE_QUERIES)
+
+        Returns:
+            Key (as given) -> issue id; keys that do not exist are left out
+        """
+        keys = list(dict.fromkeys(keys))
+        wanted = list(dict.fromkeys(key.strip().upper() for key in keys))
+        found = self.cache.ids(wanted)
+        missing = [key for key in wanted if key not in found]
+        if missing:
+            requests = self._lookup("key", missing, issue_type)
+            found.update(self.cache.ids(missing))
+            logger.info(f"Resolved {len(missing)} uncached {issue_type} keys in {requests} requests")
+            unknown = [key for key in missing if key not in found]
+            if unknown:
+                logger.warning(f"{len(unknown)} {issue_type} keys not found: {', '.join(unknown[:20])}")
+        return {key: found[key.strip().upper()] for key in keys if key.strip().upper() in found}
+
+    def keys_for(self, issue_ids: Iterable[str], issue_type: str = "Test") -> Dict[str, str]:
+        """
+        Jira keys of issue ids.
+
+        Returns:
+            Issue id -> key; ids that do not exist are left out
+        """
+        wanted = list(dict.fromkeys(str(issue_id) for issue_id in issue_ids))
+        found = self.cache.keys(wanted)
+        missing = [issue_id for issue_id in wanted if issue_id not in found]
+        if missing:
+            self._lookup("id", missing, issue_type)
+            found.update(self.cache.keys(missing))
+        return {issue_id: found[issue_id] for issue_id in wanted if issue_id in found}
+
+
+def main():
+    from auth_utils import XrayAPIClient
+
+    parser = argparse.ArgumentParser(description="Resolve Jira keys to Xray issue ids (cached)")
+    parser.add_argument("keys", nargs="+", help="Jira keys, or issue ids with --reverse")
+    parser.add_argument("--type", default="Test", choices=sorted(ISSUE_QUERIES), help="Issue type")
+    parser.add_argument("--reverse", action="store_true", help="Resolve issue ids to keys")
+    args = parser.parse_args()
+
+    resolver = IssueIdResolver(XrayAPIClient().execute_graphql_query)
+    resolved = (resolver.keys_for(args.keys, args.type) if args.reverse
+                else resolver.resolve(args.keys, args.type))
+    for value in args.keys:
+        print(f"{value}\t{resolved.get(value, 'not found')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Jira REST client for the Jira-side remediation scripts.
+
+One pooled session per client, credentials from the environment (JIRA_BASE_URL,
+JIRA_EMAIL, JIRA_API_TOKEN or ATLASSIAN_TOKEN), every request paced by the
+process-wide Jira rate limiter and retried on 429/503 after Retry-After:
+
+    jira = JiraClient()
+    for issue in jira.search('project = FRAMED AND labels = functional', ["labels", "priority"]):
+        ...
+    results = jira.bulk(lambda key: jira.update_issue(key, {"labels": []}), keys)
+
+search() always sends an explicit `fields=` list, so Jira returns only what
+the caller reads. On Jira Cloud it pages /rest/api/3/search/jql with
+nextPageToken and fetches the next page while the caller works through the
+current one. On Jira Server/Data Center it pages /rest/api/2/search with
+startAt, fetching every page after the first concurrently.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+from rate_limiter import RateLimiter, jira_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Largest page Jira returns for a search
+MAX_PAGE_SIZE = 100
+
+# Attempts per request when Jira answers 429/503
+MAX_ATTEMPTS = 4
+
+
+class JiraError(Exception):
+    """A Jira REST request that returned an error status"""
+
+    def __init__(self, status_code: int, body: str, method: str = "", path: str = ""):
+        super().__init__(f"Error {status_code} from {method} {path}: {body[:500]}")
+        self.status_code = status_code
+        self.body = body
+
+
+class JiraClient:
+    """Pooled, rate-limited access to the Jira REST API."""
+
+    def __init__(self, base_url: Optional[str] = None, email: Optional[str] = None,
+                 api_token: Optional[str] = None, max_workers: int = 4,
+                 search_api: Optional[str] = None, rate_limiter: Optional[RateLimiter] = None):
+        """
+        Args:
+            base_url: Jira site (defaults to JIRA_BASE_URL)
+            email: Account email (defaults to JIRA_EMAIL)
+            api_token: API token (defaults to JIRA_API_TOKEN, then ATLASSIAN_TOKEN)
+            max_workers: Concurrent requests for bulk() and page prefetching
+            search_api: "token" (/rest/api/3/search/jql) or "offset" (/rest/api/2/search);
+                        defaults to "token" on *.atlassian.net and "offset" elsewhere
+            rate_limiter: Request pacing (defaults to the process-wide Jira limiter)
+        """
+        self.base_url = (base_url or os.environ.get('JIRA_BASE_URL') or '').rstrip('/')
+        email = email or os.environ.get('JIRA_EMAIL')
+        api_token = api_token or os.environ.get('JIRA_API_TOKEN') or os.environ.get('ATLASSIAN_TOKEN')
+        if not self.base_url or not email or not api_token:
+            raise ValueError("JIRA_BASE_URL, JIRA_EMAIL and JIRA_API_TOKEN (or ATLASSIAN_TOKEN) must be set")
+
+        self.max_workers = max_workers
+        self.search_api = search_api or ("token" if "atlassian.net" in self.base_url else "offset")
+        self.rate_limiter = rate_limiter or jira_rate_limiter()
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(email, api_token)
+        self.session.headers.update({"Accept": "application/json", "Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(max_workers, 10))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._priorities: Optional[Dict[str, str]] = None
+
+    def request(self, method: str, path: str, **kwargs) -> Any:
+        """
+        Send one request and return the decoded body (None for empty responses).
+
+        Raises:
+            JiraError: The response status is 400 or above (after retries for 429/503)
+        """
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+        kwargs.setdefault("timeout", 30)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.rate_limiter.acquire()
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code in (429, 503) and attempt < MAX_ATTEMPTS:
+                retry_after = response.headers.get("Retry-After", "")
+                wait = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+                logger.warning(f"Jira answered {response.status_code} for {method} {path}, retrying in {wait:.0f}s")
+                time.sleep(wait)
+                continue
+            if response.status_code >= 400:
+                raise JiraError(response.status_code, response.text, method, path)
+            return response.json() if response.content else None
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        return self.request("GET", path, params=params)
+
+    def post(self, path: str, body: Optional[Dict[str, Any]] = None) -> Any:
+        return self.request("POST", path, json=body)
+
+    def put(self, path: str, body: Optional[Dict[str, Any]] = None) -> Any:
+        return self.request("PUT", path, json=body)
+
+    def myself(self) -> Dict[str, Any]:
+        """The authenticated user (also a cheap credentials check)"""
+        return self.get("/rest/api/2/myself")
+
+    def get_issue(self, key: str, fields: Sequence[str]) -> Dict[str, Any]:
+        """One issue with only the given fields"""
+        return self.get(f"/rest/api/2/issue/{key}", {"fields": ",".join(fields)})
+
+    def update_issue(self, key: str, fields: Dict[str, Any]):
+        """Set fields of an issue"""
+        self.put(f"/rest/api/2/issue/{key}", {"fields": fields})
+
+    def priority_id(self, name: str) -> Optional[str]:
+        """Id of a priority by name (the priority list is read once per client)"""
+        if self._priorities is None:
+            self._priorities = {p["name"]: p["id"] for p in self.get("/rest/api/2/priority") or []}
+        return self._priorities.get(name)
+
+    def transitions(self, key: str) -> List[Dict[str, Any]]:
+        """Transitions available for an issue in its current status"""
+        return (self.get(f"/rest/api/2/issue/{key}/transitions") or {}).get("transitions") or []
+
+    def transition_issue(self, key: str, transition_id: str, comment: Optional[str] = None):
+        """Move an issue through a transition, optionally adding a comment"""
+        body: Dict[str, Any] = {"transition": {"id": str(transition_id)}}
+        if comment:
+            body["update"] = {"comment": [{"add": {"body": comment}}]}
+        self.post(f"/rest/api/2/issue/{key}/transitions", body)
+
+    def _search_page(self, jql: str, fields: Sequence[str], page_size: int,
+                     start: int = 0, token: Optional[str] = None) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"jql": jql, "fields": ",".join(fields), "maxResults": page_size}
+        if self.search_api == "token":
+            if token:
+                params["nextPageToken"] = token
+            return self.get("/rest/api/3/search/jql", params) or {}
+        params["startAt"] = start
+        return self.get("/rest/api/2/search", params) or {}
+
+    def search(self, jql: str, fields: Sequence[str], page_size: int = MAX_PAGE_SIZE,
+               max_results: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every issue matching the JQL, with only the given fields.
+
+        Args:
+            jql: Search query
+            fields: Fields to return (required; Jira returns `id` and `key` regardless)
+            page_size: Issues per request (at most 100)
+            max_results: Stop after this many issues
+        """
+        if not fields:
+            raise ValueError("search() needs an explicit fields list")
+        page_size = min(page_size, MAX_PAGE_SIZE, max_results or MAX_PAGE_SIZE)
+        yielded = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if self.search_api == "token":
+                pending = executor.submit(self._search_page, jql, fields, page_size)
+                while pending:
+                    page = pending.result()
+                    token = page.get("nextPageToken")
+                    more = token and not page.get("isLast")
+                    pending = executor.submit(self._search_page, jql, fields, page_size, 0, token) if more else None
+                    for issue in page.get("issues") or []:
+                        if max_results is not None and yielded >= max_results:
+                            if pending:
+                                pending.cancel()
+                            return
+                        yield issue
+                        yielded += 1
+                return
+
+            first = self._search_page(jql, fields, page_size)
+            total = first.get("total") or 0
+            if max_results is not None:
+                total = min(total, max_results)
+            pending = [executor.submit(self._search_page, jql, fields, page_size, start)
+                       for start in range(page_size, total, page_size)]
+            for page in chain([first], (future.result() for future in pending)):
+                for issue in page.get("issues") or []:
+                    if yielded >= total:
+                        return
+                    yield issue
+                    yielded += 1
+
+    def first(self, jql: str, fields: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """The first issue matching the JQL, or None"""
+        return next(self.search(jql, fields, max_results=1), None)
+
+    def bulk(self, func: Callable[[Any], Any], items: Iterable[Any],
+             max_workers: Optional[int] = None) -> List[Tuple[Any, Any, Optional[Exception]]]:
+        """
+        Call func for every item on a bounded thread pool (requests stay rate limited).
+
+        Returns:
+            (item, result, error) per item, in input order; error is None on success
+        """
+        def call(item):
+            try:
+                return item, func(item), None
+            except Exception as e:
+                return item, None, e
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            return list(executor.map(call, items))
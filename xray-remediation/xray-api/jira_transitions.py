@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Bulk Jira issue transitions.
+
+Closing tickets one transition request at a time, with a pause between
+batches, takes most of an hour for a thousand issues. BulkTransitioner reads
+the issues' current status with a few `key in (...)` searches and resolves the
+transition to the target status once per (project, issue type, status), since
+issues sharing those share a workflow step. It then moves each such group
+with Jira Cloud's bulk transition endpoint (one task per 1,000 issues, polled until
+it finishes or `max_wait` runs out; issues a stuck task has not moved go to the
+per-issue path). Where that endpoint does not exist (Jira Server/Data Center),
+it falls back to per-issue transitions on a bounded worker pool, retrying each
+issue a few times:
+
+    transitioner = BulkTransitioner(JiraClient(), "Closed", comment="Removed from backlog",
+                                    journal_path=LOGS_DIR / "close_tickets.jsonl")
+    result = transitioner.run(keys)
+    print(f"{len(result.succeeded)} closed, {len(result.failed)} failed")
+
+Issues already in the target status are skipped, and so are keys the journal
+records as done, so an interrupted run can simply be started again. The
+journal has one JSON line per issue: {"key", "ok", "error"}.
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from jira_client import JiraClient, JiraError
+from jql_planner import in_clause, split_values
+
+logger = logging.getLogger(__name__)
+
+# Issues per bulk transition task (Jira Cloud's limit)
+BULK_BATCH_SIZE = 1000
+
+BULK_TRANSITION_PATH = "/rest/api/3/bulk/issues/transition"
+BULK_QUEUE_PATH = "/rest/api/3/bulk/queue/{task_id}"
+
+# Bulk task states that will not change any more
+FINISHED_TASK_STATES = {"COMPLETE", "FAILED", "CANCELLED", "DEAD"}
+
+
+class TransitionResult(NamedTuple):
+    succeeded: List[str]    # Keys moved to the target status
+    failed: Dict[str, str]  # Key -> error
+    skipped: List[str]      # Keys already in the target status (or done in an earlier run)
+
+
+class BulkTransitioner:
+    """Moves many issues to one target status."""
+
+    def __init__(self, jira: JiraClient, target_status: str, comment: Optional[str] = None,
+                 max_workers: int = 8, retries: int = 3, use_bulk: bool = True,
+                 journal_path: Optional[Path] = None, poll_interval: float = 2, max_wait: float = 600):
+        """
+        Args:
+            jira: Client used for every request (and its rate limiter)
+            target_status: Status name to move the issues to (e.g. "Closed")
+            comment: Comment added to every transitioned issue
+            max_workers: Concurrent per-issue transitions in the fallback
+            retries: Attempts per issue in the fallback
+            use_bulk: Try the bulk transition endpoint first
+            journal_path: JSON-lines journal of outcomes (also used to skip finished keys)
+            poll_interval: Seconds between bulk task status checks
+            max_wait: Seconds to wait for one bulk task before moving its
+                      remaining issues issue by issue
+        """
+        self.jira = jira
+        self.target_status = target_status
+        self.comment = comment
+        self.max_workers = max_workers
+        self.retries = retries
+        self.use_bulk = use_bulk
+        self.journal_path = Path(journal_path) if journal_path else None
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self._journal_lock = threading.Lock()
+        self._transition_ids: Dict[Tuple[str, str, str], Optional[str]] = {}
+
+    def journaled(self) -> Dict[str, bool]:
+        """Outcome per key recorded in the journal (the last record wins)"""
+        outcomes: Dict[str, bool] = {}
+        if self.journal_path and self.journal_path.exists():
+            with open(self.journal_path) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        outcomes[record["key"]] = record["ok"]
+        return outcomes
+
+    def _record(self, key: str, error: Optional[str] = None):
+        if not self.journal_path:
+            return
+        line = json.dumps({"key": key, "ok": error is None, "error": error}, separators=(",", ":"))
+        with self._journal_lock:
+            with open(self.journal_path, "a") as f:
+                f.write(line + "\n")
+
+    def fetch_states(self, keys: List[str]) -> Dict[str, Dict]:
+        """Id, status, issue type and project of every key, 100 keys per search"""
+        issues = {}
+        for chunk in split_values(keys):
+            for issue in self.jira.search(in_clause("key", chunk), ["status", "issuetype", "project"]):
+                issues[issue["key"]] = issue
+        return issues
+
+    @staticmethod
+    def workflow_step(issue: Dict) -> Tuple[str, str, str]:
+        """(project, issue type, status): issues sharing it share a workflow step"""
+        fields = issue["fields"]
+        return fields["project"]["key"], fields["issuetype"]["name"], fields["status"]["name"]
+
+    def transition_id(self, issue: Dict) -> Optional[str]:
+        """Transition from the issue's status to the target, resolved once per (project, type, status)"""
+        step = self.workflow_step(issue)
+        if step not in self._transition_ids:
+            target = self.target_status.casefold()
+            found = None
+            for transition in self.jira.transitions(issue["key"]):
+                if ((transition.get("to") or {}).get("name", "").casefold() == target
+                        or transition.get("name", "").casefold() == target):
+                    found = transition["id"]
+                    break
+            self._transition_ids[step] = found
+            logger.info(f"Transition {step[2]} -> {self.target_status} for {step[0]} {step[1]}: {found or 'none'}")
+        return self._transition_ids[step]
+
+    def _bulk(self, transition_id: str, issues: List[Dict]) -> Optional[Tuple[Dict[str, Optional[str]], List[Dict]]]:
+        """
+        Transition issues with one bulk task.
+
+        Returns:
+            (key -> error (None on success), issues left for the per-issue path
+            because the task did not finish within max_wait), or None when the
+            endpoint is not available
+        """
+        ids_to_keys = {issue["id"]: issue["key"] for issue in issues}
+        try:
+            task = self.jira.post(BULK_TRANSITION_PATH, {
+                "bulkTransitionInputs": [{"selectedIssueIdsOrKeys": list(ids_to_keys.values()),
+                                          "transitionId": transition_id}],
+                "sendBulkNotification": False
+            })
+        except JiraError as e:
+            if e.status_code in (404, 405):
+                logger.info("Bulk transition endpoint not available, transitioning issue by issue")
+                self.use_bulk = False
+                return None
+            raise
+
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            status = self.jira.get(BULK_QUEUE_PATH.format(task_id=task["taskId"])) or {}
+            if status.get("status") in FINISHED_TASK_STATES:
+                break
+            if time.monotonic() >= deadline:
+                # Whatever the task has moved by now stays moved; the rest goes issue by issue
+                logger.warning(f"Bulk task {task['taskId']} still {status.get('status', 'unknown')} "
+                               f"after {self.max_wait:.0f}s, transitioning the rest issue by issue")
+                states = self.fetch_states(list(ids_to_keys.values()))
+                target = self.target_status.casefold()
+                moved = {key for key, issue in states.items()
+                         if issue["fields"]["status"]["name"].casefold() == target}
+                outcomes = {key: None if key in moved else "Issue not found"
+                            for key in ids_to_keys.values() if key in moved or key not in states}
+                return outcomes, [issue for issue in issues if issue["key"] in states and issue["key"] not in moved]
+            time.sleep(self.poll_interval)
+
+        outcomes: Dict[str, Optional[str]] = {}
+        for issue_id in status.get("processedAccessibleIssues") or []:
+            outcomes[ids_to_keys.get(str(issue_id), str(issue_id))] = None
+        for issue_id, errors in (status.get("failedAccessibleIssues") or {}).items():
+            outcomes[ids_to_keys.get(str(issue_id), str(issue_id))] = "; ".join(map(str, errors)) or "Failed"
+        for key in ids_to_keys.values():
+            outcomes.setdefault(key, f"Not processed (task {status.get('status', 'unknown')})")
+        return outcomes, []
+
+    def _transition_one(self, key: str, transition_id: str) -> Optional[str]:
+        """Transition one issue, retrying; returns the last error or None"""
+        error = None
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.jira.transition_issue(key, transition_id, self.comment)
+                return None
+            except Exception as e:
+                error = str(e)
+                if isinstance(e, JiraError) and e.status_code in (400, 403, 404):
+                    break
+                time.sleep(attempt)
+        return error
+
+    def _add_comment(self, key: str):
+        self.jira.post(f"/rest/api/2/issue/{key}/comment", {"body": self.comment})
+
+    def run(self, keys: Iterable[str]) -> TransitionResult:
+        """Move every key to the target status"""
+        result = TransitionResult([], {}, [])
+        keys = list(dict.fromkeys(keys))
+        done = {key for key, ok in self.journaled().items() if ok}
+        result.skipped.extend(key for key in keys if key in done)
+        pending = [key for key in keys if key not in done]
+
+        issues = self.fetch_states(pending)
+        # Grouped by workflow step, not transition id: ids like "31" repeat across workflows
+        groups: Dict[Tuple[str, str, str], List[Dict]] = {}
+        for key in pending:
+            issue = issues.get(key)
+            if issue is None:
+                result.failed[key] = "Issue not found"
+                self._record(key, "Issue not found")
+            elif issue["fields"]["status"]["name"].casefold() == self.target_status.casefold():
+                result.skipped.append(key)
+            else:
+                transition_id = self.transition_id(issue)
+                if transition_id is None:
+                    error = f"No transition from {issue['fields']['status']['name']} to {self.target_status}"
+                    result.failed[key] = error
+                    self._record(key, error)
+                else:
+                    groups.setdefault(self.workflow_step(issue), []).append(issue)
+
+        def finish(key: str, error: Optional[str]):
+            if error:
+                result.failed[key] = error
+            else:
+                result.succeeded.append(key)
+            self._record(key, error)
+
+        for step, group in groups.items():
+            transition_id = self._transition_ids[step]
+            remaining = group
+            if self.use_bulk:
+                remaining = []
+                for start in range(0, len(group), BULK_BATCH_SIZE):
+                    batch = group[start:start + BULK_BATCH_SIZE]
+                    bulk_result = self._bulk(transition_id, batch) if self.use_bulk else None
+                    if bulk_result is None:
+                        remaining.extend(batch)
+                        continue
+                    outcomes, leftover = bulk_result
+                    remaining.extend(leftover)
+                    # The bulk endpoint takes no comment; add it to the issues it moved
+                    moved = [key for key, error in outcomes.items() if error is None]
+                    if self.comment and moved:
+                        for key, _, error in self.jira.bulk(self._add_comment, moved, self.max_workers):
+                            if error:
+                                logger.warning(f"Could not comment on {key}: {error}")
+                    for key, error in outcomes.items():
+                        finish(key, error)
+
+            if remaining:
+                logger.info(f"Transitioning {len(remaining)} issues with {self.max_workers} workers")
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    errors = executor.map(lambda issue: self._transition_one(issue["key"], transition_id), remaining)
+                    for issue, error in zip(remaining, errors):
+                        finish(issue["key"], error)
+        return result
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Chunked, concurrent JQL searches over long value lists.
+
+A search for the tests carrying any of many labels, or for a long list of keys,
+is one JQL string that grows with the list: past a few hundred values it runs
+into Jira's JQL length limit, and long OR chains are slow to evaluate. The
+planner writes the list as `field in (...)` clauses that stay under a value
+count and a length budget, sends one sub-query per chunk concurrently and
+merges the results, keeping an issue matched by several chunks once:
+
+    planner = JqlPlanner()
+    page = planner.search(fetch_page, 'project = "FRAMED" AND issuetype = "Test"', "labels", labels,
+                          limit=100, start=0)
+
+`fetch_page(jql, limit, start)` returns a getTests-style page (`total` and
+`results`). A list that fits in one chunk is passed through as one request.
+Otherwise every chunk is read in full, its pages fetched concurrently, and the
+page is cut from the merged list, so `total` counts each issue once. The merged
+list is kept for `cache_ttl` seconds, so paging through it does not re-run the
+sub-queries. Merged results come chunk by chunk, each in the server's order.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from rate_limiter import RateLimiter, shared_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Values per `in (...)` clause
+DEFAULT_MAX_VALUES = 100
+
+# Characters per sub-query; Jira rejects much longer JQL and evaluates it slowly
+DEFAULT_MAX_LENGTH = 2000
+
+ORDER_BY_PATTERN = re.compile(r'\s+ORDER\s+BY\s+.*$', re.IGNORECASE | re.DOTALL)
+
+# Values that need no quotes (issue ids)
+UNQUOTED_VALUE_PATTERN = re.compile(r'^\d+$')
+
+# Jira's errors for `in (...)` values that do not exist (it rejects the whole query)
+UNKNOWN_VALUE_PATTERN = re.compile(r"does not exist|is invalid|not valid", re.IGNORECASE)
+
+FetchPage = Callable[[str, int, int], Dict[str, Any]]
+
+
+def jql_value(value: Any) -> str:
+    """A value as a JQL literal (numbers bare, anything else quoted)"""
+    value = str(value)
+    if UNQUOTED_VALUE_PATTERN.match(value):
+        return value
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def in_clause(field: str, values: Iterable[Any]) -> str:
+    return f"{field} in ({', '.join(jql_value(value) for value in values)})"
+
+
+def split_values(values: Iterable[Any], max_values: int = DEFAULT_MAX_VALUES,
+                 max_length: int = DEFAULT_MAX_LENGTH) -> List[List[str]]:
+    """
+    Unique values in consecutive chunks of at most max_values values whose
+    `in (...)` list is at most max_length characters (a value longer than
+    that gets a chunk of its own).
+    """
+    chunks: List[List[str]] = []
+    chunk: List[str] = []
+    length = 0
+    for value in dict.fromkeys(str(value) for value in values):
+        size = len(jql_value(value)) + 2
+        if chunk and (len(chunk) >= max_values or length + size > max_length):
+            chunks.append(chunk)
+            chunk, length = [], 0
+        chunk.append(value)
+        length += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _mentions(message: str, value: str) -> bool:
+    """True if an error message names the value as a whole word (FRAMED-1 is not in FRAMED-12)"""
+    return re.search(rf"(?<![\w-]){re.escape(value)}(?![\w-])", message, re.IGNORECASE) is not None
+
+
+def skip_unknown_values(fetch: Callable[[List[str]], List[Any]],
+                        values: List[str]) -> Tuple[List[Any], int, List[str]]:
+    """
+    Run fetch(values) for an `in (...)` query, leaving out values that do not exist.
+
+    Jira rejects a whole `key in (...)` list when one key does not exist. The
+    values its error names are dropped and the rest retried; when it names
+    none, the list is split in halves until the failing values are isolated.
+
+    Returns:
+        (results, requests spent, values left out)
+
+    Raises:
+        Exception: fetch failed for any other reason
+    """
+    try:
+        return fetch(values), 1, []
+    except Exception as e:
+        message = str(e)
+        if not UNKNOWN_VALUE_PATTERN.search(message):
+            raise
+        unknown = [value for value in values if _mentions(message, value)]
+        if not unknown and len(values) == 1:
+            unknown = list(values)
+        if unknown:
+            rest = [value for value in values if value not in unknown]
+            results, requests, more = skip_unknown_values(fetch, rest) if rest else ([], 0, [])
+            return results, requests + 1, unknown + more
+        half = len(values) // 2
+        first, first_requests, first_unknown = skip_unknown_values(fetch, values[:half])
+        second, second_requests, second_unknown = skip_unknown_values(fetch, values[half:])
+        return first + second, first_requests + second_requests + 1, first_unknown + second_unknown
+
+
+class JqlPlanner:
+    """Splits a `field in (values)` predicate over concurrent sub-queries and merges their pages."""
+
+    def __init__(self, max_values: int = DEFAULT_MAX_VALUES, max_length: int = DEFAULT_MAX_LENGTH,
+                 max_workers: int = 4, page_size: int = 100, cache_ttl: float = 60,
+                 rate_limiter: Optional[RateLimiter] = None):
+        """
+        Args:
+            max_values: Values per sub-query
+            max_length: JQL characters per sub-query
+            max_workers: Concurrent sub-query requests
+            page_size: Results per request when reading a chunk in full
+            cache_ttl: Seconds a merged result list is reused for further pages
+            rate_limiter: Request pacing (defaults to the process-wide limiter)
+        """
+        self.max_values = max_values
+        self.max_length = max_length
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.cache_ttl = cache_ttl
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self._merged: "OrderedDict[Tuple[str, ...], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def plan(self, base: Optional[str], field: str, values: Iterable[Any]) -> List[str]:
+        """
+        Sub-queries `(<base>) AND <field> in (chunk)`, one per chunk of values.
+
+        The base is parenthesized, so the chunk restricts all of an OR in it
+        rather than only its last term. An ORDER BY at the end of base is moved
+        to the end of every sub-query. No values means no sub-queries (the
+        predicate matches nothing).
+        """
+        base = (base or "").strip()
+        order = ORDER_BY_PATTERN.search(base)
+        where, order_by = (base[:order.start()], order.group(0)) if order else (base, "")
+        prefix = f"({where}) AND " if where else ""
+        budget = max(1, self.max_length - len(prefix) - len(order_by) - len(field) - len(" in ()"))
+        return [f"{prefix}{in_clause(field, chunk)}{order_by}"
+                for chunk in split_values(values, self.max_values, budget)]
+
+    def _fetch(self, fetch_page: FetchPage, jql: str, limit: int, start: int) -> Dict[str, Any]:
+        self.rate_limiter.acquire()
+        return fetch_page(jql, limit, start) or {}
+
+    def fetch_all(self, fetch_page: FetchPage, jqls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Every result of every sub-query, each issue once (first chunk wins).
+
+        The first page of each sub-query is fetched concurrently, then all
+        remaining pages together.
+        """
+        key = tuple(jqls)
+        with self._lock:
+            cached = self._merged.get(key)
+            if cached and time.monotonic() - cached[0] < self.cache_ttl:
+                return cached[1]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            firsts = list(executor.map(lambda jql: self._fetch(fetch_page, jql, self.page_size, 0), jqls))
+            rest = [(index, start) for index, page in enumerate(firsts)
+                    for start in range(self.page_size, page.get("total") or 0, self.page_size)]
+            pages = list(executor.map(lambda item: (item[0], self._fetch(fetch_page, jqls[item[0]],
+                                                                          self.page_size, item[1])), rest))
+
+        per_chunk: List[List[Dict[str, Any]]] = [list(page.get("results") or []) for page in firsts]
+        for index, page in pages:
+            per_chunk[index].extend(page.get("results") or [])
+
+        merged, seen = [], set()
+        for results in per_chunk:
+            for item in results:
+                issue_id = item.get("issueId")
+                if issue_id not in seen:
+                    seen.add(issue_id)
+                    merged.append(item)
+        logger.info(f"Merged {len(merged)} issues from {len(jqls)} sub-queries ({len(jqls) + len(rest)} requests)")
+
+        with self._lock:
+            self._merged[key] = (time.monotonic(), merged)
+            self._merged.move_to_end(key)
+            while len(self._merged) > 8:
+                self._merged.popitem(last=False)
+        return merged
+
+    def search(self, fetch_page: FetchPage, base: Optional[str], field: str, values: Iterable[Any],
+               limit: int = 100, start: int = 0) -> Dict[str, Any]:
+        """
+        One page of `(<base>) AND <field> in (values)`, however many values there are.
+
+        Returns:
+            {"total", "start", "limit", "results"}; total counts each matching issue once
+        """
+        jqls = self.plan(base, field, values)
+        if len(jqls) == 1:
+            return self._fetch(fetch_page, jqls[0], limit, start)
+        merged = self.fetch_all(fetch_page, jqls) if jqls else []
+        return {"total": len(merged), "start": start, "limit": limit, "results": merged[start:start + limit]}
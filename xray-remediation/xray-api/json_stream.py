@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Incremental decoding of paginated GraphQL responses.
+
+`response.json()` buffers the whole body as bytes, then as text, and only then
+builds the objects, so a 100-test expanded page with descriptions and
+preconditions briefly costs several times its decoded size, and nothing can be
+processed until the last byte has arrived. StreamedPage reads the body in
+chunks and decodes `data.<operation>.results[*]` one element at a time:
+
+    response = session.post(url, json=payload, stream=True)
+    page = StreamedPage(response.iter_content(CHUNK_SIZE), "getExpandedTests")
+    print(page.fields.get("total"))          # fields selected before results
+    for test in page.results():
+        handle(test)                         # as soon as each test is complete
+    page.raise_for_errors()
+
+Only the structure down to the results array is walked by hand; every other
+value (each result, scalar fields, errors) is decoded with the stdlib decoder.
+"""
+
+import codecs
+import json
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+CHUNK_SIZE = 64 * 1024
+
+# json.loads shares one string per distinct key across a whole document; decoding
+# results one at a time would give every result its own copies, so keys are interned
+_decoder = json.JSONDecoder(object_pairs_hook=lambda pairs: {sys.intern(key): value for key, value in pairs})
+_WHITESPACE = " \t\n\r"
+_END = object()
+
+
+class _TextStream:
+    """A text buffer fed from byte chunks, consumed from the front."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+        self.exhausted = False
+
+    def fill(self, at_least: int = 1) -> bool:
+        """Read chunks until `at_least` more characters are buffered; False once the body ends."""
+        if self.exhausted:
+            return False
+        # Drop consumed text so the buffer only holds the value being decoded
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+        target = len(self.buffer) + at_least
+        while len(self.buffer) < target:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.buffer += self._utf8.decode(b"", final=True)
+                self.exhausted = True
+                break
+            if chunk:
+                self.buffer += self._utf8.decode(chunk)
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at the end of the body)."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        actual = self.peek()
+        if actual != char:
+            raise ValueError(f"Expected {char!r} in JSON response, found {actual!r}")
+        self.position += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # Incomplete value: read at least as much again as is buffered (keeps retries linear)
+                if not self.fill(max(CHUNK_SIZE, len(self.buffer) - self.position)):
+                    raise
+                continue
+            # A number or literal ending exactly at the buffer end may continue in the next chunk
+            if end == len(self.buffer) and not self.exhausted:
+                self.fill()
+                continue
+            self.position = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """Iterate the keys of an object; the caller consumes each member's value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.position += 1
+                continue
+            self.expect("}")
+            return
+
+    def elements(self) -> Iterator[Any]:
+        """Decode the elements of an array one by one."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self.position += 1
+                continue
+            self.expect("]")
+            return
+
+
+class StreamedPage:
+    """One GraphQL page response decoded incrementally."""
+
+    def __init__(self, chunks: Iterable[bytes], operation: str, results_field: str = "results"):
+        """
+        Read up to the start of `data.<operation>.<results_field>`.
+
+        Args:
+            chunks: Response body chunks (e.g. response.iter_content(CHUNK_SIZE))
+            operation: Root field of the query, e.g. "getExpandedTests"
+            results_field: List field of the page to stream
+        """
+        self.operation = operation
+        self.results_field = results_field
+        self.fields: Dict[str, Any] = {}
+        self.errors: Optional[List[Dict[str, Any]]] = None
+        self.found = False  # Whether data.<operation> was a page object
+        self._stream = _TextStream(chunks)
+        self._walk = self._walk_body()
+        # Advance to the first result (or the end of the body if there is none)
+        self._pending = next(self._walk, _END)
+
+    def _walk_body(self) -> Iterator[Any]:
+        stream = self._stream
+        for key in stream.members():
+            if key == "data" and stream.peek() == "{":
+                for data_key in stream.members():
+                    if data_key == self.operation and stream.peek() == "{":
+                        self.found = True
+                        for field in stream.members():
+                            if field == self.results_field and stream.peek() == "[":
+                                yield from stream.elements()
+                            else:
+                                self.fields[field] = stream.value()
+                    else:
+                        stream.value()
+            elif key == "errors":
+                self.errors = stream.value()
+            else:
+                stream.value()
+
+    def results(self) -> Iterator[Dict[str, Any]]:
+        """Yield each result as soon as it is decoded; afterwards the rest of the body has been read."""
+        while self._pending is not _END:
+            result, self._pending = self._pending, _END
+            yield result
+            self._pending = next(self._walk, _END)
+
+    def raise_for_errors(self):
+        """Raise like the non-streaming clients if the response carried GraphQL errors."""
+        if self.errors:
+            raise Exception(f"GraphQL errors: {self.errors}")
+
+    def to_page(self) -> Dict[str, Any]:
+        """Consume the remaining results and return the page as a plain dict."""
+        results = list(self.results())
+        return {**self.fields, self.results_field: results}
+
+
+def iter_page_results(chunks: Iterable[bytes], operation: str) -> Iterator[Dict[str, Any]]:
+    """Yield data.<operation>.results[*] from a response body, raising on GraphQL errors."""
+    page = StreamedPage(chunks, operation)
+    page.raise_for_errors()
+    yield from page.results()
+    page.raise_for_errors()
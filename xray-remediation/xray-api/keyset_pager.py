@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Keyset (issue id range) pagination for deep, parallel scans.
+
+Offset pagination (`start`) makes Xray skip every earlier result on each page,
+so deep pages get slower, and a test created or deleted mid-scan shifts all
+later offsets so pages overlap or miss tests. Keyset pagination orders by issue
+id and asks for each page with a JQL bound instead:
+
+    project = "FRAMED" AND id > 1158139 AND id <= 1190000 ORDER BY id ASC
+
+Every page starts strictly after the last id seen, however much the project
+changed in between, and the scan stops at the highest id that existed when it
+started, so it is a consistent snapshot of the id space. The id space is split
+into ranges that independent workers scan in parallel.
+
+    scanner = KeysetScanner(fetch_page, base_jql='project = "FRAMED"', workers=4)
+    low, high, total = scanner.bounds()
+    scanner.scan(scanner.split(low, high), on_page)
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (after, upper): ids in after < id <= upper
+IdRange = Tuple[int, int]
+
+
+class KeysetOrderError(Exception):
+    """A page was not ordered by ascending id, so keyset bounds would skip results."""
+
+
+def keyset_jql(base_jql: Optional[str] = None, after: Optional[int] = None, upper: Optional[int] = None,
+               descending: bool = False) -> str:
+    """
+    Build a JQL query for one keyset page.
+
+    Args:
+        base_jql: Filter the scan is restricted to (without ORDER BY)
+        after: Only ids greater than this
+        upper: Only ids up to and including this
+        descending: Order by id descending (used to find the highest id)
+
+    Returns:
+        JQL string
+    """
+    clauses = [f"({base_jql})"] if base_jql else []
+    if after is not None:
+        clauses.append(f"id > {after}")
+    if upper is not None:
+        clauses.append(f"id <= {upper}")
+    order = "ORDER BY id DESC" if descending else "ORDER BY id ASC"
+    return f"{' AND '.join(clauses)} {order}".strip()
+
+
+def split_ranges(low: int, high: int, parts: int) -> List[IdRange]:
+    """
+    Split the ids low..high (inclusive) into at most `parts` contiguous ranges.
+
+    Returns:
+        List of (after, upper) bounds covering the whole span
+    """
+    parts = max(1, min(parts, high - low + 1))
+    width = -(-(high - low + 1) // parts)
+    return [(after, min(after + width, high)) for after in range(low - 1, high, width)]
+
+
+def resume_cursors(ranges: List[IdRange], issue_ids: Iterable[Any]) -> Dict[int, int]:
+    """
+    Rebuild per-range cursors from the ids a previous scan processed.
+
+    Each range is scanned in ascending id order and pages are recorded whole,
+    so the highest processed id inside a range is where that range continues.
+
+    Returns:
+        Range index -> last processed id, for ranges that made progress
+    """
+    cursors = {}
+    for issue_id in issue_ids:
+        issue_id = int(issue_id)
+        for index, (after, upper) in enumerate(ranges):
+            if after < issue_id <= upper:
+                cursors[index] = max(cursors.get(index, issue_id), issue_id)
+                break
+    return cursors
+
+
+class KeysetScanner:
+    """Scans a paginated query by ascending issue id, one worker per id range."""
+
+    def __init__(self, fetch_page: Callable[[str, Optional[int]], Dict[str, Any]],
+                 base_jql: Optional[str] = None, id_field: str = "issueId", workers: int = 4):
+        """
+        Args:
+            fetch_page: Called with (jql, limit) and returns the connection
+                        ({"total": ..., "results": [...]}); a limit of None means the default page size
+            base_jql: Filter the scan is restricted to (without ORDER BY)
+            id_field: Numeric id field of each result
+            workers: Ranges scanned at the same time
+        """
+        self.fetch_page = fetch_page
+        self.base_jql = base_jql
+        self.id_field = id_field
+        self.workers = max(1, workers)
+
+    def bounds(self) -> Optional[Tuple[int, int, int]]:
+        """
+        Find the lowest and highest id matching the base filter.
+
+        Returns:
+            (lowest id, highest id, total results), or None if nothing matches
+        """
+        first = self.fetch_page(keyset_jql(self.base_jql), 1)
+        if not first.get("results"):
+            return None
+        last = self.fetch_page(keyset_jql(self.base_jql, descending=True), 1)
+        low = int(first["results"][0][self.id_field])
+        high = int(last["results"][0][self.id_field])
+        return low, high, first.get("total", 0)
+
+    def split(self, low: int, high: int, parts: Optional[int] = None) -> List[IdRange]:
+        """Split low..high into ranges, by default one per worker."""
+        return split_ranges(low, high, parts or self.workers)
+
+    def scan_range(self, index: int, id_range: IdRange, on_page: Callable[[int, List[Dict[str, Any]], int], None],
+                   after: Optional[int] = None) -> int:
+        """
+        Scan one range page by page.
+
+        Args:
+            index: Range index, passed through to on_page
+            id_range: (after, upper) bounds
+            on_page: Called with (range index, results, last id in the page) after each page
+            after: Resume after this id instead of the start of the range
+
+        Returns:
+            Number of results scanned
+
+        Raises:
+            KeysetOrderError: If a page is not in ascending id order
+        """
+        start, upper = id_range
+        after = start if after is None else after
+        scanned = 0
+        while after < upper:
+            page = self.fetch_page(keyset_jql(self.base_jql, after, upper), None)
+            results = page.get("results") or []
+            if not results:
+                break
+
+            ids = [int(result[self.id_field]) for result in results]
+            if ids[0] <= after or any(previous >= current for previous, current in zip(ids, ids[1:])):
+                raise KeysetOrderError(f"Page after id {after} is not in ascending id order; "
+                                       "the server ignored ORDER BY id")
+
+            on_page(index, results, ids[-1])
+            scanned += len(results)
+            after = ids[-1]
+            # A bounded page's total counts what is left in the range, so a full read means done
+            if len(results) >= page.get("total", len(results) + 1):
+                break
+
+        logger.debug(f"Range {index} ({start}, {upper}] done: {scanned} results")
+        return scanned
+
+    def scan(self, ranges: List[IdRange], on_page: Callable[[int, List[Dict[str, Any]], int], None],
+             cursors: Optional[Dict[int, int]] = None) -> int:
+        """
+        Scan ranges in parallel.
+
+        on_page is called from worker threads; it must be thread safe.
+
+        Args:
+            ranges: (after, upper) bounds from split()
+            on_page: Called with (range index, results, last id in the page) after each page
+            cursors: Range index -> last id already processed (see resume_cursors)
+
+        Returns:
+            Total number of results scanned
+        """
+        cursors = cursors or {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.scan_range, index, id_range, on_page, cursors.get(index))
+                       for index, id_range in enumerate(ranges)]
+            return sum(future.result() for future in futures)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Concurrent membership expansion for test sets, test executions and test plans.
+
+Given many containers, fetches their first member pages in a few batched
+`getTestSets(jql: "issue in (...)")`-style queries, completes the rest of each
+membership with ConnectionExpander, and dedupes members across containers.
+All requests share the process-wide rate limiter.
+
+The result can be streamed to a compact NDJSON index as containers complete:
+
+    {"type":"member","issueId":"1160001","jira":{...}}            # once per member
+    {"type":"container","issueId":"1155028","key":"MLBMOB-2651",
+     "summary":"...","total":312,"members":["1160001", ...]}
+
+Usage:
+    python membership_expander.py TestSet MLBMOB-2651 MLBMOB-2652 --output membership.ndjson
+"""
+
+import argparse
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+from connection_expander import ConnectionExpander
+from query_complexity import DEFAULT_SERVER_LIMIT, largest_page_size
+from rate_limiter import RateLimiter, shared_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Plural root query per container type
+CONTAINER_QUERIES = {
+    "TestSet": "getTestSets",
+    "TestExecution": "getTestExecutions",
+    "TestPlan": "getTestPlans",
+}
+
+DEFAULT_MEMBER_FIELDS = 'issueId jira(fields: ["key", "summary", "status", "labels"])'
+
+MEMBERSHIP_QUERY = """
+query GetMembership($jql: String, $limit: Int!) {
+    %s(jql: $jql, limit: $limit) {
+        total
+        results {
+            issueId
+            jira(fields: ["key", "summary"])
+            tests(limit: 100, start: 0) {
+                total
+                results { %s }
+            }
+        }
+    }
+}
+"""
+
+
+class MembershipExpander:
+    """Fetches complete, deduplicated membership for many containers at once."""
+
+    def __init__(self, execute: Callable[[str, Dict[str, Any]], Dict[str, Any]], max_workers: int = 4,
+                 server_limit: int = DEFAULT_SERVER_LIMIT, rate_limiter: Optional[RateLimiter] = None):
+        """
+        Args:
+            execute: Runs a GraphQL query with variables and returns its `data`
+            max_workers: Concurrent requests
+            server_limit: Complexity limit each request must stay under
+            rate_limiter: Request pacing (defaults to the process-wide limiter)
+        """
+        self.execute = execute
+        self.max_workers = max_workers
+        self.server_limit = server_limit
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self.connections = ConnectionExpander(execute, max_workers=max_workers,
+                                              server_limit=server_limit, rate_limiter=self.rate_limiter)
+
+    def expand(self, containers: List[str], container_type: str = "TestSet",
+               member_fields: str = DEFAULT_MEMBER_FIELDS, index_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Fetch every member of every container.
+
+        Args:
+            containers: Container issue ids or Jira keys
+            container_type: TestSet, TestExecution or TestPlan
+            member_fields: Fields selected on each member test (must include issueId)
+            index_path: Optional NDJSON file the index is streamed to
+
+        Returns:
+            Dict with "containers" (issueId -> {issueId, key, summary, total, members})
+            and "members" (issueId -> member object, each stored once)
+        """
+        if container_type not in CONTAINER_QUERIES:
+            raise ValueError(f"Unknown container type {container_type}, expected one of "
+                             f"{', '.join(CONTAINER_QUERIES)}")
+
+        query = MEMBERSHIP_QUERY % (CONTAINER_QUERIES[container_type], member_fields)
+        per_request = largest_page_size(query, {"jql": ""}, server_limit=self.server_limit)
+        requested = list(dict.fromkeys(str(container) for container in containers))
+        chunks = [requested[i:i + per_request] for i in range(0, len(requested), per_request)]
+
+        index = {"containers": {}, "members": {}}
+        write_lock = threading.Lock()
+        output = open(index_path, "w", encoding="utf-8") if index_path else None
+
+        def fetch(chunk):
+            self.rate_limiter.acquire()
+            data = self.execute(query, {"jql": f"issue in ({', '.join(chunk)})", "limit": len(chunk)}) or {}
+            results = (data.get(CONTAINER_QUERIES[container_type]) or {}).get("results") or []
+            self.connections.expand(results, container_type, "tests", member_fields)
+            return results
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(fetch, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    for container in future.result():
+                        with write_lock:
+                            self._add_container(index, container, output)
+        finally:
+            if output:
+                output.close()
+
+        found = set(index["containers"])
+        found.update(c["key"] for c in index["containers"].values() if c.get("key"))
+        missing = [container for container in requested if container not in found]
+        if missing:
+            logger.warning(f"{len(missing)} {container_type} containers not found: {', '.join(missing)}")
+
+        logger.info(f"Expanded {len(index['containers'])} {container_type} containers: "
+                    f"{len(index['members'])} unique members")
+        return index
+
+    @staticmethod
+    def _add_container(index: Dict[str, Any], container: Dict[str, Any], output):
+        member_ids = []
+        seen = set()
+        for member in (container.get("tests") or {}).get("results") or []:
+            member_id = member.get("issueId")
+            if member_id is None or member_id in seen:
+                continue
+            seen.add(member_id)
+            if member_id not in index["members"]:
+                index["members"][member_id] = member
+                if output:
+                    output.write(json.dumps({"type": "member", **member}, separators=(",", ":")) + "\n")
+            member_ids.append(member_id)
+
+        jira = container.get("jira") or {}
+        record = {
+            "issueId": container.get("issueId"),
+            "key": jira.get("key"),
+            "summary": jira.get("summary"),
+            "total": (container.get("tests") or {}).get("total", len(member_ids)),
+            "members": member_ids,
+        }
+        index["containers"][record["issueId"]] = record
+        if output:
+            output.write(json.dumps({"type": "container", **record}, separators=(",", ":")) + "\n")
+            output.flush()
+
+
+def main():
+    from auth_utils import XrayAPIClient
+
+    parser = argparse.ArgumentParser(description="Fetch complete membership for many Xray containers")
+    parser.add_argument("container_type", choices=sorted(CONTAINER_QUERIES), help="Container type")
+    parser.add_argument("containers", nargs="+", help="Container issue ids or Jira keys")
+    parser.add_argument("--output", default="membership.ndjson", help="NDJSON index file")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests")
+    args = parser.parse_args()
+
+    client = XrayAPIClient()
+    index = MembershipExpander(client.execute_graphql_query, max_workers=args.workers).expand(
+        args.containers, args.container_type, index_path=args.output
+    )
+
+    for container in index["containers"].values():
+        print(f"{container['key']}: {len(container['members'])} tests")
+    print(f"\n✓ {len(index['members'])} unique tests across {len(index['containers'])} containers")
+    print(f"✓ Index saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Batched precondition-to-test association.
+
+Linking preconditions one (test, precondition) pair per request means a run
+over a few thousand pairs takes thousands of requests. PreconditionLinker groups
+the pairs by test, reads which of them are already linked, and sends one
+addPreconditionsToTest per test with the full id list, many tests per request
+(one alias each):
+
+    linker = PreconditionLinker(client.execute_graphql_query)
+    result = linker.associate([(test_id, precondition_id), ...])
+    print(f"{result.added_count} linked, {result.skipped_count} already linked")
+
+swap() replaces preconditions the same way (add the new ids, then remove the
+old ones, in one mutation per test), e.g. to move tests off a duplicate.
+Reads and writes run concurrently, paced by the shared rate limiter.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from connection_expander import ConnectionExpander
+from query_complexity import DEFAULT_SERVER_LIMIT, MAX_PAGE_SIZE, estimate_complexity
+from rate_limiter import RateLimiter, shared_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class AssociationResult(NamedTuple):
+    """Outcome of an association run, keyed by test issue id"""
+    added: Dict[str, List[str]]    # Precondition ids linked by this run
+    skipped: Dict[str, List[str]]  # Precondition ids that were already linked
+    failed: Dict[str, str]         # Error for tests whose preconditions could not be linked
+    warnings: Dict[str, str]       # Warnings Xray returned for a test
+
+    @property
+    def added_count(self) -> int:
+        return sum(len(ids) for ids in self.added.values())
+
+    @property
+    def skipped_count(self) -> int:
+        return sum(len(ids) for ids in self.skipped.values())
+
+
+def group_pairs(pairs: Iterable[Tuple[str, str]]) -> Dict[str, List[str]]:
+    """Precondition ids per test, without duplicates, in first-seen order"""
+    grouped: Dict[str, Dict[str, None]] = {}
+    for test_id, precondition_id in pairs:
+        grouped.setdefault(str(test_id), {})[str(precondition_id)] = None
+    return {test_id: list(ids) for test_id, ids in grouped.items()}
+
+
+class PreconditionLinker:
+    """Links preconditions to tests with one aliased mutation field per test."""
+
+    def __init__(self, execute: Callable[[str, Dict[str, Any]], Dict[str, Any]], max_workers: int = 4,
+                 max_aliases: int = 50, server_limit: int = DEFAULT_SERVER_LIMIT,
+                 rate_limiter: Optional[RateLimiter] = None):
+        """
+        Args:
+            execute: Runs a GraphQL query with variables and returns its `data`
+                     (XrayAPIClient.execute_graphql_query, XrayGraphQLClient.execute_query)
+            max_workers: Concurrent requests
+            max_aliases: Upper bound on tests per request
+            server_limit: Complexity limit each read must stay under
+            rate_limiter: Request pacing (defaults to the process-wide limiter)
+        """
+        self.execute = execute
+        self.max_workers = max_workers
+        self.max_aliases = max_aliases
+        self.server_limit = server_limit
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self.connections = ConnectionExpander(execute, max_workers=max_workers,
+                                              server_limit=server_limit, rate_limiter=self.rate_limiter)
+
+    @staticmethod
+    def build_read_query(test_ids: List[str]) -> Tuple[str, Dict[str, Any]]:
+        """Aliased query for the linked preconditions of several tests; test i is `t<i>`"""
+        definitions = ", ".join(f"$id{i}: String!" for i in range(len(test_ids)))
+        fields = "\n".join(
+            f"    t{i}: getTest(issueId: $id{i}) {{ issueId preconditions(limit: {MAX_PAGE_SIZE}, start: 0) "
+            "{ total results { issueId } } }"
+            for i in range(len(test_ids))
+        )
+        query = f"query GetLinkedPreconditions({definitions}) {{\n{fields}\n}}"
+        return query, {f"id{i}": test_id for i, test_id in enumerate(test_ids)}
+
+    @staticmethod
+    def build_mutation(groups: List[Tuple[str, List[str]]]) -> Tuple[str, Dict[str, Any]]:
+        """Aliased addPreconditionsToTest, one field per (test id, precondition ids); test i is `t<i>`"""
+        definitions = ", ".join(f"$id{i}: String!, $preconditions{i}: [String]!" for i in range(len(groups)))
+        fields = "\n".join(
+            f"    t{i}: addPreconditionsToTest(issueId: $id{i}, preconditionIssueIds: $preconditions{i}) "
+            "{ addedPreconditions warning }"
+            for i in range(len(groups))
+        )
+        variables: Dict[str, Any] = {}
+        for i, (test_id, precondition_ids) in enumerate(groups):
+            variables[f"id{i}"] = test_id
+            variables[f"preconditions{i}"] = precondition_ids
+        return f"mutation AddPreconditions({definitions}) {{\n{fields}\n}}", variables
+
+    @staticmethod
+    def build_swap_mutation(swaps: List[Tuple[str, List[str], List[str]]]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Aliased add-then-remove per (test id, ids to add, ids to remove).
+
+        Test i is returned under `a<i>` (addPreconditionsToTest) and `r<i>`
+        (removePreconditionsFromTest); a field is left out when its list is empty.
+        """
+        definitions, fields = [], []
+        variables: Dict[str, Any] = {}
+        for i, (test_id, add_ids, remove_ids) in enumerate(swaps):
+            definitions.append(f"$id{i}: String!")
+            variables[f"id{i}"] = test_id
+            if add_ids:
+                definitions.append(f"$add{i}: [String]!")
+                variables[f"add{i}"] = add_ids
+                fields.append(f"    a{i}: addPreconditionsToTest(issueId: $id{i}, preconditionIssueIds: $add{i}) "
+                              "{ addedPreconditions warning }")
+            if remove_ids:
+                definitions.append(f"$remove{i}: [String]!")
+                variables[f"remove{i}"] = remove_ids
+                fields.append(f"    r{i}: removePreconditionsFromTest(issueId: $id{i}, "
+                              f"preconditionIssueIds: $remove{i})")
+        return f"mutation SwapPreconditions({', '.join(definitions)}) {{\n" + "\n".join(fields) + "\n}", variables
+
+    def _reads_per_request(self) -> int:
+        query, variables = self.build_read_query(["0"])
+        cost = max(1, estimate_complexity(query, variables))
+        return max(1, min(self.max_aliases, self.server_limit // cost))
+
+    def _batches(self, items: List[Any], size: int) -> List[List[Any]]:
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def read_links(self, test_ids: Iterable[str]) -> Tuple[Dict[str, Set[str]], Dict[str, str]]:
+        """
+        Precondition ids already linked to each test, without raising on failed reads.
+
+        Returns:
+            (test id -> linked precondition ids, test id -> read error); tests
+            that do not exist are in neither
+        """
+        requested = list(dict.fromkeys(str(test_id) for test_id in test_ids))
+        errors: Dict[str, str] = {}
+
+        def fetch(batch):
+            query, variables = self.build_read_query(batch)
+            self.rate_limiter.acquire()
+            try:
+                data = self.execute(query, variables) or {}
+            except Exception as e:
+                return batch, [], str(e)
+            return batch, [data.get(f"t{i}") for i in range(len(batch))], None
+
+        tests = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch, results, error in executor.map(fetch, self._batches(requested, self._reads_per_request())):
+                if error:
+                    errors.update((test_id, f"Could not read linked preconditions: {error}") for test_id in batch)
+                tests.extend(test for test in results if test)
+        try:
+            self.connections.expand(tests, "Test", "preconditions", "issueId")
+        except Exception as e:
+            # Only the tests with more than one page of links are incomplete
+            for test in tests:
+                nested = test.get("preconditions") or {}
+                if (nested.get("total") or 0) > len(nested.get("results") or []):
+                    errors[test["issueId"]] = f"Could not read linked preconditions: {e}"
+
+        links = {
+            test["issueId"]: {p["issueId"] for p in (test.get("preconditions") or {}).get("results") or []}
+            for test in tests if test["issueId"] not in errors
+        }
+        return links, errors
+
+    def linked(self, test_ids: Iterable[str]) -> Dict[str, Set[str]]:
+        """
+        Precondition ids already linked to each test (complete, however many there are).
+
+        Tests that do not exist are left out of the result.
+
+        Raises:
+            Exception: The links of some tests could not be read
+        """
+        links, errors = self.read_links(test_ids)
+        if errors:
+            raise Exception(f"Could not read the links of {len(errors)} tests: {next(iter(errors.values()))}")
+        return links
+
+    def associate(self, pairs: Iterable[Tuple[str, str]], skip_existing: bool = True) -> AssociationResult:
+        """
+        Link every (test id, precondition id) pair.
+
+        Args:
+            pairs: Pairs to link, in any order, duplicates allowed
+            skip_existing: Read the current links first and only send missing pairs
+                           (turn off for tests created in the same run)
+
+        Returns:
+            AssociationResult
+        """
+        wanted = group_pairs(pairs)
+        result = AssociationResult({}, {}, {}, {})
+        if not wanted:
+            return result
+
+        if skip_existing:
+            # A failed read fails its tests only, like a failed mutation batch
+            existing, read_errors = self.read_links(wanted)
+            result.failed.update(read_errors)
+            for test_id in wanted:
+                if test_id in read_errors:
+                    continue
+                if test_id not in existing:
+                    result.failed[test_id] = "Test not found"
+                    continue
+                already = [pid for pid in wanted[test_id] if pid in existing[test_id]]
+                if already:
+                    result.skipped[test_id] = already
+            wanted = {test_id: [pid for pid in ids if pid not in existing.get(test_id, ())]
+                      for test_id, ids in wanted.items() if test_id in existing}
+        groups = [(test_id, ids) for test_id, ids in wanted.items() if ids]
+        batches = self._batches(groups, self.max_aliases)
+        logger.info(f"Linking {sum(len(ids) for _, ids in groups)} preconditions to {len(groups)} tests "
+                    f"in {len(batches)} requests")
+
+        def send(batch):
+            query, variables = self.build_mutation(batch)
+            self.rate_limiter.acquire()
+            try:
+                return batch, self.execute(query, variables) or {}, None
+            except Exception as e:
+                return batch, {}, str(e)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch, data, error in executor.map(send, batches):
+                for i, (test_id, precondition_ids) in enumerate(batch):
+                    response = data.get(f"t{i}")
+                    if error or response is None:
+                        result.failed[test_id] = error or "No result from mutation"
+                        continue
+                    added = response.get("addedPreconditions")
+                    result.added[test_id] = list(added) if added is not None else precondition_ids
+                    if response.get("warning"):
+                        result.warnings[test_id] = response["warning"]
+        return result
+
+    def swap(self, swaps: Dict[str, Tuple[List[str], List[str]]]) -> AssociationResult:
+        """
+        Add and remove preconditions of many tests, one add-then-remove per test.
+
+        Args:
+            swaps: Test id -> (precondition ids to add, precondition ids to remove)
+
+        Returns:
+            AssociationResult; `added` holds the ids Xray reported as added and
+            `failed` the tests whose request failed (their links are unchanged
+            or only partly changed)
+        """
+        items = [(test_id, list(add_ids), list(remove_ids))
+                 for test_id, (add_ids, remove_ids) in swaps.items() if add_ids or remove_ids]
+        result = AssociationResult({}, {}, {}, {})
+        batches = self._batches(items, self.max_aliases)
+        logger.info(f"Swapping preconditions of {len(items)} tests in {len(batches)} requests")
+
+        def send(batch):
+            query, variables = self.build_swap_mutation(batch)
+            self.rate_limiter.acquire()
+            try:
+                return batch, self.execute(query, variables) or {}, None
+            except Exception as e:
+                return batch, {}, str(e)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch, data, error in executor.map(send, batches):
+                for i, (test_id, add_ids, remove_ids) in enumerate(batch):
+                    added = data.get(f"a{i}")
+                    if error or (add_ids and added is None) or (remove_ids and data.get(f"r{i}") is None):
+                        result.failed[test_id] = error or "No result from mutation"
+                        continue
+                    if add_ids:
+                        reported = added.get("addedPreconditions")
+                        result.added[test_id] = list(reported) if reported is not None else add_ids
+                        if added.get("warning"):
+                            result.warnings[test_id] = added["warning"]
+        return result
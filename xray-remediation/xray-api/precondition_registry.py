@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Content-hash index of a project's preconditions.
+
+Scripts that create a precondition for every definition they come across leave
+a duplicate each time the same text shows up again, in the same run or a later
+one, and the duplicates then need a cleanup pass (relinking every test and
+deleting the copies). The registry reads the project's preconditions once, in
+bulk, and indexes them by their type and a hash of their normalized definition;
+creation goes through get_or_create() so an existing precondition is reused
+instead:
+
+    registry = PreconditionRegistry(client.execute_graphql_query, "FRAMED")
+    registry.load()
+    entry, created = registry.get_or_create(text, create_precondition)
+
+Definitions are compared after whitespace normalization: line endings, runs
+of spaces and surrounding whitespace do not make a precondition different, but
+letter case does, and so does the precondition type (Manual, Generic,
+Cucumber), so a test is never linked to text other than its own.
+"""
+
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from rate_limiter import RateLimiter, shared_rate_limiter
+from step_diff import normalize_text
+
+logger = logging.getLogger(__name__)
+
+PRECONDITIONS_QUERY = """
+query GetPreconditions($jql: String, $limit: Int!, $start: Int) {
+    getPreconditions(jql: $jql, limit: $limit, start: $start) {
+        total
+        results {
+            issueId
+            definition
+            preconditionType {
+                name
+            }
+            jira(fields: ["key"])
+        }
+    }
+}
+"""
+
+# Type Xray gives a precondition created without one
+DEFAULT_TYPE = "Manual"
+
+
+def normalize_definition(definition: Optional[str]) -> str:
+    return normalize_text(definition or "")
+
+
+def definition_hash(definition: Optional[str], precondition_type: str = DEFAULT_TYPE) -> str:
+    """Index key of a precondition definition of a type"""
+    key = f"{precondition_type}\0{normalize_definition(definition)}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class PreconditionEntry(NamedTuple):
+    issue_id: str
+    key: Optional[str]
+    definition: str
+    precondition_type: str = DEFAULT_TYPE
+
+
+def _entry(precondition: Any, definition: str, precondition_type: str) -> PreconditionEntry:
+    """Entry for a getPreconditions/createPrecondition result, or a bare issue id"""
+    if isinstance(precondition, PreconditionEntry):
+        return precondition
+    if not isinstance(precondition, dict):
+        return PreconditionEntry(str(precondition), None, definition, precondition_type)
+    jira = precondition.get("jira") or {}
+    return PreconditionEntry(str(precondition["issueId"]), jira.get("key") or precondition.get("key"),
+                             precondition.get("definition") or definition,
+                             (precondition.get("preconditionType") or {}).get("name") or precondition_type)
+
+
+class PreconditionRegistry:
+    """Preconditions of one project, indexed by type and normalized-definition hash."""
+
+    def __init__(self, execute: Callable[[str, Dict[str, Any]], Dict[str, Any]], project_key: str,
+                 page_size: int = 100, max_workers: int = 4, rate_limiter: Optional[RateLimiter] = None):
+        """
+        Args:
+            execute: Runs a GraphQL query with variables and returns its `data`
+                     (XrayAPIClient.execute_graphql_query, XrayGraphQLClient.execute_query)
+            project_key: Project whose preconditions are indexed
+            page_size: Preconditions per getPreconditions page
+            max_workers: Pages fetched concurrently after the first
+            rate_limiter: Request pacing (defaults to the process-wide limiter)
+        """
+        self.execute = execute
+        self.project_key = project_key
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self.loaded = False
+        self._index: Dict[str, List[PreconditionEntry]] = {}
+        self._lock = threading.Lock()
+        self._hash_locks: Dict[str, threading.Lock] = {}
+
+    def _fetch_page(self, start: int) -> Dict[str, Any]:
+        self.rate_limiter.acquire()
+        variables = {"jql": f'project = "{self.project_key}"', "limit": self.page_size, "start": start}
+        return (self.execute(PRECONDITIONS_QUERY, variables) or {}).get("getPreconditions") or {}
+
+    def load(self) -> int:
+        """
+        Index every precondition of the project: the first page gives the
+        total, the remaining pages are fetched concurrently.
+
+        Returns:
+            Number of preconditions indexed
+        """
+        first = self._fetch_page(0)
+        pages = [first]
+        starts = range(self.page_size, first.get("total") or 0, self.page_size)
+        if starts:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pages.extend(executor.map(self._fetch_page, starts))
+
+        count = 0
+        for page in pages:
+            for precondition in page.get("results") or []:
+                self.register(precondition)
+                count += 1
+        self.loaded = True
+        logger.info(f"Indexed {count} preconditions of {self.project_key}")
+        return count
+
+    def register(self, precondition: Any, definition: Optional[str] = None,
+                 precondition_type: str = DEFAULT_TYPE) -> PreconditionEntry:
+        """
+        Add a precondition to the index.
+
+        Args:
+            precondition: A getPreconditions/createPrecondition result, an entry or an issue id
+            definition: Definition text, when `precondition` does not carry it
+            precondition_type: Type name, when `precondition` does not carry it
+        """
+        entry = _entry(precondition, definition or "", precondition_type)
+        with self._lock:
+            entries = self._index.setdefault(definition_hash(entry.definition, entry.precondition_type), [])
+            if all(existing.issue_id != entry.issue_id for existing in entries):
+                entries.append(entry)
+        return entry
+
+    def find(self, definition: str, precondition_type: str = DEFAULT_TYPE) -> Optional[PreconditionEntry]:
+        """The existing precondition of this type with this definition (lowest issue id), or None"""
+        with self._lock:
+            entries = self._index.get(definition_hash(definition, precondition_type))
+            return min(entries, key=_issue_order) if entries else None
+
+    def get_or_create(self, definition: str, create: Callable[[str], Any],
+                      precondition_type: str = DEFAULT_TYPE) -> Tuple[PreconditionEntry, bool]:
+        """
+        The precondition of this type with this definition, creating it if there is none.
+
+        Concurrent calls for the same definition create it once.
+
+        Args:
+            create: Creates a precondition of the type from the definition and
+                    returns the createPrecondition result (or its issue id)
+            precondition_type: Type name the precondition must have
+
+        Returns:
+            (entry, True if it was created by this call)
+        """
+        if not self.loaded:
+            self.load()
+        digest = definition_hash(definition, precondition_type)
+        with self._lock:
+            hash_lock = self._hash_locks.setdefault(digest, threading.Lock())
+        with hash_lock:
+            existing = self.find(definition, precondition_type)
+            if existing:
+                return existing, False
+            return self.register(create(definition), definition, precondition_type), True
+
+    def duplicates(self) -> List[List[PreconditionEntry]]:
+        """Groups of preconditions sharing a type and definition, each ordered by issue id"""
+        with self._lock:
+            return [sorted(entries, key=_issue_order) for entries in self._index.values() if len(entries) > 1]
+
+    def __iter__(self) -> Iterator[PreconditionEntry]:
+        with self._lock:
+            entries = [entry for group in self._index.values() for entry in group]
+        return iter(entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._index.values())
+
+
+def _issue_order(entry: PreconditionEntry) -> Tuple[int, str]:
+    return (int(entry.issue_id), entry.issue_id) if entry.issue_id.isdigit() else (1 << 62, entry.issue_id)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Append-only progress journal for paginated fetches.
+
+Instead of rewriting a progress file with every processed issue id after each
+page (quadratic over a run), each completed page appends one compact NDJSON
+record to a page segment (`<path>.pages`). Records are flushed immediately
+(safe against a process crash) and fsynced in batches (safe against a machine
+crash, losing at most the last few pages, which are simply fetched again).
+
+Every `compact_every` pages the segment is folded into the journal itself as
+one snapshot record holding only the ids added since the previous snapshot,
+and a new, empty segment is started. Nothing is ever rewritten, so every id is
+written twice at most over a whole run:
+
+    {"type":"header","project_id":"26420","total":20000,"timestamp":"..."}   # <path>
+    {"type":"snapshot","position":19900,"pages":200,"ids":[...]}              # ids of pages 1-200
+    {"type":"snapshot","position":39800,"pages":400,"ids":[...]}              # ids of pages 201-400
+
+    {"type":"page","seq":401,"start":39800,"next":39899,"ids":["1158139", ...]}   # <path>.pages
+
+Resume replays the journal, then the segment: the last `position`/`next` is
+the position to continue from and the union of `ids` is the set of processed
+issues. Page records already covered by a snapshot (`seq` up to its `pages`,
+left behind by a crash between the two writes) are skipped.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class ProgressJournal:
+    """Append-only, fsync-batched journal of completed page offsets and issue ids."""
+
+    def __init__(self, path: str, sync_every: int = 10, sync_interval: float = 5.0, compact_every: int = 200):
+        """
+        Args:
+            path: Journal file (the current page segment is kept next to it, in <path>.pages)
+            sync_every: fsync after this many page records
+            sync_interval: ...or after this many seconds since the last fsync
+            compact_every: Fold the page segment into one snapshot record after this many page records
+        """
+        self.path = path
+        self.pages_path = f"{path}.pages"
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._pages_since_compaction = 0
+        self._state = None
+        self._new_ids = set()  # Ids recorded since the last snapshot
+        self._snapshot_pages = 0  # Pages covered by the last snapshot
+        self._journal_size = 0  # Bytes of the journal up to its last complete record
+
+    @staticmethod
+    def _records(path: str) -> Iterable[Tuple[Dict[str, Any], int]]:
+        """(record, offset after it) for each complete record of a file, stopping at a torn one."""
+        if not os.path.exists(path):
+            return
+        offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Torn final write from a crash; everything before it is intact
+                    return
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    return
+                offset += len(line)
+                yield record, offset
+
+    def replay(self) -> Optional[Dict[str, Any]]:
+        """
+        Rebuild progress from the journal and its page segment.
+
+        Returns:
+            Dict with header fields plus timestamp, position, pages and issue_ids (a set),
+            or None if there is no journal
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        state = {"position": 0, "pages": 0, "issue_ids": set()}
+        new_ids = set()
+        self._journal_size = 0
+        self._snapshot_pages = 0
+        for path in (self.path, self.pages_path):
+            for record, offset in self._records(path):
+                kind = record.pop("type", None)
+                if kind == "header":
+                    state.update(record)
+                elif kind == "snapshot":
+                    state["position"] = record["position"]
+                    state["pages"] = record["pages"]
+                    state["issue_ids"].update(record["ids"])
+                    new_ids = set()
+                    self._snapshot_pages = record["pages"]
+                elif kind == "page":
+                    if record.get("seq", state["pages"] + 1) <= state["pages"]:
+                        continue
+                    state["position"] = record["next"]
+                    state["pages"] += 1
+                    state["issue_ids"].update(record["ids"])
+                    new_ids.update(record["ids"])
+                if path == self.path:
+                    self._journal_size = offset
+
+        self._state = state
+        self._new_ids = new_ids
+        return state
+
+    def start(self, resume: bool = False, **header):
+        """
+        Open the journal for appending.
+
+        Args:
+            resume: Keep existing records (call replay() first); otherwise start a new journal
+            **header: Run metadata written at the top of a new journal (project id, total, ...)
+        """
+        if resume and self._state is not None:
+            # Drop a torn snapshot, then fold the old segment in so appends never follow a torn record
+            with open(self.path, "r+b") as f:
+                f.truncate(self._journal_size)
+            self.compact()
+            return
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        header = {"timestamp": datetime.now().isoformat(), **header}
+        self._state = {"position": 0, "pages": 0, "issue_ids": set(), **header}
+        self._new_ids = set()
+        self._snapshot_pages = 0
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "header", **header}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._file = open(self.pages_path, "w", encoding="utf-8")
+        self._pages_since_compaction = 0
+        self.sync()
+
+    def record_page(self, start: int, next_position: int, issue_ids: Iterable[str]):
+        """Append one completed page."""
+        ids = [issue_id for issue_id in issue_ids if issue_id is not None]
+        self._state["pages"] += 1
+        self._append({"type": "page", "seq": self._state["pages"], "start": start, "next": next_position,
+                      "ids": ids})
+        self._state["position"] = next_position
+        self._state["issue_ids"].update(ids)
+        self._new_ids.update(ids)
+
+        self._unsynced += 1
+        self._pages_since_compaction += 1
+        if self._pages_since_compaction >= self.compact_every:
+            self.compact()
+        elif self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def _append(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def sync(self):
+        """fsync everything appended so far."""
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def compact(self):
+        """Append the ids recorded since the last snapshot as a new snapshot and start an empty page segment."""
+        if self._state["pages"] > self._snapshot_pages:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"type": "snapshot", "position": self._state["position"],
+                                    "pages": self._state["pages"], "ids": sorted(self._new_ids)},
+                                   separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+                self._journal_size = f.tell()
+            self._snapshot_pages = self._state["pages"]
+
+        # The snapshot covers the segment's pages, so a crash before this truncation is harmless
+        if self._file:
+            self._file.close()
+        self._file = open(self.pages_path, "w", encoding="utf-8")
+        self._new_ids = set()
+        self._pages_since_compaction = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Close and delete the journal and its page segment (after a completed run)."""
+        self.close()
+        for path in (self.path, self.pages_path):
+            if os.path.exists(path):
+                os.remove(path)
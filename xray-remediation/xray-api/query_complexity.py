@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Worst-case complexity estimates for Xray GraphQL queries.
+
+Xray Cloud rejects (or times out on) queries whose worst-case number of returned
+items exceeds its complexity limit. Every paginated field (one with a `limit`
+argument, e.g. getExpandedTests, preconditions, tests) can return up to `limit`
+items for each of its parents, so nested connections multiply:
+
+    getExpandedTests(limit: 100) { results { preconditions(limit: 100) { ... } } }
+    = 100 + 100 * 100 = 10,100 items
+
+The estimator reads field definitions from docs/xray_schema.graphql, evaluates a
+query with its variables and is used by AdaptivePager to pick the largest page
+size under the limit and to shrink pages when the server times out.
+
+Usage:
+    python query_complexity.py query.graphql '{"limit": 100}'
+"""
+
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+SCHEMA_FILE = Path(__file__).resolve().parent.parent.parent / "docs" / "xray_schema.graphql"
+
+# Xray Cloud's documented per-query item limit; override with XRAY_COMPLEXITY_LIMIT
+DEFAULT_SERVER_LIMIT = int(os.environ.get("XRAY_COMPLEXITY_LIMIT", "10000"))
+# "The maximum is 100." for every paginated field in the schema
+MAX_PAGE_SIZE = 100
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<block>"""(?:.|\n)*?""")
+  | (?P<string>"(?:\\.|[^"\\])*")
+  | (?P<comment>\#[^\n]*)
+  | (?P<spread>\.\.\.)
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+  | (?P<punct>[!$():=@\[\]{}|&])
+  | (?P<skip>[\s,]+)
+''', re.VERBOSE)
+
+TIMEOUT_MARKERS = ("timeout", "timed out", "time out", "complexity", "too complex", "query cost")
+
+
+class QueryParseError(ValueError):
+    """Raised when a schema or query document cannot be tokenized or parsed."""
+
+
+def tokenize(source: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    while position < len(source):
+        match = TOKEN_PATTERN.match(source, position)
+        if not match:
+            raise QueryParseError(f"Unexpected character {source[position]!r} at offset {position}")
+        kind = match.lastgroup
+        if kind not in ("skip", "comment", "block"):
+            tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class _TokenStream:
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.index = 0
+
+    def peek(self, offset: int = 0) -> Tuple[Optional[str], Optional[str]]:
+        index = self.index + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self) -> Tuple[Optional[str], Optional[str]]:
+        token = self.peek()
+        self.index += 1
+        return token
+
+    def accept(self, value: str) -> bool:
+        if self.peek()[1] == value:
+            self.index += 1
+            return True
+        return False
+
+    def expect(self, value: str):
+        kind, actual = self.next()
+        if actual != value:
+            raise QueryParseError(f"Expected {value!r}, found {actual!r}")
+
+    def skip_balanced(self, opening: str, closing: str):
+        depth = 0
+        while True:
+            kind, value = self.next()
+            if kind is None:
+                raise QueryParseError(f"Unbalanced {opening}{closing}")
+            if value == opening:
+                depth += 1
+            elif value == closing:
+                depth -= 1
+                if depth == 0:
+                    return
+
+
+class XraySchema:
+    """Field return types and paginated fields parsed from an SDL file."""
+
+    def __init__(self, fields: Dict[str, Dict[str, Tuple[str, bool]]],
+                 arguments: Optional[Dict[str, Dict[str, Tuple[str, ...]]]] = None):
+        # type name -> field name -> (return type name, has limit argument)
+        self.fields = fields
+        # type name -> field name -> argument names
+        self.arguments = arguments or {}
+
+    @classmethod
+    def load(cls, path: Path = SCHEMA_FILE) -> "XraySchema":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.parse(f.read())
+
+    @classmethod
+    def parse(cls, sdl: str) -> "XraySchema":
+        stream = _TokenStream(tokenize(sdl))
+        fields = {}
+        arguments = {}
+        while stream.peek()[0] is not None:
+            kind, value = stream.next()
+            if value in ("type", "interface", "input") and stream.peek()[0] == "name":
+                _, type_name = stream.next()
+                # implements A & B, directives
+                while stream.peek()[1] not in ("{", None) and stream.peek()[1] not in ("type", "interface"):
+                    stream.next()
+                if stream.peek()[1] != "{":
+                    continue
+                fields[type_name], arguments[type_name] = cls._parse_fields(stream)
+            elif value == "{":
+                stream.index -= 1
+                stream.skip_balanced("{", "}")
+        return cls(fields, arguments)
+
+    @staticmethod
+    def _parse_fields(stream: _TokenStream) -> Tuple[Dict[str, Tuple[str, bool]], Dict[str, Tuple[str, ...]]]:
+        stream.expect("{")
+        fields = {}
+        arguments = {}
+        while not stream.accept("}"):
+            _, field_name = stream.next()
+            names: Tuple[str, ...] = ()
+            if stream.peek()[1] == "(":
+                start = stream.index
+                stream.skip_balanced("(", ")")
+                argument_tokens = stream.tokens[start:stream.index]
+                # `name:` directly inside the parentheses (not in directive arguments)
+                depth = 0
+                for i, (kind, value) in enumerate(argument_tokens[:-1]):
+                    depth += value == "("
+                    depth -= value == ")"
+                    if depth == 1 and kind == "name" and argument_tokens[i + 1][1] == ":":
+                        names += (value,)
+            has_limit = "limit" in names
+            stream.expect(":")
+            return_type = None
+            while True:
+                kind, value = stream.peek()
+                if kind == "name" and return_type is None:
+                    return_type = value
+                    stream.next()
+                elif value in ("[", "]", "!"):
+                    stream.next()
+                else:
+                    break
+            if stream.peek()[1] == "=":
+                stream.next()
+                stream.next()
+            while stream.accept("@"):
+                stream.next()
+                if stream.peek()[1] == "(":
+                    stream.skip_balanced("(", ")")
+            fields[field_name] = (return_type, has_limit)
+            arguments[field_name] = names
+        return fields, arguments
+
+    def field(self, type_name: Optional[str], field_name: str) -> Tuple[Optional[str], bool]:
+        return self.fields.get(type_name or "", {}).get(field_name, (None, False))
+
+    def field_arguments(self, type_name: Optional[str], field_name: str) -> Optional[Tuple[str, ...]]:
+        """Argument names of a field, or None if the schema does not define it"""
+        return self.arguments.get(type_name or "", {}).get(field_name)
+
+    def is_leaf(self, type_name: Optional[str]) -> bool:
+        """True for scalars and enums, which take no selection set"""
+        return type_name is not None and type_name not in self.fields
+
+
+_default_schema = None
+
+
+def default_schema() -> XraySchema:
+    """Schema parsed from docs/xray_schema.graphql (cached)."""
+    global _default_schema
+    if _default_schema is None:
+        _default_schema = XraySchema.load()
+    return _default_schema
+
+
+class _QueryParser:
+    """Minimal GraphQL executable-document parser (operations, fragments, arguments)."""
+
+    def __init__(self, query: str):
+        self.stream = _TokenStream(tokenize(query))
+
+    def parse(self):
+        operations = []
+        fragments = {}
+        stream = self.stream
+        while stream.peek()[0] is not None:
+            _, value = stream.peek()
+            if value == "fragment":
+                stream.next()
+                _, name = stream.next()
+                stream.expect("on")
+                _, type_condition = stream.next()
+                self._skip_directives()
+                fragments[name] = (type_condition, self._selection_set())
+            elif value == "{":
+                operations.append(("query", {}, self._selection_set()))
+            else:
+                _, operation_type = stream.next()
+                if stream.peek()[0] == "name":
+                    stream.next()
+                defaults = self._variable_definitions() if stream.peek()[1] == "(" else {}
+                self._skip_directives()
+                operations.append((operation_type, defaults, self._selection_set()))
+        return operations, fragments
+
+    def _variable_definitions(self) -> Dict[str, Any]:
+        defaults = {}
+        stream = self.stream
+        stream.expect("(")
+        while not stream.accept(")"):
+            stream.expect("$")
+            _, name = stream.next()
+            stream.expect(":")
+            depth = 0
+            while True:
+                _, value = stream.peek()
+                if value == "[":
+                    depth += 1
+                elif value == "]":
+                    depth -= 1
+                elif value not in ("!",) and depth == 0 and stream.peek()[0] == "name":
+                    stream.next()
+                    break
+                stream.next()
+            while stream.peek()[1] in ("]", "!"):
+                stream.next()
+            if stream.accept("="):
+                defaults[name] = self._value({})
+            self._skip_directives()
+        return defaults
+
+    def _skip_directives(self):
+        while self.stream.accept("@"):
+            self.stream.next()
+            if self.stream.peek()[1] == "(":
+                self.stream.skip_balanced("(", ")")
+
+    def _selection_set(self) -> List[Any]:
+        selections = []
+        stream = self.stream
+        stream.expect("{")
+        while not stream.accept("}"):
+            if stream.accept("..."):
+                if stream.peek()[1] == "on":
+                    stream.next()
+                    stream.next()
+                    self._skip_directives()
+                    selections.append(("inline", None, self._selection_set()))
+                elif stream.peek()[1] == "{":
+                    selections.append(("inline", None, self._selection_set()))
+                else:
+                    _, name = stream.next()
+                    self._skip_directives()
+                    selections.append(("spread", name, None))
+                continue
+
+            _, name = stream.next()
+            if stream.accept(":"):
+                _, name = stream.next()
+            arguments = self._arguments() if stream.peek()[1] == "(" else {}
+            self._skip_directives()
+            children = self._selection_set() if stream.peek()[1] == "{" else []
+            selections.append(("field", name, (arguments, children)))
+        return selections
+
+    def _arguments(self) -> Dict[str, Any]:
+        arguments = {}
+        stream = self.stream
+        stream.expect("(")
+        while not stream.accept(")"):
+            _, name = stream.next()
+            stream.expect(":")
+            arguments[name] = self._value(arguments)
+        return arguments
+
+    def _value(self, _context) -> Any:
+        stream = self.stream
+        kind, value = stream.next()
+        if value == "$":
+            _, name = stream.next()
+            return ("$", name)
+        if value == "[":
+            items = []
+            while not stream.accept("]"):
+                items.append(self._value(_context))
+            return items
+        if value == "{":
+            obj = {}
+            while not stream.accept("}"):
+                _, key = stream.next()
+                stream.expect(":")
+                obj[key] = self._value(_context)
+            return obj
+        if kind == "number":
+            return float(value) if any(c in value for c in ".eE") else int(value)
+        if kind == "string":
+            return json.loads(value)
+        if value in ("true", "false"):
+            return value == "true"
+        if value == "null":
+            return None
+        return value
+
+
+def _resolve(value: Any, variables: Dict[str, Any]) -> Any:
+    if isinstance(value, tuple) and value and value[0] == "$":
+        return variables.get(value[1])
+    return value
+
+
+def root_field_errors(query: str, schema: Optional[XraySchema] = None) -> List[str]:
+    """
+    Validation errors Xray reports for the root fields of a query: arguments the
+    schema does not define, selections on scalar results and missing selections
+    on object results. Fields the schema does not define are not checked.
+    """
+    schema = schema or default_schema()
+    operations, _ = _QueryParser(query).parse()
+    errors = []
+    for operation_type, _, selections in operations:
+        root_type = "Mutation" if operation_type == "mutation" else "Query"
+        for kind, name, payload in selections:
+            allowed = schema.field_arguments(root_type, name) if kind == "field" else None
+            if allowed is None:
+                continue
+            arguments, children = payload
+            for argument in arguments:
+                if argument not in allowed:
+                    errors.append(f'Unknown argument "{argument}" on field "{root_type}.{name}"')
+            return_type, _ = schema.field(root_type, name)
+            if schema.is_leaf(return_type) and children:
+                errors.append(f'Field "{name}" must not have a selection since type "{return_type}" has no subfields')
+            elif not schema.is_leaf(return_type) and not children:
+                errors.append(f'Field "{name}" of type "{return_type}" must have a selection of subfields')
+    return errors
+
+
+def estimate_complexity(query: str, variables: Optional[Dict[str, Any]] = None,
+                        schema: Optional[XraySchema] = None) -> int:
+    """
+    Worst-case number of items a query can return.
+
+    Args:
+        query: GraphQL document
+        variables: Variables the query will be sent with
+        schema: Parsed schema (defaults to docs/xray_schema.graphql)
+
+    Returns:
+        Sum over paginated fields of limit x the worst-case count of their parents
+    """
+    schema = schema or default_schema()
+    operations, fragments = _QueryParser(query).parse()
+    total = 0
+
+    def walk(selections, parent_type, multiplier):
+        nonlocal total
+        for kind, name, payload in selections:
+            if kind == "spread":
+                type_condition, children = fragments.get(name, (parent_type, []))
+                walk(children, type_condition, multiplier)
+            elif kind == "inline":
+                walk(payload, parent_type, multiplier)
+            else:
+                arguments, children = payload
+                return_type, paginated = schema.field(parent_type, name)
+                child_multiplier = multiplier
+                if paginated or "limit" in arguments:
+                    limit = _resolve(arguments.get("limit"), all_variables)
+                    limit = int(limit) if isinstance(limit, (int, float)) else MAX_PAGE_SIZE
+                    child_multiplier = multiplier * max(limit, 0)
+                    total += child_multiplier
+                if children:
+                    walk(children, return_type, child_multiplier)
+
+    for operation_type, defaults, selections in operations:
+        all_variables = dict(defaults)
+        all_variables.update(variables or {})
+        root_type = "Mutation" if operation_type == "mutation" else "Query"
+        walk(selections, root_type, 1)
+
+    return total
+
+
+def largest_page_size(query: str, variables: Optional[Dict[str, Any]] = None, page_variable: str = "limit",
+                      server_limit: int = DEFAULT_SERVER_LIMIT, max_page_size: int = MAX_PAGE_SIZE,
+                      schema: Optional[XraySchema] = None) -> int:
+    """
+    Largest value for `page_variable` that keeps the query within the server limit.
+
+    Returns at least 1 even if a single item already exceeds the limit.
+    """
+    variables = dict(variables or {})
+    low, high = 1, max(1, max_page_size)
+    while low < high:
+        candidate = (low + high + 1) // 2
+        variables[page_variable] = candidate
+        if estimate_complexity(query, variables, schema) <= server_limit:
+            low = candidate
+        else:
+            high = candidate - 1
+    return low
+
+
+def is_timeout_error(error: Any) -> bool:
+    """True for request timeouts and GraphQL errors that indicate an oversized query."""
+    if type(error).__name__ in ("Timeout", "ReadTimeout", "ConnectTimeout"):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status in (502, 503, 504):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in TIMEOUT_MARKERS)
+
+
+class AdaptivePager:
+    """
+    Page size for a paginated query: the largest size under the complexity limit,
+    halved on timeouts and grown back after consecutive successes.
+    """
+
+    def __init__(self, query: str, variables: Optional[Dict[str, Any]] = None, page_variable: str = "limit",
+                 max_page_size: int = MAX_PAGE_SIZE, server_limit: int = DEFAULT_SERVER_LIMIT,
+                 grow_after: int = 5, schema: Optional[XraySchema] = None):
+        self.max_page_size = largest_page_size(query, variables, page_variable, server_limit,
+                                               max_page_size, schema)
+        self.page_size = self.max_page_size
+        self.grow_after = grow_after
+        self._successes = 0
+
+    def shrink(self) -> int:
+        """Halve the page size after a timeout; returns the new size."""
+        self.page_size = max(1, self.page_size // 2)
+        self._successes = 0
+        return self.page_size
+
+    def record_success(self) -> int:
+        """Count a successful page; double back toward the maximum after `grow_after` in a row."""
+        self._successes += 1
+        if self._successes >= self.grow_after and self.page_size < self.max_page_size:
+            self.page_size = min(self.max_page_size, self.page_size * 2)
+            self._successes = 0
+        return self.page_size
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python query_complexity.py <query.graphql> ['{\"limit\": 100}']")
+        sys.exit(1)
+
+    with open(sys.argv[1], "r") as f:
+        document = f.read()
+    query_variables = json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}
+
+    print(f"Worst-case items: {estimate_complexity(document, query_variables)}")
+    print(f"Server limit: {DEFAULT_SERVER_LIMIT}")
+    print(f"Largest 'limit' under the server limit: {largest_page_size(document, query_variables)}")
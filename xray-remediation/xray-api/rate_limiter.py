@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Process-wide request pacing for concurrent Xray calls.
+
+Concurrent helpers (nested-connection expansion, membership expansion) share one
+token bucket so adding workers does not multiply the request rate seen by Xray.
+The rate is configured with XRAY_RATE_LIMIT (requests per second, default 5) and
+XRAY_RATE_BURST (default 5). Jira REST calls have their own bucket
+(jira_rate_limiter(), JIRA_RATE_LIMIT / JIRA_RATE_BURST).
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Thread-safe token bucket."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: Sustained requests per second (0 or less disables pacing)
+            burst: Requests allowed back to back before pacing applies
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def shared_rate_limiter() -> RateLimiter:
+    """The limiter shared by every concurrent Xray helper in this process."""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(float(os.environ.get("XRAY_RATE_LIMIT", "5")),
+                                          int(os.environ.get("XRAY_RATE_BURST", "5")))
+        return _shared_limiter
+
+
+_jira_limiter: Optional[RateLimiter] = None
+
+
+def jira_rate_limiter() -> RateLimiter:
+    """The limiter shared by every Jira REST call in this process (JIRA_RATE_LIMIT / JIRA_RATE_BURST, default 10)."""
+    global _jira_limiter
+    with _shared_lock:
+        if _jira_limiter is None:
+            _jira_limiter = RateLimiter(float(os.environ.get("JIRA_RATE_LIMIT", "10")),
+                                        int(os.environ.get("JIRA_RATE_BURST", "10")))
+        return _jira_limiter
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Minimal step edits between a test's current and desired steps.
+
+Replacing a test's steps by removing all of them and adding the new list costs
+one request per step twice over and gives every step a new id, which detaches
+it from its execution history. This module compares the two lists instead:
+
+    edits = diff_steps(current_steps, desired_steps)    # keep/update/insert/remove/move
+    plan = plan_step_sync(current_steps, desired_steps)  # what to send to Xray
+    for query, variables in build_step_mutations(issue_id, plan):
+        client.execute_query(query, variables)
+
+Steps are compared on their normalized (action, data, result): surrounding
+whitespace, line endings and runs of spaces do not count as changes.
+
+diff_steps() is the minimal edit script (longest common subsequence), suited
+to showing what changed. Xray itself appends new steps at the end and has no
+mutation that moves a step, so plan_step_sync() works with step slots instead:
+it keeps the current steps that line up with the start of the desired list
+(updating the text of those that differ), removes the rest and appends what is
+left over, choosing the alignment that needs the fewest operations. All
+operations for a test go out as aliased fields of one mutation.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from step_texts import STEP_TEXT_FIELDS
+
+# Operations sent per mutation request
+MAX_STEP_OPERATIONS = 50
+
+_SPACES = re.compile(r"[ \t]+")
+
+StepText = Tuple[str, str, str]
+
+
+def step_text(step: Any) -> StepText:
+    """(action, data, result) of a step given as a dict, a TestStep/Step object or a tuple"""
+    if isinstance(step, dict):
+        values = [step.get(field) for field in STEP_TEXT_FIELDS]
+    elif isinstance(step, tuple) and not hasattr(step, "_fields"):
+        values = list(step[-len(STEP_TEXT_FIELDS):])
+    else:
+        values = [getattr(step, field, "") for field in STEP_TEXT_FIELDS]
+    return tuple(value or "" for value in values)
+
+
+def step_id(step: Any) -> Optional[str]:
+    return step.get("id") if isinstance(step, dict) else getattr(step, "id", None)
+
+
+def normalize_text(text: str) -> str:
+    lines = (text or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(_SPACES.sub(" ", line).strip() for line in lines).strip()
+
+
+def normalize_step(step: Any) -> StepText:
+    """Comparison key of a step"""
+    return tuple(normalize_text(value) for value in step_text(step))
+
+
+class StepEdit(NamedTuple):
+    """One edit of the minimal edit script"""
+    kind: str                 # "keep", "update", "insert", "remove" or "move"
+    step_id: Optional[str]    # Current step it applies to (None for insert)
+    position: int             # Index in the desired list (in the current list for remove)
+    step: Optional[StepText]  # Desired text (None for remove)
+
+
+def _common_subsequence(current: Sequence[StepText], desired: Sequence[StepText]) -> List[Tuple[int, int]]:
+    """Index pairs of a longest common subsequence (common prefix/suffix trimmed before the DP)"""
+    prefix = 0
+    while prefix < min(len(current), len(desired)) and current[prefix] == desired[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < min(len(current), len(desired)) - prefix
+           and current[-1 - suffix] == desired[-1 - suffix]):
+        suffix += 1
+
+    middle_current = current[prefix:len(current) - suffix]
+    middle_desired = desired[prefix:len(desired) - suffix]
+    n, m = len(middle_current), len(middle_desired)
+    lengths = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n - 1, -1, -1):
+        row, below = lengths[i], lengths[i + 1]
+        for j in range(m - 1, -1, -1):
+            row[j] = below[j + 1] + 1 if middle_current[i] == middle_desired[j] else max(below[j], row[j + 1])
+
+    pairs = [(i, i) for i in range(prefix)]
+    i = j = 0
+    while i < n and j < m:
+        if middle_current[i] == middle_desired[j]:
+            pairs.append((prefix + i, prefix + j))
+            i += 1
+            j += 1
+        elif lengths[i + 1][j] >= lengths[i][j + 1]:
+            i += 1
+        else:
+            j += 1
+    pairs.extend((len(current) - suffix + k, len(desired) - suffix + k) for k in range(suffix))
+    return pairs
+
+
+def diff_steps(current: Sequence[Any], desired: Sequence[Any]) -> List[StepEdit]:
+    """
+    Minimal edit script turning the current steps into the desired ones.
+
+    Steps on the longest common subsequence are kept. Of the rest, a current
+    step whose text appears unmatched elsewhere in the desired list is a move;
+    within each gap between kept steps the remaining current steps are paired
+    with desired ones as updates, and leftovers are removes or inserts.
+
+    Returns:
+        Edits in desired order, followed by removes in current order
+    """
+    current_keys = [normalize_step(step) for step in current]
+    desired_keys = [normalize_step(step) for step in desired]
+    pairs = _common_subsequence(current_keys, desired_keys)
+
+    matched_current = {i for i, _ in pairs}
+    matched_desired = {j: i for i, j in pairs}
+    unmatched_current: Dict[StepText, List[int]] = {}
+    for i, key in enumerate(current_keys):
+        if i not in matched_current:
+            unmatched_current.setdefault(key, []).append(i)
+
+    # Moves: same text, out of order relative to the kept steps
+    moved: Dict[int, int] = {}
+    for j, key in enumerate(desired_keys):
+        if j not in matched_desired and unmatched_current.get(key):
+            moved[j] = unmatched_current[key].pop(0)
+    moved_current = set(moved.values())
+
+    # Pair what is left within each gap between kept steps
+    anchors = [(-1, -1)] + sorted(pairs) + [(len(current), len(desired))]
+    updated: Dict[int, int] = {}
+    for (ci, dj), (next_ci, next_dj) in zip(anchors, anchors[1:]):
+        gap_current = [i for i in range(ci + 1, next_ci) if i not in moved_current]
+        gap_desired = [j for j in range(dj + 1, next_dj) if j not in moved]
+        for i, j in zip(gap_current, gap_desired):
+            updated[j] = i
+
+    edits = []
+    for j, key in enumerate(desired_keys):
+        text = step_text(desired[j])
+        if j in matched_desired:
+            edits.append(StepEdit("keep", step_id(current[matched_desired[j]]), j, text))
+        elif j in moved:
+            edits.append(StepEdit("move", step_id(current[moved[j]]), j, text))
+        elif j in updated:
+            edits.append(StepEdit("update", step_id(current[updated[j]]), j, text))
+        else:
+            edits.append(StepEdit("insert", None, j, text))
+    used = matched_current | moved_current | set(updated.values())
+    edits.extend(StepEdit("remove", step_id(step), i, None) for i, step in enumerate(current) if i not in used)
+    return edits
+
+
+class StepSyncPlan(NamedTuple):
+    """Operations that make a test's steps equal to the desired list"""
+    updates: List[Tuple[str, StepText]]  # (step id, new text), in step order
+    removals: List[str]                  # Step ids
+    additions: List[StepText]            # Appended in this order
+    kept: int                            # Steps left untouched
+
+    @property
+    def operations(self) -> int:
+        return len(self.updates) + len(self.removals) + len(self.additions)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.operations == 0
+
+
+def plan_step_sync(current: Sequence[Any], desired: Sequence[Any]) -> StepSyncPlan:
+    """
+    Fewest update/remove/append operations that turn the current steps into the desired ones.
+
+    Current steps that survive keep their id and relative order and take the
+    first desired positions; every other desired step is appended. Among all
+    choices of surviving steps this picks the one that maximizes
+    surviving + unchanged steps, i.e. minimizes removes + appends + updates.
+    """
+    current_keys = [normalize_step(step) for step in current]
+    desired_keys = [normalize_step(step) for step in desired]
+    n, m = len(current_keys), len(desired_keys)
+    limit = min(n, m)
+
+    # best[i][t]: most unchanged steps when t of the first i current steps survive
+    unreachable = -1
+    best = [[0] + [unreachable] * limit for _ in range(n + 1)]
+    kept = [[False] * (limit + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1):
+        previous, row, key = best[i - 1], best[i], current_keys[i - 1]
+        for t in range(1, min(i, limit) + 1):
+            keep = previous[t - 1] + (key == desired_keys[t - 1])
+            # On ties drop this step, so earlier steps survive and keep their positions
+            if keep > previous[t]:
+                row[t], kept[i][t] = keep, True
+            else:
+                row[t] = previous[t]
+
+    survivors = max(range(limit + 1), key=lambda t: (t + best[n][t], t))
+
+    kept_indexes = []
+    t = survivors
+    for i in range(n, 0, -1):
+        if t and kept[i][t]:
+            kept_indexes.append(i - 1)
+            t -= 1
+    kept_indexes.reverse()
+
+    updates = []
+    unchanged = 0
+    for t, i in enumerate(kept_indexes):
+        if current_keys[i] == desired_keys[t]:
+            unchanged += 1
+        else:
+            updates.append((step_id(current[i]), step_text(desired[t])))
+    kept_set = set(kept_indexes)
+    removals = [step_id(step) for i, step in enumerate(current) if i not in kept_set]
+    additions = [step_text(step) for step in desired[survivors:]]
+    return StepSyncPlan(updates, removals, additions, unchanged)
+
+
+def build_step_mutations(issue_id: str, plan: StepSyncPlan,
+                         max_operations: int = MAX_STEP_OPERATIONS) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    """
+    Aliased mutations executing a plan: updates, then removals, then additions.
+
+    Mutation fields run in document order, so additions are appended after the
+    removals. Operation i is returned under alias `u<i>`, `r<i>` or `a<i>`.
+
+    Yields:
+        (query, variables) per request of at most max_operations operations
+    """
+    operations = ([("u", step, text) for step, text in plan.updates]
+                  + [("r", step, None) for step in plan.removals]
+                  + [("a", None, text) for text in plan.additions])
+    for start in range(0, len(operations), max_operations):
+        batch = operations[start:start + max_operations]
+        # updateTestStep and removeTestStep address the step by its id alone
+        needs_issue = any(kind == "a" for kind, _, _ in batch)
+        definitions = ["$issueId: String!"] if needs_issue else []
+        fields = []
+        variables: Dict[str, Any] = {"issueId": issue_id} if needs_issue else {}
+        for i, (kind, step, text) in enumerate(batch, start):
+            if kind in "ur":
+                definitions.append(f"$id{i}: String!")
+                variables[f"id{i}"] = step
+            if kind in "ua":
+                input_type = "UpdateStepInput" if kind == "u" else "CreateStepInput"
+                definitions.append(f"$step{i}: {input_type}!")
+                variables[f"step{i}"] = dict(zip(STEP_TEXT_FIELDS, text))
+            if kind == "u":
+                fields.append(f"    u{i}: updateTestStep(stepId: $id{i}, step: $step{i}) {{ warnings }}")
+            elif kind == "r":
+                # removeTestStep returns a plain String
+                fields.append(f"    r{i}: removeTestStep(stepId: $id{i})")
+            else:
+                fields.append(f"    a{i}: addTestStep(issueId: $issueId, step: $step{i}) {{ id }}")
+        query = f"mutation SyncTestSteps({', '.join(definitions)}) {{\n" + "\n".join(fields) + "\n}"
+        yield query, variables
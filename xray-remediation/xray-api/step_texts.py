@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Content-addressed storage for test step text.
+
+Step text repeats heavily across a project: the same "Launch the app" action or
+"App opens to the Home tab" result appears on hundreds of tests, and empty data
+fields are the norm. A StepTextTable stores each distinct text once, keyed by a
+digest of its content, and steps refer to it by a small integer id. Two steps
+have the same text exactly when they have the same ids, so comparing steps is
+an integer comparison.
+
+The catalog, snapshots, backups and exports all use the same table. In a
+deduplicated JSON document the table is the top-level "step_texts" list and the
+action/data/result of every step is an id into it:
+
+    {"step_texts": ["Launch the app", "", "App opens"],
+     "tests": [{"key": "MLBMOB-1", "steps": [{"id": "s1", "action": 0, "data": 1, "result": 2}]}]}
+
+load_json() expands such documents back to plain strings, so readers do not
+need to know whether a file was deduplicated.
+"""
+
+import hashlib
+import json
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Step fields stored in the text table (step ids are unique and stay inline)
+STEP_TEXT_FIELDS = ("action", "data", "result")
+
+# Top-level key holding the table in deduplicated JSON documents
+TABLE_KEY = "step_texts"
+
+
+def text_digest(text: str) -> bytes:
+    """Content address of a step text"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class StepTextTable:
+    """Each distinct step text stored once in a UTF-8 buffer, addressed by id"""
+
+    def __init__(self, texts: Iterable[str] = ()):
+        self._buffer = bytearray()
+        self._offsets = array("Q", [0])
+        self._ids: Dict[bytes, int] = {}
+        for text in texts:
+            self.add(text)
+
+    def add(self, text: Optional[str]) -> int:
+        """Id of a text, storing it if it is new"""
+        encoded = (text or "").encode("utf-8")
+        digest = hashlib.blake2b(encoded, digest_size=16).digest()
+        text_id = self._ids.get(digest)
+        if text_id is None:
+            text_id = self._ids[digest] = len(self._offsets) - 1
+            self._buffer += encoded
+            self._offsets.append(len(self._buffer))
+        return text_id
+
+    def find(self, text: str) -> Optional[int]:
+        """Id of a text, or None if it was never added"""
+        return self._ids.get(text_digest(text))
+
+    def raw(self, text_id: int) -> bytes:
+        return bytes(self._buffer[self._offsets[text_id]:self._offsets[text_id + 1]])
+
+    def __getitem__(self, text_id: int) -> str:
+        return self._buffer[self._offsets[text_id]:self._offsets[text_id + 1]].decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[text_id] for text_id in range(len(self)))
+
+    @property
+    def stored_bytes(self) -> int:
+        return len(self._buffer)
+
+
+def record_steps(record: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """The step list of a test record (fetch output, GraphQL result or backup entry)"""
+    steps = record.get("steps")
+    if steps is None and isinstance(record.get("current_data"), dict):
+        steps = record["current_data"].get("steps")
+    return steps if isinstance(steps, list) else None
+
+
+def dedupe_steps(steps: List[Dict[str, Any]], table: StepTextTable) -> List[Dict[str, Any]]:
+    """Copies of steps with their text fields replaced by ids into the table"""
+    deduped = []
+    for step in steps:
+        step = dict(step)
+        for field in STEP_TEXT_FIELDS:
+            if isinstance(step.get(field), str):
+                step[field] = table.add(step[field])
+        deduped.append(step)
+    return deduped
+
+
+def dedupe_record(record: Dict[str, Any], table: StepTextTable) -> Dict[str, Any]:
+    """A record with deduplicated steps (the record itself if it has none)"""
+    steps = record_steps(record)
+    if not steps:
+        return record
+    record = dict(record)
+    if "steps" in record:
+        record["steps"] = dedupe_steps(steps, table)
+    else:
+        record["current_data"] = {**record["current_data"], "steps": dedupe_steps(steps, table)}
+    return record
+
+
+def expand_steps(steps: List[Dict[str, Any]], texts) -> None:
+    """Replace text ids in steps with the texts (in place)"""
+    for step in steps:
+        for field in STEP_TEXT_FIELDS:
+            value = step.get(field)
+            if isinstance(value, int) and not isinstance(value, bool):
+                step[field] = texts[value]
+
+
+def dedupe_document(document: Dict[str, Any], records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Deduplicated copy of a document whose record list is `records`.
+
+    Args:
+        document: Top-level object (e.g. {"tests": [...], "total": ...})
+        records: The record list inside it whose steps are deduplicated
+
+    Returns:
+        A shallow copy with TABLE_KEY first and every record's steps replaced by
+        deduplicated copies; the input is not modified
+    """
+    table = StepTextTable()
+    deduped_records = [dedupe_record(record, table) for record in records]
+
+    result = {TABLE_KEY: list(table)}
+    for key, value in document.items():
+        result[key] = deduped_records if value is records else value
+    return result
+
+
+def expand_document(document: Any, records: Optional[List[Dict[str, Any]]] = None) -> Any:
+    """
+    Expand a deduplicated document in place; plain documents are returned unchanged.
+
+    Args:
+        records: Record list to expand; by default every list of dicts at the top level
+    """
+    if not isinstance(document, dict) or TABLE_KEY not in document:
+        return document
+    texts = document.pop(TABLE_KEY)
+    lists = [records] if records is not None else [
+        value for value in document.values() if isinstance(value, list)
+    ]
+    for record_list in lists:
+        for record in record_list:
+            steps = record_steps(record) if isinstance(record, dict) else None
+            if steps:
+                expand_steps(steps, texts)
+    return document
+
+
+def dump_json(document: Dict[str, Any], records: List[Dict[str, Any]], path: str, dedupe: bool = True, **kwargs):
+    """Write a document, deduplicating the step text of `records` unless dedupe is False"""
+    if dedupe:
+        document = dedupe_document(document, records)
+    kwargs.setdefault("ensure_ascii", False)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, **kwargs)
+
+
+def load_json(path: str) -> Any:
+    """Read a JSON document, expanding deduplicated step text"""
+    with open(path, "r", encoding="utf-8") as f:
+        return expand_document(json.load(f))
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Durable SQLite-backed work queue for bulk Xray/Jira scripts.
+
+Every item moves through pending -> in_flight -> done | failed, and each
+transition is its own committed transaction, so a crash loses at most the
+items that were in flight. In-flight items are leased: if a worker dies, its
+lease expires and the item is handed out again, until it has used up its
+attempts (an item that keeps killing its worker ends up failed). A failed
+attempt is handed out again only after a backoff that doubles per attempt.
+run_workers() first releases the leases of dead processes on this host, so a
+rerun right after a crash picks their items up immediately, and keeps
+extending an item's lease while its handler runs. Enqueueing is idempotent
+(items are keyed), so re-running a script resumes where it stopped instead of
+redoing finished work.
+
+    queue = WorkQueue(LOGS_DIR / 'work_queue.sqlite', 'upload_tests')
+    queue.enqueue((test['summary'], test) for test in tests)
+    run_workers(queue, upload_one_test, workers=4)
+    print(queue.counts())
+
+Usage:
+    python work_queue.py status logs/work_queue.sqlite [queue]
+    python work_queue.py retry-failed logs/work_queue.sqlite queue
+    python work_queue.py reset logs/work_queue.sqlite queue
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+STATES = (PENDING, IN_FLIGHT, DONE, FAILED)
+
+
+@dataclass
+class WorkItem:
+    """An item handed to a worker."""
+    key: str
+    payload: Any
+    attempts: int
+
+
+class WorkQueue:
+    """A named queue of keyed items in a SQLite file (several queues can share one file)."""
+
+    def __init__(self, path: str, name: str = "default", lease_seconds: float = 300, max_attempts: int = 3,
+                 retry_delay: float = 5):
+        """
+        Args:
+            path: SQLite file
+            name: Queue name within the file
+            lease_seconds: How long a claimed item stays reserved for its worker
+            max_attempts: Attempts before an item is marked failed
+            retry_delay: Seconds before a failed item is handed out again, doubled per attempt
+        """
+        self.path = str(path)
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " queue TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " payload TEXT,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " lease_until REAL,"
+            " owner TEXT,"
+            " result TEXT,"
+            " error TEXT,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (queue, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS items_state ON items (queue, state, seq)")
+
+    def _transaction(self, statements: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._db)
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def enqueue(self, items: Iterable[Tuple[str, Any]]) -> int:
+        """
+        Add (key, payload) items; keys already in the queue are left untouched.
+
+        Returns:
+            Number of new items
+        """
+        now = time.time()
+
+        def insert(db):
+            seq = db.execute("SELECT COALESCE(MAX(seq), 0) FROM items WHERE queue = ?", (self.name,)).fetchone()[0]
+            added = 0
+            for key, payload in items:
+                seq += 1
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO items (queue, key, seq, payload, state, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.name, str(key), seq, json.dumps(payload), PENDING, now)
+                )
+                added += cursor.rowcount
+            return added
+
+        return self._transaction(insert)
+
+    def claim(self, limit: int = 1, worker: Optional[str] = None) -> List[WorkItem]:
+        """
+        Lease up to `limit` pending items whose retry backoff has passed, or
+        in-flight items whose lease has expired; an expired item that has used
+        up its attempts is marked failed.
+        """
+        now = time.time()
+        owner = f"{self.owner}:{worker or threading.current_thread().name}"
+
+        def lease(db):
+            db.execute(
+                "UPDATE items SET state = ?, error = 'Lease expired after ' || attempts || ' attempts', "
+                "lease_until = NULL, updated_at = ? "
+                "WHERE queue = ? AND state = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, now, self.name, IN_FLIGHT, now, self.max_attempts)
+            )
+            rows = db.execute(
+                "SELECT key, payload, attempts FROM items WHERE queue = ? AND "
+                "((state = ? AND (lease_until IS NULL OR lease_until <= ?)) OR (state = ? AND lease_until < ?)) "
+                "ORDER BY seq LIMIT ?",
+                (self.name, PENDING, now, IN_FLIGHT, now, limit)
+            ).fetchall()
+            for key, _, _ in rows:
+                db.execute(
+                    "UPDATE items SET state = ?, attempts = attempts + 1, lease_until = ?, owner = ?, "
+                    "updated_at = ? WHERE queue = ? AND key = ?",
+                    (IN_FLIGHT, now + self.lease_seconds, owner, now, self.name, key)
+                )
+            return [WorkItem(key, json.loads(payload), attempts + 1) for key, payload, attempts in rows]
+
+        return self._transaction(lease)
+
+    def complete(self, key: str, result: Any = None):
+        """Mark an item done, storing its result."""
+        self._transaction(lambda db: db.execute(
+            "UPDATE items SET state = ?, result = ?, error = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE queue = ? AND key = ?",
+            (DONE, json.dumps(result), time.time(), self.name, str(key))
+        ))
+
+    def fail(self, key: str, error: str, retry: bool = True):
+        """
+        Record a failed attempt; the item goes back to pending, held back for
+        the retry backoff, until max_attempts is reached.
+
+        A failure reported for an item that was not claimed (e.g. work done
+        outside run_workers) counts as an attempt of its own.
+        """
+        def record(db):
+            row = db.execute("SELECT attempts, state FROM items WHERE queue = ? AND key = ?",
+                             (self.name, str(key))).fetchone()
+            attempts, current = row if row else (self.max_attempts, None)
+            if current in (PENDING, FAILED):
+                attempts += 1
+            state = PENDING if retry and attempts < self.max_attempts else FAILED
+            now = time.time()
+            not_before = now + self.retry_delay * 2 ** (attempts - 1) if state == PENDING else None
+            db.execute(
+                "UPDATE items SET state = ?, attempts = ?, error = ?, lease_until = ?, updated_at = ? "
+                "WHERE queue = ? AND key = ?",
+                (state, attempts, error, not_before, now, self.name, str(key))
+            )
+            return state
+
+        return self._transaction(record)
+
+    def release_dead_leases(self) -> int:
+        """
+        Give back the items leased by processes on this host that are no longer
+        running, without waiting for their leases to expire. Items that have used
+        up their attempts are marked failed, the rest go back to pending.
+
+        Returns:
+            Number of items released
+        """
+        host = socket.gethostname()
+        now = time.time()
+
+        def release(db):
+            rows = db.execute("SELECT key, attempts, owner FROM items WHERE queue = ? AND state = ? AND owner LIKE ?",
+                              (self.name, IN_FLIGHT, f"{host}:%")).fetchall()
+            released = 0
+            for key, attempts, owner in rows:
+                pid = owner[len(host) + 1:].split(":", 1)[0]
+                if not pid.isdigit() or _process_alive(int(pid)):
+                    continue
+                state = PENDING if attempts < self.max_attempts else FAILED
+                db.execute(
+                    "UPDATE items SET state = ?, error = ?, lease_until = NULL, updated_at = ? "
+                    "WHERE queue = ? AND key = ?",
+                    (state, f"Worker process {pid} died (attempt {attempts})", now, self.name, key)
+                )
+                released += 1
+            return released
+
+        released = self._transaction(release)
+        if released:
+            logger.info(f"{self.name}: released {released} items leased by dead processes")
+        return released
+
+    def next_retry_in(self) -> Optional[float]:
+        """Seconds until a pending item in backoff becomes available (0 if one already is), or None if none waits."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(COALESCE(lease_until, 0)) FROM items WHERE queue = ? AND state = ?",
+                (self.name, PENDING)
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def extend_lease(self, key: str):
+        """Keep a long-running item reserved."""
+        now = time.time()
+        self._transaction(lambda db: db.execute(
+            "UPDATE items SET lease_until = ?, updated_at = ? WHERE queue = ? AND key = ? AND state = ?",
+            (now + self.lease_seconds, now, self.name, str(key), IN_FLIGHT)
+        ))
+
+    def counts(self) -> Dict[str, int]:
+        """Number of items per state."""
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM items WHERE queue = ? GROUP BY state",
+                                    (self.name,)).fetchall()
+        counts = {state: 0 for state in STATES}
+        counts.update(dict(rows))
+        return counts
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """State, attempts, result and error of one item."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state, attempts, result, error FROM items WHERE queue = ? AND key = ?",
+                (self.name, str(key))
+            ).fetchone()
+        if row is None:
+            return None
+        state, attempts, result, error = row
+        return {"state": state, "attempts": attempts,
+                "result": json.loads(result) if result is not None else None, "error": error}
+
+    def items(self, state: Optional[str] = None) -> Iterator[Tuple[str, Any, Any, Optional[str]]]:
+        """Yield (key, payload, result, error) in enqueue order, optionally for one state."""
+        with self._lock:
+            if state:
+                rows = self._db.execute(
+                    "SELECT key, payload, result, error FROM items WHERE queue = ? AND state = ? ORDER BY seq",
+                    (self.name, state)
+                ).fetchall()
+            else:
+                rows = self._db.execute(
+                    "SELECT key, payload, result, error FROM items WHERE queue = ? ORDER BY seq", (self.name,)
+                ).fetchall()
+        for key, payload, result, error in rows:
+            yield key, json.loads(payload), json.loads(result) if result is not None else None, error
+
+    def retry_failed(self) -> int:
+        """Move failed items back to pending with a fresh attempt budget."""
+        return self._transaction(lambda db: db.execute(
+            "UPDATE items SET state = ?, attempts = 0, lease_until = NULL, updated_at = ? "
+            "WHERE queue = ? AND state = ?",
+            (PENDING, time.time(), self.name, FAILED)
+        ).rowcount)
+
+    def reset(self):
+        """Remove every item of this queue."""
+        self._transaction(lambda db: db.execute("DELETE FROM items WHERE queue = ?", (self.name,)))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # os.kill(pid, 0) would terminate the process on Windows; rely on lease expiry
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_workers(queue: WorkQueue, handler: Callable[[WorkItem], Any], workers: int = 1,
+                progress: Optional[Callable[[WorkItem, bool, Any], None]] = None) -> Dict[str, int]:
+    """
+    Process every available item with `workers` threads.
+
+    Items leased by dead processes on this host are released first. The
+    handler's return value is stored as the item's result; an exception is
+    recorded as a failed attempt (retried up to the queue's max_attempts,
+    after the queue's backoff). While a handler runs, its item's lease is
+    extended every third of the lease time, so a slow handler is not given
+    the same item a second time.
+
+    Args:
+        queue: Queue to drain
+        handler: Called with each WorkItem
+        workers: Worker threads
+        progress: Optional callback(item, succeeded, result_or_error)
+
+    Returns:
+        Item counts per state after the run
+    """
+    def heartbeat(key: str, stop: threading.Event):
+        while not stop.wait(queue.lease_seconds / 3):
+            queue.extend_lease(key)
+
+    def work():
+        while True:
+            claimed = queue.claim()
+            if not claimed:
+                # Wait for items in retry backoff instead of leaving them behind
+                wait = queue.next_retry_in()
+                if wait is None:
+                    return
+                time.sleep(max(0.05, min(wait, 1.0)))
+                continue
+            item = claimed[0]
+            stop = threading.Event()
+            threading.Thread(target=heartbeat, args=(item.key, stop), daemon=True).start()
+            try:
+                result = handler(item)
+            except Exception as e:
+                state = queue.fail(item.key, str(e))
+                logger.warning(f"{queue.name}: {item.key} failed (attempt {item.attempts}, now {state}): {e}")
+                if progress:
+                    progress(item, False, e)
+            else:
+                queue.complete(item.key, result)
+                if progress:
+                    progress(item, True, result)
+            finally:
+                stop.set()
+
+    queue.release_dead_leases()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for future in [executor.submit(work) for _ in range(max(1, workers))]:
+            future.result()
+    return queue.counts()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("status", "retry-failed", "reset") or \
+            (sys.argv[1] != "status" and len(sys.argv) < 4):
+        print("Usage: python work_queue.py status <queue.sqlite> [queue]")
+        print("       python work_queue.py retry-failed <queue.sqlite> <queue>")
+        print("       python work_queue.py reset <queue.sqlite> <queue>")
+        sys.exit(1)
+
+    command, path = sys.argv[1], sys.argv[2]
+    if command == "status":
+        names = sys.argv[3:] or [row[0] for row in sqlite3.connect(path).execute(
+            "SELECT DISTINCT queue FROM items ORDER BY queue")]
+        for queue_name in names:
+            counts = WorkQueue(path, queue_name).counts()
+            print(f"{queue_name}: " + ", ".join(f"{state} {count}" for state, count in counts.items()))
+    elif command == "retry-failed":
+        print(f"✓ {WorkQueue(path, sys.argv[3]).retry_failed()} failed items requeued")
+    else:
+        WorkQueue(path, sys.argv[3]).reset()
+        print(f"✓ Queue {sys.argv[3]} cleared")